@@ -43,6 +43,65 @@ class Settings(BaseSettings):
     MAX_LOGIN_ATTEMPTS: int = 5
     ACCOUNT_LOCKOUT_MINUTES: int = 30
 
+    # AI result cache (keyed by file SHA-256, task, model and prompt version)
+    AI_RESULT_CACHE_ENABLED: bool = True
+    AI_RESULT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB of cached results
+
+    # Shared page-rasterization cache (OCR, classification, metadata extraction, thumbnails)
+    PAGE_CACHE_DIR: str = "uploads/page_cache"
+    PAGE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2GB of rendered pages
+
+    # Metadata extraction: pages sent to the vision model per request
+    METADATA_EXTRACTION_PAGE_WINDOW: int = 4
+
+    # Warehouse hierarchy tree cache (invalidated on warehouse writes)
+    WAREHOUSE_HIERARCHY_CACHE_TTL_SECONDS: int = 60
+
+    # In-memory barcode index for scanner lookups (changes arrive by LISTEN/NOTIFY; the interval is a background full reload that repairs missed ones)
+    BARCODE_INDEX_ENABLED: bool = True
+    BARCODE_INDEX_REFRESH_SECONDS: int = 300
+
+    # Per-location capacity snapshots (incremental refresh / websocket push interval, full rebuild interval)
+    CAPACITY_SNAPSHOT_REFRESH_SECONDS: int = 5
+    CAPACITY_SNAPSHOT_FULL_REBUILD_SECONDS: int = 300
+
+    # Approval escalation worker (one leader across replicas; others retry at this interval)
+    APPROVAL_ESCALATION_ENABLED: bool = True
+    APPROVAL_LEADER_RETRY_SECONDS: int = 30
+
+    # Compiled routing rules (reloaded to pick up edits made by other worker processes)
+    ROUTING_RULES_REFRESH_SECONDS: int = 60
+
+    # Workflow engine: compiled graph cache and timer scheduler
+    WORKFLOW_GRAPH_CACHE_SIZE: int = 512
+    WORKFLOW_TIMER_POLL_SECONDS: int = 30
+    WORKFLOW_TIMER_LEASE_SECONDS: int = 300
+
+    # Websocket notifications: cross-process bus ("postgres" LISTEN/NOTIFY or "local")
+    # and per-connection outbound queue (slow consumers beyond these limits are dropped)
+    WEBSOCKET_BUS_BACKEND: str = "postgres"
+    WEBSOCKET_BUS_CHANNEL: str = "websocket_notifications"
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256
+    WEBSOCKET_SEND_TIMEOUT_SECONDS: float = 10.0
+
+    # Informational notifications within this window are coalesced into one digest per user (0 disables)
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: int = 300
+
+    # Audit log: batched writes (flush interval/size, buffer cap) and asynchronous chain sealing
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_MAX_PENDING: int = 50000
+    AUDIT_SEAL_INTERVAL_SECONDS: int = 10
+    AUDIT_SEAL_BATCH_SIZE: int = 5000
+    # Worker processes for offline chain verification (one partition per worker)
+    AUDIT_VERIFY_WORKERS: int = 4
+
+    # Checkout analytics: how often checkouts past their due date are flagged overdue
+    CHECKOUT_OVERDUE_SWEEP_SECONDS: int = 60
+
+    # Folder statistics: how often pending deltas are folded into folder_stats
+    FOLDER_STATS_FOLD_SECONDS: int = 30
+
     @property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
@@ -44,7 +44,7 @@ from app.routers import (
     physical_barcodes, physical_locations, physical_mobile, physical_print,
     checkinout, warehouse, warehouse_extensions, warehouse_print, metadata_schemas,
     classification, embeddings, metadata_extraction, search, documents_extensions,
-    ai, signatures
+    ai, signatures, websocket
 )
 from app.routers import settings as settings_router
 
@@ -247,6 +247,7 @@ app.include_router(metadata_extraction.router)
 app.include_router(search.router)
 app.include_router(ai.router)
 app.include_router(signatures.router)
+app.include_router(websocket.router)
 
 # Pydantic models
 class SearchRequest(BaseModel):
@@ -274,6 +275,41 @@ async def startup_event():
         init_db_pool()
         embedding_service.load_model()
 
+        # Load the scanner barcode index in the background and follow changes
+        # from all workers (lookups go to SQL until it is loaded)
+        from app.services.barcode_index import barcode_index
+        barcode_index.start()
+
+        # Push capacity snapshots to subscribed warehouse dashboards
+        from app.services.capacity_snapshot_service import capacity_snapshot_service
+        capacity_snapshot_service.start_publisher()
+
+        # Escalate overdue approvals as their deadlines pass (one leader across replicas)
+        from app.services.approval_scheduler import start_approval_scheduler
+        start_approval_scheduler()
+
+        # Resume workflow executions whose timers are due
+        from app.services.workflow_timer_scheduler import workflow_timer_scheduler
+        workflow_timer_scheduler.start()
+
+        # Receive websocket notifications raised by other workers and replicas
+        from app.services.websocket_manager import connection_manager
+        connection_manager.start()
+
+        # Batch audit log writes and seal them into per-partition hash chains
+        from app.services.audit_logger import audit_logger
+        from app.services.audit_chain import audit_chain_sealer
+        audit_logger.start()
+        audit_chain_sealer.start()
+
+        # Flag overdue checkouts (feeds the precomputed checkout analytics)
+        from app.services.checkout_analytics import checkout_analytics_service
+        checkout_analytics_service.start()
+
+        # Fold pending folder statistics deltas into folder_stats
+        from app.services.folder_index import folder_index_service
+        folder_index_service.start()
+
         # Check LLM service status
         from app.llm_service import llm_service
         llm_info = llm_service.get_provider_info()
@@ -287,6 +323,24 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    from app.services.barcode_index import barcode_index
+    await barcode_index.shutdown()
+    from app.services.capacity_snapshot_service import capacity_snapshot_service
+    await capacity_snapshot_service.stop_publisher()
+    from app.services.approval_scheduler import stop_approval_scheduler
+    stop_approval_scheduler()
+    from app.services.workflow_timer_scheduler import workflow_timer_scheduler
+    await workflow_timer_scheduler.shutdown()
+    from app.services.websocket_manager import connection_manager
+    await connection_manager.shutdown()
+    from app.services.audit_logger import audit_logger
+    from app.services.audit_chain import audit_chain_sealer
+    await audit_chain_sealer.shutdown()
+    await audit_logger.shutdown()
+    from app.services.checkout_analytics import checkout_analytics_service
+    await checkout_analytics_service.shutdown()
+    from app.services.folder_index import folder_index_service
+    await folder_index_service.shutdown()
     close_db_pool()
     logger.info("API shutdown complete")
 
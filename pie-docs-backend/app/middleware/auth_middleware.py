@@ -125,3 +125,14 @@ def require_roles(*required_roles: str):
         return current_user
 
     return role_checker
+
+
+async def get_websocket_user(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Authenticate a websocket connection from the access token it passes as
+    a query parameter (browsers cannot set headers on websocket requests)
+    Returns None if the token is missing or invalid
+    """
+    if not token:
+        return None
+    return await get_current_user_optional(f"Bearer {token}")
@@ -83,6 +83,7 @@ class CustomSummaryResponse(BaseModel):
     summary: str
     word_count: int
     generation_time_ms: int
+    cached: bool = False
 
 
 # ==========================================
@@ -103,6 +103,14 @@ class DocumentListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    tag_facets: Optional[List[Dict[str, Any]]] = None
+
+
+class ThumbnailBatchRequest(BaseModel):
+    """Thumbnails for a page of the document grid in one round trip"""
+    document_ids: List[UUID] = Field(..., min_length=1, max_length=100)
+    size: str = 'grid'
+    format: str = 'webp'
 
 
 # ==========================================
@@ -327,6 +335,10 @@ class Folder(FolderBase):
     path: str
     document_count: int = 0
     total_size: int = 0
+    # Including all descendant folders
+    subtree_document_count: int = 0
+    subtree_total_size: int = 0
+    subtree_folder_count: int = 0
     permissions: Dict[str, Any] = {}
     owner_id: Optional[UUID]
     created_by: Optional[UUID]
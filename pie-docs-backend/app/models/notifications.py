@@ -2,7 +2,7 @@
 Notification Pydantic models
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
 
@@ -33,6 +33,10 @@ class Notification(NotificationBase):
     is_read: bool = False
     read_at: Optional[datetime] = None
     created_at: datetime
+    # Event payload; digests hold the latest of event_count coalesced events
+    data: Optional[Dict[str, Any]] = None
+    event_count: int = 1
+    last_event_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -126,7 +126,7 @@ class BarcodeGenerationRequest(BaseModel):
     format: BarcodeFormatType
     prefix: Optional[str] = None
     suffix: Optional[str] = None
-    quantity: int = 1
+    quantity: int = Field(1, ge=0, le=1000000)
 
 
 class BarcodeGenerationJob(BaseModel):
@@ -171,7 +171,7 @@ class WorkflowExecutionBase(BaseModel):
     workflow_id: UUID
     document_id: Optional[UUID] = None
     current_step_id: Optional[str] = None
-    status: Literal['running', 'completed', 'failed', 'paused'] = 'running'
+    status: Literal['running', 'completed', 'failed', 'paused', 'waiting'] = 'running'
     execution_data: Dict[str, Any] = Field(default_factory=dict)
 
 
@@ -196,7 +196,7 @@ class WorkflowExecutionResponse(WorkflowExecutionBase):
 class WorkflowExecutionUpdate(BaseModel):
     """Schema for updating workflow execution"""
     current_step_id: Optional[str] = None
-    status: Optional[Literal['running', 'completed', 'failed', 'paused']] = None
+    status: Optional[Literal['running', 'completed', 'failed', 'paused', 'waiting']] = None
     execution_data: Optional[Dict[str, Any]] = None
     error_message: Optional[str] = None
 
@@ -19,6 +19,7 @@ from app.models.ai import (
 )
 from app.database import get_db_cursor
 from app.services.document_intelligence_service import document_intelligence_service
+from app.services.ai_result_cache import ai_result_cache
 from app.middleware.auth_middleware import get_current_user, get_current_user_optional
 from app.config import settings
 
@@ -153,7 +154,7 @@ async def create_custom_summary(
         # Get document OCR text
         with get_db_cursor() as cursor:
             cursor.execute("""
-                SELECT ocr.extracted_text
+                SELECT ocr.extracted_text, d.checksum_sha256
                 FROM documents d
                 LEFT JOIN ocr_results ocr ON d.id = ocr.document_id
                 WHERE d.id = %s AND d.deleted_at IS NULL
@@ -167,22 +168,33 @@ async def create_custom_summary(
                 )
 
             text_content = row['extracted_text']
+            content_sha256 = row['checksum_sha256']
 
         # Generate custom summary
         max_lengths = {"short": 100, "medium": 200, "long": 400}
         max_length = max_lengths.get(request.length, 200)
 
-        success, summary_data, error = document_intelligence_service.generate_summary(
-            text_content, max_length=max_length, extract_key_points=True
-        )
+        # Reuse a summary cached for identical file bytes and OCR text
+        task = f"summary:{request.length}"
+        prompt_version = f"{document_intelligence_service.PROMPT_VERSION}:{ai_result_cache.fingerprint(text_content)}"
+        summary_data = ai_result_cache.get(content_sha256, task, document_intelligence_service.MODEL, prompt_version)
+        cached = summary_data is not None
 
-        if not success:
-            raise HTTPException(status_code=500, detail=error or "Failed to generate summary")
+        if not cached:
+            success, summary_data, error = document_intelligence_service.generate_summary(
+                text_content, max_length=max_length, extract_key_points=True
+            )
+
+            if not success:
+                raise HTTPException(status_code=500, detail=error or "Failed to generate summary")
+
+            ai_result_cache.put(content_sha256, task, document_intelligence_service.MODEL, prompt_version, summary_data)
 
         return CustomSummaryResponse(
             summary=summary_data['summary_text'],
             word_count=summary_data['word_count'],
-            generation_time_ms=summary_data['generation_time_ms']
+            generation_time_ms=summary_data['generation_time_ms'],
+            cached=cached
         )
 
     except HTTPException:
@@ -741,6 +753,24 @@ async def download_generated_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ==========================================
+# AI Result Cache
+# ==========================================
+
+@router.get("/cache/stats")
+async def get_ai_result_cache_stats(
+    current_user: Optional[dict] = Depends(get_auth_dependency())
+):
+    """
+    Report AI result cache usage per task (OCR, classification, summaries, metadata extraction)
+    """
+    try:
+        return ai_result_cache.get_stats()
+    except Exception as e:
+        logger.error(f"Error fetching AI result cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ==========================================
 # Health Check
 # ==========================================
@@ -23,11 +23,23 @@ from app.services.approval_service import (
     ApprovalPermissionError
 )
 from app.services.notification_service import notification_service
+from app.services.routing_rule_matcher import compile_conditions, routing_rule_matcher
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/approvals", tags=["approvals"])
 
+# Documents per batch auto-route call
+MAX_AUTO_ROUTE_DOCUMENTS = 10000
+
+
+def validate_routing_conditions(conditions: Dict[str, Any]) -> None:
+    """Reject conditions the routing matcher cannot compile (400)"""
+    try:
+        compile_conditions(conditions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid routing conditions: {e}")
+
 
 # ==========================================
 # Approval Chains
@@ -1013,6 +1025,33 @@ async def auto_route_request(document_metadata: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/requests/auto-route/batch")
+async def auto_route_requests(documents: List[Dict[str, Any]]):
+    """
+    Find the matching approval chain for each document (e.g. bulk imports).
+    Results are in input order; chain_id is null where no rule matched.
+    """
+    if len(documents) > MAX_AUTO_ROUTE_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_AUTO_ROUTE_DOCUMENTS} documents can be routed per request"
+        )
+
+    try:
+        chain_ids = routing_rule_matcher.match_many(documents)
+        return {
+            "total": len(documents),
+            "matched": sum(1 for chain_id in chain_ids if chain_id),
+            "results": [
+                {"index": i, "chain_id": str(chain_id) if chain_id else None}
+                for i, chain_id in enumerate(chain_ids)
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error auto-routing requests: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/escalation/check-timeouts")
 async def check_escalation_timeouts():
     """
@@ -1082,6 +1121,8 @@ async def create_routing_rule(rule: RoutingRuleCreate):
     Create a new routing rule
     """
     try:
+        validate_routing_conditions(rule.conditions)
+
         with get_db_cursor(commit=True) as cursor:
             cursor.execute("""
                 INSERT INTO routing_rules (name, description, conditions, target_chain_id, priority, is_active)
@@ -1093,7 +1134,11 @@ async def create_routing_rule(rule: RoutingRuleCreate):
             ))
 
             new_rule = cursor.fetchone()
-            return dict(new_rule)
+
+        routing_rule_matcher.invalidate()
+        return dict(new_rule)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating routing rule: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1119,6 +1164,9 @@ async def update_routing_rule(rule_id: UUID, rule_update: RoutingRuleUpdate):
         if not update_fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
+        if rule_update.conditions is not None:
+            validate_routing_conditions(rule_update.conditions)
+
         params.append(str(rule_id))
 
         with get_db_cursor(commit=True) as cursor:
@@ -1134,7 +1182,8 @@ async def update_routing_rule(rule_id: UUID, rule_update: RoutingRuleUpdate):
             if not rule:
                 raise HTTPException(status_code=404, detail="Routing rule not found")
 
-            return dict(rule)
+        routing_rule_matcher.invalidate()
+        return dict(rule)
     except HTTPException:
         raise
     except Exception as e:
@@ -1154,6 +1203,7 @@ async def delete_routing_rule(rule_id: UUID):
             if not cursor.fetchone():
                 raise HTTPException(status_code=404, detail="Routing rule not found")
 
+        routing_rule_matcher.invalidate()
     except HTTPException:
         raise
     except Exception as e:
@@ -1177,74 +1227,44 @@ async def bulk_approval_action(bulk_action: BulkApprovalAction):
     if bulk_action.action not in ['approve', 'reject', 'request_changes']:
         raise HTTPException(status_code=400, detail="Invalid action type")
 
-    succeeded = []
-    failed = []
-
     try:
-        # Validate permissions for all requests first
-        permissions = ApprovalService.validate_bulk_action_permissions(
+        # Permission check, action inserts, status updates and workflow
+        # progression for all requests run in one transaction
+        result = ApprovalService.apply_bulk_action(
             bulk_action.user_id,
             bulk_action.approval_ids,
-            bulk_action.action
+            bulk_action.action,
+            bulk_action.comments
         )
-
-        # Add denied requests to failed list
-        for denied_id in permissions['denied']:
-            failed.append({
-                "id": str(denied_id),
-                "error": "Permission denied or request not eligible"
-            })
-
-        # Process allowed requests
-        with get_db_cursor(commit=True) as cursor:
-            for approval_id in permissions['allowed']:
-                try:
-                    # Get current step
-                    cursor.execute("""
-                        SELECT current_step FROM approval_requests WHERE id = %s
-                    """, (str(approval_id),))
-                    request = cursor.fetchone()
-                    current_step = request['current_step'] if request else 1
-
-                    # Insert action
+        succeeded = result['succeeded']
+        failed = [
+            {"id": request_id, "error": error}
+            for request_id, error in result['denied'].items()
+        ]
+
+        # One grouped notification fan-out (non-blocking - errors won't fail the request)
+        if succeeded:
+            try:
+                with get_db_cursor() as cursor:
                     cursor.execute("""
-                        INSERT INTO approval_actions (approval_request_id, user_id, action, comments, annotations, step_number)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
-                        str(approval_id),
-                        str(bulk_action.user_id),
-                        bulk_action.action,
-                        bulk_action.comments,
-                        Json({}),
-                        current_step
-                    ))
-
-                    # Update request status based on action
-                    new_status = {
-                        'approve': 'pending',  # Will be updated by workflow progression
-                        'reject': 'rejected',
-                        'request_changes': 'changes_requested'
-                    }.get(bulk_action.action, 'pending')
-
-                    cursor.execute("""
-                        UPDATE approval_requests
-                        SET status = %s, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (new_status, str(approval_id)))
-
-                    succeeded.append(approval_id)
-
-                    # Progress workflow for approve actions
-                    if bulk_action.action == 'approve':
-                        progress_result = ApprovalService.progress_workflow(approval_id)
-                        logger.info(f"Bulk workflow progression for {approval_id}: {progress_result}")
-
-                except Exception as item_error:
-                    failed.append({
-                        "id": str(approval_id),
-                        "error": str(item_error)
-                    })
-                    logger.error(f"Error processing approval {approval_id}: {item_error}")
+                        SELECT ar.id, ar.requester_id, ar.assigned_to, d.title AS document_title
+                        FROM approval_requests ar
+                        LEFT JOIN documents d ON ar.document_id = d.id
+                        WHERE ar.id = ANY(%s::uuid[])
+                    """, (succeeded,))
+                    requests = cursor.fetchall()
+
+                await notification_service.notify_bulk_approval_results(
+                    decided_by=str(bulk_action.user_id),
+                    action=bulk_action.action,
+                    comments=bulk_action.comments,
+                    requests=requests,
+                    progress=result['progress'],
+                    failed_count=len(failed),
+                    total_count=len(bulk_action.approval_ids)
+                )
+            except Exception as notif_error:
+                logger.warning(f"Failed to send bulk action notifications: {notif_error}")
 
         return BulkApprovalResult(
             succeeded=succeeded,
@@ -4,13 +4,17 @@ Handles audit log querying and viewing
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Optional, List, Tuple
 from datetime import datetime
+from uuid import UUID
+import base64
 import logging
 
 from app.database import get_db_cursor
-from app.middleware import get_current_user
+from app.middleware import get_current_user, require_permissions
+from app.services.audit_verification import audit_chain_verifier
 
 logger = logging.getLogger(__name__)
 
@@ -42,10 +46,119 @@ class AuditLogResponse(BaseModel):
 
 class AuditLogsListResponse(BaseModel):
     audit_logs: List[AuditLogResponse]
+    # Exact up to EXACT_COUNT_LIMIT matches, otherwise the planner's estimate
     total: int
+    total_is_estimate: bool = False
     page: int
     page_size: int
     total_pages: int
+    # Pass as cursor to fetch the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+# ============= Helpers =============
+
+# Matches beyond this are counted from the query plan's row estimate
+EXACT_COUNT_LIMIT = 10000
+
+AUDIT_LOG_COLUMNS = """
+    id, event_type, resource_type, resource_id, user_id,
+    ip_address, user_agent, action, description, metadata,
+    old_values, new_values, success, error_message, created_at
+"""
+
+
+def encode_cursor(created_at: datetime, log_id: Any) -> str:
+    """Opaque keyset cursor for the row a page ended on"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{log_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), str(UUID(log_id))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def count_matches(cursor, where_sql: str, params: List[Any]) -> Tuple[int, bool]:
+    """Exact count when small, otherwise the planner's estimate; returns (count, is_estimate)"""
+    cursor.execute(
+        f"SELECT COUNT(*) AS count FROM (SELECT 1 FROM audit_logs WHERE {where_sql} LIMIT %s) AS bounded",
+        params + [EXACT_COUNT_LIMIT + 1]
+    )
+    count = cursor.fetchone()['count']
+    if count <= EXACT_COUNT_LIMIT:
+        return count, False
+
+    cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM audit_logs WHERE {where_sql}", params)
+    plan = cursor.fetchone()['QUERY PLAN']
+    return max(int(plan[0]['Plan']['Plan Rows']), count), True
+
+
+def list_audit_logs(
+    filters: List[Tuple[str, Any]],
+    page: int,
+    page_size: int,
+    cursor: Optional[str]
+) -> AuditLogsListResponse:
+    """
+    Newest-first page of audit logs matching filters ((sql condition, value) pairs).
+    With a cursor the page starts after the cursor row (keyset, served by the
+    (created_at, id) primary key); without one, page > 1 falls back to OFFSET.
+    """
+    where = [condition for condition, _ in filters] or ["TRUE"]
+    params = [value for _, value in filters]
+    where_sql = " AND ".join(where)
+
+    page_where_sql = where_sql
+    page_params = list(params)
+    offset = 0
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        page_where_sql += " AND (created_at, id) < (%s, %s)"
+        page_params += [created_at, log_id]
+    else:
+        offset = (page - 1) * page_size
+
+    with get_db_cursor() as db_cursor:
+        total, is_estimate = count_matches(db_cursor, where_sql, params)
+
+        # One extra row tells whether there is a next page
+        db_cursor.execute(
+            f"""
+            SELECT {AUDIT_LOG_COLUMNS}
+            FROM audit_logs
+            WHERE {page_where_sql}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s OFFSET %s
+            """,
+            page_params + [page_size + 1, offset]
+        )
+        audit_logs = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(audit_logs) > page_size:
+        audit_logs = audit_logs[:page_size]
+        next_cursor = encode_cursor(audit_logs[-1]['created_at'], audit_logs[-1]['id'])
+
+    return AuditLogsListResponse(
+        audit_logs=[
+            AuditLogResponse(**{
+                **dict(log),
+                'id': str(log['id']),
+                'resource_id': str(log['resource_id']) if log['resource_id'] else None,
+                'user_id': str(log['user_id']) if log['user_id'] else None,
+            })
+            for log in audit_logs
+        ],
+        total=total,
+        total_is_estimate=is_estimate,
+        page=page,
+        page_size=page_size,
+        total_pages=(total + page_size - 1) // page_size,
+        next_cursor=next_cursor
+    )
 
 
 # ============= Audit Logs Endpoints =============
@@ -54,82 +167,46 @@ class AuditLogsListResponse(BaseModel):
 async def get_audit_logs(
     event_type: Optional[str] = None,
     resource_type: Optional[str] = None,
+    resource_id: Optional[UUID] = None,
     user_id: Optional[str] = None,
     success: Optional[bool] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get audit logs with optional filters
 
     - Requires authentication
-    - Supports filtering by event type, resource type, user, success status, and date range
-    - Supports pagination
+    - Supports filtering by event type, resource, user, success status, and date range
+    - Pages newest first; follow next_cursor for the next page (page numbers
+      without a cursor still work but get slower the deeper they go)
+    - total is exact up to 10,000 matches and estimated beyond
     """
     try:
-        # Build query
-        query = """
-            SELECT id, event_type, resource_type, resource_id, user_id,
-                   ip_address, user_agent, action, description, metadata,
-                   old_values, new_values, success, error_message, created_at
-            FROM audit_logs
-            WHERE 1=1
-        """
-        params = []
-
+        filters = []
         if event_type:
-            query += " AND event_type = %s"
-            params.append(event_type)
-
+            filters.append(("event_type = %s", event_type))
         if resource_type:
-            query += " AND resource_type = %s"
-            params.append(resource_type)
-
+            filters.append(("resource_type = %s", resource_type))
+        if resource_id:
+            filters.append(("resource_id = %s", str(resource_id)))
         if user_id:
-            query += " AND user_id = %s"
-            params.append(user_id)
-
+            filters.append(("user_id = %s", user_id))
         if success is not None:
-            query += " AND success = %s"
-            params.append(success)
-
+            filters.append(("success = %s", success))
         if start_date:
-            query += " AND created_at >= %s"
-            params.append(start_date)
-
+            filters.append(("created_at >= %s", start_date))
         if end_date:
-            query += " AND created_at <= %s"
-            params.append(end_date)
-
-        # Get total count
-        count_query = f"SELECT COUNT(*) FROM ({query}) AS filtered_logs"
-        with get_db_cursor() as cursor:
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()['count']
-
-        # Add ordering and pagination
-        query += " ORDER BY created_at DESC LIMIT %s OFFSET %s"
-        params.extend([page_size, (page - 1) * page_size])
+            filters.append(("created_at <= %s", end_date))
 
-        # Execute main query
-        with get_db_cursor() as cursor:
-            cursor.execute(query, params)
-            audit_logs = cursor.fetchall()
-
-        # Calculate total pages
-        total_pages = (total + page_size - 1) // page_size
-
-        return AuditLogsListResponse(
-            audit_logs=[AuditLogResponse(**dict(log)) for log in audit_logs],
-            total=total,
-            page=page,
-            page_size=page_size,
-            total_pages=total_pages
-        )
+        return list_audit_logs(filters, page, page_size, cursor)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching audit logs: {e}")
         raise HTTPException(
@@ -144,6 +221,7 @@ async def get_resource_audit_logs(
     resource_id: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -151,47 +229,16 @@ async def get_resource_audit_logs(
 
     - Requires authentication
     - Returns all audit logs related to a specific resource
-    - Supports pagination
+    - Pages newest first via next_cursor (page numbers still accepted)
     """
     try:
-        # Count total logs for this resource
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT COUNT(*) FROM audit_logs
-                WHERE resource_type = %s AND resource_id = %s
-                """,
-                (resource_type, resource_id)
-            )
-            total = cursor.fetchone()['count']
-
-        # Get logs
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, event_type, resource_type, resource_id, user_id,
-                       ip_address, user_agent, action, description, metadata,
-                       old_values, new_values, success, error_message, created_at
-                FROM audit_logs
-                WHERE resource_type = %s AND resource_id = %s
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
-                """,
-                (resource_type, resource_id, page_size, (page - 1) * page_size)
-            )
-            audit_logs = cursor.fetchall()
-
-        # Calculate total pages
-        total_pages = (total + page_size - 1) // page_size
-
-        return AuditLogsListResponse(
-            audit_logs=[AuditLogResponse(**dict(log)) for log in audit_logs],
-            total=total,
-            page=page,
-            page_size=page_size,
-            total_pages=total_pages
+        return list_audit_logs(
+            [("resource_type = %s", resource_type), ("resource_id = %s", resource_id)],
+            page, page_size, cursor
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching resource audit logs: {e}")
         raise HTTPException(
@@ -261,3 +308,28 @@ async def get_resource_types(current_user: dict = Depends(get_current_user)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while fetching resource types"
         )
+
+
+@router.post("/verify", status_code=status.HTTP_200_OK)
+async def verify_audit_chain(
+    full: bool = Query(False, description="Re-verify every partition from its first batch, ignoring checkpoints"),
+    partition: Optional[List[str]] = Query(None, description="Only verify these partitions (e.g. audit_logs_y2026m10)"),
+    current_user: dict = Depends(require_permissions("audit_logs.manage"))
+):
+    """
+    Verify the audit log hash chains
+
+    - Requires audit_logs.manage permission
+    - Partitions are verified in parallel worker processes
+    - Only batches sealed since the last verified checkpoint are checked unless full=true
+    - Reports the first broken link of each partition; status is "broken" if any
+    """
+    try:
+        return await run_in_threadpool(audit_chain_verifier.run, full, partition)
+
+    except Exception as e:
+        logger.error(f"Error verifying audit chain: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while verifying the audit chain"
+        )
@@ -10,6 +10,7 @@ import logging
 
 from app.services.auth_service import auth_service
 from app.database import get_db_cursor
+from app.services.audit_logger import audit_logger
 
 logger = logging.getLogger(__name__)
 
@@ -129,23 +130,16 @@ async def login(request: LoginRequest, http_request: Request):
         auth_service.store_token(user_id, refresh_token, "refresh", client_host, user_agent)
 
         # Log audit event
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute(
-                    """
-                    SELECT log_audit_event(
-                        'login',
-                        'successful_login',
-                        %s,
-                        'user',
-                        %s,
-                        'User logged in successfully'
-                    )
-                    """,
-                    (user_id, user_id)
-                )
-        except Exception as e:
-            logger.error(f"Error logging audit event: {e}")
+        audit_logger.log(
+            "login",
+            "successful_login",
+            user_id=user_id,
+            resource_type="user",
+            resource_id=user_id,
+            description="User logged in successfully",
+            ip_address=client_host,
+            user_agent=user_agent
+        )
 
         return LoginResponse(
             access_token=access_token,
@@ -199,23 +193,14 @@ async def logout(authorization: Optional[str] = Header(None)):
         auth_service.blacklist_token(token, user_id)
 
         # Log audit event
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute(
-                    """
-                    SELECT log_audit_event(
-                        'logout',
-                        'successful_logout',
-                        %s,
-                        'user',
-                        %s,
-                        'User logged out successfully'
-                    )
-                    """,
-                    (user_id, user_id)
-                )
-        except Exception as e:
-            logger.error(f"Error logging audit event: {e}")
+        audit_logger.log(
+            "logout",
+            "successful_logout",
+            user_id=user_id,
+            resource_type="user",
+            resource_id=user_id,
+            description="User logged out successfully"
+        )
 
         return MessageResponse(message="Logged out successfully")
 
@@ -363,23 +348,14 @@ async def forgot_password(request: ForgotPasswordRequest):
         logger.info(f"Password reset token for {request.email}: {reset_token}")
 
         # Log audit event
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute(
-                    """
-                    SELECT log_audit_event(
-                        'password_reset',
-                        'reset_requested',
-                        %s,
-                        'user',
-                        %s,
-                        'Password reset requested'
-                    )
-                    """,
-                    (user_id, user_id)
-                )
-        except Exception as e:
-            logger.error(f"Error logging audit event: {e}")
+        audit_logger.log(
+            "password_reset",
+            "reset_requested",
+            user_id=user_id,
+            resource_type="user",
+            resource_id=user_id,
+            description="Password reset requested"
+        )
 
         return MessageResponse(message="If the email exists, a password reset link has been sent")
 
@@ -475,23 +451,14 @@ async def verify_mfa(request: MFAVerifyRequest, http_request: Request):
         auth_service.store_token(user_id, refresh_token, "refresh", client_host, user_agent)
 
         # Log audit event
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute(
-                    """
-                    SELECT log_audit_event(
-                        'mfa_verify',
-                        'successful_mfa_verification',
-                        %s,
-                        'user',
-                        %s,
-                        'MFA verification successful'
-                    )
-                    """,
-                    (user_id, user_id)
-                )
-        except Exception as e:
-            logger.error(f"Error logging audit event: {e}")
+        audit_logger.log(
+            "mfa_verify",
+            "successful_mfa_verification",
+            user_id=user_id,
+            resource_type="user",
+            resource_id=user_id,
+            description="MFA verification successful"
+        )
 
         return LoginResponse(
             access_token=access_token,
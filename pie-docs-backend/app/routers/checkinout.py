@@ -18,6 +18,7 @@ from app.models.checkinout import (
     CheckoutStatusResponse, CheckoutAnalytics
 )
 from app.services.workflow_execution import WorkflowExecutionEngine
+from app.services.checkout_analytics import checkout_analytics_service
 
 logger = logging.getLogger(__name__)
 
@@ -430,71 +431,10 @@ async def list_checkout_records(
 @router.get("/analytics", response_model=CheckoutAnalytics)
 async def get_checkout_analytics():
     """
-    Get checkout analytics and statistics
+    Get checkout analytics and statistics (precomputed, see checkout_analytics)
     """
     try:
-        with get_db_cursor() as cursor:
-            # Active checkouts
-            cursor.execute("SELECT COUNT(*) as count FROM document_checkout_records WHERE status = 'checked-out'")
-            active_count = cursor.fetchone()['count']
-
-            # Overdue checkouts
-            cursor.execute("SELECT COUNT(*) as count FROM document_checkout_records WHERE is_overdue = true")
-            overdue_count = cursor.fetchone()['count']
-
-            # Checked in today
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM document_checkout_records
-                WHERE checkin_date::date = CURRENT_DATE
-            """)
-            checkin_today = cursor.fetchone()['count']
-
-            # Average duration
-            cursor.execute("""
-                SELECT AVG(EXTRACT(EPOCH FROM (checkin_date - checkout_date))/3600) as avg_hours
-                FROM document_checkout_records
-                WHERE checkin_date IS NOT NULL
-            """)
-            avg_duration = cursor.fetchone()['avg_hours'] or 0
-
-            # By department
-            cursor.execute("""
-                SELECT user_department, COUNT(*) as count
-                FROM document_checkout_records
-                WHERE status = 'checked-out'
-                GROUP BY user_department
-            """)
-            dept_counts = {row['user_department']: row['count'] for row in cursor.fetchall()}
-
-            # Most checked out documents
-            cursor.execute("""
-                SELECT d.id, d.title, COUNT(*) as checkout_count
-                FROM document_checkout_records cr
-                JOIN documents d ON d.id = cr.document_id
-                GROUP BY d.id, d.title
-                ORDER BY checkout_count DESC
-                LIMIT 10
-            """)
-            most_checked_out = [dict(row) for row in cursor.fetchall()]
-
-            # Overdue records
-            cursor.execute("""
-                SELECT * FROM document_checkout_records
-                WHERE is_overdue = true
-                ORDER BY due_date
-                LIMIT 10
-            """)
-            overdue_records = [dict(row) for row in cursor.fetchall()]
-
-            return CheckoutAnalytics(
-                total_active_checkouts=active_count,
-                total_overdue=overdue_count,
-                total_checked_in_today=checkin_today,
-                avg_checkout_duration_hours=float(avg_duration),
-                checkouts_by_department=dept_counts,
-                most_checked_out_documents=most_checked_out,
-                overdue_checkouts=overdue_records
-            )
+        return CheckoutAnalytics(**checkout_analytics_service.get_snapshot())
 
     except Exception as e:
         logger.error(f"Error getting checkout analytics: {e}")
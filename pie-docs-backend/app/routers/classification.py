@@ -10,6 +10,7 @@ import logging
 
 from app.services.classification_service import classification_service
 from app.services.ocr_service import ocr_service
+from app.services.ai_result_cache import ai_result_cache
 from app.database import get_db_cursor
 
 logger = logging.getLogger(__name__)
@@ -85,10 +86,11 @@ async def classify_document(
         logger.info(f"📚 Available document types: {len(available_types)}")
         logger.info(f"========================================")
 
-        success, result, error = classification_service.classify_document(
+        success, result, error, cached = classification_service.classify_document_cached(
             temp_file,
             available_types,
-            extracted_ocr_text
+            extracted_ocr_text,
+            content_sha256=ai_result_cache.hash_bytes(content)
         )
 
         if not success:
@@ -103,6 +105,7 @@ async def classify_document(
             "ocr_performed": bool(extracted_ocr_text),
             "ocr_text": extracted_ocr_text if extracted_ocr_text else None,
             "ocr_text_length": len(extracted_ocr_text) if extracted_ocr_text else 0,
+            "cached": cached,
             "error": error if not success else None
         }
 
@@ -160,7 +163,7 @@ async def classify_documents_batch(
         ocr_texts = []
         if use_ocr and ocr_service.is_available():
             for temp_file in temp_files:
-                success, ocr_result, error = ocr_service.process_document(temp_file)
+                success, ocr_result, error, _ = ocr_service.process_document_cached(temp_file)
                 if success and ocr_result:
                     ocr_texts.append(ocr_result.get('full_text', ''))
                 else:
@@ -2,10 +2,12 @@
 Documents API Router - Comprehensive document management
 Handles documents, versions, metadata, permissions, shares, and comments
 """
-from fastapi import APIRouter, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status, Query, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from typing import List, Optional
 from uuid import UUID
+import base64
 import logging
 import os
 import shutil
@@ -16,7 +18,7 @@ from psycopg2.extras import Json
 
 from app.database import get_db_cursor
 from app.models.documents import (
-    Document, DocumentCreate, DocumentUpdate, DocumentListResponse,
+    Document, DocumentCreate, DocumentUpdate, DocumentListResponse, ThumbnailBatchRequest,
     DocumentVersion, DocumentVersionCreate,
     DocumentMetadata, DocumentMetadataCreate, DocumentMetadataUpdate,
     DocumentPermission, DocumentPermissionCreate,
@@ -24,10 +26,15 @@ from app.models.documents import (
     DocumentComment, DocumentCommentCreate, DocumentCommentUpdate
 )
 from app.services.file_storage_service import file_storage_service
-from app.services.thumbnail_service import thumbnail_service
+from app.services.thumbnail_service import thumbnail_service, THUMBNAIL_FORMATS, THUMBNAIL_SIZES
 from app.services.ocr_service import ocr_service
 from app.services.document_intelligence_service import document_intelligence_service
+from app.services.tag_index import tag_index_service
 from app.utils.file_utils import calculate_checksums, get_mime_type_from_extension, sanitize_filename
+from app.utils.file_responses import (
+    CACHE_IMMUTABLE, CACHE_REVALIDATE, conditional_bytes_response, conditional_file_response,
+    is_not_modified, make_etag, not_modified_response, thumbnail_version
+)
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +53,7 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 
 @router.post("/upload", response_model=Document, status_code=status.HTTP_201_CREATED)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
     document_type: Optional[str] = Form(None),
@@ -144,23 +152,15 @@ async def upload_document(
             md5_checksum = None
             sha256_checksum = None
 
-        # Generate thumbnail
-        try:
-            thumbnail_output_path = file_storage_service.generate_file_path(
-                document_id,
-                f"{original_filename}_thumb.jpg",
-                storage_type='thumbnail'
+        # Thumbnail is rendered after the response is sent (and lazily on
+        # first request if that has not finished yet)
+        if thumbnail_service.is_supported(full_file_path):
+            source_key = sha256_checksum or str(document_id)
+            thumbnail_path = os.path.relpath(thumbnail_service.rendition_path(source_key, 'grid', 'jpeg'), UPLOAD_DIR)
+            background_tasks.add_task(
+                thumbnail_service.prerender, full_file_path, source_key, content_sha256=sha256_checksum
             )
-            success, error = thumbnail_service.generate_from_file(full_file_path, thumbnail_output_path)
-            if success:
-                thumbnail_path = str(thumbnail_output_path.relative_to(UPLOAD_DIR.parent / 'uploads'))
-                logger.info(f"  → Thumbnail generated: {thumbnail_path}")
-            else:
-                logger.warning(f"  ⚠ Thumbnail generation failed: {error}")
-                thumbnail_path = None
-        except Exception as e:
-            logger.warning(f"  ⚠ Thumbnail generation error: {e}")
-            thumbnail_path = None
+            logger.info(f"  → Thumbnail scheduled: {thumbnail_path}")
 
         # Determine MIME type
         mime_type = file.content_type
@@ -511,40 +511,16 @@ async def upload_document(
                             else:
                                 logger.warning(f"  ⚠ Could not resolve warehouse location from rack {rack_id}")
 
-                        # Update rack capacity counter
+                        # Rack/shelf/zone counters are maintained by database triggers;
+                        # uploads still go through when the rack is full, with a warning
                         if rack_id:
-                            logger.info(f"  → Incrementing rack capacity counter...")
-                            cursor.execute("""
-                                UPDATE racks
-                                SET current_documents = current_documents + 1
-                                WHERE id = %s AND current_documents < max_documents
-                                RETURNING id, current_documents, max_documents
-                            """, (rack_id,))
-
-                            rack_update = cursor.fetchone()
-                            if not rack_update:
-                                logger.warning(f"  ⚠ Rack may be at maximum capacity")
-                                # Don't fail the upload, just log warning
-                            else:
-                                current = rack_update['current_documents'] if isinstance(rack_update, dict) else rack_update[1]
-                                max_cap = rack_update['max_documents'] if isinstance(rack_update, dict) else rack_update[2]
-                                logger.info(f"  → Rack capacity updated: {current}/{max_cap}")
-
-                        # Update zone capacity counter (location_id is the zone_id)
-                        if location_id:
-                            logger.info(f"  → Incrementing zone capacity counter...")
-                            cursor.execute("""
-                                UPDATE zones
-                                SET current_capacity = current_capacity + 1
-                                WHERE id = %s
-                                RETURNING id, current_capacity, max_capacity
-                            """, (location_id,))
-
-                            zone_update = cursor.fetchone()
-                            if zone_update:
-                                zone_current = zone_update['current_capacity'] if isinstance(zone_update, dict) else zone_update[1]
-                                zone_max = zone_update['max_capacity'] if isinstance(zone_update, dict) else zone_update[2]
-                                logger.info(f"  → Zone capacity updated: {zone_current}/{zone_max}")
+                            cursor.execute(
+                                "SELECT current_documents, max_documents FROM racks WHERE id = %s",
+                                (rack_id,)
+                            )
+                            rack_row = cursor.fetchone()
+                            if rack_row and rack_row['current_documents'] >= rack_row['max_documents']:
+                                logger.warning(f"  ⚠ Rack {rack_id} is at maximum capacity ({rack_row['max_documents']})")
 
                         # Create physical_documents record
                         # Note: document_type here refers to physical type (original/copy/etc), not classification type
@@ -726,6 +702,8 @@ async def upload_document(
         preview_url = f"{base_url}/{document_id}/preview"
         download_url = f"{base_url}/{document_id}/download"
         thumbnail_url = f"{base_url}/{document_id}/thumbnail" if thumbnail_path else None
+        if thumbnail_url and sha256_checksum:
+            thumbnail_url += f"?v={thumbnail_version(sha256_checksum)}"
 
         logger.info(f"  → Generated preview URL: {preview_url}")
         logger.info(f"  → Generated download URL: {download_url}")
@@ -809,7 +787,7 @@ async def upload_document(
         logger.info(f"  URLs:")
         logger.info(f"    - Preview: {preview_url}")
         logger.info(f"    - Download: {download_url}")
-        logger.info(f"    - Thumbnail: {thumbnail_url or 'Not generated'}")
+        logger.info(f"    - Thumbnail: {thumbnail_url or 'Not available'}")
         logger.info(f"{'='*80}")
 
         # Note: auto_ocr and auto_classify flags are ignored in this refactored workflow.
@@ -831,12 +809,6 @@ async def upload_document(
             except:
                 pass
 
-        if thumbnail_path:
-            try:
-                file_storage_service.delete_file(thumbnail_path)
-            except:
-                pass
-
         if document_id:
             # Delete document record
             try:
@@ -848,18 +820,91 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+@router.post("/thumbnails/batch")
+async def get_thumbnails_batch(request: ThumbnailBatchRequest):
+    """
+    Get thumbnails for many documents in one response
+
+    Intended for the document grid: one request per page of results instead
+    of one per card. Missing renditions are rendered on demand. Each thumbnail
+    is returned as a data URL along with its content version.
+    """
+    if request.size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Invalid size. Use one of: {', '.join(THUMBNAIL_SIZES)}")
+    if request.format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(THUMBNAIL_FORMATS)}")
+
+    try:
+        document_ids = [str(document_id) for document_id in dict.fromkeys(request.document_ids)]
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, thumbnail_path, file_storage_path, checksum_sha256
+                FROM documents
+                WHERE id = ANY(%s::uuid[]) AND deleted_at IS NULL
+                """,
+                (document_ids,)
+            )
+            documents = {str(row['id']): row for row in cursor.fetchall()}
+
+        media_type = THUMBNAIL_FORMATS[request.format][2]
+
+        def load_thumbnails():
+            loaded = {}
+            for document_id, document in documents.items():
+                try:
+                    data = thumbnail_service.get_for_document(document, request.size, request.format)
+                    if data:
+                        loaded[document_id] = data
+                except Exception as e:
+                    logger.warning(f"Batch thumbnail failed for document {document_id}: {e}")
+            return loaded
+
+        loaded = await run_in_threadpool(load_thumbnails)
+
+        thumbnails = []
+        missing = []
+        for document_id in document_ids:
+            data = loaded.get(document_id)
+            if data is None:
+                missing.append(document_id)
+                continue
+            checksum = documents[document_id]['checksum_sha256']
+            thumbnails.append({
+                "document_id": document_id,
+                "version": thumbnail_version(checksum) if checksum else None,
+                "media_type": media_type,
+                "data_url": f"data:{media_type};base64,{base64.b64encode(data).decode('ascii')}"
+            })
+
+        return {
+            "size": request.size,
+            "format": request.format,
+            "thumbnails": thumbnails,
+            "missing": missing
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting thumbnail batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Thumbnail batch failed: {str(e)}")
+
+
 @router.get("/{document_id}/download")
-async def download_document(document_id: UUID):
+async def download_document(document_id: UUID, request: Request):
     """
     Download a document file
 
-    Returns the actual file for download with appropriate headers
+    Returns the actual file for download with appropriate headers.
+    Supports conditional GET (ETag from checksum_sha256 -> 304) and
+    byte ranges (206) so large downloads can resume.
     """
     try:
         with get_db_cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id, title, file_storage_path, file_original_name, mime_type, file_size
+                SELECT id, title, file_storage_path, file_original_name, mime_type, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
                 """,
@@ -867,36 +912,37 @@ async def download_document(document_id: UUID):
             )
             document = cursor.fetchone()
 
-            if not document:
-                raise HTTPException(status_code=404, detail="Document not found")
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-            # Check if file exists
-            if not document['file_storage_path']:
-                raise HTTPException(status_code=404, detail="File not found for this document")
+        # Check if file exists
+        if not document['file_storage_path']:
+            raise HTTPException(status_code=404, detail="File not found for this document")
 
-            file_path = file_storage_service.get_file_path(document['file_storage_path'])
+        # Unchanged content: answer from the stored checksum without touching the file
+        etag = make_etag(document['checksum_sha256'])
+        if etag and is_not_modified(request, etag):
+            return not_modified_response(etag, CACHE_REVALIDATE)
 
-            if not file_path.exists():
-                raise HTTPException(status_code=404, detail="Physical file not found")
+        file_path = file_storage_service.get_file_path(document['file_storage_path'])
 
-            # Determine filename for download
-            download_filename = document['file_original_name'] or f"{document['title']}.pdf"
-
-            # Return file response
-            from fastapi.responses import FileResponse
-
-            return FileResponse(
-                path=str(file_path),
-                filename=download_filename,
-                media_type=document['mime_type'] or 'application/octet-stream',
-                headers={
-                    'Content-Disposition': f'attachment; filename="{download_filename}"',
-                    'Content-Length': str(document['file_size'] or file_path.stat().st_size),
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*'
-                }
-            )
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Physical file not found")
+
+        # Determine filename for download
+        download_filename = document['file_original_name'] or f"{document['title']}.pdf"
+
+        return conditional_file_response(
+            request,
+            file_path,
+            media_type=document['mime_type'] or 'application/octet-stream',
+            etag=etag,
+            cache_control=CACHE_REVALIDATE,
+            content_disposition=f'attachment; filename="{download_filename}"',
+            stat_result=stat_result
+        )
 
     except HTTPException:
         raise
@@ -906,17 +952,18 @@ async def download_document(document_id: UUID):
 
 
 @router.get("/{document_id}/preview")
-async def preview_document(document_id: UUID):
+async def preview_document(document_id: UUID, request: Request):
     """
     Preview a document file (inline display in browser)
 
-    Returns the file for inline viewing (PDFs, images)
+    Returns the file for inline viewing (PDFs, images).
+    Supports conditional GET and byte ranges so PDF viewers can seek.
     """
     try:
         with get_db_cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id, title, file_storage_path, file_original_name, mime_type, file_size, preview_path
+                SELECT id, title, file_storage_path, file_original_name, mime_type, preview_path, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
                 """,
@@ -924,43 +971,45 @@ async def preview_document(document_id: UUID):
             )
             document = cursor.fetchone()
 
-            if not document:
-                raise HTTPException(status_code=404, detail="Document not found")
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-            # If preview exists, use it; otherwise use original file
-            preview_path = document.get('preview_path')
-            if preview_path and file_storage_service.file_exists(preview_path):
-                file_path = file_storage_service.get_file_path(preview_path)
-                mime_type = 'application/pdf'  # Previews are typically PDF
-            else:
-                # Use original file for preview
-                if not document['file_storage_path']:
-                    raise HTTPException(status_code=404, detail="File not found for this document")
-
-                file_path = file_storage_service.get_file_path(document['file_storage_path'])
-                mime_type = document['mime_type'] or 'application/octet-stream'
-
-            if not file_path.exists():
-                raise HTTPException(status_code=404, detail="Physical file not found")
+        # If preview exists, use it; otherwise use original file
+        preview_path = document.get('preview_path')
+        if preview_path and file_storage_service.file_exists(preview_path):
+            file_path = file_storage_service.get_file_path(preview_path)
+            mime_type = 'application/pdf'  # Previews are typically PDF
+            etag = make_etag(document['checksum_sha256'], variant='preview')
+        else:
+            # Use original file for preview
+            if not document['file_storage_path']:
+                raise HTTPException(status_code=404, detail="File not found for this document")
 
-            # Determine filename
-            preview_filename = document['file_original_name'] or f"{document['title']}.pdf"
+            file_path = file_storage_service.get_file_path(document['file_storage_path'])
+            mime_type = document['mime_type'] or 'application/octet-stream'
+            etag = make_etag(document['checksum_sha256'])
 
-            # Return file response for inline viewing
-            from fastapi.responses import FileResponse
+        # Unchanged content: answer from the stored checksum without touching the file
+        if etag and is_not_modified(request, etag):
+            return not_modified_response(etag, CACHE_REVALIDATE)
 
-            return FileResponse(
-                path=str(file_path),
-                filename=preview_filename,
-                media_type=mime_type,
-                headers={
-                    'Content-Disposition': f'inline; filename="{preview_filename}"',
-                    'Content-Length': str(file_path.stat().st_size),
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*'
-                }
-            )
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Physical file not found")
+
+        # Determine filename
+        preview_filename = document['file_original_name'] or f"{document['title']}.pdf"
+
+        return conditional_file_response(
+            request,
+            file_path,
+            media_type=mime_type,
+            etag=etag,
+            cache_control=CACHE_REVALIDATE,
+            content_disposition=f'inline; filename="{preview_filename}"',
+            stat_result=stat_result
+        )
 
     except HTTPException:
         raise
@@ -984,17 +1033,32 @@ async def thumbnail_options(document_id: UUID):
     )
 
 @router.get("/{document_id}/thumbnail")
-async def get_thumbnail(document_id: UUID):
+async def get_thumbnail(
+    document_id: UUID,
+    request: Request,
+    v: Optional[str] = Query(None),
+    size: str = Query('grid', description="Rendition: list, grid or preview"),
+    format: str = Query('jpeg', description="Image format: jpeg or webp"),
+    page: int = Query(1, ge=1, description="Page to render (PDFs, 1-indexed)")
+):
     """
     Get document thumbnail image
 
-    Returns the thumbnail image (JPEG format)
+    Renditions are rendered on first request and kept in the page render
+    cache (evicted renditions are rendered again). Thumbnail
+    URLs in document listings carry ?v=<content version>; requests with the
+    current version are cached as immutable, others revalidate against the ETag.
     """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Invalid size. Use one of: {', '.join(THUMBNAIL_SIZES)}")
+    if format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(THUMBNAIL_FORMATS)}")
+
     try:
         with get_db_cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id, title, thumbnail_path
+                SELECT id, title, thumbnail_path, file_storage_path, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
                 """,
@@ -1002,30 +1066,34 @@ async def get_thumbnail(document_id: UUID):
             )
             document = cursor.fetchone()
 
-            if not document:
-                raise HTTPException(status_code=404, detail="Document not found")
-
-            thumbnail_path = document.get('thumbnail_path')
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-            if not thumbnail_path or not file_storage_service.file_exists(thumbnail_path):
-                raise HTTPException(status_code=404, detail="Thumbnail not found for this document")
+        checksum = document['checksum_sha256']
+        versioned = bool(v and checksum and v == thumbnail_version(checksum))
+        cache_control = CACHE_IMMUTABLE if versioned else 'public, no-cache'
 
-            file_path = file_storage_service.get_file_path(thumbnail_path)
+        etag = make_etag(checksum, variant=f'thumb-{size}-p{page}-{format}')
+        if etag and is_not_modified(request, etag):
+            return not_modified_response(etag, cache_control)
 
-            # Return thumbnail image
-            from fastapi.responses import FileResponse
-
-            return FileResponse(
-                path=str(file_path),
-                media_type='image/jpeg',
-                headers={
-                    'Cache-Control': 'public, max-age=86400',  # Cache for 24 hours
-                    'Content-Length': str(file_path.stat().st_size),
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*'
-                }
+        try:
+            data = await run_in_threadpool(
+                thumbnail_service.get_for_document, document, size, format, page - 1
             )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not data:
+            raise HTTPException(status_code=404, detail="Thumbnail not found for this document")
+
+        return conditional_bytes_response(
+            request,
+            data,
+            media_type=THUMBNAIL_FORMATS[format][2],
+            etag=etag,
+            cache_control=cache_control
+        )
 
     except HTTPException:
         raise
@@ -1188,9 +1256,14 @@ async def list_documents(
     document_type: Optional[str] = Query(None, description="Filter by document type"),
     status: Optional[str] = Query(None, description="Filter by status"),
     tags: Optional[str] = Query(None, description="Comma-separated tags"),
+    tag_match: str = Query("any", regex="^(any|all)$", description="Match any or all of the tags"),
+    tag_facets: bool = Query(False, description="Include co-occurring tags to refine the tag filter by"),
 ):
     """
     List documents with filtering, search, and pagination
+
+    Tag facets come from the tag co-occurrence index and count documents
+    carrying the facet tag and the selected tags, ignoring other filters.
     """
     try:
         offset = (page - 1) * page_size
@@ -1221,11 +1294,24 @@ async def list_documents(
             params.append(status)
 
         # Tags filter
-        if tags:
-            tag_list = [t.strip() for t in tags.split(',')]
-            where_clauses.append("d.tags && %s")
+        tag_list = [t.strip() for t in tags.split(',') if t.strip()] if tags else []
+        if tag_list:
+            where_clauses.append("d.tags @> %s" if tag_match == "all" else "d.tags && %s")
             params.append(tag_list)
 
+        facets = tag_index_service.tag_facets(tag_list) if tag_facets else None
+
+        # The co-occurrence index rules out tag combinations no document carries
+        if tag_list and tag_match == "all" and not tag_index_service.can_match_all(tag_list):
+            return {
+                "documents": [],
+                "total": 0,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": 0,
+                "tag_facets": facets
+            }
+
         # Exclude deleted documents
         where_clauses.append("d.deleted_at IS NULL")
 
@@ -1271,6 +1357,7 @@ async def list_documents(
                     CASE
                         WHEN d.thumbnail_path IS NOT NULL
                         THEN '/api/v1/documents/' || d.id || '/thumbnail'
+                             || COALESCE('?v=' || LEFT(d.checksum_sha256, 16), '')
                         ELSE NULL
                     END as thumbnail_url
                 FROM documents d
@@ -1324,7 +1411,8 @@ async def list_documents(
                 "total": total,
                 "page": page,
                 "page_size": page_size,
-                "total_pages": total_pages
+                "total_pages": total_pages,
+                "tag_facets": facets
             }
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
@@ -1374,6 +1462,7 @@ async def get_document(document_id: UUID):
                     CASE
                         WHEN d.thumbnail_path IS NOT NULL
                         THEN '/api/v1/documents/' || d.id || '/thumbnail'
+                             || COALESCE('?v=' || LEFT(d.checksum_sha256, 16), '')
                         ELSE NULL
                     END as thumbnail_url
                 FROM documents d
@@ -2031,17 +2120,19 @@ async def resolve_document_comment(comment_id: UUID, resolved_by: UUID):
 
 
 @router.get("/{document_id}/download")
-async def download_document(document_id: UUID):
+async def download_document(document_id: UUID, request: Request):
     """
     Download a document file
 
-    Returns the actual file for download with appropriate headers
+    Returns the actual file for download with appropriate headers.
+    Supports conditional GET (ETag from checksum_sha256 -> 304) and
+    byte ranges (206) so large downloads can resume.
     """
     try:
         with get_db_cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id, title, file_storage_path, file_original_name, mime_type, file_size
+                SELECT id, title, file_storage_path, file_original_name, mime_type, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
                 """,
@@ -2049,36 +2140,37 @@ async def download_document(document_id: UUID):
             )
             document = cursor.fetchone()
 
-            if not document:
-                raise HTTPException(status_code=404, detail="Document not found")
-
-            # Check if file exists
-            if not document['file_storage_path']:
-                raise HTTPException(status_code=404, detail="File not found for this document")
-
-            file_path = file_storage_service.get_file_path(document['file_storage_path'])
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-            if not file_path.exists():
-                raise HTTPException(status_code=404, detail="Physical file not found")
+        # Check if file exists
+        if not document['file_storage_path']:
+            raise HTTPException(status_code=404, detail="File not found for this document")
 
-            # Determine filename for download
-            download_filename = document['file_original_name'] or f"{document['title']}.pdf"
+        # Unchanged content: answer from the stored checksum without touching the file
+        etag = make_etag(document['checksum_sha256'])
+        if etag and is_not_modified(request, etag):
+            return not_modified_response(etag, CACHE_REVALIDATE)
 
-            # Return file response
-            from fastapi.responses import FileResponse
+        file_path = file_storage_service.get_file_path(document['file_storage_path'])
 
-            return FileResponse(
-                path=str(file_path),
-                filename=download_filename,
-                media_type=document['mime_type'] or 'application/octet-stream',
-                headers={
-                    'Content-Disposition': f'attachment; filename="{download_filename}"',
-                    'Content-Length': str(document['file_size'] or file_path.stat().st_size),
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*'
-                }
-            )
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Physical file not found")
+
+        # Determine filename for download
+        download_filename = document['file_original_name'] or f"{document['title']}.pdf"
+
+        return conditional_file_response(
+            request,
+            file_path,
+            media_type=document['mime_type'] or 'application/octet-stream',
+            etag=etag,
+            cache_control=CACHE_REVALIDATE,
+            content_disposition=f'attachment; filename="{download_filename}"',
+            stat_result=stat_result
+        )
 
     except HTTPException:
         raise
@@ -2088,17 +2180,18 @@ async def download_document(document_id: UUID):
 
 
 @router.get("/{document_id}/preview")
-async def preview_document(document_id: UUID):
+async def preview_document(document_id: UUID, request: Request):
     """
     Preview a document file (inline display in browser)
 
-    Returns the file for inline viewing (PDFs, images)
+    Returns the file for inline viewing (PDFs, images).
+    Supports conditional GET and byte ranges so PDF viewers can seek.
     """
     try:
         with get_db_cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id, title, file_storage_path, file_original_name, mime_type, file_size, preview_path
+                SELECT id, title, file_storage_path, file_original_name, mime_type, preview_path, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
                 """,
@@ -2106,43 +2199,45 @@ async def preview_document(document_id: UUID):
             )
             document = cursor.fetchone()
 
-            if not document:
-                raise HTTPException(status_code=404, detail="Document not found")
-
-            # If preview exists, use it; otherwise use original file
-            preview_path = document.get('preview_path')
-            if preview_path and file_storage_service.file_exists(preview_path):
-                file_path = file_storage_service.get_file_path(preview_path)
-                mime_type = 'application/pdf'  # Previews are typically PDF
-            else:
-                # Use original file for preview
-                if not document['file_storage_path']:
-                    raise HTTPException(status_code=404, detail="File not found for this document")
-
-                file_path = file_storage_service.get_file_path(document['file_storage_path'])
-                mime_type = document['mime_type'] or 'application/octet-stream'
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-            if not file_path.exists():
-                raise HTTPException(status_code=404, detail="Physical file not found")
+        # If preview exists, use it; otherwise use original file
+        preview_path = document.get('preview_path')
+        if preview_path and file_storage_service.file_exists(preview_path):
+            file_path = file_storage_service.get_file_path(preview_path)
+            mime_type = 'application/pdf'  # Previews are typically PDF
+            etag = make_etag(document['checksum_sha256'], variant='preview')
+        else:
+            # Use original file for preview
+            if not document['file_storage_path']:
+                raise HTTPException(status_code=404, detail="File not found for this document")
 
-            # Determine filename
-            preview_filename = document['file_original_name'] or f"{document['title']}.pdf"
+            file_path = file_storage_service.get_file_path(document['file_storage_path'])
+            mime_type = document['mime_type'] or 'application/octet-stream'
+            etag = make_etag(document['checksum_sha256'])
 
-            # Return file response for inline viewing
-            from fastapi.responses import FileResponse
+        # Unchanged content: answer from the stored checksum without touching the file
+        if etag and is_not_modified(request, etag):
+            return not_modified_response(etag, CACHE_REVALIDATE)
 
-            return FileResponse(
-                path=str(file_path),
-                filename=preview_filename,
-                media_type=mime_type,
-                headers={
-                    'Content-Disposition': f'inline; filename="{preview_filename}"',
-                    'Content-Length': str(file_path.stat().st_size),
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*'
-                }
-            )
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Physical file not found")
+
+        # Determine filename
+        preview_filename = document['file_original_name'] or f"{document['title']}.pdf"
+
+        return conditional_file_response(
+            request,
+            file_path,
+            media_type=mime_type,
+            etag=etag,
+            cache_control=CACHE_REVALIDATE,
+            content_disposition=f'inline; filename="{preview_filename}"',
+            stat_result=stat_result
+        )
 
     except HTTPException:
         raise
@@ -2166,17 +2261,32 @@ async def thumbnail_options(document_id: UUID):
     )
 
 @router.get("/{document_id}/thumbnail")
-async def get_thumbnail(document_id: UUID):
+async def get_thumbnail(
+    document_id: UUID,
+    request: Request,
+    v: Optional[str] = Query(None),
+    size: str = Query('grid', description="Rendition: list, grid or preview"),
+    format: str = Query('jpeg', description="Image format: jpeg or webp"),
+    page: int = Query(1, ge=1, description="Page to render (PDFs, 1-indexed)")
+):
     """
     Get document thumbnail image
 
-    Returns the thumbnail image (JPEG format)
+    Renditions are rendered on first request and kept in the page render
+    cache (evicted renditions are rendered again). Thumbnail
+    URLs in document listings carry ?v=<content version>; requests with the
+    current version are cached as immutable, others revalidate against the ETag.
     """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Invalid size. Use one of: {', '.join(THUMBNAIL_SIZES)}")
+    if format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(THUMBNAIL_FORMATS)}")
+
     try:
         with get_db_cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id, title, thumbnail_path
+                SELECT id, title, thumbnail_path, file_storage_path, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
                 """,
@@ -2184,30 +2294,34 @@ async def get_thumbnail(document_id: UUID):
             )
             document = cursor.fetchone()
 
-            if not document:
-                raise HTTPException(status_code=404, detail="Document not found")
-
-            thumbnail_path = document.get('thumbnail_path')
-
-            if not thumbnail_path or not file_storage_service.file_exists(thumbnail_path):
-                raise HTTPException(status_code=404, detail="Thumbnail not found for this document")
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-            file_path = file_storage_service.get_file_path(thumbnail_path)
+        checksum = document['checksum_sha256']
+        versioned = bool(v and checksum and v == thumbnail_version(checksum))
+        cache_control = CACHE_IMMUTABLE if versioned else 'public, no-cache'
 
-            # Return thumbnail image
-            from fastapi.responses import FileResponse
+        etag = make_etag(checksum, variant=f'thumb-{size}-p{page}-{format}')
+        if etag and is_not_modified(request, etag):
+            return not_modified_response(etag, cache_control)
 
-            return FileResponse(
-                path=str(file_path),
-                media_type='image/jpeg',
-                headers={
-                    'Cache-Control': 'public, max-age=86400',  # Cache for 24 hours
-                    'Content-Length': str(file_path.stat().st_size),
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*'
-                }
+        try:
+            data = await run_in_threadpool(
+                thumbnail_service.get_for_document, document, size, format, page - 1
             )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not data:
+            raise HTTPException(status_code=404, detail="Thumbnail not found for this document")
+
+        return conditional_bytes_response(
+            request,
+            data,
+            media_type=THUMBNAIL_FORMATS[format][2],
+            etag=etag,
+            cache_control=cache_control
+        )
 
     except HTTPException:
         raise
@@ -2370,9 +2484,14 @@ async def list_documents(
     document_type: Optional[str] = Query(None, description="Filter by document type"),
     status: Optional[str] = Query(None, description="Filter by status"),
     tags: Optional[str] = Query(None, description="Comma-separated tags"),
+    tag_match: str = Query("any", regex="^(any|all)$", description="Match any or all of the tags"),
+    tag_facets: bool = Query(False, description="Include co-occurring tags to refine the tag filter by"),
 ):
     """
     List documents with filtering, search, and pagination
+
+    Tag facets come from the tag co-occurrence index and count documents
+    carrying the facet tag and the selected tags, ignoring other filters.
     """
     try:
         offset = (page - 1) * page_size
@@ -2403,11 +2522,24 @@ async def list_documents(
             params.append(status)
 
         # Tags filter
-        if tags:
-            tag_list = [t.strip() for t in tags.split(',')]
-            where_clauses.append("d.tags && %s")
+        tag_list = [t.strip() for t in tags.split(',') if t.strip()] if tags else []
+        if tag_list:
+            where_clauses.append("d.tags @> %s" if tag_match == "all" else "d.tags && %s")
             params.append(tag_list)
 
+        facets = tag_index_service.tag_facets(tag_list) if tag_facets else None
+
+        # The co-occurrence index rules out tag combinations no document carries
+        if tag_list and tag_match == "all" and not tag_index_service.can_match_all(tag_list):
+            return {
+                "documents": [],
+                "total": 0,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": 0,
+                "tag_facets": facets
+            }
+
         # Exclude deleted documents
         where_clauses.append("d.deleted_at IS NULL")
 
@@ -2453,6 +2585,7 @@ async def list_documents(
                     CASE
                         WHEN d.thumbnail_path IS NOT NULL
                         THEN '/api/v1/documents/' || d.id || '/thumbnail'
+                             || COALESCE('?v=' || LEFT(d.checksum_sha256, 16), '')
                         ELSE NULL
                     END as thumbnail_url
                 FROM documents d
@@ -2506,7 +2639,8 @@ async def list_documents(
                 "total": total,
                 "page": page,
                 "page_size": page_size,
-                "total_pages": total_pages
+                "total_pages": total_pages,
+                "tag_facets": facets
             }
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
@@ -2556,6 +2690,7 @@ async def get_document(document_id: UUID):
                     CASE
                         WHEN d.thumbnail_path IS NOT NULL
                         THEN '/api/v1/documents/' || d.id || '/thumbnail'
+                             || COALESCE('?v=' || LEFT(d.checksum_sha256, 16), '')
                         ELSE NULL
                     END as thumbnail_url
                 FROM documents d
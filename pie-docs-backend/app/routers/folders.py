@@ -6,10 +6,14 @@ from typing import List, Optional
 from uuid import UUID
 import logging
 
+from psycopg2.extras import Json
+
 from app.database import get_db_cursor
 from app.models.documents import (
     Folder, FolderCreate, FolderUpdate, FolderListResponse
 )
+from app.services.folder_index import FOLDER_COLUMNS, STATS_COLUMNS, folder_index_service
+from app.services.smart_folders import smart_folder_service, validate_smart_criteria
 
 logger = logging.getLogger(__name__)
 
@@ -32,29 +36,31 @@ async def list_folders(
     """
     try:
         offset = (page - 1) * page_size
-        where_clauses = ["deleted_at IS NULL"]
+        where_clauses = ["f.deleted_at IS NULL"]
         params = []
 
         if parent_id:
-            where_clauses.append("parent_id = %s")
+            where_clauses.append("f.parent_id = %s")
             params.append(str(parent_id))
 
         if folder_type:
-            where_clauses.append("folder_type = %s")
+            where_clauses.append("f.folder_type = %s")
             params.append(folder_type)
 
         where_sql = " AND ".join(where_clauses)
 
         with get_db_cursor() as cursor:
             # Get total count
-            cursor.execute(f"SELECT COUNT(*) as total FROM folders WHERE {where_sql}", params)
+            cursor.execute(f"SELECT COUNT(*) as total FROM folders f WHERE {where_sql}", params)
             total = cursor.fetchone()['total']
 
-            # Get folders
+            # Get folders (counts and sizes come from the trigger-maintained folder_stats_current)
             query = f"""
-                SELECT * FROM folders
+                SELECT {FOLDER_COLUMNS}, {STATS_COLUMNS}
+                FROM folders f
+                LEFT JOIN folder_stats_current s ON s.folder_id = f.id
                 WHERE {where_sql}
-                ORDER BY name ASC
+                ORDER BY f.name ASC
                 LIMIT %s OFFSET %s
             """
             cursor.execute(query, params + [page_size, offset])
@@ -81,10 +87,12 @@ async def get_folder(folder_id: UUID):
     """
     try:
         with get_db_cursor() as cursor:
-            cursor.execute(
-                "SELECT * FROM folders WHERE id = %s AND deleted_at IS NULL",
-                (str(folder_id),)
-            )
+            cursor.execute(f"""
+                SELECT {FOLDER_COLUMNS}, {STATS_COLUMNS}
+                FROM folders f
+                LEFT JOIN folder_stats_current s ON s.folder_id = f.id
+                WHERE f.id = %s AND f.deleted_at IS NULL
+            """, (str(folder_id),))
             folder = cursor.fetchone()
 
             if not folder:
@@ -103,6 +111,12 @@ async def create_folder(folder: FolderCreate):
     """
     Create a new folder
     """
+    if folder.folder_type == "smart":
+        try:
+            validate_smart_criteria(folder.smart_criteria)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
         # Build path based on parent
         path = "/"
@@ -128,7 +142,8 @@ async def create_folder(folder: FolderCreate):
             """, (
                 folder.name, folder.description,
                 str(folder.parent_id) if folder.parent_id else None,
-                folder.folder_type, folder.smart_criteria,
+                folder.folder_type,
+                Json(folder.smart_criteria) if folder.smart_criteria is not None else None,
                 folder.auto_refresh, folder.color, folder.icon, path
             ))
 
@@ -154,6 +169,13 @@ async def update_folder(folder_id: UUID, folder_update: FolderUpdate):
             if field == "parent_id" and value:
                 update_fields.append(f"{field} = %s")
                 params.append(str(value))
+            elif field == "smart_criteria" and value is not None:
+                try:
+                    validate_smart_criteria(value)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                update_fields.append(f"{field} = %s")
+                params.append(Json(value))
             else:
                 update_fields.append(f"{field} = %s")
                 params.append(value)
@@ -217,35 +239,20 @@ async def list_folder_documents(
     page_size: int = Query(20, ge=1, le=100),
 ):
     """
-    List documents in a folder
+    List documents in a folder (smart folders read their materialized membership)
     """
     try:
-        offset = (page - 1) * page_size
-
         with get_db_cursor() as cursor:
-            # Get total count
             cursor.execute(
-                "SELECT COUNT(*) as total FROM documents WHERE folder_id = %s AND deleted_at IS NULL",
+                "SELECT folder_type FROM folders WHERE id = %s AND deleted_at IS NULL",
                 (str(folder_id),)
             )
-            total = cursor.fetchone()['total']
-
-            # Get documents
-            cursor.execute("""
-                SELECT * FROM documents
-                WHERE folder_id = %s AND deleted_at IS NULL
-                ORDER BY modified_at DESC
-                LIMIT %s OFFSET %s
-            """, (str(folder_id), page_size, offset))
+            folder = cursor.fetchone()
 
-            documents = cursor.fetchall()
+        if folder and folder['folder_type'] == 'smart':
+            return smart_folder_service.list_documents(folder_id, page, page_size)
 
-            return {
-                "documents": [dict(d) for d in documents],
-                "total": total,
-                "page": page,
-                "page_size": page_size
-            }
+        return folder_index_service.list_documents(folder_id, page, page_size)
     except Exception as e:
         logger.error(f"Error listing folder documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -308,29 +315,10 @@ async def remove_document_from_folder(folder_id: UUID, document_id: UUID):
 @router.get("/{folder_id}/tree")
 async def get_folder_tree(folder_id: UUID):
     """
-    Get folder hierarchy tree
+    Get folder hierarchy tree with subtree document counts and sizes
     """
     try:
-        with get_db_cursor() as cursor:
-            # Recursive query to get folder tree
-            cursor.execute("""
-                WITH RECURSIVE folder_tree AS (
-                    SELECT id, name, parent_id, path, 0 as level
-                    FROM folders
-                    WHERE id = %s AND deleted_at IS NULL
-
-                    UNION ALL
-
-                    SELECT f.id, f.name, f.parent_id, f.path, ft.level + 1
-                    FROM folders f
-                    INNER JOIN folder_tree ft ON f.parent_id = ft.id
-                    WHERE f.deleted_at IS NULL
-                )
-                SELECT * FROM folder_tree ORDER BY level, name
-            """, (str(folder_id),))
-
-            tree = cursor.fetchall()
-            return {"tree": [dict(t) for t in tree]}
+        return {"tree": folder_index_service.get_tree(folder_id)}
     except Exception as e:
         logger.error(f"Error getting folder tree: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -348,8 +336,10 @@ async def create_smart_folder(folder: FolderCreate):
     if folder.folder_type != "smart":
         raise HTTPException(status_code=400, detail="Folder type must be 'smart'")
 
-    if not folder.smart_criteria:
-        raise HTTPException(status_code=400, detail="Smart criteria required for smart folders")
+    try:
+        validate_smart_criteria(folder.smart_criteria)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     try:
         with get_db_cursor(commit=True) as cursor:
@@ -363,7 +353,7 @@ async def create_smart_folder(folder: FolderCreate):
             """, (
                 folder.name, folder.description,
                 str(folder.parent_id) if folder.parent_id else None,
-                folder.smart_criteria, folder.auto_refresh,
+                Json(folder.smart_criteria), folder.auto_refresh,
                 folder.color, folder.icon, f"/{folder.name}/"
             ))
 
@@ -378,33 +368,28 @@ async def create_smart_folder(folder: FolderCreate):
 async def refresh_smart_folder(folder_id: UUID):
     """
     Refresh smart folder contents based on criteria
+
+    Membership is kept current by database triggers as documents change;
+    this re-materializes the folder from scratch (e.g. after a bulk load
+    with triggers disabled).
     """
     try:
-        with get_db_cursor(commit=True) as cursor:
-            # Get smart folder
+        with get_db_cursor() as cursor:
             cursor.execute(
-                "SELECT * FROM folders WHERE id = %s AND folder_type = 'smart' AND deleted_at IS NULL",
+                "SELECT id FROM folders WHERE id = %s AND folder_type = 'smart' AND deleted_at IS NULL",
                 (str(folder_id),)
             )
-            folder = cursor.fetchone()
-
-            if not folder:
+            if not cursor.fetchone():
                 raise HTTPException(status_code=404, detail="Smart folder not found")
 
-            # Update last refreshed timestamp
-            cursor.execute(
-                "UPDATE folders SET last_refreshed_at = CURRENT_TIMESTAMP WHERE id = %s",
-                (str(folder_id),)
-            )
-
-            # In a real implementation, you would execute the smart_criteria
-            # to dynamically populate the folder contents
+        result = smart_folder_service.refresh(folder_id)
 
-            return {
-                "success": True,
-                "message": "Smart folder refreshed",
-                "refreshed_at": "CURRENT_TIMESTAMP"
-            }
+        return {
+            "success": True,
+            "message": "Smart folder refreshed",
+            "document_count": result['document_count'],
+            "refreshed_at": result['refreshed_at']
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -7,15 +7,27 @@ import logging
 import tempfile
 import json
 import base64
+import hashlib
+from contextlib import closing
+from itertools import islice
 from pathlib import Path
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Iterator, Any
+from app.config import settings
 from app.database import get_db_cursor
+from app.services.ai_result_cache import ai_result_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/metadata", tags=["Metadata Extraction"])
 
+EXTRACTION_MODEL = "gpt-5-nano"
+# Bump when the extraction prompt changes so cached results are not reused
+EXTRACTION_PROMPT_VERSION = "extract-v2"
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.bmp']
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
 # Check if OpenAI is available
 try:
     from openai import OpenAI
@@ -45,11 +57,18 @@ async def extract_metadata(
     classification_ocr_text: Optional[str] = Form(None),
     process_all_pages: bool = Form(default=True),
     include_embeddings: bool = Form(default=True),
-    include_vision_ocr: bool = Form(default=True)
+    include_vision_ocr: bool = Form(default=True),
+    page_window: Optional[int] = Form(default=None),
+    stop_when_complete: Optional[bool] = Form(default=None)
 ):
     """
     Extract metadata from document using GPT-5-Nano Vision
 
+    Pages are streamed through the vision model a window at a time, so memory
+    stays constant regardless of page count. Results from earlier windows are
+    carried forward: filled fields are kept, text/insights/key terms accumulate,
+    and the summary is refined.
+
     This endpoint processes ALL pages of multi-page documents and returns:
     1. Metadata fields extracted based on document type schema
     2. Formatted OCR/Vision text from ALL pages
@@ -65,6 +84,10 @@ async def extract_metadata(
         process_all_pages: Process all pages of multi-page documents (default: True)
         include_embeddings: Generate semantic embeddings (default: True)
         include_vision_ocr: Extract formatted OCR text using vision (default: True)
+        page_window: Pages sent per vision request (default: METADATA_EXTRACTION_PAGE_WINDOW)
+        stop_when_complete: Stop reading pages once every schema field is filled.
+            Defaults to True only when vision OCR text is not requested, since
+            stopping early leaves the text of later pages unread.
 
     Returns:
         {
@@ -76,6 +99,8 @@ async def extract_metadata(
             "summary": {...},             // Document summary with key points
             "key_terms": [...],           // Key terms with definitions
             "pages_processed": 3,
+            "total_pages": 3,
+            "stopped_early": false,
             "model_version": "gpt-5-nano"
         }
     """
@@ -89,10 +114,16 @@ async def extract_metadata(
         logger.info(f"👁️  Include vision OCR: {include_vision_ocr}")
         logger.info("====================================")
 
-        # Save uploaded file temporarily
+        page_window = max(1, page_window or settings.METADATA_EXTRACTION_PAGE_WINDOW)
+        if stop_when_complete is None:
+            stop_when_complete = not include_vision_ocr
+
+        # Stream upload to a temp file in chunks, hashing as we go
+        content_hash = hashlib.sha256()
         with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                content_hash.update(chunk)
+                tmp.write(chunk)
             temp_file = Path(tmp.name)
 
         logger.info(f"📂 Saved temp file: {temp_file}")
@@ -139,42 +170,138 @@ async def extract_metadata(
         logger.info(f"📊 Schema found: {bool(schema_row)}")
         logger.info(f"📝 Schema has {len(fields)} fields")
 
-        #  ===============================================
-        # STEP 1: Convert ALL pages to images (for PDFs)
-        # ===============================================
-        page_images = []
-        pages_processed = 1
-
-        if temp_file.suffix.lower() == '.pdf' and process_all_pages:
-            logger.info("📑 Converting PDF pages to images...")
-            page_images = await convert_pdf_to_images(temp_file)
-            pages_processed = len(page_images)
-            logger.info(f"✅ Converted {pages_processed} pages to images")
-        elif temp_file.suffix.lower() in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-            # Single image file
-            with open(temp_file, 'rb') as img_file:
-                img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                mime_type = f"image/{temp_file.suffix[1:]}"
-                page_images = [f"data:{mime_type};base64,{img_data}"]
-            logger.info("✅ Single image file processed")
-        else:
-            logger.warning(f"⚠️ Unsupported file type: {temp_file.suffix}")
-
         # ===============================================
-        # STEP 2: Extract metadata + OCR using GPT-5-Nano Vision
-        # Send ALL pages in a single API call
+        # STEP 0: Reuse results cached for identical bytes + schema
         # ===============================================
-        if not OPENAI_AVAILABLE or not openai_client:
-            raise HTTPException(status_code=503, detail="OpenAI GPT-5-Nano not available")
-
-        extracted_metadata, formatted_ocr_text, insights, summary, key_terms = await extract_with_vision(
-            openai_client=openai_client,
-            page_images=page_images,
-            doc_type=doc_type,
-            fields=fields,
-            classification_ocr_text=classification_ocr_text,
-            include_vision_ocr=include_vision_ocr
+        content_sha256 = content_hash.hexdigest()
+        prompt_version = "{}:{}".format(
+            EXTRACTION_PROMPT_VERSION,
+            ai_result_cache.fingerprint({
+                "document_type_id": document_type_id,
+                "schema_version": schema_row['version'] if schema_row else None,
+                "fields": fields,
+                "classification_ocr_text": classification_ocr_text,
+                "process_all_pages": process_all_pages,
+                "include_vision_ocr": include_vision_ocr,
+                "page_window": page_window,
+                "stop_when_complete": stop_when_complete
+            })
         )
+        cached = ai_result_cache.get(content_sha256, "metadata_extraction", EXTRACTION_MODEL, prompt_version)
+
+        if cached:
+            extracted_metadata = cached['extracted_fields']
+            formatted_ocr_text = cached['ocr_text']
+            insights = cached['insights']
+            summary = cached['summary']
+            key_terms = cached['key_terms']
+            pages_processed = cached['pages_processed']
+            total_pages = cached.get('total_pages', pages_processed)
+            stopped_early = cached.get('stopped_early', False)
+        else:
+            if not OPENAI_AVAILABLE or not openai_client:
+                raise HTTPException(status_code=503, detail="OpenAI GPT-5-Nano not available")
+
+            # ===============================================
+            # STEP 1: Lazily stream page images (rendered one page at a time)
+            # ===============================================
+            total_pages = 1
+            suffix = temp_file.suffix.lower()
+            if suffix == '.pdf':
+                from app.services.page_render_service import page_render_service
+                total_pages = page_render_service.get_page_count(temp_file)
+                if not process_all_pages:
+                    total_pages = 1
+            elif suffix not in IMAGE_EXTENSIONS:
+                logger.warning(f"⚠️ Unsupported file type: {temp_file.suffix}")
+                total_pages = 0
+
+            # ===============================================
+            # STEP 2: Extract metadata + OCR using GPT-5-Nano Vision
+            # One request per window of pages; results are merged as we go
+            # ===============================================
+            extracted_metadata: Dict[str, Any] = {}
+            text_parts: List[str] = []
+            insights: List[Dict] = []
+            summary: Dict = {}
+            key_terms: List[Dict] = []
+            pages_processed = 0
+            stopped_early = False
+            # Set when page 1 could not be parsed; its classification OCR text is used instead
+            ocr_fallback = False
+
+            page_iter = iter_page_images(
+                temp_file,
+                content_sha256=content_sha256,
+                max_pages=None if process_all_pages else 1
+            )
+            with closing(page_iter):
+                for window in iter_page_windows(page_iter, page_window):
+                    first_page = pages_processed + 1
+                    logger.info(f"📑 Pages {first_page}-{first_page + len(window) - 1} of {total_pages}")
+
+                    window_metadata, window_text, window_insights, window_summary, window_terms = await extract_with_vision(
+                        openai_client=openai_client,
+                        page_images=window,
+                        doc_type=doc_type,
+                        fields=fields,
+                        classification_ocr_text=classification_ocr_text,
+                        include_vision_ocr=include_vision_ocr,
+                        known_metadata=extracted_metadata,
+                        previous_summary=summary,
+                        first_page_number=first_page,
+                        total_pages=total_pages
+                    )
+                    pages_processed += len(window)
+                    del window
+
+                    merge_extracted_fields(extracted_metadata, window_metadata)
+                    if window_text is None:
+                        ocr_fallback = ocr_fallback or first_page == 1
+                    elif window_text:
+                        text_parts.append(window_text)
+                    insights.extend(window_insights)
+                    merge_key_terms(key_terms, window_terms)
+                    if window_summary:
+                        summary = window_summary
+
+                    if stop_when_complete and fields and all_fields_filled(fields, extracted_metadata):
+                        stopped_early = pages_processed < total_pages
+                        if stopped_early:
+                            logger.info(f"⏹️ All schema fields filled after {pages_processed} pages, stopping early")
+                        break
+
+            if pages_processed == 0:
+                # No page images (unsupported file type): extract from the classification OCR text alone
+                extracted_metadata, window_text, insights, summary, key_terms = await extract_with_vision(
+                    openai_client=openai_client,
+                    page_images=[],
+                    doc_type=doc_type,
+                    fields=fields,
+                    classification_ocr_text=classification_ocr_text,
+                    include_vision_ocr=include_vision_ocr,
+                    total_pages=total_pages
+                )
+                if window_text is None:
+                    ocr_fallback = True
+                elif window_text:
+                    text_parts.append(window_text)
+
+            if ocr_fallback and classification_ocr_text:
+                text_parts.insert(0, classification_ocr_text)
+            formatted_ocr_text = "\n\n".join(text_parts)
+
+            if extracted_metadata or formatted_ocr_text:
+                ai_result_cache.put(content_sha256, "metadata_extraction", EXTRACTION_MODEL, prompt_version, {
+                    "extracted_fields": extracted_metadata,
+                    "ocr_text": formatted_ocr_text,
+                    "insights": insights,
+                    "summary": summary,
+                    "key_terms": key_terms,
+                    "pages_processed": pages_processed,
+                    "total_pages": total_pages,
+                    "stopped_early": stopped_early
+                })
 
         logger.info(f"✅ Metadata extraction complete")
         logger.info(f"  - Fields extracted: {len(extracted_metadata)}")
@@ -216,10 +343,13 @@ async def extract_metadata(
             "summary": summary,  # NEW: Document summary
             "key_terms": key_terms,  # NEW: Key terms
             "pages_processed": pages_processed,
+            "total_pages": total_pages,
+            "stopped_early": stopped_early,
             "field_count": len(extracted_metadata),
             "confidence": 0.9,
             "schema_version": schema_row['version'] if schema_row else None,
-            "model_version": "gpt-5-nano"  # NEW: Model used for extraction
+            "model_version": EXTRACTION_MODEL,  # NEW: Model used for extraction
+            "cached": bool(cached)
         }
 
     except Exception as e:
@@ -241,65 +371,92 @@ async def extract_metadata(
 # Helper Functions
 # ===============================================
 
-async def convert_pdf_to_images(pdf_path: Path) -> List[str]:
+def iter_page_images(
+    file_path: Path,
+    content_sha256: Optional[str] = None,
+    max_pages: Optional[int] = None
+) -> Iterator[str]:
     """
-    Convert ALL pages of PDF to base64-encoded JPEG images (compressed)
+    Lazily yield base64 JPEG data URLs, one page at a time
 
-    Returns:
-        List of base64 image data URLs (one per page)
+    PDF pages come from the shared page-render cache and are only rendered
+    when the consumer advances, so at most one page image is held here.
+    Other file types yield nothing.
     """
-    try:
-        import fitz  # PyMuPDF
-        from PIL import Image
-        import io
+    suffix = file_path.suffix.lower()
 
-        pdf_document = fitz.open(pdf_path)
-        page_images = []
+    if suffix in IMAGE_EXTENSIONS:
+        img_data = base64.b64encode(file_path.read_bytes()).decode('utf-8')
+        mime_type = f"image/{'jpeg' if suffix in ('.jpg', '.jpeg') else suffix[1:]}"
+        yield f"data:{mime_type};base64,{img_data}"
+        return
 
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
+    if suffix != '.pdf':
+        return
 
-            # Render page to image with moderate zoom
-            zoom = 1.5  # Balanced quality/size
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
+    from app.services.page_render_service import page_render_service, VISION_DPI
 
-            # Convert to PIL Image for better compression
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
+    if not page_render_service.is_available():
+        logger.error("PyMuPDF (fitz) not installed - cannot convert PDF to images")
+        raise HTTPException(
+            status_code=503,
+            detail="PDF processing not available - PyMuPDF not installed"
+        )
 
-            # Resize if too large (max 2048px on longest side)
-            max_size = 2048
-            if max(img.width, img.height) > max_size:
-                ratio = max_size / max(img.width, img.height)
-                new_size = (int(img.width * ratio), int(img.height * ratio))
-                img = img.resize(new_size, Image.Resampling.LANCZOS)
-                logger.info(f"  - Resized page {page_num + 1} to {new_size}")
+    for page_num, compressed_data in page_render_service.iter_pages(
+        file_path,
+        dpi=VISION_DPI,  # 1.5x zoom, balanced quality/size
+        fmt='jpeg',
+        max_pages=max_pages,
+        content_sha256=content_sha256
+    ):
+        logger.info(f"  - Streamed page {page_num + 1} ({len(compressed_data)} bytes)")
+        yield f"data:image/jpeg;base64,{base64.b64encode(compressed_data).decode('utf-8')}"
 
-            # Save as JPEG with compression
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='JPEG', quality=85, optimize=True)
-            compressed_data = img_byte_arr.getvalue()
 
-            # Convert to base64
-            img_base64 = base64.b64encode(compressed_data).decode('utf-8')
-            data_url = f"data:image/jpeg;base64,{img_base64}"
-            page_images.append(data_url)
+def iter_page_windows(pages: Iterator[str], size: int) -> Iterator[List[str]]:
+    """Group a page stream into windows of at most `size` pages"""
+    while True:
+        window = list(islice(pages, size))
+        if not window:
+            return
+        yield window
 
-            logger.info(f"  - Converted page {page_num + 1}/{len(pdf_document)} ({len(compressed_data)} bytes)")
 
-        pdf_document.close()
-        return page_images
+def _is_filled(value: Any) -> bool:
+    return value is not None and value != "" and value != [] and value != {}
 
-    except ImportError:
-        logger.error("PyMuPDF (fitz) not installed - cannot convert PDF to images")
-        raise HTTPException(
-            status_code=503,
-            detail="PDF processing not available - PyMuPDF not installed"
+
+def all_fields_filled(fields: List[Dict], extracted: Dict[str, Any]) -> bool:
+    """True once every schema field has a non-empty value"""
+    return all(
+        _is_filled(extracted.get(field.get('field_name', field.get('name', ''))))
+        for field in fields
+    )
+
+
+def merge_extracted_fields(extracted: Dict[str, Any], window_fields: Dict[str, Any]) -> None:
+    """Keep the first non-empty value found for each field"""
+    for name, value in (window_fields or {}).items():
+        if _is_filled(value) and not _is_filled(extracted.get(name)):
+            extracted[name] = value
+        else:
+            extracted.setdefault(name, value)
+
+
+def merge_key_terms(key_terms: List[Dict], window_terms: List[Dict]) -> None:
+    """Merge key terms by name, summing frequency and combining page references"""
+    by_term = {str(t.get('term', '')).lower(): t for t in key_terms}
+    for term in window_terms or []:
+        existing = by_term.get(str(term.get('term', '')).lower())
+        if existing is None:
+            key_terms.append(term)
+            by_term[str(term.get('term', '')).lower()] = term
+            continue
+        existing['frequency'] = (existing.get('frequency') or 0) + (term.get('frequency') or 0)
+        existing['page_references'] = sorted(
+            set(existing.get('page_references') or []) | set(term.get('page_references') or [])
         )
-    except Exception as e:
-        logger.error(f"PDF conversion failed: {e}")
-        raise
 
 
 async def extract_with_vision(
@@ -308,12 +465,16 @@ async def extract_with_vision(
     doc_type: Dict,
     fields: List[Dict],
     classification_ocr_text: Optional[str],
-    include_vision_ocr: bool
-) -> Tuple[Dict, str, List[Dict], Dict, List[Dict]]:
+    include_vision_ocr: bool,
+    known_metadata: Optional[Dict] = None,
+    previous_summary: Optional[Dict] = None,
+    first_page_number: int = 1,
+    total_pages: Optional[int] = None
+) -> Tuple[Dict, Optional[str], List[Dict], Dict, List[Dict]]:
     """
     Extract metadata, OCR text, insights, summary, and key terms using GPT-5-Nano Vision
 
-    Sends ALL page images in a single API call for:
+    Sends one window of page images in a single API call for:
     1. Metadata field extraction
     2. Formatted OCR text from all pages
     3. Document insights (observations, risks, compliance issues)
@@ -327,9 +488,14 @@ async def extract_with_vision(
         fields: Schema fields to extract
         classification_ocr_text: OCR from classification (page 1 only)
         include_vision_ocr: Whether to extract formatted OCR text
+        known_metadata: Fields already extracted from earlier windows
+        previous_summary: Summary of earlier windows, refined by this call
+        first_page_number: Page number of the first image in this window
+        total_pages: Total pages in the document (for the window note)
 
     Returns:
-        Tuple of (extracted_metadata_dict, formatted_ocr_text, insights_list, summary_dict, key_terms_list)
+        Tuple of (extracted_metadata_dict, formatted_ocr_text, insights_list, summary_dict, key_terms_list);
+        formatted_ocr_text is None when the response could not be parsed
     """
     try:
         # Build prompt for metadata extraction + OCR
@@ -444,7 +610,28 @@ Return JSON:
 
 JSON only, no markdown."""
 
-        # Build messages with all page images
+        # Windowed extraction: say which pages these are and what is already known
+        window_notes = []
+        if total_pages and (first_page_number > 1 or len(page_images) < total_pages):
+            last_page = first_page_number + len(page_images) - 1
+            window_notes.append(
+                f"These images are pages {first_page_number}-{last_page} of {total_pages}; use those page numbers."
+            )
+        filled_metadata = {k: v for k, v in (known_metadata or {}).items() if _is_filled(v)}
+        if filled_metadata:
+            window_notes.append(
+                "Fields already extracted from earlier pages (only fill the missing ones): "
+                + json.dumps(filled_metadata, default=str)
+            )
+        if previous_summary and previous_summary.get('summary_text'):
+            window_notes.append(
+                "Summary of earlier pages (return an updated summary covering all pages so far): "
+                + previous_summary['summary_text']
+            )
+        if window_notes:
+            extraction_prompt += "\n\n" + "\n".join(window_notes)
+
+        # Build messages with this window's page images
         messages = [
             {
                 "role": "system",
@@ -464,7 +651,7 @@ JSON only, no markdown."""
                 "type": "image_url",
                 "image_url": {"url": img_data_url}
             })
-            logger.info(f"  - Added page {idx + 1} to vision request")
+            logger.info(f"  - Added page {first_page_number + idx} to vision request")
 
         logger.info(f"🚀 Sending {len(page_images)} pages to GPT-5-Nano Vision...")
 
@@ -478,7 +665,7 @@ JSON only, no markdown."""
                 logger.info(f"🔄 Vision API attempt {attempt + 1}/{max_retries}")
 
                 response = openai_client.chat.completions.create(
-                    model="gpt-5-nano",
+                    model=EXTRACTION_MODEL,
                     messages=messages,
                     max_completion_tokens=8000,  # Increased: reasoning uses ~4000, output needs ~2000-4000
                     timeout=60  # Longer timeout for vision with multiple pages
@@ -518,7 +705,7 @@ JSON only, no markdown."""
 
         if not result_text:
             logger.error("❌ Failed to get valid response from vision API")
-            return {}, ""  # Return empty extraction
+            return {}, "", [], {}, []  # Return empty extraction
 
         logger.info(f"📝 Received response from GPT-5-Nano ({len(result_text)} chars)")
 
@@ -539,7 +726,7 @@ JSON only, no markdown."""
         key_terms = result_data.get('key_terms', [])
 
         # Add model_version to insights, summary, and key_terms
-        model_version = "gpt-5-nano"
+        model_version = EXTRACTION_MODEL
 
         # Add model_version to each insight
         for insight in insights:
@@ -567,8 +754,8 @@ JSON only, no markdown."""
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse GPT-5-Nano response as JSON: {e}")
         logger.error(f"Raw response: {result_text[:500]}")
-        # Return empty extraction
-        return {}, classification_ocr_text or "", [], {}, []
+        # Return empty extraction; the caller falls back to the classification OCR text
+        return {}, None, [], {}, []
     except Exception as e:
         logger.error(f"Vision extraction failed: {e}")
         import traceback
@@ -7,6 +7,7 @@ from uuid import UUID
 import logging
 
 from app.database import get_db_cursor
+from app.services.notification_store import notification_store
 from app.models.notifications import (
     Notification, NotificationCreate, NotificationListResponse
 )
@@ -38,15 +39,14 @@ async def list_notifications(
 
         where_sql = " AND ".join(where_clauses)
 
-        with get_db_cursor() as cursor:
-            # Get total and unread count
-            cursor.execute(
-                f"SELECT COUNT(*) as total, COUNT(*) FILTER (WHERE is_read = FALSE) as unread FROM notifications WHERE {where_sql}",
-                params
-            )
-            counts = cursor.fetchone()
+        # Totals come from the per-user counters rather than a count per page load
+        counts = notification_store.get_counts(user_id)
+        if is_read is None:
+            total = counts['total']
+        else:
+            total = counts['total'] - counts['unread'] if is_read else counts['unread']
 
-            # Get notifications
+        with get_db_cursor() as cursor:
             query = f"""
                 SELECT * FROM notifications
                 WHERE {where_sql}
@@ -58,7 +58,7 @@ async def list_notifications(
 
             return {
                 "notifications": [dict(n) for n in notifications],
-                "total": counts['total'],
+                "total": total,
                 "unread_count": counts['unread']
             }
     except Exception as e:
@@ -66,6 +66,18 @@ async def list_notifications(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/unread-count")
+async def get_unread_count(user_id: UUID):
+    """
+    Get count of unread notifications
+    """
+    try:
+        return {"unread_count": notification_store.get_unread_count(user_id)}
+    except Exception as e:
+        logger.error(f"Error getting unread count: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{notification_id}", response_model=Notification)
 async def get_notification(notification_id: UUID):
     """
@@ -162,24 +174,3 @@ async def delete_notification(notification_id: UUID):
     except Exception as e:
         logger.error(f"Error deleting notification: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
-
-@router.get("/unread-count")
-async def get_unread_count(user_id: UUID):
-    """
-    Get count of unread notifications
-    """
-    try:
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM notifications
-                WHERE user_id = %s AND is_read = FALSE
-                AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
-            """, (str(user_id),))
-
-            result = cursor.fetchone()
-
-            return {"unread_count": result['count']}
-    except Exception as e:
-        logger.error(f"Error getting unread count: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
@@ -50,7 +50,7 @@ async def start_ocr_job(job: OCRJobCreate):
         with get_db_cursor(commit=True) as cursor:
             # Get document information
             cursor.execute("""
-                SELECT id, file_storage_path, file_original_name, mime_type
+                SELECT id, file_storage_path, file_original_name, mime_type, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
             """, (str(job.document_id),))
@@ -99,10 +99,11 @@ async def start_ocr_job(job: OCRJobCreate):
 
             logger.info(f"Starting Vision OCR for document {job.document_id}, job {ocr_job_id}")
 
-            # Process document with Vision OCR
-            success, ocr_results, error = ocr_service.process_document(
+            # Process document with Vision OCR (reuses results cached for identical bytes)
+            success, ocr_results, error, cached = ocr_service.process_document_cached(
                 file_path,
-                language=job.language or 'eng'
+                language=job.language or 'eng',
+                content_sha256=doc_dict.get('checksum_sha256')
             )
 
             if success and ocr_results:
@@ -323,7 +324,7 @@ async def extract_text_from_document(
         with get_db_cursor() as cursor:
             # Get document information
             cursor.execute("""
-                SELECT id, file_storage_path, file_original_name, mime_type
+                SELECT id, file_storage_path, file_original_name, mime_type, checksum_sha256
                 FROM documents
                 WHERE id = %s AND deleted_at IS NULL
             """, (str(document_id),))
@@ -356,10 +357,11 @@ async def extract_text_from_document(
 
             logger.info(f"Extracting text from document {document_id} using Vision OCR")
 
-            # Process document with Vision OCR
-            success, ocr_results, error = ocr_service.process_document(
+            # Process document with Vision OCR (reuses results cached for identical bytes)
+            success, ocr_results, error, cached = ocr_service.process_document_cached(
                 file_path,
-                language=language
+                language=language,
+                content_sha256=doc_dict.get('checksum_sha256')
             )
 
             if success and ocr_results:
@@ -374,6 +376,7 @@ async def extract_text_from_document(
                     "total_chars": ocr_results.get('total_chars', 0),
                     "language": language,
                     "method": "GPT-4 Vision",
+                    "cached": cached,
                     "success": True
                 }
             else:
@@ -1,7 +1,8 @@
 """
 Physical Documents - Barcode Management API Router
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from uuid import UUID
 import hashlib
@@ -15,9 +16,13 @@ from app.models.physical_documents import (
     BarcodeGenerationRequest, BarcodeGenerationJob,
     BarcodeFormat, BarcodeFormatType
 )
+from app.services.barcode_allocator import barcode_allocator, validate_check_digit, validate_request
 
 router = APIRouter(prefix="/api/v1/physical/barcodes", tags=["physical-barcodes"])
 
+# Generation jobs up to this many codes complete within the request
+INLINE_GENERATION_LIMIT = 1000
+
 
 # ==========================================
 # Barcode Formats Endpoints
@@ -258,7 +263,7 @@ async def activate_barcode(barcode_id: UUID):
 # ==========================================
 
 def generate_barcode_code(prefix: Optional[str] = None, suffix: Optional[str] = None, length: int = 12) -> str:
-    """Generate a unique barcode code"""
+    """Generate a random barcode code (single manual codes; bulk jobs use barcode_allocator)"""
     # Generate random alphanumeric code
     chars = string.ascii_uppercase + string.digits
     code_part = ''.join(random.choices(chars, k=length))
@@ -269,9 +274,20 @@ def generate_barcode_code(prefix: Optional[str] = None, suffix: Optional[str] =
 
 
 @router.post("/generate", response_model=BarcodeGenerationJob)
-async def generate_barcodes(request: BarcodeGenerationRequest):
-    """Generate barcodes for documents or assets"""
+async def generate_barcodes(request: BarcodeGenerationRequest, background_tasks: BackgroundTasks):
+    """
+    Generate barcodes for documents or assets
+
+    Small jobs complete before the response. Larger jobs run in the
+    background; poll GET /jobs/{job_id} for progress.
+    """
     try:
+        total = max(request.quantity, len(request.document_ids) + len(request.asset_ids))
+        try:
+            validate_request(request.format.value, request.prefix, request.suffix, total)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         # Get format
         with get_db_cursor() as cursor:
             cursor.execute("""
@@ -289,7 +305,7 @@ async def generate_barcodes(request: BarcodeGenerationRequest):
             cursor.execute("""
                 INSERT INTO barcode_generation_jobs (document_ids, format, prefix, suffix, quantity, status)
                 VALUES (%s, %s, %s, %s, %s, 'processing')
-                RETURNING id, document_ids, format, prefix, suffix, quantity, status, progress, created_at
+                RETURNING id
             """, (
                 request.document_ids,
                 request.format.value,
@@ -297,63 +313,16 @@ async def generate_barcodes(request: BarcodeGenerationRequest):
                 request.suffix,
                 request.quantity
             ))
-            job = cursor.fetchone()
-            job_id = job['id']
+            job_id = cursor.fetchone()['id']
 
-        # Generate barcodes
-        generated_count = 0
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                # Generate for documents
-                for doc_id in request.document_ids:
-                    code = generate_barcode_code(request.prefix, request.suffix)
-                    checksum = hashlib.md5(code.encode()).hexdigest()
-
-                    cursor.execute("""
-                        INSERT INTO barcode_records (code, format_id, document_id, checksum)
-                        VALUES (%s, %s, %s, %s)
-                    """, (code, format_id, doc_id, checksum))
-                    generated_count += 1
-
-                # Generate for assets
-                for asset_id in request.asset_ids:
-                    code = generate_barcode_code(request.prefix, request.suffix)
-                    checksum = hashlib.md5(code.encode()).hexdigest()
-
-                    cursor.execute("""
-                        INSERT INTO barcode_records (code, format_id, asset_id, checksum)
-                        VALUES (%s, %s, %s, %s)
-                    """, (code, format_id, asset_id, checksum))
-                    generated_count += 1
-
-                # Generate additional quantity if specified
-                remaining = request.quantity - generated_count
-                for _ in range(remaining):
-                    code = generate_barcode_code(request.prefix, request.suffix)
-                    checksum = hashlib.md5(code.encode()).hexdigest()
-
-                    cursor.execute("""
-                        INSERT INTO barcode_records (code, format_id, checksum)
-                        VALUES (%s, %s, %s)
-                    """, (code, format_id, checksum))
-                    generated_count += 1
-
-                # Update job status
-                cursor.execute("""
-                    UPDATE barcode_generation_jobs
-                    SET status = 'completed', progress = 100, completed_at = NOW()
-                    WHERE id = %s
-                """, (job_id,))
-
-        except Exception as e:
-            # Mark job as failed
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute("""
-                    UPDATE barcode_generation_jobs
-                    SET status = 'failed', error = %s
-                    WHERE id = %s
-                """, (str(e), job_id))
-            raise
+        job_args = (
+            job_id, format_id, request.format.value, request.prefix, request.suffix,
+            request.quantity, request.document_ids, request.asset_ids
+        )
+        if total <= INLINE_GENERATION_LIMIT:
+            await run_in_threadpool(barcode_allocator.run_job, *job_args)
+        else:
+            background_tasks.add_task(barcode_allocator.run_job, *job_args)
 
         # Return job details
         with get_db_cursor() as cursor:
@@ -405,6 +374,7 @@ async def validate_barcode(code: str):
                 "code": code,
                 "is_valid": len(code) > 0,
                 "is_unique": is_unique,
+                "check_digit_valid": validate_check_digit(code),
                 "checksum": hashlib.md5(code.encode()).hexdigest()
             }
     except Exception as e:
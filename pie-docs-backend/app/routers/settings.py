@@ -10,6 +10,7 @@ import logging
 import json
 
 from app.database import get_db_cursor
+from app.services.audit_logger import audit_logger
 from app.middleware import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -235,23 +236,13 @@ async def update_setting(
             setting_dict['setting_value'] = "***ENCRYPTED***"
 
         # Log audit event
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute(
-                    """
-                    SELECT log_audit_event(
-                        'setting_update',
-                        'setting_changed',
-                        %s,
-                        'system_setting',
-                        NULL,
-                        %s
-                    )
-                    """,
-                    (current_user['id'], f"Setting '{setting_key}' updated")
-                )
-        except Exception as e:
-            logger.error(f"Error logging audit event: {e}")
+        audit_logger.log(
+            "setting_update",
+            "setting_changed",
+            user_id=current_user['id'],
+            resource_type="system_setting",
+            description=f"Setting '{setting_key}' updated"
+        )
 
         return SettingResponse(**setting_dict)
 
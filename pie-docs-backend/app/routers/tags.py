@@ -8,6 +8,7 @@ import logging
 
 from app.database import get_db_cursor
 from app.models.documents import Tag, TagCreate, TagUpdate
+from app.services.tag_index import tag_index_service
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +67,21 @@ async def get_popular_tags(limit: int = Query(20, ge=1, le=100)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/related")
+async def get_related_tags(
+    tag: str = Query(..., min_length=1, description="Tag name"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Get tags most often used together with a tag, from the co-occurrence index
+    """
+    try:
+        return {"tag": tag, "related": tag_index_service.related_tags(tag, limit)}
+    except Exception as e:
+        logger.error(f"Error getting related tags: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("", response_model=Tag, status_code=status.HTTP_201_CREATED)
 async def create_tag(tag: TagCreate):
     """
@@ -3,12 +3,16 @@ Warehouse Management System API Router
 Comprehensive endpoints for Location → Warehouse → Zone → Shelf → Rack → Document hierarchy
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
 from psycopg2.extras import Json
 
 from app.database import get_db_cursor
+from app.services.barcode_index import barcode_index
+from app.services.capacity_snapshot_service import capacity_snapshot_service
+from app.services.warehouse_hierarchy_service import warehouse_hierarchy_cache
 from app.models.warehouse import (
     # Location
     Location, LocationCreate, LocationUpdate,
@@ -108,7 +112,9 @@ async def create_location(location: LocationCreate, user_id: UUID = Query(...)):
                 user_id, user_id
             ))
             new_location = cursor.fetchone()
-            return dict(new_location)
+        warehouse_hierarchy_cache.invalidate(new_location['id'])
+        barcode_index.upsert_node('location', new_location)
+        return dict(new_location)
     except Exception as e:
         if 'unique constraint' in str(e).lower():
             raise HTTPException(status_code=409, detail="Location code already exists")
@@ -149,7 +155,9 @@ async def update_location(location_id: UUID, location: LocationUpdate, user_id:
             if not updated_location:
                 raise HTTPException(status_code=404, detail="Location not found")
 
-            return dict(updated_location)
+        warehouse_hierarchy_cache.invalidate(location_id)
+        barcode_index.upsert_node('location', updated_location)
+        return dict(updated_location)
     except HTTPException:
         raise
     except Exception as e:
@@ -235,7 +243,9 @@ async def create_warehouse(warehouse: WarehouseCreate, user_id: UUID = Query(...
                 Json(warehouse.contact.dict()), Json(warehouse.metadata), user_id, user_id
             ))
             new_warehouse = cursor.fetchone()
-            return dict(new_warehouse)
+        warehouse_hierarchy_cache.invalidate(new_warehouse['location_id'])
+        barcode_index.upsert_node('warehouse', new_warehouse)
+        return dict(new_warehouse)
     except Exception as e:
         error_msg = str(e).lower()
         if 'unique constraint' in error_msg:
@@ -282,7 +292,9 @@ async def update_warehouse(warehouse_id: UUID, warehouse: WarehouseUpdate, user_
             if not updated_warehouse:
                 raise HTTPException(status_code=404, detail="Warehouse not found")
 
-            return dict(updated_warehouse)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('warehouse', updated_warehouse)
+        return dict(updated_warehouse)
     except HTTPException:
         raise
     except Exception as e:
@@ -379,7 +391,9 @@ async def create_zone(zone: ZoneCreate, user_id: UUID = Query(...)):
                 zone.access_level, Json(zone.metadata), user_id, user_id
             ))
             new_zone = cursor.fetchone()
-            return dict(new_zone)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('zone', new_zone)
+        return dict(new_zone)
     except Exception as e:
         error_msg = str(e).lower()
         if 'unique constraint' in error_msg:
@@ -426,7 +440,9 @@ async def update_zone(zone_id: UUID, zone: ZoneUpdate, user_id: UUID = Query(...
             if not updated_zone:
                 raise HTTPException(status_code=404, detail="Zone not found")
 
-            return dict(updated_zone)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('zone', updated_zone)
+        return dict(updated_zone)
     except HTTPException:
         raise
     except Exception as e:
@@ -514,7 +530,9 @@ async def create_shelf(shelf: ShelfCreate, user_id: UUID = Query(...)):
                 shelf.max_racks, Json(shelf.position.dict()), Json(shelf.metadata), user_id, user_id
             ))
             new_shelf = cursor.fetchone()
-            return dict(new_shelf)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('shelf', new_shelf)
+        return dict(new_shelf)
     except Exception as e:
         error_msg = str(e).lower()
         if 'unique constraint' in error_msg:
@@ -561,7 +579,9 @@ async def update_shelf(shelf_id: UUID, shelf: ShelfUpdate, user_id: UUID = Query
             if not updated_shelf:
                 raise HTTPException(status_code=404, detail="Shelf not found")
 
-            return dict(updated_shelf)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('shelf', updated_shelf)
+        return dict(updated_shelf)
     except HTTPException:
         raise
     except Exception as e:
@@ -662,7 +682,9 @@ async def create_rack(rack: RackCreate, user_id: UUID = Query(...)):
                 rack.assignment_type, Json(rack.metadata), user_id, user_id
             ))
             new_rack = cursor.fetchone()
-            return dict(new_rack)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('rack', new_rack)
+        return dict(new_rack)
     except Exception as e:
         error_msg = str(e).lower()
         if 'unique constraint' in error_msg:
@@ -709,7 +731,9 @@ async def update_rack(rack_id: UUID, rack: RackUpdate, user_id: UUID = Query(...
             if not updated_rack:
                 raise HTTPException(status_code=404, detail="Rack not found")
 
-            return dict(updated_rack)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_node('rack', updated_rack)
+        return dict(updated_rack)
     except HTTPException:
         raise
     except Exception as e:
@@ -827,12 +851,12 @@ async def create_physical_document(document: PhysicalDocumentCreate, user_id: UU
     """Create a new physical document record"""
     try:
         with get_db_cursor(commit=True) as cursor:
-            # Update rack capacity
+            # Lock the rack while checking capacity; the counter itself is
+            # incremented by the physical_documents trigger on insert
             cursor.execute("""
-                UPDATE racks
-                SET current_documents = current_documents + 1
+                SELECT id FROM racks
                 WHERE id = %s AND current_documents < max_documents
-                RETURNING id
+                FOR UPDATE
             """, (document.rack_id,))
 
             if not cursor.fetchone():
@@ -856,7 +880,9 @@ async def create_physical_document(document: PhysicalDocumentCreate, user_id: UU
                 document.customer_id, Json(document.metadata), user_id, user_id, user_id
             ))
             new_document = cursor.fetchone()
-            return dict(new_document)
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.upsert_document(new_document)
+        return dict(new_document)
     except HTTPException:
         raise
     except Exception as e:
@@ -1077,68 +1103,44 @@ async def get_capacity_stats(
         raise HTTPException(status_code=500, detail=f"Failed to fetch capacity stats: {str(e)}")
 
 
-@router.get("/hierarchy/{location_id}")
-async def get_warehouse_hierarchy(location_id: UUID):
-    """Get complete warehouse hierarchy for a location"""
-    try:
-        with get_db_cursor() as cursor:
-            # Get location
-            cursor.execute("SELECT * FROM locations WHERE id = %s", (location_id,))
-            location = cursor.fetchone()
-
-            if not location:
-                raise HTTPException(status_code=404, detail="Location not found")
-
-            # Get warehouses
-            cursor.execute("SELECT * FROM warehouses WHERE location_id = %s ORDER BY name", (location_id,))
-            warehouses = cursor.fetchall()
-
-            hierarchy = {
-                "location": dict(location),
-                "warehouses": []
-            }
-
-            for warehouse in warehouses:
-                warehouse_dict = dict(warehouse)
-
-                # Get zones
-                cursor.execute("SELECT * FROM zones WHERE warehouse_id = %s ORDER BY name", (warehouse['id'],))
-                zones = cursor.fetchall()
-                warehouse_dict['zones'] = []
-
-                for zone in zones:
-                    zone_dict = dict(zone)
-
-                    # Get shelves
-                    cursor.execute("SELECT * FROM shelves WHERE zone_id = %s ORDER BY position", (zone['id'],))
-                    shelves = cursor.fetchall()
-                    zone_dict['shelves'] = []
-
-                    for shelf in shelves:
-                        shelf_dict = dict(shelf)
-
-                        # Get racks
-                        cursor.execute("SELECT * FROM racks WHERE shelf_id = %s ORDER BY position", (shelf['id'],))
-                        racks = cursor.fetchall()
-                        shelf_dict['racks'] = []
+@router.get("/stats/capacity/snapshot/{location_id}")
+async def get_capacity_snapshot(location_id: UUID, refresh: bool = False):
+    """
+    Cached utilization snapshot for a location (totals, buckets and per-zone utilization)
 
-                        for rack in racks:
-                            rack_dict = dict(rack)
-
-                            # Get documents
-                            cursor.execute("SELECT * FROM physical_documents WHERE rack_id = %s", (rack['id'],))
-                            documents = cursor.fetchall()
-                            rack_dict['documents'] = [dict(doc) for doc in documents]
+    Refreshed incrementally from rows changed since the last refresh. Dashboards
+    can receive the same payload pushed over the notifications websocket by
+    sending "subscribe_capacity:<location_id>".
+    """
+    try:
+        if refresh:
+            return await run_in_threadpool(capacity_snapshot_service.refresh, location_id)
+        return await run_in_threadpool(capacity_snapshot_service.get, location_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch capacity snapshot: {str(e)}")
 
-                            shelf_dict['racks'].append(rack_dict)
 
-                        zone_dict['shelves'].append(shelf_dict)
+@router.get("/hierarchy/{location_id}")
+async def get_warehouse_hierarchy(
+    location_id: UUID,
+    documents_per_rack: int = Query(0, ge=0, le=100, description="Documents embedded per rack (0 = counts only)"),
+    refresh: bool = Query(False, description="Bypass the hierarchy cache")
+):
+    """
+    Get complete warehouse hierarchy for a location
 
-                    warehouse_dict['zones'].append(zone_dict)
+    Each rack carries document_count; at most documents_per_rack documents
+    are embedded (use /racks/{rack_id}/documents to page through the rest).
+    """
+    try:
+        if refresh:
+            warehouse_hierarchy_cache.invalidate(location_id)
 
-                hierarchy['warehouses'].append(warehouse_dict)
+        hierarchy = warehouse_hierarchy_cache.get(location_id, documents_per_rack)
+        if hierarchy is None:
+            raise HTTPException(status_code=404, detail="Location not found")
 
-            return hierarchy
+        return hierarchy
     except HTTPException:
         raise
     except Exception as e:
@@ -8,6 +8,8 @@ from uuid import UUID
 from datetime import datetime
 
 from app.database import get_db_cursor
+from app.services.barcode_index import barcode_index
+from app.services.warehouse_hierarchy_service import warehouse_hierarchy_cache
 from app.models.warehouse import (
     Location, Warehouse, Zone, Shelf, Rack, PhysicalDocument,
     DocumentMovement, DocumentMovementCreate
@@ -42,7 +44,9 @@ async def delete_location(location_id: UUID):
             if not deleted:
                 raise HTTPException(status_code=404, detail="Location not found")
 
-            return {"message": "Location deleted successfully", "id": str(deleted['id'])}
+        warehouse_hierarchy_cache.invalidate(location_id)
+        barcode_index.remove_node(deleted['id'])
+        return {"message": "Location deleted successfully", "id": str(deleted['id'])}
     except HTTPException:
         raise
     except Exception as e:
@@ -71,7 +75,9 @@ async def delete_warehouse(warehouse_id: UUID):
             if not deleted:
                 raise HTTPException(status_code=404, detail="Warehouse not found")
 
-            return {"message": "Warehouse deleted successfully", "id": str(deleted['id'])}
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.remove_node(deleted['id'])
+        return {"message": "Warehouse deleted successfully", "id": str(deleted['id'])}
     except HTTPException:
         raise
     except Exception as e:
@@ -100,7 +106,9 @@ async def delete_zone(zone_id: UUID):
             if not deleted:
                 raise HTTPException(status_code=404, detail="Zone not found")
 
-            return {"message": "Zone deleted successfully", "id": str(deleted['id'])}
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.remove_node(deleted['id'])
+        return {"message": "Zone deleted successfully", "id": str(deleted['id'])}
     except HTTPException:
         raise
     except Exception as e:
@@ -129,7 +137,9 @@ async def delete_shelf(shelf_id: UUID):
             if not deleted:
                 raise HTTPException(status_code=404, detail="Shelf not found")
 
-            return {"message": "Shelf deleted successfully", "id": str(deleted['id'])}
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.remove_node(deleted['id'])
+        return {"message": "Shelf deleted successfully", "id": str(deleted['id'])}
     except HTTPException:
         raise
     except Exception as e:
@@ -158,7 +168,9 @@ async def delete_rack(rack_id: UUID):
             if not deleted:
                 raise HTTPException(status_code=404, detail="Rack not found")
 
-            return {"message": "Rack deleted successfully", "id": str(deleted['id'])}
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.remove_node(deleted['id'])
+        return {"message": "Rack deleted successfully", "id": str(deleted['id'])}
     except HTTPException:
         raise
     except Exception as e:
@@ -177,7 +189,9 @@ async def delete_document(document_id: UUID):
             if not deleted:
                 raise HTTPException(status_code=404, detail="Document not found")
 
-            return {"message": "Document deleted successfully", "id": str(deleted['id'])}
+        warehouse_hierarchy_cache.invalidate()
+        barcode_index.remove_document(deleted['id'])
+        return {"message": "Document deleted successfully", "id": str(deleted['id'])}
     except HTTPException:
         raise
     except Exception as e:
@@ -275,7 +289,10 @@ async def move_document(
                     WHERE id = %s
                 """, (movement.to_rack_id, document_id))
 
-            return dict(movement_record)
+        warehouse_hierarchy_cache.invalidate()
+        if movement.movement_type in ['initial_storage', 'relocation', 'return']:
+            barcode_index.move_document(document_id, movement.to_rack_id)
+        return dict(movement_record)
     except HTTPException:
         raise
     except Exception as e:
@@ -424,15 +441,22 @@ async def get_shelf_racks(shelf_id: UUID):
 
 
 @router.get("/racks/{rack_id}/documents", response_model=List[PhysicalDocument])
-async def get_rack_documents(rack_id: UUID):
-    """Get all documents in a rack"""
+async def get_rack_documents(
+    rack_id: UUID,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=500)
+):
+    """Get documents in a rack, a page at a time"""
     try:
+        offset = (page - 1) * page_size
+
         with get_db_cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM physical_documents
                 WHERE rack_id = %s
-                ORDER BY title
-            """, (rack_id,))
+                ORDER BY title, id
+                LIMIT %s OFFSET %s
+            """, (rack_id, page_size, offset))
             documents = cursor.fetchall()
             return [dict(row) for row in documents]
     except Exception as e:
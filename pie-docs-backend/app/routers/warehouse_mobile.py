@@ -2,17 +2,31 @@
 Warehouse Management System - Mobile Scanning Module
 Mobile barcode scanning, inventory verification, offline sync
 """
+import json
+import logging
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from uuid import UUID, uuid4
 from datetime import datetime
 from enum import Enum
 
+from psycopg2.extras import execute_values
+
 from app.database import get_db_cursor
+from app.services.barcode_index import barcode_index
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/warehouse/mobile", tags=["warehouse"])
 
+# Rows per multi-row INSERT statement when syncing offline scans
+BULK_SCAN_PAGE_SIZE = 1000
+
+# Racks reconciled per query (and per streamed chunk) in multi-rack audits
+RECONCILE_RACK_BATCH = 100
+
 
 # ==========================================
 # PYDANTIC MODELS
@@ -85,6 +99,7 @@ class ScanRecordCreate(BaseModel):
     photo_url: Optional[str] = None
     notes: Optional[str] = None
     offline: bool = False  # True if scanned while offline
+    client_scan_id: Optional[str] = Field(None, max_length=100)  # Device-generated ID, makes re-syncs idempotent
 
 
 class ScanRecord(BaseModel):
@@ -103,6 +118,7 @@ class ScanRecord(BaseModel):
     notes: Optional[str]
     verified: bool
     offline: bool
+    client_scan_id: Optional[str] = None
 
 
 class InventoryVerification(BaseModel):
@@ -116,9 +132,42 @@ class InventoryVerification(BaseModel):
     accuracy_percentage: float
 
 
+class RackScanSet(BaseModel):
+    """Barcodes scanned in one rack during an audit"""
+    rack_id: UUID
+    scanned_barcodes: List[str] = []
+
+
+class MultiRackVerification(BaseModel):
+    """Scans for many racks, e.g. a full zone or warehouse audit"""
+    racks: List[RackScanSet] = Field(..., min_length=1, max_length=5000)
+
+
+class MisplacedDocument(BaseModel):
+    """Known document scanned in a rack it is not assigned to"""
+    barcode: str
+    document_id: UUID
+    title: Optional[str]
+    expected_rack_id: Optional[UUID]  # None if the document is not assigned to a rack
+    expected_location_path: Optional[str]
+
+
+class RackReconciliation(BaseModel):
+    """Reconciliation result for one rack"""
+    rack_id: UUID
+    rack_name: str
+    expected_count: int
+    scanned_count: int
+    matched: List[Dict[str, Any]]
+    missing: List[Dict[str, Any]]
+    misplaced: List[MisplacedDocument]
+    unexpected: List[str]  # Barcodes that match no document
+    accuracy_percentage: float
+
+
 class BulkScanSync(BaseModel):
     """Bulk sync for offline scans"""
-    scans: List[ScanRecordCreate]
+    scans: List[ScanRecordCreate] = Field(..., max_length=10000)
 
 
 class EntityLookupResponse(BaseModel):
@@ -150,57 +199,91 @@ def detect_entity_type(barcode: str) -> EntityType:
     return EntityType.UNKNOWN
 
 
+# Tables backing each scannable entity type
+ENTITY_TABLES = {
+    EntityType.ZONE: "zones",
+    EntityType.SHELF: "shelves",
+    EntityType.RACK: "racks",
+    EntityType.DOCUMENT: "physical_documents",
+}
+
+# Lookup queries per entity type; {match} is "= %s" for one barcode or "= ANY(%s)" for many
+ENTITY_LOOKUP_QUERIES = {
+    EntityType.ZONE: """
+        SELECT z.id, z.name, z.barcode,
+               l.name || ' > ' || w.name || ' > ' || z.name as location_path
+        FROM zones z
+        JOIN warehouses w ON z.warehouse_id = w.id
+        JOIN locations l ON w.location_id = l.id
+        WHERE z.barcode {match} AND z.status = 'active'
+    """,
+    EntityType.SHELF: """
+        SELECT s.id, s.name, s.barcode,
+               l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name as location_path
+        FROM shelves s
+        JOIN zones z ON s.zone_id = z.id
+        JOIN warehouses w ON z.warehouse_id = w.id
+        JOIN locations l ON w.location_id = l.id
+        WHERE s.barcode {match} AND s.status = 'active'
+    """,
+    EntityType.RACK: """
+        SELECT r.id, r.name, r.barcode,
+               l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name as location_path
+        FROM racks r
+        JOIN shelves s ON r.shelf_id = s.id
+        JOIN zones z ON s.zone_id = z.id
+        JOIN warehouses w ON z.warehouse_id = w.id
+        JOIN locations l ON w.location_id = l.id
+        WHERE r.barcode {match} AND r.status = 'active'
+    """,
+    EntityType.DOCUMENT: """
+        SELECT d.id, d.title as name, d.barcode, d.rack_id,
+               l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name as location_path
+        FROM physical_documents d
+        LEFT JOIN racks r ON d.rack_id = r.id
+        LEFT JOIN shelves s ON r.shelf_id = s.id
+        LEFT JOIN zones z ON s.zone_id = z.id
+        LEFT JOIN warehouses w ON z.warehouse_id = w.id
+        LEFT JOIN locations l ON w.location_id = l.id
+        WHERE d.barcode {match}
+    """,
+}
+
+
 def lookup_entity(cursor, barcode: str, entity_type: EntityType) -> Optional[Dict[str, Any]]:
-    """Look up entity by barcode and type"""
-    if entity_type == EntityType.ZONE:
-        cursor.execute("""
-            SELECT z.id, z.name, z.barcode,
-                   l.name || ' > ' || w.name || ' > ' || z.name as location_path
-            FROM zones z
-            JOIN warehouses w ON z.warehouse_id = w.id
-            JOIN locations l ON w.location_id = l.id
-            WHERE z.barcode = %s AND z.status = 'active'
-        """, (barcode,))
-    elif entity_type == EntityType.SHELF:
-        cursor.execute("""
-            SELECT s.id, s.name, s.barcode,
-                   l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name as location_path
-            FROM shelves s
-            JOIN zones z ON s.zone_id = z.id
-            JOIN warehouses w ON z.warehouse_id = w.id
-            JOIN locations l ON w.location_id = l.id
-            WHERE s.barcode = %s AND s.status = 'active'
-        """, (barcode,))
-    elif entity_type == EntityType.RACK:
-        cursor.execute("""
-            SELECT r.id, r.name, r.barcode,
-                   l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name as location_path
-            FROM racks r
-            JOIN shelves s ON r.shelf_id = s.id
-            JOIN zones z ON s.zone_id = z.id
-            JOIN warehouses w ON z.warehouse_id = w.id
-            JOIN locations l ON w.location_id = l.id
-            WHERE r.barcode = %s AND r.status = 'active'
-        """, (barcode,))
-    elif entity_type == EntityType.DOCUMENT:
-        cursor.execute("""
-            SELECT d.id, d.title as name, d.barcode,
-                   l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name as location_path
-            FROM physical_documents d
-            LEFT JOIN racks r ON d.rack_id = r.id
-            LEFT JOIN shelves s ON r.shelf_id = s.id
-            LEFT JOIN zones z ON s.zone_id = z.id
-            LEFT JOIN warehouses w ON z.warehouse_id = w.id
-            LEFT JOIN locations l ON w.location_id = l.id
-            WHERE d.barcode = %s
-        """, (barcode,))
-    else:
+    """Look up entity by barcode and type (in-memory index first, then the database)"""
+    query = ENTITY_LOOKUP_QUERIES.get(entity_type)
+    if not query:
         return None
 
+    indexed = barcode_index.resolve(barcode, entity_type.value)
+    if indexed:
+        return indexed
+
+    cursor.execute(query.format(match="= %s"), (barcode,))
     result = cursor.fetchone()
     return dict(result) if result else None
 
 
+def lookup_entities(cursor, barcodes: List[str], entity_type: EntityType) -> Dict[str, Dict[str, Any]]:
+    """Look up many barcodes of one type in a single query, keyed by barcode"""
+    query = ENTITY_LOOKUP_QUERIES.get(entity_type)
+    if not query or not barcodes:
+        return {}
+
+    found = {}
+    for barcode in barcodes:
+        indexed = barcode_index.resolve(barcode, entity_type.value)
+        if indexed:
+            found[barcode] = indexed
+
+    misses = [barcode for barcode in barcodes if barcode not in found]
+    if misses:
+        cursor.execute(query.format(match="= ANY(%s)"), (misses,))
+        found.update({row['barcode']: dict(row) for row in cursor.fetchall()})
+    return found
+
+
 # ==========================================
 # SCAN SESSION ENDPOINTS
 # ==========================================
@@ -384,23 +467,30 @@ async def record_scan(scan: ScanRecordCreate):
             cursor.execute("""
                 INSERT INTO scan_records (
                     session_id, barcode, entity_type, entity_id, entity_name, entity_location_path,
-                    location_lat, location_lon, photo_url, notes, verified, offline
+                    location_lat, location_lon, photo_url, notes, verified, offline, client_scan_id
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (session_id, client_scan_id) WHERE client_scan_id IS NOT NULL DO NOTHING
                 RETURNING *
             """, (
                 scan.session_id, scan.barcode, entity_type.value, entity_id, entity_name,
                 location_path, scan.location_lat, scan.location_lon, scan.photo_url,
-                scan.notes, verified, scan.offline
+                scan.notes, verified, scan.offline, scan.client_scan_id
             ))
 
             result = cursor.fetchone()
+            if not result:
+                # Already recorded by an earlier attempt
+                cursor.execute("""
+                    SELECT * FROM scan_records
+                    WHERE session_id = %s AND client_scan_id = %s
+                """, (scan.session_id, scan.client_scan_id))
+                return dict(cursor.fetchone())
 
             # Update barcode status to 'scanned' if entity found
             if verified and entity_id:
-                table_name = f"{entity_type.value}s" if entity_type != EntityType.DOCUMENT else "physical_documents"
                 cursor.execute(f"""
-                    UPDATE {table_name}
+                    UPDATE {ENTITY_TABLES[entity_type]}
                     SET barcode_status = 'scanned'
                     WHERE id = %s AND barcode_status != 'scanned'
                 """, (entity_id,))
@@ -412,54 +502,86 @@ async def record_scan(scan: ScanRecordCreate):
 
 @router.post("/scans/bulk", response_model=Dict[str, Any])
 async def bulk_record_scans(bulk_sync: BulkScanSync):
-    """Bulk upload scans (for offline sync)"""
+    """
+    Bulk upload scans (for offline sync)
+
+    Barcodes are grouped by entity type and resolved with one query per type,
+    then all scan records are inserted in batches. Scans carrying a
+    client_scan_id that was already synced for the session are skipped, so a
+    device can safely retry the whole upload after a dropped connection.
+    """
     try:
-        successful = 0
-        failed = 0
         errors = []
 
         with get_db_cursor(commit=True) as cursor:
+            # Reject scans for unknown sessions up front instead of failing the batch
+            session_ids = list({str(scan.session_id) for scan in bulk_sync.scans})
+            cursor.execute("SELECT id FROM scan_sessions WHERE id = ANY(%s::uuid[])", (session_ids,))
+            known_sessions = {str(row['id']) for row in cursor.fetchall()}
+
+            # Group barcodes needing lookup by detected entity type
+            pending = []
+            barcodes_by_type: Dict[EntityType, set] = {}
             for scan in bulk_sync.scans:
-                try:
-                    # Auto-detect entity type
-                    entity_type = scan.entity_type or detect_entity_type(scan.barcode)
-
-                    # Auto-lookup entity
-                    entity_id = scan.entity_id
-                    entity_name = None
-                    location_path = None
-                    verified = False
-
-                    if not entity_id and entity_type != EntityType.UNKNOWN:
-                        entity_info = lookup_entity(cursor, scan.barcode, entity_type)
-                        if entity_info:
-                            entity_id = entity_info['id']
-                            entity_name = entity_info['name']
-                            location_path = entity_info['location_path']
-                            verified = True
-
-                    # Insert scan record
-                    cursor.execute("""
-                        INSERT INTO scan_records (
-                            session_id, barcode, entity_type, entity_id, entity_name, entity_location_path,
-                            location_lat, location_lon, photo_url, notes, verified, offline
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        scan.session_id, scan.barcode, entity_type.value, entity_id, entity_name,
-                        location_path, scan.location_lat, scan.location_lon, scan.photo_url,
-                        scan.notes, verified, scan.offline
-                    ))
-
-                    successful += 1
-                except Exception as e:
-                    failed += 1
-                    errors.append({"barcode": scan.barcode, "error": str(e)})
-
+                if str(scan.session_id) not in known_sessions:
+                    errors.append({
+                        "barcode": scan.barcode,
+                        "client_scan_id": scan.client_scan_id,
+                        "error": "Scan session not found"
+                    })
+                    continue
+
+                entity_type = scan.entity_type or detect_entity_type(scan.barcode)
+                pending.append((scan, entity_type))
+                if not scan.entity_id and entity_type != EntityType.UNKNOWN:
+                    barcodes_by_type.setdefault(entity_type, set()).add(scan.barcode)
+
+            entities_by_type = {
+                entity_type: lookup_entities(cursor, list(barcodes), entity_type)
+                for entity_type, barcodes in barcodes_by_type.items()
+            }
+
+            rows = []
+            for scan, entity_type in pending:
+                entity_id = scan.entity_id
+                entity_name = None
+                location_path = None
+                verified = False
+
+                if not entity_id:
+                    entity_info = entities_by_type.get(entity_type, {}).get(scan.barcode)
+                    if entity_info:
+                        entity_id = entity_info['id']
+                        entity_name = entity_info['name']
+                        location_path = entity_info['location_path']
+                        verified = True
+
+                rows.append((
+                    str(scan.session_id), scan.barcode, entity_type.value,
+                    str(entity_id) if entity_id else None, entity_name, location_path,
+                    scan.location_lat, scan.location_lon, scan.photo_url,
+                    scan.notes, verified, scan.offline, scan.client_scan_id
+                ))
+
+            inserted = []
+            if rows:
+                inserted = execute_values(cursor, """
+                    INSERT INTO scan_records (
+                        session_id, barcode, entity_type, entity_id, entity_name, entity_location_path,
+                        location_lat, location_lon, photo_url, notes, verified, offline, client_scan_id
+                    )
+                    VALUES %s
+                    ON CONFLICT (session_id, client_scan_id) WHERE client_scan_id IS NOT NULL DO NOTHING
+                    RETURNING id
+                """, rows, template="(%s::uuid, %s, %s, %s::uuid, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    page_size=BULK_SCAN_PAGE_SIZE, fetch=True)
+
+        successful = len(inserted)
         return {
             "total": len(bulk_sync.scans),
             "successful": successful,
-            "failed": failed,
+            "duplicates": len(rows) - successful,
+            "failed": len(errors),
             "errors": errors
         }
     except Exception as e:
@@ -488,62 +610,56 @@ async def get_session_scans(session_id: UUID):
 # ==========================================
 
 @router.get("/lookup/{barcode}", response_model=EntityLookupResponse)
-async def lookup_barcode(barcode: str):
+async def lookup_barcode(
+    barcode: str,
+    include_details: bool = Query(True, description="Include the full entity row (one extra query)")
+):
     """Look up entity by barcode (quick lookup)"""
     try:
         entity_type = detect_entity_type(barcode)
 
-        if entity_type == EntityType.UNKNOWN:
-            return EntityLookupResponse(
-                barcode=barcode,
-                entity_type=EntityType.UNKNOWN,
-                entity_id=None,
-                entity_name=None,
-                location_path=None,
-                details=None,
-                found=False
-            )
-
-        with get_db_cursor() as cursor:
-            entity_info = lookup_entity(cursor, barcode, entity_type)
-
-            if not entity_info:
-                return EntityLookupResponse(
-                    barcode=barcode,
-                    entity_type=entity_type,
-                    entity_id=None,
-                    entity_name=None,
-                    location_path=None,
-                    details=None,
-                    found=False
-                )
+        not_found = EntityLookupResponse(
+            barcode=barcode,
+            entity_type=entity_type,
+            entity_id=None,
+            entity_name=None,
+            location_path=None,
+            details=None,
+            found=False
+        )
 
-            # Get additional details based on entity type
-            entity_id = entity_info['id']
-            details = {}
-
-            if entity_type == EntityType.ZONE:
-                cursor.execute("SELECT * FROM zones WHERE id = %s", (entity_id,))
-                details = dict(cursor.fetchone())
-            elif entity_type == EntityType.SHELF:
-                cursor.execute("SELECT * FROM shelves WHERE id = %s", (entity_id,))
-                details = dict(cursor.fetchone())
-            elif entity_type == EntityType.RACK:
-                cursor.execute("SELECT * FROM racks WHERE id = %s", (entity_id,))
-                details = dict(cursor.fetchone())
-            elif entity_type == EntityType.DOCUMENT:
-                cursor.execute("SELECT * FROM physical_documents WHERE id = %s", (entity_id,))
-                details = dict(cursor.fetchone())
-
-            return EntityLookupResponse(
-                barcode=barcode,
-                entity_type=entity_type,
-                entity_id=entity_id,
-                entity_name=entity_info['name'],
-                location_path=entity_info['location_path'],
-                details=details,
-                found=True
-            )
+        if entity_type == EntityType.UNKNOWN:
+            return not_found
+
+        # Served from memory when indexed; no connection is taken for the lookup itself
+        entity_info = barcode_index.resolve(barcode, entity_type.value)
+
+        if not entity_info or include_details:
+            with get_db_cursor() as cursor:
+                if not entity_info:
+                    entity_info = lookup_entity(cursor, barcode, entity_type)
+                    if not entity_info:
+                        return not_found
+
+                details = None
+                if include_details:
+                    cursor.execute(
+                        f"SELECT * FROM {ENTITY_TABLES[entity_type]} WHERE id = %s", (entity_info['id'],)
+                    )
+                    row = cursor.fetchone()
+                    details = dict(row) if row else {}
+        else:
+            details = None
+
+        return EntityLookupResponse(
+            barcode=barcode,
+            entity_type=entity_type,
+            entity_id=entity_info['id'],
+            entity_name=entity_info['name'],
+            location_path=entity_info['location_path'],
+            details=details,
+            found=True
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lookup failed: {str(e)}")
 
@@ -595,3 +711,175 @@ async def verify_rack_inventory(
             )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Inventory verification failed: {str(e)}")
+
+
+def reconcile_racks(rack_scans: Dict[UUID, List[str]], rack_names: Dict[str, str]) -> List[RackReconciliation]:
+    """
+    Reconcile a batch of racks against their scans in one transaction
+
+    Scans are loaded into a temp table and joined to physical_documents, so
+    matched/missing/unexpected are computed in SQL for all racks at once.
+    Unexpected barcodes that belong to a known document are reported as
+    misplaced, resolved through the barcode index (database fallback).
+    """
+    scan_rows = [
+        (str(rack_id), barcode)
+        for rack_id, barcodes in rack_scans.items()
+        for barcode in set(barcodes)
+    ]
+    rack_ids = [str(rack_id) for rack_id in rack_scans]
+
+    with get_db_cursor(commit=True) as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE rack_audit_scans (
+                rack_id UUID NOT NULL,
+                barcode VARCHAR(255) NOT NULL
+            ) ON COMMIT DROP
+        """)
+        if scan_rows:
+            execute_values(
+                cursor,
+                "INSERT INTO rack_audit_scans (rack_id, barcode) VALUES %s",
+                scan_rows,
+                page_size=BULK_SCAN_PAGE_SIZE
+            )
+
+        cursor.execute("""
+            WITH expected AS (
+                SELECT id, rack_id, title, barcode, document_type, status
+                FROM physical_documents
+                WHERE rack_id = ANY(%s::uuid[])
+            )
+            SELECT
+                COALESCE(e.rack_id, s.rack_id) AS audit_rack_id,
+                CASE
+                    WHEN e.id IS NULL THEN 'unexpected'
+                    WHEN s.barcode IS NULL THEN 'missing'
+                    ELSE 'matched'
+                END AS outcome,
+                e.id, e.title, e.barcode, e.document_type, e.status,
+                s.barcode AS scanned_barcode
+            FROM expected e
+            FULL OUTER JOIN rack_audit_scans s
+                ON s.rack_id = e.rack_id AND s.barcode = e.barcode
+            ORDER BY e.title
+        """, (rack_ids,))
+        rows = cursor.fetchall()
+
+        results: Dict[str, Dict[str, Any]] = {
+            rack_id: {'matched': [], 'missing': [], 'unexpected': []} for rack_id in rack_ids
+        }
+        for row in rows:
+            row = dict(row)
+            bucket = results[str(row.pop('audit_rack_id'))]
+            outcome = row.pop('outcome')
+            scanned_barcode = row.pop('scanned_barcode')
+            if outcome == 'unexpected':
+                bucket['unexpected'].append(scanned_barcode)
+            else:
+                bucket[outcome].append(row)
+
+        # Cross-reference unexpected barcodes against all known documents
+        unexpected = {barcode for bucket in results.values() for barcode in bucket['unexpected']}
+        known: Dict[str, Dict[str, Any]] = {}
+        for barcode in unexpected:
+            indexed = barcode_index.resolve(barcode, EntityType.DOCUMENT.value)
+            # An index entry placing the document in an audited rack is stale (SQL says otherwise)
+            if indexed and indexed.get('rack_id') not in results:
+                known[barcode] = indexed
+        misses = [barcode for barcode in unexpected if barcode not in known]
+        if misses:
+            cursor.execute(ENTITY_LOOKUP_QUERIES[EntityType.DOCUMENT].format(match="= ANY(%s)"), (misses,))
+            known.update({row['barcode']: dict(row) for row in cursor.fetchall()})
+
+    reconciliations = []
+    for rack_id in rack_ids:
+        bucket = results[rack_id]
+        misplaced = []
+        unknown = []
+        for barcode in sorted(bucket['unexpected']):
+            document = known.get(barcode)
+            if document is None:
+                unknown.append(barcode)
+                continue
+            misplaced.append(MisplacedDocument(
+                barcode=barcode,
+                document_id=document['id'],
+                title=document['name'],
+                expected_rack_id=document.get('rack_id'),
+                expected_location_path=document.get('location_path')
+            ))
+
+        expected_count = len(bucket['matched']) + len(bucket['missing'])
+        accuracy = (len(bucket['matched']) / expected_count * 100) if expected_count > 0 else 100.0
+        reconciliations.append(RackReconciliation(
+            rack_id=rack_id,
+            rack_name=rack_names[rack_id],
+            expected_count=expected_count,
+            scanned_count=len(set(rack_scans[UUID(rack_id)])),
+            matched=bucket['matched'],
+            missing=bucket['missing'],
+            misplaced=misplaced,
+            unexpected=unknown,
+            accuracy_percentage=round(accuracy, 2)
+        ))
+    return reconciliations
+
+
+@router.post("/inventory/verify")
+async def verify_racks_inventory(request: MultiRackVerification):
+    """
+    Reconcile many racks against scanned barcodes in one request
+
+    Streams newline-delimited JSON: one {"type": "rack", ...} line per rack
+    (RackReconciliation) as each batch of racks is reconciled, then a final
+    {"type": "summary", ...} line with totals. If reconciliation fails part
+    way, the last line is {"type": "error", "error": ...} instead of the
+    summary.
+    """
+    # Scans for the same rack sent in several entries are merged
+    rack_scans: Dict[UUID, List[str]] = {}
+    for entry in request.racks:
+        rack_scans.setdefault(entry.rack_id, []).extend(entry.scanned_barcodes)
+
+    try:
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, name FROM racks WHERE id = ANY(%s::uuid[])",
+                ([str(rack_id) for rack_id in rack_scans],)
+            )
+            rack_names = {str(row['id']): row['name'] for row in cursor.fetchall()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Inventory verification failed: {str(e)}")
+
+    unknown_racks = [str(rack_id) for rack_id in rack_scans if str(rack_id) not in rack_names]
+    if unknown_racks:
+        raise HTTPException(status_code=404, detail=f"Racks not found: {', '.join(unknown_racks[:20])}")
+
+    def stream_results():
+        rack_ids = list(rack_scans)
+        totals = {'racks': 0, 'expected': 0, 'matched': 0, 'missing': 0, 'misplaced': 0, 'unexpected': 0}
+
+        try:
+            for start in range(0, len(rack_ids), RECONCILE_RACK_BATCH):
+                batch = {rack_id: rack_scans[rack_id] for rack_id in rack_ids[start:start + RECONCILE_RACK_BATCH]}
+                lines = []
+                for result in reconcile_racks(batch, rack_names):
+                    totals['racks'] += 1
+                    totals['expected'] += result.expected_count
+                    totals['matched'] += len(result.matched)
+                    totals['missing'] += len(result.missing)
+                    totals['misplaced'] += len(result.misplaced)
+                    totals['unexpected'] += len(result.unexpected)
+                    lines.append(json.dumps({'type': 'rack', **result.model_dump(mode='json')}, default=str))
+                yield '\n'.join(lines) + '\n'
+        except Exception as e:
+            # The 200 status is already sent; tell the client the stream is incomplete
+            logger.error(f"Inventory verification failed after {totals['racks']} racks: {e}")
+            yield json.dumps({'type': 'error', 'error': f"Inventory verification failed: {str(e)}", 'racks_completed': totals['racks']}) + '\n'
+            return
+
+        accuracy = (totals['matched'] / totals['expected'] * 100) if totals['expected'] > 0 else 100.0
+        yield json.dumps({'type': 'summary', **totals, 'accuracy_percentage': round(accuracy, 2)}) + '\n'
+
+    return StreamingResponse(stream_results(), media_type='application/x-ndjson')
@@ -4,12 +4,16 @@ Label printing for zones, shelves, racks, and documents
 Integrates with existing physical print system
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime
 
 from app.database import get_db_cursor
+from app.services.label_render_service import (
+    DEFAULT_DPMM, OUTPUT_FORMATS, default_template, label_render_service
+)
 
 router = APIRouter(prefix="/api/v1/warehouse/print", tags=["warehouse"])
 
@@ -57,6 +61,20 @@ class BatchPrintRequest(BaseModel):
     notes: Optional[str] = None
 
 
+class RenderLabelsRequest(BaseModel):
+    """Render print-ready labels for warehouse entities"""
+    zones: List[UUID] = []
+    shelves: List[UUID] = []
+    racks: List[UUID] = []
+    documents: List[UUID] = []
+    format: str = Field(default='pdf', pattern='^(pdf|zpl)$')
+    template_id: Optional[UUID] = None  # print_templates layout; built-in layout if omitted
+    label_size: Optional[LabelSize] = None  # Built-in layout size (default 100x50mm)
+    include_qr_code: bool = False  # Built-in layout only
+    copies: int = Field(default=1, ge=1, le=10)
+    dpmm: int = Field(default=DEFAULT_DPMM, ge=6, le=24)  # ZPL printer resolution (dots/mm)
+
+
 class PrintJobResponse(BaseModel):
     """Print job response"""
     job_id: UUID
@@ -83,177 +101,19 @@ class LabelData(BaseModel):
 # HELPER FUNCTIONS
 # ==========================================
 
-def get_zone_label_data(cursor, zone_id: UUID) -> LabelData:
-    """Get zone data for label printing"""
-    cursor.execute("""
-        SELECT
-            z.id, z.name, z.code, z.barcode, z.zone_type,
-            z.max_capacity, z.current_capacity,
-            l.name || ' > ' || w.name || ' > ' || z.name as location_path,
-            w.name as warehouse_name,
-            l.name as location_name
-        FROM zones z
-        JOIN warehouses w ON z.warehouse_id = w.id
-        JOIN locations l ON w.location_id = l.id
-        WHERE z.id = %s
-    """, (zone_id,))
-
-    row = cursor.fetchone()
-    if not row:
-        raise HTTPException(status_code=404, detail=f"Zone {zone_id} not found")
-
-    data = dict(row)
-    utilization = (data['current_capacity'] / data['max_capacity'] * 100) if data['max_capacity'] > 0 else 0
-
-    return LabelData(
-        entity_id=data['id'],
-        entity_type='zone',
-        entity_name=data['name'],
-        barcode=data['barcode'],
-        location_path=data['location_path'],
-        capacity_info={
-            'current': data['current_capacity'],
-            'max': data['max_capacity'],
-            'utilization': round(utilization, 1)
-        },
-        qr_code_data=data['barcode'],
-        additional_info={
-            'code': data['code'],
-            'type': data['zone_type'],
-            'warehouse': data['warehouse_name'],
-            'location': data['location_name']
-        }
-    )
-
-
-def get_shelf_label_data(cursor, shelf_id: UUID) -> LabelData:
-    """Get shelf data for label printing"""
-    cursor.execute("""
-        SELECT
-            s.id, s.name, s.barcode, s.position,
-            s.max_capacity, s.current_capacity,
-            l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name as location_path,
-            z.name as zone_name,
-            w.name as warehouse_name
-        FROM shelves s
-        JOIN zones z ON s.zone_id = z.id
-        JOIN warehouses w ON z.warehouse_id = w.id
-        JOIN locations l ON w.location_id = l.id
-        WHERE s.id = %s
-    """, (shelf_id,))
-
-    row = cursor.fetchone()
-    if not row:
-        raise HTTPException(status_code=404, detail=f"Shelf {shelf_id} not found")
-
-    data = dict(row)
-    utilization = (data['current_capacity'] / data['max_capacity'] * 100) if data['max_capacity'] > 0 else 0
-
-    return LabelData(
-        entity_id=data['id'],
-        entity_type='shelf',
-        entity_name=data['name'],
-        barcode=data['barcode'],
-        location_path=data['location_path'],
-        capacity_info={
-            'current': data['current_capacity'],
-            'max': data['max_capacity'],
-            'utilization': round(utilization, 1)
-        },
-        qr_code_data=data['barcode'],
-        additional_info={
-            'position': data['position'],
-            'zone': data['zone_name'],
-            'warehouse': data['warehouse_name']
-        }
-    )
-
-
-def get_rack_label_data(cursor, rack_id: UUID) -> LabelData:
-    """Get rack data for label printing"""
-    cursor.execute("""
-        SELECT
-            r.id, r.name, r.barcode, r.position_on_shelf,
-            r.max_capacity, r.current_capacity,
-            l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name as location_path,
-            s.name as shelf_name,
-            z.name as zone_name
-        FROM racks r
-        JOIN shelves s ON r.shelf_id = s.id
-        JOIN zones z ON s.zone_id = z.id
-        JOIN warehouses w ON z.warehouse_id = w.id
-        JOIN locations l ON w.location_id = l.id
-        WHERE r.id = %s
-    """, (rack_id,))
-
-    row = cursor.fetchone()
-    if not row:
-        raise HTTPException(status_code=404, detail=f"Rack {rack_id} not found")
-
-    data = dict(row)
-    utilization = (data['current_capacity'] / data['max_capacity'] * 100) if data['max_capacity'] > 0 else 0
-
-    return LabelData(
-        entity_id=data['id'],
-        entity_type='rack',
-        entity_name=data['name'],
-        barcode=data['barcode'],
-        location_path=data['location_path'],
-        capacity_info={
-            'current': data['current_capacity'],
-            'max': data['max_capacity'],
-            'utilization': round(utilization, 1)
-        },
-        qr_code_data=data['barcode'],
-        additional_info={
-            'position': data['position_on_shelf'],
-            'shelf': data['shelf_name'],
-            'zone': data['zone_name']
-        }
-    )
-
-
-def get_document_label_data(cursor, document_id: UUID) -> LabelData:
-    """Get document data for label printing"""
-    cursor.execute("""
-        SELECT
-            d.id, d.title, d.barcode, d.document_type, d.status,
-            COALESCE(
-                l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name,
-                'Not Assigned'
-            ) as location_path,
-            r.name as rack_name,
-            d.created_at
-        FROM physical_documents d
-        LEFT JOIN racks r ON d.rack_id = r.id
-        LEFT JOIN shelves s ON r.shelf_id = s.id
-        LEFT JOIN zones z ON s.zone_id = z.id
-        LEFT JOIN warehouses w ON z.warehouse_id = w.id
-        LEFT JOIN locations l ON w.location_id = l.id
-        WHERE d.id = %s
-    """, (document_id,))
-
-    row = cursor.fetchone()
-    if not row:
-        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
-
-    data = dict(row)
-
-    return LabelData(
-        entity_id=data['id'],
-        entity_type='document',
-        entity_name=data['title'],
-        barcode=data['barcode'],
-        location_path=data['location_path'],
-        capacity_info=None,
-        qr_code_data=data['barcode'],
-        additional_info={
-            'type': data['document_type'],
-            'status': data['status'],
-            'rack': data['rack_name'] if data['rack_name'] else 'Unassigned',
-            'created': data['created_at'].strftime('%Y-%m-%d') if data['created_at'] else None
-        }
-    )
+def get_label_data(cursor, entity_type: str, entity_ids: List[UUID]) -> List[Dict[str, Any]]:
+    """Get label data for many entities of one type with a single query"""
+    try:
+        labels, missing = label_render_service.fetch_label_data(cursor, entity_type, entity_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{entity_type.capitalize()} {missing[0]} not found" + (f" (and {len(missing) - 1} more)" if len(missing) > 1 else "")
+        )
+    return labels
 
 
 def create_print_job_record(cursor, entity_type: str, entity_ids: List[UUID], printer_id: Optional[UUID], copies: int, notes: Optional[str]) -> UUID:
@@ -279,22 +139,8 @@ async def print_labels(request: PrintLabelRequest):
     """Print labels for warehouse entities"""
     try:
         with get_db_cursor(commit=True) as cursor:
-            # Get label data for all entities
-            label_data_list = []
-
-            for entity_id in request.entity_ids:
-                if request.entity_type == 'zone':
-                    label_data = get_zone_label_data(cursor, entity_id)
-                elif request.entity_type == 'shelf':
-                    label_data = get_shelf_label_data(cursor, entity_id)
-                elif request.entity_type == 'rack':
-                    label_data = get_rack_label_data(cursor, entity_id)
-                elif request.entity_type == 'document':
-                    label_data = get_document_label_data(cursor, entity_id)
-                else:
-                    raise HTTPException(status_code=400, detail=f"Invalid entity type: {request.entity_type}")
-
-                label_data_list.append(label_data)
+            # Validate all entities exist (one query for the whole request)
+            get_label_data(cursor, request.entity_type, request.entity_ids)
 
             # Create print job record
             job_id = create_print_job_record(
@@ -318,12 +164,11 @@ async def print_labels(request: PrintLabelRequest):
             }
             table_name = table_map[request.entity_type]
 
-            for entity_id in request.entity_ids:
-                cursor.execute(f"""
-                    UPDATE {table_name}
-                    SET barcode_status = 'printed'
-                    WHERE id = %s AND barcode_status IN ('generated', 'assigned')
-                """, (entity_id,))
+            cursor.execute(f"""
+                UPDATE {table_name}
+                SET barcode_status = 'printed'
+                WHERE id = ANY(%s::uuid[]) AND barcode_status IN ('generated', 'assigned')
+            """, ([str(entity_id) for entity_id in request.entity_ids],))
 
             return PrintJobResponse(
                 job_id=job_id,
@@ -355,29 +200,37 @@ async def batch_print_labels(request: BatchPrintRequest):
             if request.zones:
                 job_id = create_print_job_record(cursor, 'zone', request.zones, request.printer_id, request.copies, request.notes)
                 job_ids.append(job_id)
-                for zone_id in request.zones:
-                    cursor.execute("UPDATE zones SET barcode_status = 'printed' WHERE id = %s", (zone_id,))
+                cursor.execute(
+                    "UPDATE zones SET barcode_status = 'printed' WHERE id = ANY(%s::uuid[])",
+                    ([str(zone_id) for zone_id in request.zones],)
+                )
 
             # Print shelf labels
             if request.shelves:
                 job_id = create_print_job_record(cursor, 'shelf', request.shelves, request.printer_id, request.copies, request.notes)
                 job_ids.append(job_id)
-                for shelf_id in request.shelves:
-                    cursor.execute("UPDATE shelves SET barcode_status = 'printed' WHERE id = %s", (shelf_id,))
+                cursor.execute(
+                    "UPDATE shelves SET barcode_status = 'printed' WHERE id = ANY(%s::uuid[])",
+                    ([str(shelf_id) for shelf_id in request.shelves],)
+                )
 
             # Print rack labels
             if request.racks:
                 job_id = create_print_job_record(cursor, 'rack', request.racks, request.printer_id, request.copies, request.notes)
                 job_ids.append(job_id)
-                for rack_id in request.racks:
-                    cursor.execute("UPDATE racks SET barcode_status = 'printed' WHERE id = %s", (rack_id,))
+                cursor.execute(
+                    "UPDATE racks SET barcode_status = 'printed' WHERE id = ANY(%s::uuid[])",
+                    ([str(rack_id) for rack_id in request.racks],)
+                )
 
             # Print document labels
             if request.documents:
                 job_id = create_print_job_record(cursor, 'document', request.documents, request.printer_id, request.copies, request.notes)
                 job_ids.append(job_id)
-                for doc_id in request.documents:
-                    cursor.execute("UPDATE physical_documents SET barcode_status = 'printed' WHERE id = %s", (doc_id,))
+                cursor.execute(
+                    "UPDATE physical_documents SET barcode_status = 'printed' WHERE id = ANY(%s::uuid[])",
+                    ([str(doc_id) for doc_id in request.documents],)
+                )
 
             # Get printer name
             printer_name = None
@@ -405,22 +258,61 @@ async def preview_label(entity_type: str, entity_id: UUID):
     """Preview label data for an entity"""
     try:
         with get_db_cursor() as cursor:
-            if entity_type == 'zone':
-                return get_zone_label_data(cursor, entity_id)
-            elif entity_type == 'shelf':
-                return get_shelf_label_data(cursor, entity_id)
-            elif entity_type == 'rack':
-                return get_rack_label_data(cursor, entity_id)
-            elif entity_type == 'document':
-                return get_document_label_data(cursor, entity_id)
-            else:
-                raise HTTPException(status_code=400, detail=f"Invalid entity type: {entity_type}")
+            return get_label_data(cursor, entity_type, [entity_id])[0]
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to preview label: {str(e)}")
 
 
+# Upper bound on distinct entities per render request
+MAX_RENDER_LABELS = 20000
+
+
+@router.post("/render")
+async def render_labels(request: RenderLabelsRequest):
+    """
+    Render labels as a print-ready PDF or ZPL stream
+
+    Label data is loaded with one query per entity type; output is streamed
+    while it is generated.
+    """
+    groups = [('zone', request.zones), ('shelf', request.shelves), ('rack', request.racks), ('document', request.documents)]
+    total_count = sum(len(ids) for _, ids in groups)
+
+    if total_count == 0:
+        raise HTTPException(status_code=400, detail="No entities specified for rendering")
+    if total_count > MAX_RENDER_LABELS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RENDER_LABELS} labels can be rendered per request")
+
+    try:
+        with get_db_cursor() as cursor:
+            if request.template_id:
+                template = label_render_service.load_template(cursor, request.template_id)
+                if template is None:
+                    raise HTTPException(status_code=404, detail="Print template not found")
+            else:
+                label_size = (request.label_size.width, request.label_size.height) if request.label_size else None
+                template = default_template(request.include_qr_code, label_size)
+
+            labels = []
+            for entity_type, entity_ids in groups:
+                labels.extend(get_label_data(cursor, entity_type, entity_ids))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load label data: {str(e)}")
+
+    return StreamingResponse(
+        label_render_service.render(request.format, labels, template, request.copies, request.dpmm),
+        media_type=OUTPUT_FORMATS[request.format],
+        headers={
+            'Content-Disposition': f'attachment; filename="warehouse-labels.{request.format}"',
+            'X-Label-Count': str(len(labels) * request.copies)
+        }
+    )
+
+
 @router.get("/jobs", response_model=List[Dict[str, Any]])
 async def list_print_jobs(
     entity_type: Optional[str] = None,
@@ -1,9 +1,13 @@
 """
 WebSocket router for real-time notifications
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends, HTTPException, status
 from app.services.websocket_manager import connection_manager
 from app.services.notification_service import notification_service
+from app.services.capacity_snapshot_service import capacity_snapshot_service
+from app.middleware.auth_middleware import get_current_user, get_websocket_user
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,28 +18,41 @@ router = APIRouter(prefix="/api/v1/ws", tags=["websocket"])
 @router.websocket("/notifications")
 async def websocket_notifications(
     websocket: WebSocket,
-    user_id: str = Query(..., description="User ID for authentication")
+    token: Optional[str] = Query(None, description="Access token (JWT)")
 ):
     """
     WebSocket endpoint for real-time notifications.
 
-    Client should connect with user_id as query parameter:
-    ws://localhost:8000/api/v1/ws/notifications?user_id=USER_ID
+    Client should connect with its access token as query parameter:
+    ws://localhost:8000/api/v1/ws/notifications?token=ACCESS_TOKEN
+
+    The connection is closed with 1008 (policy violation) unless the token
+    is a valid access token; notifications are for the token's user.
+
+    Warehouse dashboards send "subscribe_capacity:<location_id>" (and
+    "unsubscribe_capacity:<location_id>") to receive "capacity_snapshot"
+    messages whenever that location's utilization changes.
 
     Message format received:
     {
-        "type": "approval_required|approval_decision|approval_escalated|...",
+        "type": "approval_required|approval_decision|approval_escalated|capacity_snapshot|...",
         "timestamp": "ISO-8601 timestamp",
         "data": {
             ... notification-specific data ...
         }
     }
     """
+    user = await get_websocket_user(token)
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = str(user['id'])
+
     await connection_manager.connect(websocket, user_id)
 
     try:
         # Send initial connection confirmation
-        await websocket.send_json({
+        connection_manager.queue_message(websocket, {
             "type": "connected",
             "timestamp": "",
             "data": {
@@ -51,25 +68,55 @@ async def websocket_notifications(
 
             # Handle client messages
             if data == "ping":
-                await websocket.send_json({
+                connection_manager.queue_message(websocket, {
                     "type": "pong",
                     "timestamp": "",
                     "data": {}
                 })
             elif data == "get_unread_count":
                 # Send unread notification count
-                notifications = await notification_service.get_user_notifications(user_id, unread_only=True)
-                await websocket.send_json({
+                unread_count = await notification_service.get_unread_count(user_id)
+                connection_manager.queue_message(websocket, {
                     "type": "unread_count",
                     "timestamp": "",
                     "data": {
-                        "count": len(notifications)
+                        "count": unread_count
                     }
                 })
+            elif data.startswith("subscribe_capacity:"):
+                try:
+                    location_id = str(UUID(data.split(":", 1)[1].strip()))
+                except ValueError:
+                    connection_manager.queue_message(websocket, {
+                        "type": "error",
+                        "timestamp": "",
+                        "data": {"message": "Invalid location id"}
+                    })
+                    continue
+                await capacity_snapshot_service.subscribe(location_id, websocket)
+            elif data.startswith("unsubscribe_capacity:"):
+                capacity_snapshot_service.unsubscribe(websocket, data.split(":", 1)[1].strip())
 
     except WebSocketDisconnect:
         connection_manager.disconnect(websocket)
+        capacity_snapshot_service.unsubscribe(websocket)
         logger.info(f"WebSocket disconnected for user {user_id}")
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {e}")
         connection_manager.disconnect(websocket)
+        capacity_snapshot_service.unsubscribe(websocket)
+
+
+@router.get("/stats")
+async def get_websocket_stats(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Report this worker's websocket delivery metrics: connections, outbound
+    queue depth, dropped slow consumers, delivery latency and bus traffic
+    """
+    try:
+        return connection_manager.get_stats()
+    except Exception as e:
+        logger.error(f"Error fetching websocket stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
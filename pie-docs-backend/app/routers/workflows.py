@@ -22,6 +22,7 @@ from app.models.workflows import (
 from app.database import get_db_cursor
 from app.middleware.auth_middleware import get_current_user
 from app.services.workflow_execution import execution_engine
+from app.services.workflow_graph import workflow_graph_cache
 
 logger = logging.getLogger(__name__)
 
@@ -283,6 +284,7 @@ async def delete_workflow(
                 detail=f"Workflow {workflow_id} not found"
             )
 
+        workflow_graph_cache.invalidate(workflow_id)
         logger.info(f"Deleted workflow {workflow_id}")
         return None
     except HTTPException:
@@ -316,7 +318,7 @@ async def execute_workflow(
         # Verify workflow exists and is active
         with get_db_cursor() as cursor:
             cursor.execute(
-                "SELECT id, status, elements FROM workflows WHERE id = %s",
+                "SELECT id, status FROM workflows WHERE id = %s",
                 (str(workflow_id),)
             )
             workflow = cursor.fetchone()
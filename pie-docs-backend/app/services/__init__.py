@@ -1,4 +1 @@
 """Services package"""
-from app.services.auth_service import auth_service
-
-__all__ = ['auth_service']
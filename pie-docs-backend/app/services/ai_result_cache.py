@@ -0,0 +1,237 @@
+"""
+AI Result Cache - Content-hash keyed cache of AI extraction results
+
+Results are keyed by (file SHA-256, task, model, prompt version) so that:
+- Clicking OCR / classify / summarize / extract again on unchanged bytes is free
+- Re-uploaded duplicates reuse the result computed for the first copy
+- Changing the model or bumping a prompt version naturally misses the cache
+
+The cache lives in the ai_result_cache table (migration 24) and is bounded by
+AI_RESULT_CACHE_MAX_BYTES with least-recently-accessed eviction. Stores do
+not scan the table: each process checks the total size only after it has
+written EVICTION_CHECK_FRACTION of the budget, and when the cache is over
+budget evicts down to EVICTION_TARGET_FRACTION of it, so the next check is
+not immediately over again.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.database import get_db_cursor
+from app.utils.file_utils import calculate_sha256
+
+logger = logging.getLogger(__name__)
+
+# Bytes a process stores (as a fraction of the budget) between size checks
+EVICTION_CHECK_FRACTION = 0.05
+# Eviction trims the cache down to this fraction of the budget
+EVICTION_TARGET_FRACTION = 0.9
+EVICTION_LOCK_NAME = 'ai_result_cache_eviction'
+
+
+class AIResultCache:
+    """Persistent, size-bounded cache of AI task results"""
+
+    def __init__(self, max_bytes: int = settings.AI_RESULT_CACHE_MAX_BYTES, enabled: bool = settings.AI_RESULT_CACHE_ENABLED):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Per-process counters, reported alongside persistent hit counts
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        self._bytes_since_check = 0
+
+    # ==========================================
+    # Key helpers
+    # ==========================================
+
+    @staticmethod
+    def hash_bytes(content: bytes) -> str:
+        """SHA-256 of in-memory file content (e.g. an UploadFile body)"""
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def hash_file(file_path: Path, known_checksum: Optional[str] = None) -> str:
+        """SHA-256 of a stored file, preferring the checksum recorded at upload"""
+        if known_checksum:
+            return known_checksum
+        return calculate_sha256(file_path)
+
+    @staticmethod
+    def fingerprint(value: Any) -> str:
+        """Short stable hash of auxiliary prompt inputs (type lists, schema fields, ...)"""
+        encoded = json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    # ==========================================
+    # Lookup / store
+    # ==========================================
+
+    def get(self, content_sha256: str, task: str, model: str, prompt_version: str) -> Optional[Dict]:
+        """
+        Look up a cached result
+
+        Returns:
+            The cached result dict, or None on a miss (or if the cache is unavailable)
+        """
+        if not self.enabled or not content_sha256:
+            return None
+
+        try:
+            with get_db_cursor(commit=True) as cursor:
+                cursor.execute("""
+                    UPDATE ai_result_cache
+                    SET hit_count = hit_count + 1, last_accessed_at = NOW()
+                    WHERE content_sha256 = %s AND task = %s AND model = %s AND prompt_version = %s
+                    RETURNING result_data
+                """, (content_sha256, task, model, prompt_version))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"AI result cache lookup failed for {task}: {e}")
+            return None
+
+        with self._lock:
+            if row:
+                self._hits[task] += 1
+            else:
+                self._misses[task] += 1
+
+        if row:
+            logger.info(f"AI result cache hit: task={task} model={model} sha256={content_sha256[:12]}")
+            return row['result_data']
+        return None
+
+    def put(self, content_sha256: str, task: str, model: str, prompt_version: str, result: Dict) -> None:
+        """Store a result, checking the size budget once enough has been written"""
+        if not self.enabled or not content_sha256 or result is None:
+            return
+
+        payload = json.dumps(result, default=str)
+        try:
+            with get_db_cursor(commit=True) as cursor:
+                cursor.execute("""
+                    INSERT INTO ai_result_cache (
+                        content_sha256, task, model, prompt_version, result_data, size_bytes
+                    ) VALUES (%s, %s, %s, %s, %s::jsonb, %s)
+                    ON CONFLICT (content_sha256, task, model, prompt_version) DO UPDATE SET
+                        result_data = EXCLUDED.result_data,
+                        size_bytes = EXCLUDED.size_bytes,
+                        last_accessed_at = NOW()
+                """, (content_sha256, task, model, prompt_version, payload, len(payload)))
+        except Exception as e:
+            logger.warning(f"AI result cache store failed for {task}: {e}")
+            return
+
+        with self._lock:
+            self._bytes_since_check += len(payload)
+            due = self._bytes_since_check >= self.max_bytes * EVICTION_CHECK_FRACTION
+            if due:
+                self._bytes_since_check = 0
+
+        if due:
+            try:
+                self.evict()
+            except Exception as e:
+                logger.warning(f"AI result cache eviction failed: {e}")
+
+    def evict(self) -> int:
+        """
+        Evict least-recently-accessed entries if the cache is over budget
+
+        One process evicts at a time; others skip while it runs.
+
+        Returns:
+            Number of entries evicted
+        """
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (EVICTION_LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                return 0
+
+            cursor.execute("SELECT COALESCE(SUM(size_bytes), 0) AS total FROM ai_result_cache")
+            if cursor.fetchone()['total'] <= self.max_bytes:
+                return 0
+
+            # Keep the most recently accessed entries up to the target size
+            cursor.execute("""
+                DELETE FROM ai_result_cache
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, SUM(size_bytes) OVER (
+                            ORDER BY last_accessed_at DESC, id
+                        ) AS running_bytes
+                        FROM ai_result_cache
+                    ) ranked
+                    WHERE running_bytes > %s
+                )
+            """, (int(self.max_bytes * EVICTION_TARGET_FRACTION),))
+            evicted = cursor.rowcount
+
+        if evicted:
+            logger.info(f"AI result cache evicted {evicted} entries")
+        return evicted
+
+    def invalidate(self, content_sha256: str, task: Optional[str] = None) -> int:
+        """Drop cached results for a file (optionally a single task)"""
+        query = "DELETE FROM ai_result_cache WHERE content_sha256 = %s"
+        params = [content_sha256]
+        if task:
+            query += " AND task = %s"
+            params.append(task)
+
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute(query, tuple(params))
+            return cursor.rowcount
+
+    # ==========================================
+    # Reporting
+    # ==========================================
+
+    def get_stats(self) -> Dict:
+        """Cache hits per task: persistent totals plus this process's hit/miss counters"""
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                SELECT task,
+                       COUNT(*) AS entries,
+                       COALESCE(SUM(hit_count), 0) AS total_hits,
+                       COALESCE(SUM(size_bytes), 0) AS size_bytes
+                FROM ai_result_cache
+                GROUP BY task
+                ORDER BY task
+            """)
+            rows = cursor.fetchall()
+
+        with self._lock:
+            hits = dict(self._hits)
+            misses = dict(self._misses)
+
+        tasks = {}
+        for row in rows:
+            tasks[row['task']] = {
+                "entries": row['entries'],
+                "total_hits": int(row['total_hits']),
+                "size_bytes": int(row['size_bytes'])
+            }
+        for task in set(hits) | set(misses):
+            entry = tasks.setdefault(task, {"entries": 0, "total_hits": 0, "size_bytes": 0})
+            task_hits = hits.get(task, 0)
+            task_misses = misses.get(task, 0)
+            entry["process_hits"] = task_hits
+            entry["process_misses"] = task_misses
+            entry["process_hit_rate"] = task_hits / (task_hits + task_misses) if (task_hits + task_misses) else 0.0
+
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "size_bytes": sum(t["size_bytes"] for t in tasks.values()),
+            "tasks": tasks
+        }
+
+
+# Singleton instance
+ai_result_cache = AIResultCache()
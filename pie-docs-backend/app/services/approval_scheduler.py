@@ -1,63 +1,236 @@
 """
-Background scheduler for approval system tasks.
-Handles automatic escalation checks and other periodic tasks.
+Background worker for approval escalations.
+
+Instead of polling on an interval, the worker keeps a min-heap of upcoming
+escalation deadlines and sleeps until the earliest one. Creating a request or
+changing its deadline fires NOTIFY approval_deadlines (migration 28) on
+whichever replica made the change, which pushes the new deadline onto the heap
+and wakes the worker early. A periodic resync reloads the heap from the
+partial deadline index to absorb extensions and missed notifications.
+
+Only one API replica escalates at a time: the leader holds a session-level
+advisory lock on a dedicated connection. The other replicas retry every
+APPROVAL_LEADER_RETRY_SECONDS and take over if the leader's connection goes
+away. Escalation itself is set-based (ApprovalService.escalate_overdue).
+Due deadlines that were not escalated are retried after
+ESCALATION_RETRY_SECONDS only while their request is still eligible
+(database clock behind this host, rows locked by another session, or an
+error); deadlines of approved, rejected or extended requests are dropped.
 """
-import logging
 import asyncio
-from datetime import datetime, timedelta
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+import heapq
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import psycopg2
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
 from app.services.approval_service import ApprovalService
 
 logger = logging.getLogger(__name__)
 
+DEADLINE_CHANNEL = 'approval_deadlines'
+LEADER_LOCK_NAME = 'approval_escalation_leader'
+# Deadlines loaded into the heap per resync
+UPCOMING_DEADLINE_WINDOW = 1000
+# Full reload of the heap (and leader connection health check)
+RESYNC_SECONDS = 300
+# Delay before retrying due deadlines that were not escalated
+ESCALATION_RETRY_SECONDS = 5
+
 
 class ApprovalScheduler:
-    """Scheduler for approval system background tasks"""
+    """Leader-elected, deadline-driven escalation worker"""
 
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
-        self._setup_jobs()
+        self._task: Optional[asyncio.Task] = None
+        self._conn = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Min-heap of (due at, deadline) as Unix timestamps; due at is later
+        # than the deadline only for retries
+        self._deadlines: List[Tuple[float, float]] = []
+        self.is_leader = False
 
-    def _setup_jobs(self):
-        """Configure scheduled jobs"""
-
-        # Check for escalation timeouts every 5 minutes
-        self.scheduler.add_job(
-            self._check_escalations,
-            trigger=IntervalTrigger(minutes=5),
-            id='check_escalations',
-            name='Check approval escalation timeouts',
-            replace_existing=True
-        )
-
-        logger.info("Approval scheduler jobs configured")
+    def start(self):
+        """Start the worker on the running event loop"""
+        if not settings.APPROVAL_ESCALATION_ENABLED:
+            logger.info("Approval escalation worker disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info("Approval escalation worker started")
 
-    async def _check_escalations(self):
-        """Background task to check and escalate overdue approvals"""
+    def shutdown(self):
+        """Stop the worker and give up leadership"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._release_leadership()
+        logger.info("Approval escalation worker stopped")
+
+    # ==========================================
+    # Leadership
+    # ==========================================
+
+    def _try_acquire_leadership(self) -> bool:
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (LEADER_LOCK_NAME,))
+            if not cursor.fetchone()[0]:
+                conn.close()
+                return False
+            cursor.execute(f"LISTEN {DEADLINE_CHANNEL}")
+        self._conn = conn
+        self.is_leader = True
+        return True
+
+    def _release_leadership(self):
+        # Closing the session releases the advisory lock
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        self.is_leader = False
+
+    async def _run(self):
+        while True:
+            try:
+                if await run_in_threadpool(self._try_acquire_leadership):
+                    logger.info("Acquired approval escalation leadership")
+                    await self._lead()
+            except asyncio.CancelledError:
+                self._release_leadership()
+                raise
+            except Exception as e:
+                logger.error(f"Approval escalation worker error: {e}", exc_info=True)
+            self._release_leadership()
+            await asyncio.sleep(settings.APPROVAL_LEADER_RETRY_SECONDS)
+
+    # ==========================================
+    # Deadline loop
+    # ==========================================
+
+    async def _lead(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        fileno = self._conn.fileno()
+        loop.add_reader(fileno, self._on_notify)
         try:
-            logger.info("Running escalation timeout check...")
-            escalated_ids = ApprovalService.check_escalation_timeouts()
-
-            if escalated_ids:
-                logger.info(f"Escalated {len(escalated_ids)} approval requests: {escalated_ids}")
+            await self._resync()
+            synced_at = time.monotonic()
+
+            while True:
+                timeout = RESYNC_SECONDS - (time.monotonic() - synced_at)
+                if self._deadlines:
+                    timeout = min(timeout, self._deadlines[0][0] - time.time())
+
+                self._wakeup.clear()
+                if timeout > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+
+                if self._conn.closed:
+                    raise ConnectionError("Leader connection closed")
+
+                if self._deadlines and self._deadlines[0][0] <= time.time():
+                    await self._escalate_due()
+
+                if time.monotonic() - synced_at >= RESYNC_SECONDS or not self._deadlines:
+                    await loop.run_in_executor(None, self._check_connection)
+                    self._drain_notifies()
+                    await self._resync()
+                    synced_at = time.monotonic()
+        finally:
+            loop.remove_reader(fileno)
+
+    def _on_notify(self):
+        """Collect NOTIFY payloads from the leader connection (event loop reader callback)"""
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.warning(f"Approval escalation leader connection lost: {e}")
+            self._conn.close()
+            self._wakeup.set()
+            return
+        self._drain_notifies()
+
+    def _drain_notifies(self):
+        # Also called after queries on the leader connection, which collect
+        # notifications without waking the reader callback
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            try:
+                deadline = float(notify.payload)
+            except ValueError:
+                continue
+            heapq.heappush(self._deadlines, (deadline, deadline))
+            self._wakeup.set()
+
+    def _check_connection(self):
+        if self._conn is None or self._conn.closed:
+            raise ConnectionError("Leader connection closed")
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    async def _resync(self):
+        deadlines = await run_in_threadpool(ApprovalService.get_upcoming_deadlines, UPCOMING_DEADLINE_WINDOW)
+        self._deadlines = [(deadline.timestamp(), deadline.timestamp()) for deadline in deadlines]
+        heapq.heapify(self._deadlines)
+
+    async def _escalate_due(self):
+        now = time.time()
+        escalated = await run_in_threadpool(ApprovalService.escalate_overdue)
+
+        # Drop the due deadlines that were escalated (matched to the
+        # millisecond; NOTIFY payloads and timestamps round differently)
+        handled = Counter(round(deadline.timestamp(), 3) for _, deadline in escalated)
+        retries = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, deadline = heapq.heappop(self._deadlines)
+            key = round(deadline, 3)
+            if handled[key] > 0:
+                handled[key] -= 1
             else:
-                logger.debug("No approval requests needed escalation")
-
+                retries.append(deadline)
+        retries = await self._still_eligible(retries)
+        for deadline in retries:
+            heapq.heappush(self._deadlines, (now + ESCALATION_RETRY_SECONDS, deadline))
+
+        if escalated:
+            logger.info(f"Escalated {len(escalated)} approval requests")
+        if retries:
+            logger.debug(f"Retrying {len(retries)} due approval deadlines in {ESCALATION_RETRY_SECONDS}s")
+
+    async def _still_eligible(self, deadlines: List[float]) -> List[float]:
+        """Deadlines that still belong to a request eligible for escalation"""
+        if not deadlines:
+            return []
+        until = datetime.fromtimestamp(max(deadlines) + 0.001, timezone.utc)
+        try:
+            eligible = await run_in_threadpool(
+                ApprovalService.get_upcoming_deadlines, UPCOMING_DEADLINE_WINDOW, until
+            )
         except Exception as e:
-            logger.error(f"Error in escalation check job: {e}", exc_info=True)
-
-    def start(self):
-        """Start the scheduler"""
-        if not self.scheduler.running:
-            self.scheduler.start()
-            logger.info("Approval scheduler started")
-
-    def shutdown(self):
-        """Shutdown the scheduler"""
-        if self.scheduler.running:
-            self.scheduler.shutdown()
-            logger.info("Approval scheduler stopped")
+            logger.warning(f"Could not check due approval deadlines, retrying all: {e}")
+            return deadlines
+
+        pending = Counter(round(deadline.timestamp(), 3) for deadline in eligible)
+        kept = []
+        for deadline in deadlines:
+            key = round(deadline, 3)
+            if pending[key] > 0:
+                pending[key] -= 1
+                kept.append(deadline)
+        return kept
 
 
 # Global scheduler instance
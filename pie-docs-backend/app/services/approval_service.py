@@ -7,9 +7,30 @@ from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
 from datetime import datetime, timedelta
 from app.database import get_db_cursor
+from app.services.routing_rule_matcher import compile_conditions, routing_rule_matcher
 
 logger = logging.getLogger(__name__)
 
+# Admin user bypasses approval permission checks
+ADMIN_USER_ID = "00000000-0000-0000-0000-000000000001"
+
+# Request status set by each bulk action (approvals are then settled by workflow progression)
+BULK_ACTION_STATUSES = {
+    'approve': 'pending',
+    'reject': 'rejected',
+    'request_changes': 'changes_requested'
+}
+
+# Requests escalated per UPDATE statement
+ESCALATION_BATCH_SIZE = 1000
+
+# Pending requests that can still time out (matches the partial index in migration 28)
+ESCALATION_ELIGIBLE = """
+    status = 'pending'
+    AND deadline IS NOT NULL
+    AND (escalation_date IS NULL OR escalation_date < deadline)
+"""
+
 
 class ApprovalValidationError(Exception):
     """Raised when approval validation fails"""
@@ -64,7 +85,7 @@ class ApprovalService:
     def evaluate_routing_conditions(document_metadata: Dict[str, Any], conditions: Dict[str, Any]) -> bool:
         """
         Evaluate routing rule conditions against document metadata.
-        Supports: equals, not_equals, contains, greater_than, less_than, in, not_in
+        Supports: equals, not_equals, contains, greater_than, less_than, in, not_in, regex
 
         Example conditions:
         {
@@ -72,45 +93,12 @@ class ApprovalService:
             "value": {"greater_than": 10000},
             "department": {"in": ["legal", "finance"]}
         }
+
+        For routing many documents use routing_rule_matcher, which compiles
+        the active rules once.
         """
         try:
-            for field, condition in conditions.items():
-                doc_value = document_metadata.get(field)
-
-                if 'equals' in condition:
-                    if doc_value != condition['equals']:
-                        return False
-
-                elif 'not_equals' in condition:
-                    if doc_value == condition['not_equals']:
-                        return False
-
-                elif 'contains' in condition:
-                    if not isinstance(doc_value, str) or condition['contains'] not in doc_value:
-                        return False
-
-                elif 'greater_than' in condition:
-                    if not isinstance(doc_value, (int, float)) or doc_value <= condition['greater_than']:
-                        return False
-
-                elif 'less_than' in condition:
-                    if not isinstance(doc_value, (int, float)) or doc_value >= condition['less_than']:
-                        return False
-
-                elif 'in' in condition:
-                    if doc_value not in condition['in']:
-                        return False
-
-                elif 'not_in' in condition:
-                    if doc_value in condition['not_in']:
-                        return False
-
-                elif 'regex' in condition:
-                    import re
-                    if not isinstance(doc_value, str) or not re.match(condition['regex'], doc_value):
-                        return False
-
-            return True
+            return compile_conditions(conditions)(document_metadata)
         except Exception as e:
             logger.error(f"Error evaluating routing conditions: {e}")
             return False
@@ -122,25 +110,56 @@ class ApprovalService:
         Returns chain_id with highest priority that matches, or None if no match.
         """
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT id, conditions, target_chain_id, priority
-                    FROM routing_rules
-                    WHERE is_active = true
-                    ORDER BY priority DESC
-                """)
-
-                rules = cursor.fetchall()
-
-                for rule in rules:
-                    if ApprovalService.evaluate_routing_conditions(document_metadata, rule['conditions']):
-                        return rule['target_chain_id']
-
-                return None
+            return routing_rule_matcher.match(document_metadata)
         except Exception as e:
             logger.error(f"Error finding matching approval chain: {e}")
             return None
 
+    @staticmethod
+    def _evaluate_step(consensus_type: str, required_approvers: List[Any], actions: List[Dict[str, Any]]) -> Tuple[bool, str]:
+        """
+        Decide whether a step is complete from its consensus rule and the
+        actions recorded on it. Returns: (is_complete, status_reason)
+        """
+        approvals = [a for a in actions if a['action'] == 'approve']
+        rejections = [a for a in actions if a['action'] == 'reject']
+
+        # If any rejection, step is rejected
+        if rejections:
+            return True, "rejected"
+
+        required_approvers = required_approvers or []
+
+        if consensus_type in ['all', 'unanimous']:
+            # All approvers must approve
+            approved_users = {str(a['user_id']) for a in approvals}
+            if {str(uid) for uid in required_approvers}.issubset(approved_users):
+                return True, "approved"
+            return False, f"waiting_for_all ({len(approved_users)}/{len(required_approvers)})"
+
+        elif consensus_type == 'any':
+            # Any single approver is sufficient
+            if approvals:
+                return True, "approved"
+            return False, "waiting_for_any"
+
+        elif consensus_type == 'majority':
+            # More than 50% must approve
+            required_count = (len(required_approvers) // 2) + 1
+            if len(approvals) >= required_count:
+                return True, "approved"
+            return False, f"waiting_for_majority ({len(approvals)}/{required_count})"
+
+        elif consensus_type == 'weighted':
+            # Weighted voting - for now treat as majority
+            # TODO: Implement proper weighted voting with weights stored per approver
+            required_count = (len(required_approvers) // 2) + 1
+            if len(approvals) >= required_count:
+                return True, "approved"
+            return False, f"waiting_for_weighted ({len(approvals)}/{required_count})"
+
+        return False, f"unknown_consensus_type: {consensus_type}"
+
     @staticmethod
     def check_step_completion(request_id: UUID, step_number: int) -> Tuple[bool, str]:
         """
@@ -170,45 +189,7 @@ class ApprovalService:
                 """, (str(request_id), step_number))
 
                 actions = cursor.fetchall()
-                approvals = [a for a in actions if a['action'] == 'approve']
-                rejections = [a for a in actions if a['action'] == 'reject']
-
-                # If any rejection, step is rejected
-                if rejections:
-                    return True, "rejected"
-
-                consensus_type = step['consensus_type']
-                required_approvers = step['approver_ids']
-
-                if consensus_type in ['all', 'unanimous']:
-                    # All approvers must approve
-                    approved_users = {str(a['user_id']) for a in approvals}
-                    if set(required_approvers).issubset(approved_users):
-                        return True, "approved"
-                    return False, f"waiting_for_all ({len(approved_users)}/{len(required_approvers)})"
-
-                elif consensus_type == 'any':
-                    # Any single approver is sufficient
-                    if approvals:
-                        return True, "approved"
-                    return False, "waiting_for_any"
-
-                elif consensus_type == 'majority':
-                    # More than 50% must approve
-                    required_count = (len(required_approvers) // 2) + 1
-                    if len(approvals) >= required_count:
-                        return True, "approved"
-                    return False, f"waiting_for_majority ({len(approvals)}/{required_count})"
-
-                elif consensus_type == 'weighted':
-                    # Weighted voting - for now treat as majority
-                    # TODO: Implement proper weighted voting with weights stored per approver
-                    required_count = (len(required_approvers) // 2) + 1
-                    if len(approvals) >= required_count:
-                        return True, "approved"
-                    return False, f"waiting_for_weighted ({len(approvals)}/{required_count})"
-
-                return False, f"unknown_consensus_type: {consensus_type}"
+                return ApprovalService._evaluate_step(step['consensus_type'], step['approver_ids'], actions)
 
         except Exception as e:
             logger.error(f"Error checking step completion: {e}")
@@ -222,71 +203,107 @@ class ApprovalService:
         """
         try:
             with get_db_cursor(commit=True) as cursor:
-                # Get current request status
-                cursor.execute("""
-                    SELECT ar.*, ac.id as chain_id
-                    FROM approval_requests ar
-                    JOIN approval_chains ac ON ar.chain_id = ac.id
-                    WHERE ar.id = %s
-                """, (str(request_id),))
-
-                request = cursor.fetchone()
-                if not request:
-                    return {"advanced": False, "new_status": "error", "message": "Request not found"}
-
-                current_step = request.get('current_step', 1)
+                results, approved = ApprovalService._progress_requests(cursor, [request_id])
 
-                # Check if current step is complete
-                is_complete, status = ApprovalService.check_step_completion(request_id, current_step)
+            # Trigger associated action based on metadata type
+            for request in approved:
+                ApprovalService._trigger_approval_action(request['id'], request)
 
-                if not is_complete:
-                    return {"advanced": False, "new_status": request['status'], "message": f"Current step not complete: {status}"}
-
-                if status == "rejected":
-                    cursor.execute("""
-                        UPDATE approval_requests
-                        SET status = 'rejected', updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (str(request_id),))
-                    return {"advanced": True, "new_status": "rejected", "message": "Request rejected"}
-
-                # Get total number of steps
-                cursor.execute("""
-                    SELECT MAX(step_number) as max_step
-                    FROM approval_chain_steps
-                    WHERE chain_id = %s
-                """, (str(request['chain_id']),))
-
-                result = cursor.fetchone()
-                max_step = result['max_step'] if result else 0
-
-                # If this is the last step, mark as approved
-                if current_step >= max_step:
-                    cursor.execute("""
-                        UPDATE approval_requests
-                        SET status = 'approved', updated_at = CURRENT_TIMESTAMP, completed_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (str(request_id),))
-
-                    # Trigger associated action based on metadata type
-                    ApprovalService._trigger_approval_action(request_id, request)
-
-                    return {"advanced": True, "new_status": "approved", "message": "All steps complete, request approved"}
-
-                # Move to next step
-                next_step = current_step + 1
-                cursor.execute("""
-                    UPDATE approval_requests
-                    SET current_step = %s, status = 'pending', updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (next_step, str(request_id)))
-
-                return {"advanced": True, "new_status": "pending", "message": f"Advanced to step {next_step}"}
+            return results[str(request_id)]
 
         except Exception as e:
             logger.error(f"Error progressing workflow: {e}")
             return {"advanced": False, "new_status": "error", "message": str(e)}
 
+    @staticmethod
+    def _progress_requests(cursor, request_ids: List[Any]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Evaluate the current step of many requests and advance, approve or
+        reject them with one UPDATE per outcome, inside the caller's transaction.
+        Returns (progress_workflow-style result per request id, rows of requests
+        that became approved, for _trigger_approval_action after commit).
+        """
+        ids = [str(request_id) for request_id in request_ids]
+
+        cursor.execute("""
+            SELECT ar.id, ar.status, COALESCE(ar.current_step, 1) AS current_step,
+                   ar.chain_id, ar.document_id, ar.requester_id, ar.metadata,
+                   acs.id AS step_id, acs.consensus_type, acs.approver_ids,
+                   (SELECT MAX(step_number) FROM approval_chain_steps s WHERE s.chain_id = ar.chain_id) AS max_step
+            FROM approval_requests ar
+            JOIN approval_chains ac ON ar.chain_id = ac.id
+            LEFT JOIN approval_chain_steps acs
+                ON acs.chain_id = ar.chain_id AND acs.step_number = COALESCE(ar.current_step, 1)
+            WHERE ar.id = ANY(%s::uuid[])
+        """, (ids,))
+        requests = {str(row['id']): row for row in cursor.fetchall()}
+
+        # Actions on each request's current step
+        cursor.execute("""
+            SELECT aa.approval_request_id, aa.user_id, aa.action
+            FROM approval_actions aa
+            JOIN approval_requests ar ON ar.id = aa.approval_request_id
+            WHERE ar.id = ANY(%s::uuid[])
+            AND aa.step_number = COALESCE(ar.current_step, 1)
+        """, (ids,))
+        actions_by_request: Dict[str, List[Dict[str, Any]]] = {}
+        for row in cursor.fetchall():
+            actions_by_request.setdefault(str(row['approval_request_id']), []).append(row)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        rejected, completed, advanced = [], [], []
+        for request_id in ids:
+            request = requests.get(request_id)
+            if not request:
+                results[request_id] = {"advanced": False, "new_status": "error", "message": "Request not found"}
+                continue
+
+            current_step = request['current_step']
+            if request['step_id'] is None:
+                is_complete, status = False, "Step not found"
+            else:
+                is_complete, status = ApprovalService._evaluate_step(
+                    request['consensus_type'], request['approver_ids'], actions_by_request.get(request_id, [])
+                )
+
+            if not is_complete:
+                results[request_id] = {"advanced": False, "new_status": request['status'], "message": f"Current step not complete: {status}"}
+            elif status == "rejected":
+                rejected.append(request_id)
+                results[request_id] = {"advanced": True, "new_status": "rejected", "message": "Request rejected"}
+            elif current_step >= (request['max_step'] or 0):
+                completed.append(request_id)
+                results[request_id] = {"advanced": True, "new_status": "approved", "message": "All steps complete, request approved"}
+            else:
+                advanced.append(request_id)
+                results[request_id] = {"advanced": True, "new_status": "pending", "message": f"Advanced to step {current_step + 1}"}
+
+            results[request_id]['current_step'] = current_step + 1 if request_id in advanced else current_step
+            results[request_id]['total_steps'] = request['max_step']
+
+        if rejected:
+            cursor.execute("""
+                UPDATE approval_requests
+                SET status = 'rejected', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s::uuid[])
+            """, (rejected,))
+
+        if completed:
+            cursor.execute("""
+                UPDATE approval_requests
+                SET status = 'approved', updated_at = CURRENT_TIMESTAMP, completed_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s::uuid[])
+            """, (completed,))
+
+        if advanced:
+            cursor.execute("""
+                UPDATE approval_requests
+                SET current_step = COALESCE(current_step, 1) + 1, status = 'pending', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s::uuid[])
+            """, (advanced,))
+
+        return results, [dict(requests[request_id]) for request_id in completed]
+
     @staticmethod
     def _trigger_approval_action(request_id: UUID, request: Dict[str, Any]) -> None:
         """
@@ -431,7 +448,6 @@ class ApprovalService:
             user_id_str = str(user_id)
 
             # Admin user bypass - always has full access
-            ADMIN_USER_ID = "00000000-0000-0000-0000-000000000001"
             if user_id_str == ADMIN_USER_ID:
                 logger.info(f"Admin user {ADMIN_USER_ID} bypassing permission check for action: {action}")
                 return True, None
@@ -447,82 +463,121 @@ class ApprovalService:
                 if not request:
                     return False, "Approval request not found"
 
-                assigned_to = request['assigned_to'] or []
-
-                # Convert all assigned UUIDs to strings for comparison
-                assigned_to_str = [str(uid) for uid in assigned_to]
-
-                # Request creator can always view
-                if action == 'view' and request['requester_id'] and str(request['requester_id']) == user_id_str:
-                    return True, None
-
-                # Check if user is assigned to this request
-                if user_id_str not in assigned_to_str:
-                    return False, "User not assigned to this approval request"
-
-                # Check request status
-                if request['status'] in ['approved', 'rejected', 'cancelled']:
-                    return False, f"Cannot {action} - request is already {request['status']}"
-
-                # Specific action checks
-                if action in ['approve', 'reject', 'request_changes']:
-                    return True, None
-
-                if action == 'escalate':
-                    # Only allow escalation if not already escalated
-                    if request['status'] == 'escalated':
-                        return False, "Request is already escalated"
-                    return True, None
-
-                return False, f"Unknown action: {action}"
+                error = ApprovalService._permission_error(user_id_str, request, action)
+                return error is None, error
 
         except Exception as e:
             logger.error(f"Error checking user permission: {e}")
             return False, f"Error checking permissions: {str(e)}"
 
     @staticmethod
-    def check_escalation_timeouts() -> List[UUID]:
+    def _permission_error(user_id_str: str, request: Dict[str, Any], action: str) -> Optional[str]:
         """
-        Check all pending approval requests for escalation timeouts.
-        Returns list of request IDs that should be escalated.
+        Permission rules for a non-admin user on one request row
+        (assigned_to, status, requester_id). Returns None if allowed.
         """
-        try:
-            escalated_ids = []
-            with get_db_cursor(commit=True) as cursor:
-                # Find requests past their deadline
-                cursor.execute("""
-                    SELECT id, deadline, escalation_date
-                    FROM approval_requests
-                    WHERE status = 'pending'
-                    AND deadline IS NOT NULL
-                    AND deadline < CURRENT_TIMESTAMP
-                    AND (escalation_date IS NULL OR escalation_date < deadline)
-                """)
+        # Convert all assigned UUIDs to strings for comparison
+        assigned_to_str = [str(uid) for uid in request['assigned_to'] or []]
 
-                overdue_requests = cursor.fetchall()
+        # Request creator can always view
+        if action == 'view' and request['requester_id'] and str(request['requester_id']) == user_id_str:
+            return None
 
-                for request in overdue_requests:
-                    # Auto-escalate
-                    cursor.execute("""
-                        UPDATE approval_requests
-                        SET status = 'escalated', escalation_date = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (str(request['id']),))
+        # Check if user is assigned to this request
+        if user_id_str not in assigned_to_str:
+            return "User not assigned to this approval request"
 
-                    # Create escalation action record
-                    cursor.execute("""
-                        INSERT INTO approval_actions (approval_request_id, action, comments)
-                        VALUES (%s, 'escalate', 'Automatically escalated due to timeout')
-                    """, (str(request['id']),))
+        # Check request status
+        if request['status'] in ['approved', 'rejected', 'cancelled']:
+            return f"Cannot {action} - request is already {request['status']}"
 
-                    escalated_ids.append(request['id'])
-                    logger.info(f"Auto-escalated approval request {request['id']} due to timeout")
+        # Specific action checks
+        if action in ['approve', 'reject', 'request_changes']:
+            return None
+
+        if action == 'escalate':
+            # Only allow escalation if not already escalated
+            if request['status'] == 'escalated':
+                return "Request is already escalated"
+            return None
+
+        return f"Unknown action: {action}"
+
+    @staticmethod
+    def check_escalation_timeouts(batch_size: int = ESCALATION_BATCH_SIZE) -> List[UUID]:
+        """
+        Escalate all pending approval requests whose deadline has passed.
+        Returns list of escalated request IDs.
+        """
+        return [request_id for request_id, _ in ApprovalService.escalate_overdue(batch_size)]
 
-                return escalated_ids
+    @staticmethod
+    def escalate_overdue(batch_size: int = ESCALATION_BATCH_SIZE) -> List[Tuple[UUID, datetime]]:
+        """
+        Escalate all pending approval requests whose deadline has passed.
+        Each batch is one UPDATE ... RETURNING plus a bulk insert of the
+        'escalate' actions; rows locked by a concurrent escalation are skipped.
+        Returns (request id, deadline) of the escalated requests.
+        """
+        escalated = []
+        try:
+            while True:
+                with get_db_cursor(commit=True) as cursor:
+                    cursor.execute(f"""
+                        WITH overdue AS (
+                            SELECT id
+                            FROM approval_requests
+                            WHERE {ESCALATION_ELIGIBLE}
+                            AND deadline <= CURRENT_TIMESTAMP
+                            ORDER BY deadline
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        ),
+                        escalated AS (
+                            UPDATE approval_requests ar
+                            SET status = 'escalated', escalation_date = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                            FROM overdue
+                            WHERE ar.id = overdue.id
+                            RETURNING ar.id, ar.deadline
+                        ),
+                        actions AS (
+                            INSERT INTO approval_actions (approval_request_id, action, comments)
+                            SELECT id, 'escalate', 'Automatically escalated due to timeout'
+                            FROM escalated
+                        )
+                        SELECT id, deadline FROM escalated
+                    """, (batch_size,))
+                    batch = [(row['id'], row['deadline']) for row in cursor.fetchall()]
+
+                escalated.extend(batch)
+                if len(batch) < batch_size:
+                    break
+
+            if escalated:
+                logger.info(f"Auto-escalated {len(escalated)} approval requests due to timeout")
+            return escalated
 
         except Exception as e:
             logger.error(f"Error checking escalation timeouts: {e}")
-            return []
+            return escalated
+
+    @staticmethod
+    def get_upcoming_deadlines(limit: int, until: Optional[datetime] = None) -> List[datetime]:
+        """
+        Earliest deadlines of requests that are still eligible for escalation
+        (overdue ones first), served by the partial deadline index. With
+        until, only deadlines up to that time are returned.
+        """
+        with get_db_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT deadline
+                FROM approval_requests
+                WHERE {ESCALATION_ELIGIBLE}
+                  AND (%s::timestamptz IS NULL OR deadline <= %s::timestamptz)
+                ORDER BY deadline
+                LIMIT %s
+            """, (until, until, limit))
+            return [row['deadline'] for row in cursor.fetchall()]
 
     @staticmethod
     def validate_bulk_action_permissions(user_id: UUID, approval_ids: List[UUID], action: str) -> Dict[str, List[UUID]]:
@@ -530,17 +585,85 @@ class ApprovalService:
         Validate user permissions for bulk approval actions.
         Returns: {"allowed": [ids...], "denied": [ids...]}
         """
-        allowed = []
-        denied = []
+        with get_db_cursor() as cursor:
+            denied = ApprovalService._bulk_permission_errors(cursor, user_id, approval_ids, action)
 
-        for approval_id in approval_ids:
-            has_permission, error = ApprovalService.check_user_permission(user_id, approval_id, action)
-            if has_permission:
-                allowed.append(approval_id)
-            else:
-                denied.append(approval_id)
+        return {
+            "allowed": [approval_id for approval_id in approval_ids if str(approval_id) not in denied],
+            "denied": [approval_id for approval_id in approval_ids if str(approval_id) in denied]
+        }
+
+    @staticmethod
+    def _bulk_permission_errors(cursor, user_id: UUID, approval_ids: List[UUID], action: str, lock: bool = False) -> Dict[str, str]:
+        """
+        Check permissions for many requests with one query (optionally locking
+        the rows for the rest of the caller's transaction).
+        Returns {request id: error} for the requests the user may not act on.
+        """
+        user_id_str = str(user_id)
+        ids = list(dict.fromkeys(str(approval_id) for approval_id in approval_ids))
+
+        cursor.execute(f"""
+            SELECT id, assigned_to, status, requester_id
+            FROM approval_requests
+            WHERE id = ANY(%s::uuid[])
+            ORDER BY id
+            {'FOR UPDATE' if lock else ''}
+        """, (ids,))
+        requests = {str(row['id']): row for row in cursor.fetchall()}
+
+        errors = {}
+        for request_id in ids:
+            request = requests.get(request_id)
+            if not request:
+                errors[request_id] = "Approval request not found"
+            elif user_id_str != ADMIN_USER_ID:
+                error = ApprovalService._permission_error(user_id_str, request, action)
+                if error:
+                    errors[request_id] = error
+        return errors
+
+    @staticmethod
+    def apply_bulk_action(user_id: UUID, approval_ids: List[UUID], action: str, comments: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Apply one approve/reject/request_changes action to many requests in a
+        single transaction: one permission query (rows locked), one insert of
+        all actions, one status update, and batch workflow progression.
+        Returns {"succeeded": [ids], "denied": {id: error}, "progress": {id: progress result}}
+        """
+        ids = list(dict.fromkeys(str(approval_id) for approval_id in approval_ids))
+        progress: Dict[str, Dict[str, Any]] = {}
+        approved: List[Dict[str, Any]] = []
+
+        with get_db_cursor(commit=True) as cursor:
+            denied = ApprovalService._bulk_permission_errors(cursor, user_id, ids, action, lock=True)
+            allowed = [request_id for request_id in ids if request_id not in denied]
+
+            if allowed:
+                cursor.execute("""
+                    INSERT INTO approval_actions (approval_request_id, user_id, action, comments, annotations, step_number)
+                    SELECT id, %s, %s, %s, '{}'::jsonb, COALESCE(current_step, 1)
+                    FROM approval_requests
+                    WHERE id = ANY(%s::uuid[])
+                """, (str(user_id), action, comments, allowed))
+
+                # Approvals go back to pending and are settled by workflow progression
+                new_status = BULK_ACTION_STATUSES[action]
+                cursor.execute(f"""
+                    UPDATE approval_requests
+                    SET status = %s, updated_at = CURRENT_TIMESTAMP
+                        {", completed_at = CURRENT_TIMESTAMP" if new_status == 'rejected' else ""}
+                    WHERE id = ANY(%s::uuid[])
+                """, (new_status, allowed))
+
+                if action == 'approve':
+                    progress, approved = ApprovalService._progress_requests(cursor, allowed)
+
+        # Trigger associated actions once the approvals are committed
+        for request in approved:
+            ApprovalService._trigger_approval_action(request['id'], request)
 
-        return {"allowed": allowed, "denied": denied}
+        return {"succeeded": allowed, "denied": denied, "progress": progress}
 
     @staticmethod
     def calculate_approval_metrics(request_id: UUID) -> Dict[str, Any]:
@@ -0,0 +1,171 @@
+"""
+Audit Chain - Asynchronous hash chaining of audit log rows
+
+Audit rows get their own checksum when inserted (migration 32) but are not
+chained on the insert path, which used to serialize every audit write
+behind the previous row. Instead the sealer periodically takes the rows not
+yet in a batch, groups them by partition and seals each group as a batch:
+
+    batch_checksum = sha256(row checksums concatenated in (created_at, id) order)
+    chain_checksum = sha256(previous batch's chain_checksum + batch_checksum)
+
+The first batch of a partition chains from partition_genesis(name), so every
+monthly partition is an independent chain that can be verified on its own.
+The batch row and its rows' batch_id are written in one transaction, under
+a transaction-level advisory lock so only one replica seals at a time. Rows
+inserted late (a long transaction committing after newer rows were sealed)
+simply land in a later batch.
+
+The sealer also keeps monthly partitions created ahead of time.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+from app.services.audit_checksums import batch_checksum, chain_checksum, partition_genesis
+
+logger = logging.getLogger(__name__)
+
+SEAL_LOCK_NAME = 'audit_log_sealer'
+# Months of partitions kept created ahead of the current one
+PARTITIONS_AHEAD = 2
+PARTITION_CHECK_SECONDS = 3600
+
+
+class AuditChainSealer:
+    """Seals unsealed audit rows into hash-chained batches"""
+
+    def __init__(
+        self,
+        interval_seconds: int = settings.AUDIT_SEAL_INTERVAL_SECONDS,
+        batch_size: int = settings.AUDIT_SEAL_BATCH_SIZE
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._partitions_checked_at = 0.0
+        self._sealed_rows = 0
+        self._sealed_batches = 0
+
+    def start(self):
+        """Start the sealer on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info("Audit chain sealer started")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Audit chain sealer stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                if time.monotonic() - self._partitions_checked_at > PARTITION_CHECK_SECONDS:
+                    await run_in_threadpool(self.ensure_partitions)
+                # Keep sealing while there is a backlog
+                while await run_in_threadpool(self.seal_pending) >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Audit chain sealer error: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    def ensure_partitions(self) -> int:
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute(
+                "SELECT ensure_audit_log_partitions(CURRENT_TIMESTAMP, %s) AS created",
+                (PARTITIONS_AHEAD,)
+            )
+            created = cursor.fetchone()['created']
+        self._partitions_checked_at = time.monotonic()
+        if created:
+            logger.info(f"Created {created} audit log partitions")
+        return created
+
+    def seal_pending(self) -> int:
+        """Seal up to batch_size unsealed rows; returns the number of rows sealed"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (SEAL_LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                return 0
+
+            cursor.execute("""
+                SELECT tableoid::regclass::text AS partition_name, created_at, id, checksum
+                FROM audit_logs
+                WHERE batch_id IS NULL
+                ORDER BY created_at, id
+                LIMIT %s
+            """, (self.batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+
+            by_partition: Dict[str, List[dict]] = {}
+            for row in rows:
+                by_partition.setdefault(row['partition_name'], []).append(row)
+
+            for partition_name, partition_rows in by_partition.items():
+                self._seal_batch(cursor, partition_name, partition_rows)
+
+        self._sealed_rows += len(rows)
+        return len(rows)
+
+    def _seal_batch(self, cursor, partition_name: str, rows: List[dict]) -> None:
+        cursor.execute("""
+            SELECT chain_checksum FROM audit_log_batches
+            WHERE partition_name = %s
+            ORDER BY id DESC
+            LIMIT 1
+        """, (partition_name,))
+        head = cursor.fetchone()
+        prev = head['chain_checksum'] if head else partition_genesis(partition_name)
+
+        batch_hash = batch_checksum(row['checksum'] or '' for row in rows)
+        cursor.execute("""
+            INSERT INTO audit_log_batches (
+                partition_name, row_count, first_created_at, last_created_at,
+                batch_checksum, prev_chain_checksum, chain_checksum
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            partition_name, len(rows), rows[0]['created_at'], rows[-1]['created_at'],
+            batch_hash, prev, chain_checksum(prev, batch_hash)
+        ))
+        batch_id = cursor.fetchone()['id']
+
+        # created_at bounds let the update prune to the partition
+        cursor.execute("""
+            UPDATE audit_logs
+            SET batch_id = %s, verification_status = 'sealed'
+            WHERE created_at BETWEEN %s AND %s
+            AND id = ANY(%s::uuid[])
+            AND batch_id IS NULL
+        """, (batch_id, rows[0]['created_at'], rows[-1]['created_at'], [str(row['id']) for row in rows]))
+        if cursor.rowcount != len(rows):
+            raise RuntimeError(
+                f"Audit batch for {partition_name} matched {cursor.rowcount} of {len(rows)} rows"
+            )
+        self._sealed_batches += 1
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'sealed_rows': self._sealed_rows,
+            'sealed_batches': self._sealed_batches,
+        }
+
+
+# Global sealer instance
+audit_chain_sealer = AuditChainSealer()
@@ -0,0 +1,45 @@
+"""
+Audit Checksums - Row, batch and chain checksums of the audit log
+
+Shared by the sealer (audit_chain.py) and the verifier
+(audit_verification.py). Standard library only, so verification worker
+processes and offline tools can import it without the web stack.
+"""
+import hashlib
+from typing import Iterable, Optional
+
+
+def sha256_hex(value: str) -> str:
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def row_checksum(
+    user_id: Optional[str],
+    action: Optional[str],
+    resource_type: Optional[str],
+    resource_id: Optional[str],
+    metadata: Optional[str],
+    ip_address: Optional[str],
+    created_at: Optional[str]
+) -> str:
+    """
+    Checksum computed by the audit_logs insert trigger, from the columns'
+    text forms (select them cast ::text, in the writers' TimeZone)
+    """
+    return sha256_hex(''.join((
+        user_id or '', action or '', resource_type or '', resource_id or '',
+        metadata if metadata is not None else '{}', ip_address or '', created_at or ''
+    )))
+
+
+def partition_genesis(partition_name: str) -> str:
+    """Chain value preceding a partition's first batch"""
+    return sha256_hex(f"audit_logs:{partition_name}")
+
+
+def batch_checksum(row_checksums: Iterable[str]) -> str:
+    return sha256_hex(''.join(row_checksums))
+
+
+def chain_checksum(prev_chain_checksum: str, batch_hash: str) -> str:
+    return sha256_hex(prev_chain_checksum + batch_hash)
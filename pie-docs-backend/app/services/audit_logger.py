@@ -0,0 +1,191 @@
+"""
+Audit Logger - Batched, asynchronous audit log writes
+
+Request handlers call audit_logger.log(...), which only appends the event
+(stamped with its own id and time) to an in-memory buffer. A background
+task writes the buffer with one multi-row insert every
+AUDIT_FLUSH_INTERVAL_SECONDS, or sooner once AUDIT_BATCH_SIZE events are
+waiting, and the buffer is flushed on shutdown. Checksums are added by the
+partition trigger and chaining happens later (app/services/audit_chain.py),
+so a flush never waits on other audit writers.
+
+Events are at risk only for the flush interval if the process dies. A
+failed flush is retried with the next one; beyond AUDIT_MAX_PENDING
+buffered events, log() writes synchronously instead of buffering more.
+Outside the event loop (scripts, or before startup) log() writes
+immediately.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import psycopg2
+from fastapi.concurrency import run_in_threadpool
+from psycopg2.extras import Json, execute_values
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    'id', 'event_type', 'action', 'user_id', 'resource_type', 'resource_id',
+    'description', 'metadata', 'old_values', 'new_values', 'success', 'error_message',
+    'ip_address', 'user_agent', 'created_at',
+)
+
+
+class AuditLogger:
+    """Buffers audit events and writes them in batches"""
+
+    def __init__(
+        self,
+        batch_size: int = settings.AUDIT_BATCH_SIZE,
+        flush_seconds: float = settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = settings.AUDIT_MAX_PENDING
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Any, ...]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._written = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+
+    def start(self):
+        """Start the background flusher on the running event loop"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_event_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+            logger.info("Audit logger started")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Whatever is still buffered is written before the pool closes
+        await run_in_threadpool(self.flush)
+        logger.info("Audit logger stopped")
+
+    def log(
+        self,
+        event_type: str,
+        action: str,
+        user_id: Optional[Any] = None,
+        resource_type: Optional[str] = None,
+        resource_id: Optional[Any] = None,
+        description: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        old_values: Optional[Dict[str, Any]] = None,
+        new_values: Optional[Dict[str, Any]] = None,
+        success: bool = True,
+        error_message: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> str:
+        """Record an audit event (same fields as log_audit_event); returns its id"""
+        event_id = str(uuid4())
+        row = (
+            event_id, event_type, action,
+            str(user_id) if user_id else None,
+            resource_type,
+            str(resource_id) if resource_id else None,
+            description,
+            Json(metadata or {}),
+            Json(old_values) if old_values is not None else None,
+            Json(new_values) if new_values is not None else None,
+            success, error_message, ip_address, user_agent,
+            datetime.now(timezone.utc),
+        )
+
+        if self._task is None or self._task.done():
+            self._write_or_log([row])
+            return event_id
+
+        with self._lock:
+            overflow = len(self._pending) >= self.max_pending
+            if not overflow:
+                self._pending.append(row)
+                pending = len(self._pending)
+        if overflow:
+            # Back-pressure: the flusher is behind (or the database is failing)
+            self._write_or_log([row])
+        elif pending >= self.batch_size:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return event_id
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await run_in_threadpool(self.flush)
+
+    def flush(self) -> int:
+        """Write all buffered events; returns the number written"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        try:
+            self._write(rows)
+        except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+            # A bad event (e.g. unknown user id) must not block the rest
+            logger.warning(f"Audit batch rejected ({e}); writing {len(rows)} events individually")
+            for row in rows:
+                self._write_or_log([row])
+            self._flushes += 1
+            return len(rows)
+        except Exception as e:
+            self._failed_flushes += 1
+            logger.error(f"Failed to write {len(rows)} audit events, will retry: {e}")
+            with self._lock:
+                self._pending = rows + self._pending
+            return 0
+        self._flushes += 1
+        return len(rows)
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> None:
+        with get_db_cursor(commit=True) as cursor:
+            execute_values(
+                cursor,
+                f"INSERT INTO audit_logs ({', '.join(COLUMNS)}) VALUES %s",
+                rows,
+                page_size=1000
+            )
+        self._written += len(rows)
+
+    def _write_or_log(self, rows: List[Tuple[Any, ...]]) -> None:
+        try:
+            self._write(rows)
+        except Exception as e:
+            logger.error(f"Error logging audit event: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'pending': pending,
+            'written': self._written,
+            'flushes': self._flushes,
+            'failed_flushes': self._failed_flushes,
+        }
+
+
+# Global audit logger instance
+audit_logger = AuditLogger()
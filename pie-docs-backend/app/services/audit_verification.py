@@ -0,0 +1,311 @@
+"""
+Audit Verification - Parallel, incremental verification of the audit chain
+
+Each audit_logs partition is an independent hash chain of sealed batches
+(app/services/audit_chain.py), so partitions are verified side by side in
+worker processes. A worker opens its own read-only REPEATABLE READ
+connection, reads the partition's batches, and streams the partition's
+rows in (batch, created_at, id) order through a server-side cursor. For
+every row it recomputes the checksum from the row's columns, and for every
+batch it checks:
+
+- the row count
+- the batch checksum (the rows' checksums in order)
+- the link to the previous batch's chain_checksum
+- the batch's own chain_checksum
+
+A partition stops at its first broken link, which is reported with the
+batch, row and reason.
+
+Verified progress is checkpointed per partition
+(audit_verification_checkpoints, migration 33). The next run checks that
+the checkpointed batch still has the same chain_checksum and then verifies
+only newer batches; full=True starts every partition from its genesis.
+Rows not sealed yet are counted but not verified.
+
+Checksums hash created_at's text form, so verification must run with the
+same server TimeZone setting the rows were written under (the default for
+application connections).
+"""
+import hashlib
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg2
+from psycopg2 import sql
+
+from app.config import settings
+from app.services.audit_checksums import chain_checksum, partition_genesis, row_checksum
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_ROWS = 20000
+
+
+def _broken(result: Dict[str, Any], reason: str, batch_id: Optional[int] = None, row: Optional[tuple] = None) -> Dict[str, Any]:
+    result['status'] = 'broken'
+    result['first_broken'] = {
+        'reason': reason,
+        'batch_id': batch_id,
+        'row_id': row[1] if row else None,
+        'created_at': row[2] if row else None,
+    }
+    return result
+
+
+def verify_segment(
+    partition_name: str,
+    checkpoint_batch_id: Optional[int] = None,
+    checkpoint_chain: Optional[str] = None,
+    dsn: str = settings.DATABASE_URL
+) -> Dict[str, Any]:
+    """
+    Verify one partition's chain after the checkpoint (runs in a worker
+    process). last_batch_id/chain_checksum in the result are the last
+    batch that verified.
+    """
+    started = time.monotonic()
+    result: Dict[str, Any] = {
+        'partition': partition_name,
+        'status': 'ok',
+        'resumed_from_batch': checkpoint_batch_id,
+        'batches_checked': 0,
+        'rows_checked': 0,
+        'last_batch_id': checkpoint_batch_id,
+        'chain_checksum': checkpoint_chain,
+        'first_broken': None,
+    }
+
+    conn = psycopg2.connect(dsn)
+    try:
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        with conn.cursor() as cursor:
+            prev = partition_genesis(partition_name)
+            after_batch_id = 0
+            if checkpoint_batch_id:
+                cursor.execute(
+                    "SELECT chain_checksum FROM audit_log_batches WHERE id = %s AND partition_name = %s",
+                    (checkpoint_batch_id, partition_name)
+                )
+                row = cursor.fetchone()
+                if not row or row[0] != checkpoint_chain:
+                    return _broken(result, "Checkpointed batch is missing or its chain checksum changed", checkpoint_batch_id)
+                prev = checkpoint_chain
+                after_batch_id = checkpoint_batch_id
+
+            cursor.execute("""
+                SELECT id, row_count, batch_checksum, prev_chain_checksum, chain_checksum
+                FROM audit_log_batches
+                WHERE partition_name = %s AND id > %s
+                ORDER BY id
+            """, (partition_name, after_batch_id))
+            batches = cursor.fetchall()
+
+        if not batches:
+            return result
+
+        # partition_name comes from audit_log_batches (a regclass text form,
+        # already quoted where needed) and was matched against the catalog.
+        # ORDER BY names the table columns, not the ::text outputs of the
+        # same name, so rows come in the sealer's order via idx_audit_logs_batch
+        rows = conn.cursor(name='audit_verify')
+        rows.itersize = STREAM_BATCH_ROWS
+        rows.execute(sql.SQL("""
+            SELECT batch_id, id::text, created_at::text, user_id::text, action, resource_type,
+                   resource_id::text, metadata::text, ip_address::text, checksum
+            FROM {} AS a
+            WHERE a.batch_id > %s
+            ORDER BY a.batch_id, a.created_at, a.id
+        """).format(sql.SQL(partition_name)), (after_batch_id,))
+
+        pending = iter(batches)
+        batch = None
+        hasher = None
+        count = 0
+
+        def close_batch() -> Optional[str]:
+            """Check the batch just streamed; returns the failure reason, if any"""
+            nonlocal prev
+            batch_id, row_count, batch_hash, prev_chain, chain = batch
+            if count != row_count:
+                return f"Batch has {count} rows, sealed with {row_count} (rows deleted or added)"
+            if hasher.hexdigest() != batch_hash:
+                return "Batch checksum mismatch (rows reordered or checksums altered)"
+            if prev_chain != prev:
+                return "Chain link broken (batch does not follow the previous batch)"
+            if chain_checksum(prev, batch_hash) != chain:
+                return "Chain checksum mismatch"
+            prev = chain
+            result['batches_checked'] += 1
+            result['rows_checked'] += count
+            result['last_batch_id'] = batch_id
+            result['chain_checksum'] = chain
+            return None
+
+        for row in rows:
+            if batch is None or row[0] != batch[0]:
+                if batch is not None:
+                    reason = close_batch()
+                    if reason:
+                        return _broken(result, reason, batch[0])
+                batch = next(pending, None)
+                if batch is None or batch[0] > row[0]:
+                    return _broken(result, "Row belongs to a batch that does not exist", row[0], row)
+                if batch[0] < row[0]:
+                    return _broken(result, "Sealed batch has no rows", batch[0])
+                hasher = hashlib.sha256()
+                count = 0
+
+            if row_checksum(*row[3:9], created_at=row[2]) != row[9]:
+                return _broken(result, "Row checksum mismatch (row altered)", row[0], row)
+            hasher.update((row[9] or '').encode('utf-8'))
+            count += 1
+
+        if batch is not None:
+            reason = close_batch()
+            if reason:
+                return _broken(result, reason, batch[0])
+        leftover = next(pending, None)
+        if leftover is not None:
+            return _broken(result, "Sealed batch has no rows", leftover[0])
+        return result
+    finally:
+        result['duration_seconds'] = round(time.monotonic() - started, 2)
+        conn.close()
+
+
+class AuditChainVerifier:
+    """Runs verify_segment over partitions in parallel and records checkpoints"""
+
+    def __init__(self, dsn: str = settings.DATABASE_URL, workers: int = settings.AUDIT_VERIFY_WORKERS):
+        self.dsn = dsn
+        self.workers = workers
+
+    def _segments(self, conn, partitions: Optional[List[str]], full: bool) -> List[Dict[str, Any]]:
+        with conn.cursor() as cursor:
+            # Only names present in the catalog are ever interpolated into SQL
+            cursor.execute("""
+                SELECT DISTINCT b.partition_name, c.last_batch_id, c.chain_checksum
+                FROM audit_log_batches b
+                JOIN pg_inherits i ON i.inhrelid::regclass::text = b.partition_name
+                    AND i.inhparent = 'audit_logs'::regclass
+                LEFT JOIN audit_verification_checkpoints c ON c.partition_name = b.partition_name
+                ORDER BY b.partition_name
+            """)
+            segments = [
+                {
+                    'partition': name,
+                    'checkpoint_batch_id': None if full else last_batch_id,
+                    'checkpoint_chain': None if full else chain,
+                }
+                for name, last_batch_id, chain in cursor.fetchall()
+            ]
+        if partitions:
+            segments = [segment for segment in segments if segment['partition'] in partitions]
+        return segments
+
+    def run(
+        self,
+        full: bool = False,
+        partitions: Optional[List[str]] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Verify all (or the named) partitions; on_result is called as each one finishes"""
+        started = time.monotonic()
+        conn = psycopg2.connect(self.dsn)
+        try:
+            segments = self._segments(conn, partitions, full)
+            results: List[Dict[str, Any]] = []
+
+            if segments:
+                # spawn: forking a process with live connections and threads is unsafe
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=max(1, min(self.workers, len(segments))), mp_context=context) as pool:
+                    futures = {
+                        pool.submit(
+                            verify_segment, segment['partition'],
+                            segment['checkpoint_batch_id'], segment['checkpoint_chain'], self.dsn
+                        ): segment
+                        for segment in segments
+                    }
+                    for future in as_completed(futures):
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {
+                                'partition': futures[future]['partition'],
+                                'status': 'error',
+                                'first_broken': None,
+                                'error': str(e),
+                            }
+                        results.append(result)
+                        if result['status'] != 'ok':
+                            logger.error(
+                                f"Audit chain verification of {result['partition']} failed: "
+                                f"{result['first_broken'] or result.get('error')}"
+                            )
+                        if on_result:
+                            on_result(result)
+
+            self._record_checkpoints(conn, results)
+            unsealed = self._unsealed_rows(conn)
+        finally:
+            conn.close()
+
+        results.sort(key=lambda result: result['partition'])
+        statuses = {result['status'] for result in results}
+        return {
+            'status': 'broken' if 'broken' in statuses else 'error' if 'error' in statuses else 'ok',
+            'full': full,
+            'segments': results,
+            'rows_checked': sum(result.get('rows_checked', 0) for result in results),
+            'batches_checked': sum(result.get('batches_checked', 0) for result in results),
+            'unsealed_rows': unsealed,
+            'duration_seconds': round(time.monotonic() - started, 2),
+        }
+
+    @staticmethod
+    def _record_checkpoints(conn, results: List[Dict[str, Any]]) -> None:
+        """Advance checkpoints to the last verified batch of each partition"""
+        rows = [
+            (result['partition'], result['last_batch_id'], result['chain_checksum'],
+             result['batches_checked'], result['rows_checked'])
+            for result in results
+            if result.get('batches_checked') and result.get('last_batch_id')
+        ]
+        if not rows:
+            return
+        with conn.cursor() as cursor:
+            for row in rows:
+                cursor.execute("""
+                    INSERT INTO audit_verification_checkpoints (
+                        partition_name, last_batch_id, chain_checksum, verified_batches, verified_rows
+                    ) VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (partition_name) DO UPDATE SET
+                        last_batch_id = EXCLUDED.last_batch_id,
+                        chain_checksum = EXCLUDED.chain_checksum,
+                        verified_batches = CASE
+                            WHEN EXCLUDED.last_batch_id > audit_verification_checkpoints.last_batch_id
+                            THEN audit_verification_checkpoints.verified_batches + EXCLUDED.verified_batches
+                            ELSE EXCLUDED.verified_batches END,
+                        verified_rows = CASE
+                            WHEN EXCLUDED.last_batch_id > audit_verification_checkpoints.last_batch_id
+                            THEN audit_verification_checkpoints.verified_rows + EXCLUDED.verified_rows
+                            ELSE EXCLUDED.verified_rows END,
+                        verified_at = CURRENT_TIMESTAMP
+                """, row)
+        conn.commit()
+
+    @staticmethod
+    def _unsealed_rows(conn) -> int:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM audit_logs WHERE batch_id IS NULL")
+            return cursor.fetchone()[0]
+
+
+# Default verifier instance
+audit_chain_verifier = AuditChainVerifier()
@@ -0,0 +1,335 @@
+"""
+Barcode Allocator - Bulk, collision-free barcode code generation
+
+Codes are built from serial numbers reserved in contiguous ranges from a
+sequence and carry a GS1 mod-10 check digit, so allocation needs no
+randomness and no per-code uniqueness probing. Alphanumeric formats share
+barcode_code_seq (migration 26). Formats with a fixed number of digits each
+have their own sequence (pharmacode: migration 39, numeric formats:
+migration 42), so no format uses up another's range; a request that does not
+fit the format's remaining serials is rejected before the job starts.
+
+Rows are streamed into a staging table with COPY and moved into
+barcode_records with one INSERT ... SELECT per batch (MD5 checksums are
+computed in SQL). A conflicting code - e.g. a hand-entered code that happens
+to match - is skipped and replaced by a freshly reserved serial, so a large
+job never aborts near the end. Each batch commits and advances
+barcode_generation_jobs.progress.
+"""
+import io
+import logging
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Rows per COPY batch (one commit and progress update per batch)
+ALLOCATION_BATCH_SIZE = 10000
+
+# Fully numeric symbologies: total digits including the check digit.
+# Numeric prefixes count towards the length; suffixes are not allowed.
+NUMERIC_FORMAT_LENGTHS = {
+    'EAN13': 13,
+    'EAN8': 8,
+    'UPC': 12,
+    'UPCE': 8,
+    'ITF14': 14,
+    'ITF': 14,
+}
+# UPC-E: number system digit (0 or 1), six data digits, check digit
+UPCE_NUMBER_SYSTEMS = ('0', '1')
+# Pharmacode encodes a bare integer in this range, without a check digit
+PHARMACODE_RANGE = (3, 131070)
+# Sequence each format reserves its serials from (default: SERIAL_SEQUENCE)
+SERIAL_SEQUENCE = 'barcode_code_seq'
+FORMAT_SEQUENCES = {
+    'EAN13': 'barcode_ean13_seq',
+    'EAN8': 'barcode_ean8_seq',
+    'UPC': 'barcode_upc_seq',
+    'UPCE': 'barcode_upce_seq',
+    'ITF14': 'barcode_itf14_seq',
+    'ITF': 'barcode_itf_seq',
+    'pharmacode': 'barcode_pharmacode_seq',
+}
+# Serial width for alphanumeric symbologies (CODE128, CODE39, CODE93, MSI)
+SERIAL_WIDTH = 10
+# NULL marker in COPY text format
+COPY_NULL = '\\N'
+
+
+def _copy_value(value: str) -> str:
+    """Escape a value for COPY text format"""
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def gs1_check_digit(digits: str) -> str:
+    """GS1 mod-10 check digit (EAN/UPC/ITF): weights 3,1,3,... from the right"""
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        total += int(digit) * (3 if position % 2 == 0 else 1)
+    return str((10 - total % 10) % 10)
+
+
+def expand_upce(body: str) -> str:
+    """
+    Expand a UPC-E number (number system + six digits) to the UPC-A digits
+    its check digit is computed over
+    """
+    number_system, data = body[0], body[1:]
+    last = data[5]
+    if last in '012':
+        expanded = data[:2] + last + '0000' + data[2:5]
+    elif last == '3':
+        expanded = data[:3] + '00000' + data[3:5]
+    elif last == '4':
+        expanded = data[:4] + '00000' + data[4]
+    else:
+        expanded = data[:5] + '0000' + last
+    return number_system + expanded
+
+
+def validate_check_digit(code: str) -> bool:
+    """Check the trailing GS1 check digit of the numeric part of a code"""
+    digits = ''.join(ch for ch in code if ch.isdigit())
+    return len(digits) >= 2 and gs1_check_digit(digits[:-1]) == digits[-1]
+
+
+def _body_length(fmt: str, prefix: str) -> int:
+    """Serial digits of a numeric code: its length minus prefix and check digit"""
+    return NUMERIC_FORMAT_LENGTHS[fmt] - 1 - len(prefix)
+
+
+def serial_sequence(fmt: str) -> str:
+    """Sequence a format reserves its serials from"""
+    return FORMAT_SEQUENCES.get(fmt, SERIAL_SEQUENCE)
+
+
+def max_serial(fmt: str, prefix: Optional[str] = None) -> Optional[int]:
+    """Largest serial a format can encode with this prefix (None if unbounded)"""
+    if fmt == 'pharmacode':
+        return PHARMACODE_RANGE[1]
+    if fmt in NUMERIC_FORMAT_LENGTHS:
+        if fmt == 'UPCE' and not prefix:
+            prefix = UPCE_NUMBER_SYSTEMS[0]
+        return 10 ** _body_length(fmt, prefix or '') - 1
+    return None
+
+
+def _last_serial(cursor, sequence: str) -> int:
+    """Last serial reserved from a sequence (start - 1 if none yet)"""
+    cursor.execute("""
+        SELECT COALESCE(last_value, start_value - 1) AS last_serial
+        FROM pg_sequences
+        WHERE schemaname = current_schema() AND sequencename = %s
+    """, (sequence,))
+    return cursor.fetchone()['last_serial']
+
+
+def build_code(fmt: str, serial: int, prefix: Optional[str] = None, suffix: Optional[str] = None) -> str:
+    """
+    Build the barcode code for a reserved serial number
+
+    Raises:
+        ValueError: If the serial does not fit the format
+    """
+    prefix = prefix or ''
+    suffix = suffix or ''
+    if fmt == 'UPCE' and not prefix:
+        prefix = UPCE_NUMBER_SYSTEMS[0]
+
+    if fmt == 'pharmacode':
+        if not PHARMACODE_RANGE[0] <= serial <= PHARMACODE_RANGE[1]:
+            raise ValueError("Pharmacode range exhausted")
+        return str(serial)
+
+    if fmt in NUMERIC_FORMAT_LENGTHS:
+        body_length = _body_length(fmt, prefix)
+        serial_str = str(serial)
+        if len(serial_str) > body_length:
+            raise ValueError(f"Serial {serial} does not fit a {fmt} code with prefix '{prefix}'")
+        body = prefix + serial_str.zfill(body_length)
+        if fmt == 'UPCE':
+            return body + gs1_check_digit(expand_upce(body))
+        return body + gs1_check_digit(body)
+
+    serial_str = str(serial).zfill(SERIAL_WIDTH)
+    return f"{prefix}{serial_str}{gs1_check_digit(serial_str)}{suffix}"
+
+
+def validate_request(fmt: str, prefix: Optional[str], suffix: Optional[str], quantity: int = 0) -> None:
+    """
+    Reject prefixes/suffixes the symbology cannot encode, and requests for
+    more codes than the format has serials left
+    """
+    if fmt in NUMERIC_FORMAT_LENGTHS:
+        if prefix and not prefix.isdigit():
+            raise ValueError(f"{fmt} codes are numeric; prefix must contain digits only")
+        if suffix:
+            raise ValueError(f"{fmt} codes end with a check digit; suffix is not supported")
+        if prefix and len(prefix) >= NUMERIC_FORMAT_LENGTHS[fmt] - 1:
+            raise ValueError(f"Prefix is too long for {fmt}")
+        if fmt == 'UPCE' and prefix and prefix[0] not in UPCE_NUMBER_SYSTEMS:
+            raise ValueError("UPCE codes must start with number system 0 or 1")
+    elif fmt == 'pharmacode' and (prefix or suffix):
+        raise ValueError("Pharmacode does not support prefix or suffix")
+
+    limit = max_serial(fmt, prefix)
+    if limit is not None and quantity > 0:
+        with get_db_cursor() as cursor:
+            remaining = max(0, limit - _last_serial(cursor, serial_sequence(fmt)))
+        if quantity > remaining:
+            raise ValueError(
+                f"Only {remaining} {fmt} codes are left with prefix '{prefix or ''}'; {quantity} requested"
+            )
+
+
+class BarcodeAllocator:
+    """Allocates and stores barcodes for a generation job"""
+
+    def reserve_serials(
+        self,
+        count: int,
+        sequence: str = SERIAL_SEQUENCE,
+        limit: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """
+        Reserve a contiguous block of serial numbers
+
+        Returns:
+            (first, last) inclusive
+
+        Raises:
+            ValueError: If the block would pass limit (nothing is reserved)
+        """
+        with get_db_cursor(commit=True) as cursor:
+            # Serialize reservations so nextval+setval yields one contiguous block
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (sequence,))
+            if limit is not None and _last_serial(cursor, sequence) + count > limit:
+                raise ValueError(f"Serial range of {sequence} exhausted")
+            cursor.execute(
+                "SELECT setval(%s, nextval(%s) + %s - 1) AS last_value",
+                (sequence, sequence, count)
+            )
+            last = cursor.fetchone()['last_value']
+        return last - count + 1, last
+
+    def _insert_batch(
+        self,
+        format_id: UUID,
+        codes: List[str],
+        targets: List[Tuple[Optional[str], Optional[str]]]
+    ) -> List[int]:
+        """
+        COPY one batch into staging and insert it, skipping conflicting codes
+
+        Returns:
+            Indexes (into codes) of rows that were not inserted
+        """
+        buffer = io.StringIO()
+        for index, (code, (document_id, asset_id)) in enumerate(zip(codes, targets)):
+            buffer.write('\t'.join((
+                str(index), _copy_value(code), document_id or COPY_NULL, asset_id or COPY_NULL
+            )) + '\n')
+        buffer.seek(0)
+
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE barcode_staging (
+                    row_index INTEGER,
+                    code VARCHAR(255),
+                    document_id UUID,
+                    asset_id UUID
+                ) ON COMMIT DROP
+            """)
+            cursor.copy_expert(
+                "COPY barcode_staging (row_index, code, document_id, asset_id) FROM STDIN",
+                buffer
+            )
+            cursor.execute("""
+                WITH inserted AS (
+                    INSERT INTO barcode_records (code, format_id, document_id, asset_id, checksum)
+                    SELECT code, %s, document_id, asset_id, md5(code)
+                    FROM barcode_staging
+                    ON CONFLICT (code) DO NOTHING
+                    RETURNING code
+                )
+                SELECT s.row_index
+                FROM barcode_staging s
+                LEFT JOIN inserted i ON i.code = s.code
+                WHERE i.code IS NULL
+            """, (str(format_id),))
+            return [row['row_index'] for row in cursor.fetchall()]
+
+    def _set_progress(self, job_id: UUID, progress: int) -> None:
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute(
+                "UPDATE barcode_generation_jobs SET progress = %s WHERE id = %s",
+                (progress, str(job_id))
+            )
+
+    def run_job(
+        self,
+        job_id: UUID,
+        format_id: UUID,
+        fmt: str,
+        prefix: Optional[str],
+        suffix: Optional[str],
+        quantity: int,
+        document_ids: List[UUID],
+        asset_ids: List[UUID]
+    ) -> None:
+        """
+        Generate all barcodes for a job and record completion or failure
+
+        The first codes are assigned to document_ids, then asset_ids; any
+        remaining quantity is generated unassigned.
+        """
+        targets: List[Tuple[Optional[str], Optional[str]]] = (
+            [(str(doc_id), None) for doc_id in document_ids] +
+            [(None, str(asset_id)) for asset_id in asset_ids]
+        )
+        total = max(quantity, len(targets))
+        targets.extend([(None, None)] * (total - len(targets)))
+
+        sequence = serial_sequence(fmt)
+        limit = max_serial(fmt, prefix)
+
+        try:
+            generated = 0
+            for batch_start in range(0, total, ALLOCATION_BATCH_SIZE):
+                pending = targets[batch_start:batch_start + ALLOCATION_BATCH_SIZE]
+
+                # Retry only the rows whose code collided, with new serials
+                while pending:
+                    first, _ = self.reserve_serials(len(pending), sequence, limit)
+                    codes = [build_code(fmt, first + offset, prefix, suffix) for offset in range(len(pending))]
+                    skipped = self._insert_batch(format_id, codes, pending)
+                    if skipped:
+                        logger.warning(f"Barcode job {job_id}: {len(skipped)} code collisions, reallocating")
+                    generated += len(pending) - len(skipped)
+                    pending = [pending[index] for index in skipped]
+
+                self._set_progress(job_id, min(99, generated * 100 // total))
+
+            with get_db_cursor(commit=True) as cursor:
+                cursor.execute("""
+                    UPDATE barcode_generation_jobs
+                    SET status = 'completed', progress = 100, completed_at = NOW()
+                    WHERE id = %s
+                """, (str(job_id),))
+            logger.info(f"Barcode job {job_id} completed: {generated} codes")
+
+        except Exception as e:
+            logger.error(f"Barcode job {job_id} failed: {e}")
+            with get_db_cursor(commit=True) as cursor:
+                cursor.execute("""
+                    UPDATE barcode_generation_jobs
+                    SET status = 'failed', error = %s
+                    WHERE id = %s
+                """, (str(e), str(job_id)))
+
+
+# Singleton instance
+barcode_allocator = BarcodeAllocator()
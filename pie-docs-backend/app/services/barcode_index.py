@@ -0,0 +1,465 @@
+"""
+Barcode Index - In-memory barcode → warehouse entity resolution
+
+Scanner lookups are on the critical path of warehouse staff. Instead of a
+multi-join query per scan, the zones, shelves, racks and physical documents
+are held in process memory keyed by barcode, together with the
+Location → Warehouse → Zone → Shelf → Rack tree used to build location paths
+(paths are memoized per node).
+
+A background task per process keeps the index current: it LISTENs on
+barcode_index, loads the whole index once listening, then re-reads the rows
+that triggers on the warehouse tables notify (migration 38) as other
+workers, replicas or SQL sessions change them. The warehouse endpoints also
+update the index in place after their transaction commits, so a process
+sees its own writes immediately. A full reload every
+BARCODE_INDEX_REFRESH_SECONDS, run in the background while the previous
+maps keep serving, repairs anything missed.
+
+Staleness: an entry trails a commit by the NOTIFY delivery delay plus one
+indexed re-read (normally milliseconds; longer if the listener has a
+backlog). Until the index is loaded, and whenever the listener connection
+is lost, resolve() returns None and lookups go to the database. Lookups
+that miss the index also fall back to the database.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import psycopg2
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Parent column per hierarchy level
+NODE_PARENT_COLUMNS = {
+    'location': None,
+    'warehouse': 'location_id',
+    'zone': 'warehouse_id',
+    'shelf': 'zone_id',
+    'rack': 'shelf_id',
+}
+NODE_TABLES = {
+    'location': 'locations',
+    'warehouse': 'warehouses',
+    'zone': 'zones',
+    'shelf': 'shelves',
+    'rack': 'racks',
+}
+# Levels that are resolvable by barcode (matches EntityType in warehouse_mobile)
+SCANNABLE_NODES = ('zone', 'shelf', 'rack')
+
+DOCUMENT_QUERY = "SELECT id, title, barcode, status, rack_id FROM physical_documents"
+
+NOTIFY_CHANNEL = 'barcode_index'
+# Notified table -> index kind
+TABLE_KINDS = {table: kind for kind, table in NODE_TABLES.items()}
+TABLE_KINDS['physical_documents'] = 'document'
+# Changed rows re-read per round trip; a larger backlog is absorbed by a full reload
+MAX_CHANGES_PER_APPLY = 500
+# Listener connection health check and reconnect delay
+HEALTH_CHECK_SECONDS = 30
+RECONNECT_SECONDS = 5
+
+
+class BarcodeIndex:
+    """Process-local barcode index with precomputed location paths"""
+
+    def __init__(
+        self,
+        enabled: bool = settings.BARCODE_INDEX_ENABLED,
+        refresh_seconds: int = settings.BARCODE_INDEX_REFRESH_SECONDS
+    ):
+        self.enabled = enabled
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        # Serializes full reloads (single flight)
+        self._reload_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        # Set while the listener is connected and the index has been loaded
+        # since; lookups fall back to the database otherwise
+        self._synced = False
+        self._task: Optional[asyncio.Task] = None
+        self._inbox: Optional[asyncio.Queue] = None
+        self._conn = None
+        # node id -> {kind, id, name, barcode, status, parent_id}
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        # physical document id -> {id, name, barcode, status, rack_id}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        # barcode -> (kind, id); kind is a node level or 'document'
+        self._barcodes: Dict[str, tuple] = {}
+        # node id -> "Location > Warehouse > ..." (cleared on structural changes)
+        self._paths: Dict[str, Optional[str]] = {}
+
+    # ==========================================
+    # Loading
+    # ==========================================
+
+    def warm(self) -> None:
+        """
+        (Re)load the whole index from the database. Blocking; lookups keep
+        using the previous maps until the new ones are swapped in, and a
+        reload already in progress makes this a no-op.
+        """
+        if not self.enabled:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._warm()
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def _node_query(kind: str) -> str:
+        parent_column = NODE_PARENT_COLUMNS[kind]
+        barcode_column = 'NULL' if kind == 'location' else 'barcode'
+        return f"""
+            SELECT id, name, {barcode_column} AS barcode, status,
+                   {parent_column or 'NULL'} AS parent_id
+            FROM {NODE_TABLES[kind]}
+        """
+
+    def _warm(self) -> None:
+        started = time.monotonic()
+        nodes: Dict[str, Dict[str, Any]] = {}
+        documents: Dict[str, Dict[str, Any]] = {}
+        barcodes: Dict[str, tuple] = {}
+
+        with get_db_cursor() as cursor:
+            for kind in NODE_TABLES:
+                cursor.execute(self._node_query(kind))
+                for row in cursor.fetchall():
+                    node = self._make_node(kind, row)
+                    nodes[node['id']] = node
+                    if node['barcode'] and kind in SCANNABLE_NODES:
+                        barcodes[node['barcode']] = (kind, node['id'])
+
+            cursor.execute(DOCUMENT_QUERY)
+            for row in cursor.fetchall():
+                document = self._make_document(row)
+                documents[document['id']] = document
+                if document['barcode']:
+                    barcodes[document['barcode']] = ('document', document['id'])
+
+        with self._lock:
+            self._nodes = nodes
+            self._documents = documents
+            self._barcodes = barcodes
+            self._paths = {}
+            self._loaded_at = time.monotonic()
+
+        logger.info(
+            f"Barcode index loaded: {len(barcodes)} barcodes "
+            f"({len(documents)} documents) in {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+
+    def apply_changes(self, changes: Iterable[str]) -> None:
+        """Re-read the rows named by '<table>:<id>' notifications (blocking)"""
+        ids_by_kind: Dict[str, List[str]] = {}
+        for payload in changes:
+            table, _, entity_id = payload.partition(':')
+            kind = TABLE_KINDS.get(table)
+            if kind and entity_id:
+                ids_by_kind.setdefault(kind, []).append(entity_id)
+
+        with get_db_cursor() as cursor:
+            for kind, ids in ids_by_kind.items():
+                query = DOCUMENT_QUERY if kind == 'document' else self._node_query(kind)
+                cursor.execute(f"{query} WHERE id = ANY(%s::uuid[])", (ids,))
+                rows = cursor.fetchall()
+                found = {str(row['id']) for row in rows}
+
+                for row in rows:
+                    if kind == 'document':
+                        self.upsert_document(row)
+                    else:
+                        self.upsert_node(kind, row)
+                for entity_id in set(ids) - found:
+                    if kind == 'document':
+                        self.remove_document(entity_id)
+                    else:
+                        self.remove_node(entity_id)
+
+    @staticmethod
+    def _make_node(kind: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        parent_column = NODE_PARENT_COLUMNS[kind]
+        parent_id = row.get('parent_id', row.get(parent_column) if parent_column else None)
+        return {
+            'kind': kind,
+            'id': str(row['id']),
+            'name': row['name'],
+            'barcode': row.get('barcode'),
+            'status': row.get('status'),
+            'parent_id': str(parent_id) if parent_id else None,
+        }
+
+    @staticmethod
+    def _make_document(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': str(row['id']),
+            'name': row['title'],
+            'barcode': row['barcode'],
+            'status': row.get('status'),
+            'rack_id': str(row['rack_id']) if row.get('rack_id') else None,
+        }
+
+    # ==========================================
+    # Lookups
+    # ==========================================
+
+    def location_path(self, node_id: Optional[str]) -> Optional[str]:
+        """Full "Location > Warehouse > Zone > Shelf > Rack" path of a node"""
+        if not node_id:
+            return None
+        node_id = str(node_id)
+        if node_id in self._paths:
+            return self._paths[node_id]
+
+        names = []
+        current = self._nodes.get(node_id)
+        while current is not None:
+            names.append(current['name'])
+            if current['kind'] == 'location':
+                break
+            current = self._nodes.get(current['parent_id']) if current['parent_id'] else None
+
+        # Incomplete chains yield None, like the NULL-propagating SQL concatenation
+        path = ' > '.join(reversed(names)) if current is not None else None
+        self._paths[node_id] = path
+        return path
+
+    def resolve(self, barcode: str, entity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a barcode to its entity
+
+        Args:
+            barcode: Scanned barcode
+            entity_type: Expected type (zone, shelf, rack, document); None for any
+
+        Returns:
+            {entity_type, id, name, barcode, location_path} or None if not indexed
+            (callers should fall back to the database on None)
+        """
+        if not self.enabled or not self._synced:
+            return None
+
+        with self._lock:
+            hit = self._barcodes.get(barcode)
+            if hit is None:
+                return None
+            kind, entity_id = hit
+            if entity_type and kind != entity_type:
+                return None
+
+            if kind == 'document':
+                document = self._documents[entity_id]
+                return {
+                    'entity_type': kind,
+                    'id': entity_id,
+                    'name': document['name'],
+                    'barcode': barcode,
+                    'location_path': self.location_path(document['rack_id']),
+                    'rack_id': document['rack_id'],
+                }
+
+            node = self._nodes[entity_id]
+            # Scanner lookups only resolve active zones/shelves/racks
+            if node['status'] != 'active':
+                return None
+            return {
+                'entity_type': kind,
+                'id': entity_id,
+                'name': node['name'],
+                'barcode': barcode,
+                'location_path': self.location_path(entity_id),
+            }
+
+    # ==========================================
+    # In-place updates (call after the transaction commits)
+    # ==========================================
+
+    def upsert_node(self, kind: str, row: Dict[str, Any]) -> None:
+        """Add or update a location, warehouse, zone, shelf or rack"""
+        if not self.enabled or self._loaded_at is None:
+            return
+        node = self._make_node(kind, row)
+        with self._lock:
+            previous = self._nodes.get(node['id'])
+            if previous and previous['barcode'] and previous['barcode'] != node['barcode']:
+                self._barcodes.pop(previous['barcode'], None)
+            self._nodes[node['id']] = node
+            if node['barcode'] and kind in SCANNABLE_NODES:
+                self._barcodes[node['barcode']] = (kind, node['id'])
+            # Renames and re-parenting change the paths of every descendant
+            self._paths = {}
+
+    def remove_node(self, node_id: Any) -> None:
+        """Drop a deleted location, warehouse, zone, shelf or rack"""
+        if not self.enabled or self._loaded_at is None:
+            return
+        with self._lock:
+            node = self._nodes.pop(str(node_id), None)
+            if node and node['barcode']:
+                self._barcodes.pop(node['barcode'], None)
+            self._paths = {}
+
+    def upsert_document(self, row: Dict[str, Any]) -> None:
+        """Add or update a physical document (id, title, barcode, status, rack_id)"""
+        if not self.enabled or self._loaded_at is None:
+            return
+        document = self._make_document(row)
+        with self._lock:
+            previous = self._documents.get(document['id'])
+            if previous and previous['barcode'] and previous['barcode'] != document['barcode']:
+                self._barcodes.pop(previous['barcode'], None)
+            self._documents[document['id']] = document
+            if document['barcode']:
+                self._barcodes[document['barcode']] = ('document', document['id'])
+
+    def move_document(self, document_id: Any, rack_id: Any) -> None:
+        """Record a document's new rack"""
+        if not self.enabled or self._loaded_at is None:
+            return
+        with self._lock:
+            document = self._documents.get(str(document_id))
+            if document is not None:
+                document['rack_id'] = str(rack_id) if rack_id else None
+
+    def remove_document(self, document_id: Any) -> None:
+        """Drop a deleted physical document"""
+        if not self.enabled or self._loaded_at is None:
+            return
+        with self._lock:
+            document = self._documents.pop(str(document_id), None)
+            if document and document['barcode']:
+                self._barcodes.pop(document['barcode'], None)
+
+    # ==========================================
+    # Change listener
+    # ==========================================
+
+    def start(self):
+        """Start following changes on the running event loop (loads the index once listening)"""
+        if not self.enabled:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info(f"Barcode index listening on '{NOTIFY_CHANNEL}'")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._close()
+
+    def _connect(self):
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{NOTIFY_CHANNEL}"')
+        self._conn = conn
+
+    def _close(self):
+        self._synced = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _run(self):
+        while True:
+            try:
+                self._inbox = asyncio.Queue()
+                await run_in_threadpool(self._connect)
+                # Changes committed from here on are queued; the load covers the rest
+                await run_in_threadpool(self.warm)
+                self._synced = self._loaded_at is not None
+                await self._follow()
+            except asyncio.CancelledError:
+                self._close()
+                raise
+            except Exception as e:
+                logger.error(f"Barcode index listener error: {e}")
+            # Notifications may be missed until reconnected; serve from the database
+            self._close()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _follow(self):
+        loop = asyncio.get_running_loop()
+        fileno = self._conn.fileno()
+        loop.add_reader(fileno, self._on_notify)
+        try:
+            while True:
+                until_reload = self.refresh_seconds - (time.monotonic() - (self._loaded_at or 0))
+                try:
+                    payload = await asyncio.wait_for(
+                        self._inbox.get(), max(min(until_reload, HEALTH_CHECK_SECONDS), 0)
+                    )
+                except asyncio.TimeoutError:
+                    payload = None
+
+                if self._conn.closed:
+                    raise ConnectionError("Listener connection closed")
+
+                if payload is not None:
+                    changes = {payload}
+                    while not self._inbox.empty() and len(changes) <= MAX_CHANGES_PER_APPLY:
+                        changes.add(self._inbox.get_nowait())
+                    if len(changes) > MAX_CHANGES_PER_APPLY:
+                        while not self._inbox.empty():
+                            self._inbox.get_nowait()
+                        await run_in_threadpool(self.warm)
+                    else:
+                        await run_in_threadpool(self.apply_changes, changes)
+                elif time.monotonic() - (self._loaded_at or 0) >= self.refresh_seconds:
+                    await run_in_threadpool(self.warm)
+                else:
+                    with self._conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+        finally:
+            loop.remove_reader(fileno)
+
+    def _on_notify(self):
+        """Queue NOTIFY payloads from the listener connection (event loop reader callback)"""
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.warning(f"Barcode index listener connection lost: {e}")
+            self._conn.close()
+            # Wake the follower so it notices
+            self._inbox.put_nowait(None)
+            return
+
+        while self._conn.notifies:
+            self._inbox.put_nowait(self._conn.notifies.pop(0).payload)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size and age"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "loaded": self._loaded_at is not None,
+                "synced": self._synced,
+                "pending_changes": self._inbox.qsize() if self._inbox is not None else 0,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+                "barcodes": len(self._barcodes),
+                "nodes": len(self._nodes),
+                "documents": len(self._documents),
+                "cached_paths": len(self._paths),
+            }
+
+
+# Singleton instance
+barcode_index = BarcodeIndex()
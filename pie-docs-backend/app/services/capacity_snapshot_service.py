@@ -0,0 +1,336 @@
+"""
+Capacity Snapshot Service - Cached per-location utilization, refreshed incrementally
+
+Occupancy counters (racks.current_documents, shelves.current_racks,
+zones.current_capacity) are exact because database triggers maintain them
+(migration 27). Every counter change also bumps the parent row's updated_at,
+so a snapshot is refreshed by re-reading only the zones, shelves and racks
+changed since the last refresh instead of recomputing everything per request.
+
+Deletes and re-parenting are detected by comparing per-level row counts and
+trigger a full rebuild; a full rebuild also runs every
+CAPACITY_SNAPSHOT_FULL_REBUILD_SECONDS to bound any drift from long-running
+transactions committing behind the watermark.
+
+Dashboards can subscribe over the notifications websocket; the publisher
+loop refreshes subscribed locations every CAPACITY_SNAPSHOT_REFRESH_SECONDS
+and pushes a snapshot only when it changed.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from fastapi import WebSocket
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+from app.services.websocket_manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('zone', 'shelf', 'rack')
+
+# Changed rows are re-read with this overlap so transactions that committed
+# slightly behind the watermark are not missed (re-applying a row is a no-op)
+WATERMARK_OVERLAP = timedelta(seconds=30)
+
+# Rows changed since the watermark (or all rows when the watermark is -infinity)
+CHANGED_ROWS_QUERY = """
+    SELECT 'zone' AS level, z.id, z.name, z.status, z.warehouse_id AS parent_id,
+           z.current_capacity AS current, z.max_capacity AS max, z.updated_at
+    FROM zones z
+    JOIN warehouses w ON z.warehouse_id = w.id
+    WHERE w.location_id = %(location_id)s AND z.updated_at > %(since)s
+    UNION ALL
+    SELECT 'shelf', s.id, s.name, s.status, s.zone_id,
+           s.current_racks, s.max_racks, s.updated_at
+    FROM shelves s
+    JOIN zones z ON s.zone_id = z.id
+    JOIN warehouses w ON z.warehouse_id = w.id
+    WHERE w.location_id = %(location_id)s AND s.updated_at > %(since)s
+    UNION ALL
+    SELECT 'rack', r.id, r.name, r.status, r.shelf_id,
+           r.current_documents, r.max_documents, r.updated_at
+    FROM racks r
+    JOIN shelves s ON r.shelf_id = s.id
+    JOIN zones z ON s.zone_id = z.id
+    JOIN warehouses w ON z.warehouse_id = w.id
+    WHERE w.location_id = %(location_id)s AND r.updated_at > %(since)s
+"""
+
+ROW_COUNTS_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM zones z
+            JOIN warehouses w ON z.warehouse_id = w.id
+            WHERE w.location_id = %(location_id)s) AS zone,
+        (SELECT COUNT(*) FROM shelves s
+            JOIN zones z ON s.zone_id = z.id
+            JOIN warehouses w ON z.warehouse_id = w.id
+            WHERE w.location_id = %(location_id)s) AS shelf,
+        (SELECT COUNT(*) FROM racks r
+            JOIN shelves s ON r.shelf_id = s.id
+            JOIN zones z ON s.zone_id = z.id
+            JOIN warehouses w ON z.warehouse_id = w.id
+            WHERE w.location_id = %(location_id)s) AS rack
+"""
+
+
+def utilization_status(current: int, maximum: int) -> str:
+    """Same buckets as GET /capacity"""
+    if maximum <= 0 or current >= maximum:
+        return 'full'
+    ratio = current / maximum
+    if ratio >= 0.9:
+        return 'high'
+    if ratio >= 0.5:
+        return 'normal'
+    return 'low'
+
+
+class _LocationState:
+    """Entities and derived snapshot of one location"""
+
+    def __init__(self):
+        self.entities: Dict[str, Dict[str, Any]] = {}
+        self.built = False
+        self.watermark: Optional[datetime] = None
+        self.refreshed_at = 0.0
+        self.rebuilt_at = 0.0
+        self.version = 0
+        self.snapshot: Optional[Dict[str, Any]] = None
+
+
+class CapacitySnapshotService:
+    """Per-location utilization snapshots with incremental refresh and websocket push"""
+
+    def __init__(
+        self,
+        refresh_seconds: int = settings.CAPACITY_SNAPSHOT_REFRESH_SECONDS,
+        full_rebuild_seconds: int = settings.CAPACITY_SNAPSHOT_FULL_REBUILD_SECONDS
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self._lock = threading.Lock()
+        self._locations: Dict[str, _LocationState] = {}
+        # location id -> subscribed websockets
+        self._subscribers: Dict[str, Set[WebSocket]] = {}
+        self._publisher: Optional[asyncio.Task] = None
+
+    # ==========================================
+    # Snapshots
+    # ==========================================
+
+    def get(self, location_id: Any, max_age_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Snapshot for a location, refreshed if older than max_age_seconds (default refresh interval)"""
+        key = str(location_id)
+        max_age = self.refresh_seconds if max_age_seconds is None else max_age_seconds
+        with self._lock:
+            state = self._locations.get(key)
+            if state and state.snapshot and time.monotonic() - state.refreshed_at < max_age:
+                return state.snapshot
+        return self.refresh(key)
+
+    def refresh(self, location_id: Any) -> Dict[str, Any]:
+        """Apply rows changed since the last refresh (full rebuild when needed) and return the snapshot"""
+        key = str(location_id)
+        now = time.monotonic()
+        with self._lock:
+            state = self._locations.setdefault(key, _LocationState())
+            full = not state.built or now - state.rebuilt_at > self.full_rebuild_seconds
+            since = state.watermark - WATERMARK_OVERLAP if not full and state.watermark else '-infinity'
+
+        with get_db_cursor() as cursor:
+            cursor.execute(CHANGED_ROWS_QUERY, {'location_id': key, 'since': since})
+            rows = cursor.fetchall()
+            counts = None
+            if not full:
+                cursor.execute(ROW_COUNTS_QUERY, {'location_id': key})
+                counts = dict(cursor.fetchone())
+
+        with self._lock:
+            if full:
+                entities: Dict[str, Dict[str, Any]] = {}
+            else:
+                entities = dict(state.entities)
+
+            changed = full
+            watermark = None if full else state.watermark
+            for row in rows:
+                entity = {
+                    'level': row['level'],
+                    'id': str(row['id']),
+                    'name': row['name'],
+                    'status': row['status'],
+                    'parent_id': str(row['parent_id']) if row['parent_id'] else None,
+                    'current': row['current'],
+                    'max': row['max'],
+                }
+                if entities.get(entity['id']) != entity:
+                    entities[entity['id']] = entity
+                    changed = True
+                if watermark is None or row['updated_at'] > watermark:
+                    watermark = row['updated_at']
+
+            # A level with fewer/more rows than indexed means something was
+            # deleted or moved to another location: rebuild from scratch
+            stale = False
+            if counts is not None:
+                indexed = {level: 0 for level in LEVELS}
+                for entity in entities.values():
+                    indexed[entity['level']] += 1
+                stale = any(indexed[level] != counts[level] for level in LEVELS)
+                if stale:
+                    state.built = False
+
+            if not stale:
+                state.entities = entities
+                state.built = True
+                state.watermark = watermark
+                state.refreshed_at = now
+                if full:
+                    state.rebuilt_at = now
+                if changed or state.snapshot is None:
+                    state.version += 1
+                    state.snapshot = self._build_snapshot(key, state)
+                return state.snapshot
+
+        return self.refresh(key)
+
+    def invalidate(self, location_id: Optional[Any] = None) -> None:
+        """Force a full rebuild on the next refresh of one or all locations"""
+        with self._lock:
+            states = self._locations.values() if location_id is None else [self._locations.get(str(location_id))]
+            for state in states:
+                if state is not None:
+                    state.built = False
+
+    @staticmethod
+    def _build_snapshot(location_id: str, state: _LocationState) -> Dict[str, Any]:
+        totals = {
+            level: {
+                'count': 0, 'current': 0, 'max': 0,
+                'buckets': {'full': 0, 'high': 0, 'normal': 0, 'low': 0}
+            }
+            for level in LEVELS
+        }
+        zones = []
+        for entity in state.entities.values():
+            if entity['status'] != 'active':
+                continue
+            level_totals = totals[entity['level']]
+            level_totals['count'] += 1
+            level_totals['current'] += entity['current']
+            level_totals['max'] += entity['max']
+            status = utilization_status(entity['current'], entity['max'])
+            level_totals['buckets'][status] += 1
+            if entity['level'] == 'zone':
+                zones.append({
+                    'id': entity['id'],
+                    'name': entity['name'],
+                    'warehouse_id': entity['parent_id'],
+                    'current': entity['current'],
+                    'max': entity['max'],
+                    'utilization_percentage': round(entity['current'] / entity['max'] * 100, 2) if entity['max'] else 0.0,
+                    'status': status,
+                })
+
+        for level_totals in totals.values():
+            level_totals['utilization_percentage'] = (
+                round(level_totals['current'] / level_totals['max'] * 100, 2) if level_totals['max'] else 0.0
+            )
+
+        zones.sort(key=lambda zone: zone['utilization_percentage'], reverse=True)
+        return {
+            'location_id': location_id,
+            'version': state.version,
+            'generated_at': datetime.utcnow().isoformat(),
+            'totals': totals,
+            'zones': zones,
+        }
+
+    # ==========================================
+    # Websocket push
+    # ==========================================
+
+    async def subscribe(self, location_id: str, websocket: WebSocket) -> None:
+        """Subscribe a websocket to a location and send the current snapshot"""
+        with self._lock:
+            self._subscribers.setdefault(str(location_id), set()).add(websocket)
+        snapshot = await run_in_threadpool(self.get, location_id)
+        if not connection_manager.queue_text(websocket, self._message(snapshot)):
+            self.unsubscribe(websocket)
+
+    def unsubscribe(self, websocket: WebSocket, location_id: Optional[str] = None) -> None:
+        """Remove a websocket from one location, or from all locations"""
+        with self._lock:
+            keys = [str(location_id)] if location_id else list(self._subscribers)
+            for key in keys:
+                subscribers = self._subscribers.get(key)
+                if subscribers is None:
+                    continue
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    @staticmethod
+    def _message(snapshot: Dict[str, Any]) -> str:
+        return json.dumps({
+            "type": "capacity_snapshot",
+            "timestamp": snapshot['generated_at'],
+            "data": snapshot
+        })
+
+    async def _publish_once(self, sent_versions: Dict[str, int]) -> None:
+        with self._lock:
+            subscriptions = {key: set(sockets) for key, sockets in self._subscribers.items()}
+
+        for location_id, sockets in subscriptions.items():
+            try:
+                snapshot = await run_in_threadpool(self.refresh, location_id)
+            except Exception as e:
+                logger.warning(f"Capacity snapshot refresh failed for location {location_id}: {e}")
+                continue
+            if sent_versions.get(location_id) == snapshot['version']:
+                continue
+            sent_versions[location_id] = snapshot['version']
+
+            # Queued on each connection's writer, so a slow client only delays itself
+            message = self._message(snapshot)
+            for websocket in sockets:
+                if not connection_manager.queue_text(websocket, message):
+                    self.unsubscribe(websocket)
+
+        for location_id in [key for key in sent_versions if key not in subscriptions]:
+            del sent_versions[location_id]
+
+    async def _run_publisher(self) -> None:
+        sent_versions: Dict[str, int] = {}
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self._publish_once(sent_versions)
+            except Exception as e:
+                logger.error(f"Capacity snapshot publisher error: {e}")
+
+    def start_publisher(self) -> None:
+        """Start the background push loop (call from the running event loop)"""
+        if self._publisher is None or self._publisher.done():
+            self._publisher = asyncio.get_event_loop().create_task(self._run_publisher())
+
+    async def stop_publisher(self) -> None:
+        if self._publisher is not None:
+            self._publisher.cancel()
+            try:
+                await self._publisher
+            except asyncio.CancelledError:
+                pass
+            self._publisher = None
+
+
+# Singleton instance
+capacity_snapshot_service = CapacitySnapshotService()
@@ -0,0 +1,151 @@
+"""
+Checkout Analytics - Precomputed checkout dashboard and overdue sweeper
+
+The dashboard aggregates are kept current by triggers on
+document_checkout_records (migration 34): every checkout, check-in, extend
+and force check-in adjusts the rollup tables in the same transaction.
+The totals are striped over shard rows (migration 40) so concurrent
+checkouts do not queue on one row. get_snapshot() sums the shards and
+reads today's check-ins, the per-department counts, the most checked-out
+documents and the oldest overdue checkouts in a single query.
+
+is_overdue only changes when a row is rewritten, so the sweeper runs
+mark_overdue_checkouts() every CHECKOUT_OVERDUE_SWEEP_SECONDS; the flags it
+sets reach the rollups through the same triggers. One replica sweeps at a
+time (transaction-level advisory lock).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LOCK_NAME = 'checkout_overdue_sweeper'
+# Entries in the most-checked-out and overdue lists
+TOP_LIMIT = 10
+
+SNAPSHOT_QUERY = """
+    SELECT
+        t.active_count,
+        t.overdue_count,
+        t.completed_count,
+        t.completed_hours_sum,
+        COALESCE((
+            SELECT checkin_count FROM checkout_analytics_daily_checkins
+            WHERE checkin_day = CURRENT_DATE
+        ), 0) AS checked_in_today,
+        COALESCE((
+            SELECT json_object_agg(department, active_count)
+            FROM checkout_analytics_departments
+            WHERE active_count > 0
+        ), '{}'::json) AS by_department,
+        COALESCE((
+            SELECT json_agg(top ORDER BY top.checkout_count DESC)
+            FROM (
+                SELECT d.id, d.title, c.checkout_count
+                FROM checkout_analytics_documents c
+                JOIN documents d ON d.id = c.document_id
+                WHERE c.checkout_count > 0
+                ORDER BY c.checkout_count DESC
+                LIMIT %(limit)s
+            ) top
+        ), '[]'::json) AS most_checked_out,
+        COALESCE((
+            SELECT json_agg(overdue ORDER BY overdue.due_date)
+            FROM (
+                SELECT * FROM document_checkout_records
+                WHERE is_overdue = true
+                ORDER BY due_date
+                LIMIT %(limit)s
+            ) overdue
+        ), '[]'::json) AS overdue_checkouts
+    FROM (
+        SELECT
+            SUM(active_count)::bigint AS active_count,
+            SUM(overdue_count)::bigint AS overdue_count,
+            SUM(completed_count)::bigint AS completed_count,
+            SUM(completed_hours_sum) AS completed_hours_sum
+        FROM checkout_analytics_total_shards
+        HAVING COUNT(*) > 0
+    ) t
+"""
+
+
+class CheckoutAnalyticsService:
+    """Serves the checkout dashboard snapshot and sweeps overdue checkouts"""
+
+    def __init__(self, sweep_seconds: int = settings.CHECKOUT_OVERDUE_SWEEP_SECONDS):
+        self.sweep_seconds = sweep_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the overdue sweeper on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info("Checkout overdue sweeper started")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Checkout overdue sweeper stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.sweep_overdue)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Checkout overdue sweep error: {e}", exc_info=True)
+            await asyncio.sleep(self.sweep_seconds)
+
+    def sweep_overdue(self) -> int:
+        """Flag checkouts past their due date; returns the number newly flagged"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (SWEEP_LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                return 0
+            cursor.execute("SELECT mark_overdue_checkouts() AS flagged")
+            flagged = cursor.fetchone()['flagged']
+        if flagged:
+            logger.info(f"Flagged {flagged} checkouts as overdue")
+        return flagged
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Dashboard aggregates, in the shape of CheckoutAnalytics"""
+        with get_db_cursor() as cursor:
+            cursor.execute(SNAPSHOT_QUERY, {'limit': TOP_LIMIT})
+            row = cursor.fetchone()
+
+        if not row:
+            raise RuntimeError("checkout_analytics_total_shards is empty; run migration 40")
+
+        completed = row['completed_count']
+        return {
+            'total_active_checkouts': row['active_count'],
+            'total_overdue': row['overdue_count'],
+            'total_checked_in_today': row['checked_in_today'],
+            'avg_checkout_duration_hours': float(row['completed_hours_sum'] / completed) if completed else 0.0,
+            'checkouts_by_department': row['by_department'],
+            'most_checked_out_documents': row['most_checked_out'],
+            'overdue_checkouts': row['overdue_checkouts'],
+        }
+
+    def rebuild(self) -> None:
+        """Recompute the rollups from document_checkout_records"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT rebuild_checkout_analytics()")
+
+
+# Singleton instance
+checkout_analytics_service = CheckoutAnalyticsService()
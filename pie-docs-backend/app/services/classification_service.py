@@ -33,6 +33,10 @@ except ImportError as e:
 class ClassificationService:
     """Service for LLM-based document classification"""
 
+    MODEL = "gpt-5-nano"
+    # Bump when the classification prompt changes so cached results are not reused
+    PROMPT_VERSION = "classify-v1"
+
     def __init__(self):
         self.openai_available = OPENAI_AVAILABLE
         if self.openai_available:
@@ -104,7 +108,7 @@ class ClassificationService:
                 # GPT-5-Nano only supports default temperature (1)
                 # No temperature parameter = uses default
                 response = self.client.chat.completions.create(
-                    model="gpt-5-nano",
+                    model=self.MODEL,
                     messages=messages,
                     max_completion_tokens=2000,  # Increased to allow for reasoning + output
                     timeout=timeout
@@ -152,7 +156,8 @@ class ClassificationService:
         self,
         file_path: Path,
         available_types: List[Dict[str, str]],
-        ocr_text: Optional[str] = None
+        ocr_text: Optional[str] = None,
+        content_sha256: Optional[str] = None
     ) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """
         Classify a document using LLM with vision and/or OCR text
@@ -162,6 +167,7 @@ class ClassificationService:
             available_types: List of available document types from system
                             Format: [{"id": "uuid", "name": "Invoice", "description": "..."}, ...]
             ocr_text: Optional pre-extracted OCR text
+            content_sha256: Known SHA-256 of the file (shares page renders across consumers)
 
         Returns:
             Tuple of (success, classification_result, error_message)
@@ -219,7 +225,6 @@ Return only the JSON object."""
             can_use_vision = extension in ['.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp']
 
             messages = []
-            response = None
 
             if can_use_vision:
                 # Use vision API
@@ -231,72 +236,23 @@ Return only the JSON object."""
                     logger.info(f"📂 PDF file path: {file_path}")
                     logger.info(f"📏 PDF file size: {file_path.stat().st_size} bytes")
                     try:
-                        from pdf2image import convert_from_path
-                        from PIL import Image
-                        import io
-                        import os
-
-                        # Set poppler path for Windows Chocolatey installation
-                        poppler_path = None
-                        if os.name == 'nt':  # Windows
-                            logger.info("🔍 Searching for Poppler on Windows...")
-                            # Try to find poppler from various installations
-                            possible_paths = [
-                                r'C:\poppler\poppler-24.08.0\Library\bin',  # Direct download
-                                r'C:\poppler\Library\bin',
-                                r'C:\ProgramData\chocolatey\lib\poppler\tools\poppler-25.10.0\Library\bin',
-                                r'C:\Program Files\poppler\Library\bin'
-                            ]
-                            for path in possible_paths:
-                                logger.info(f"  Checking: {path}")
-                                if os.path.exists(path):
-                                    poppler_path = path
-                                    logger.info(f"✅ Found Poppler at: {poppler_path}")
-                                    break
-
-                            if not poppler_path:
-                                logger.warning("⚠️ Poppler not found in standard locations!")
-
-                        # Convert first page to image
-                        logger.info("🖼️ Starting PDF to image conversion...")
-                        images = convert_from_path(
-                            str(file_path),
-                            first_page=1,
-                            last_page=1,
-                            poppler_path=poppler_path
+                        from app.services.page_render_service import page_render_service, VISION_DPI
+
+                        # First page only, from the shared page-render cache
+                        # (compressed JPEG, longest side capped at 2048px)
+                        logger.info("🖼️ Rendering first page...")
+                        file_bytes = page_render_service.render_page(
+                            file_path,
+                            page_number=0,
+                            dpi=VISION_DPI,
+                            fmt='jpeg',
+                            content_sha256=content_sha256
                         )
-                        logger.info(f"📊 Conversion complete. Images generated: {len(images) if images else 0}")
-
-                        if images:
-                            # Convert PIL Image to bytes with compression
-                            logger.info("💾 Converting image to JPEG bytes (compressed)...")
-                            img = images[0]
-
-                            # Resize if too large (max 2048px on longest side)
-                            max_size = 2048
-                            if max(img.width, img.height) > max_size:
-                                ratio = max_size / max(img.width, img.height)
-                                new_size = (int(img.width * ratio), int(img.height * ratio))
-                                img = img.resize(new_size, Image.Resampling.LANCZOS)
-                                logger.info(f"📐 Resized image from {images[0].size} to {new_size}")
-
-                            img_byte_arr = io.BytesIO()
-                            # Use JPEG with 85% quality for better compression
-                            img.save(img_byte_arr, format='JPEG', quality=85, optimize=True)
-                            file_bytes = img_byte_arr.getvalue()
-                            mime_type = 'image/jpeg'
-                            logger.info(f"✅ PDF converted to JPEG successfully! Size: {len(file_bytes)} bytes")
-                        else:
-                            logger.warning("⚠️ PDF conversion returned no images, falling back to text-only")
-                            can_use_vision = False
-                    except ImportError as e:
-                        logger.error(f"❌ pdf2image not installed: {e}")
-                        logger.error("   Run: pip install pdf2image")
-                        can_use_vision = False
+                        mime_type = 'image/jpeg'
+                        logger.info(f"✅ PDF page rendered to JPEG successfully! Size: {len(file_bytes)} bytes")
                     except Exception as e:
                         logger.error(f"❌ Error converting PDF to image: {e}")
                         logger.error(f"   Error type: {type(e).__name__}")
-                        logger.error(f"   Poppler path used: {poppler_path if 'poppler_path' in locals() else 'None'}")
                         can_use_vision = False
 
                 if can_use_vision and extension != '.pdf':
@@ -464,6 +420,43 @@ Return only the JSON object."""
 
             return False, None, str(e)
 
+    def classify_document_cached(
+        self,
+        file_path: Path,
+        available_types: List[Dict[str, str]],
+        ocr_text: Optional[str] = None,
+        content_sha256: Optional[str] = None
+    ) -> Tuple[bool, Optional[Dict], Optional[str], bool]:
+        """
+        Classify a document, reusing any result cached for identical file bytes
+
+        The set of available document types and any OCR text are part of the prompt,
+        so they are folded into the cache key alongside the prompt version.
+
+        Returns:
+            Tuple of (success, classification_result, error_message, cached)
+        """
+        from app.services.ai_result_cache import ai_result_cache
+
+        content_sha256 = ai_result_cache.hash_file(file_path, content_sha256)
+        prompt_version = "{}:{}".format(
+            self.PROMPT_VERSION,
+            ai_result_cache.fingerprint({
+                "types": [[str(dt['id']), dt['display_name'], dt.get('description')] for dt in available_types],
+                "ocr_text": ocr_text
+            })
+        )
+
+        cached = ai_result_cache.get(content_sha256, "classification", self.MODEL, prompt_version)
+        if cached:
+            return True, cached, None, True
+
+        success, result, error = self.classify_document(file_path, available_types, ocr_text, content_sha256)
+        # Low-confidence fallbacks are not worth pinning in the cache
+        if success and result and result.get('confidence', 0) > 0.5:
+            ai_result_cache.put(content_sha256, "classification", self.MODEL, prompt_version, result)
+        return success, result, error, False
+
     def _get_mime_type(self, file_path: Path) -> str:
         """Get MIME type for file"""
         extension = file_path.suffix.lower()
@@ -497,8 +490,8 @@ Return only the JSON object."""
         results = []
         for i, file_path in enumerate(file_paths):
             ocr_text = ocr_texts[i] if ocr_texts and i < len(ocr_texts) else None
-            result = self.classify_document(file_path, available_types, ocr_text)
-            results.append(result)
+            success, result, error, _ = self.classify_document_cached(file_path, available_types, ocr_text)
+            results.append((success, result, error))
         return results
 
     def generate_mock_classification(
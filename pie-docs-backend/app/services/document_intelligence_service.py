@@ -47,6 +47,8 @@ class DocumentIntelligenceService:
 
     # GPT-5 model configuration
     MODEL = "gpt-5"  # Using GPT-5
+    # Bump when summary/analysis prompts change so cached results are not reused
+    PROMPT_VERSION = "intel-v1"
     MAX_INPUT_TOKENS = 272000  # GPT-5 supports 272K input tokens
     MAX_OUTPUT_TOKENS = 128000  # GPT-5 supports 128K output tokens
 
@@ -0,0 +1,156 @@
+"""
+Folder Index - Hierarchy and subtree statistics reads
+
+folder_closure (every ancestor/descendant pair) and folder_stats (direct
+and subtree document counts and sizes) are maintained by triggers on
+folders and documents (migrations 36, 41 and 43). Trees are read with one
+indexed closure lookup instead of a recursive CTE, and listings take their
+totals from folder_stats_current instead of counting per page.
+
+Writers add their changes to folder_stats_delta shard rows rather than
+updating the ancestors' folder_stats rows, so uploads under a common
+ancestor do not queue on it; folder_stats_current adds the pending deltas.
+The service runs fold_folder_stats_delta() every FOLDER_STATS_FOLD_SECONDS to
+move them into folder_stats. One replica folds at a time (transaction-level
+advisory lock).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+FOLD_LOCK_NAME = 'folder_stats_fold'
+
+# Columns returned by folder document listings; content, ocr_text and the
+# embedding are left to the document detail endpoint
+DOCUMENT_LIST_COLUMNS = """
+    d.id, d.title, d.file_name, d.document_type, d.mime_type, d.file_size,
+    d.author, d.owner_id, d.status, d.version, d.tags, d.folder_id,
+    d.thumbnail_url, d.created_at, d.modified_at
+"""
+
+# Folder columns returned with STATS_COLUMNS; the stale document_count and
+# total_size columns of folders are left out in favour of the stats
+FOLDER_COLUMNS = """
+    f.id, f.name, f.description, f.path, f.parent_id, f.folder_type,
+    f.smart_criteria, f.auto_refresh, f.last_refreshed_at, f.color, f.icon,
+    f.permissions, f.owner_id, f.created_by, f.created_at, f.updated_at, f.deleted_at
+"""
+
+STATS_COLUMNS = """
+    COALESCE(s.document_count, 0) AS document_count,
+    COALESCE(s.total_size, 0) AS total_size,
+    COALESCE(s.subtree_document_count, 0) AS subtree_document_count,
+    COALESCE(s.subtree_total_size, 0) AS subtree_total_size,
+    COALESCE(s.subtree_folder_count, 0) AS subtree_folder_count
+"""
+
+
+class FolderIndexService:
+    """Reads folder subtrees and listings through the closure table and cached stats"""
+
+    def __init__(self, fold_seconds: int = settings.FOLDER_STATS_FOLD_SECONDS):
+        self.fold_seconds = fold_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the statistics fold loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info("Folder statistics fold started")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Folder statistics fold stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.fold_deltas)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Folder statistics fold error: {e}", exc_info=True)
+            await asyncio.sleep(self.fold_seconds)
+
+    def fold_deltas(self) -> int:
+        """Move pending statistics deltas into folder_stats; returns the folders updated"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (FOLD_LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                return 0
+            cursor.execute("SELECT fold_folder_stats_delta() AS folded")
+            return cursor.fetchone()['folded']
+
+    def get_tree(self, folder_id: UUID) -> List[Dict[str, Any]]:
+        """
+        The folder and its descendants (level = depth below the folder) with
+        subtree aggregates; folders under a deleted folder are left out
+        """
+        with get_db_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT f.id, f.name, f.parent_id, f.path, c.depth AS level, {STATS_COLUMNS}
+                FROM folder_closure c
+                JOIN folders f ON f.id = c.descendant_id
+                LEFT JOIN folder_stats_current s ON s.folder_id = f.id
+                WHERE c.ancestor_id = %s
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM folder_closure up
+                    JOIN folders deleted ON deleted.id = up.ancestor_id
+                    WHERE up.descendant_id = f.id
+                    AND up.depth <= c.depth
+                    AND deleted.deleted_at IS NOT NULL
+                )
+                ORDER BY c.depth, f.name
+            """, (str(folder_id),))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def list_documents(self, folder_id: UUID, page: int, page_size: int) -> Dict[str, Any]:
+        """One page of the documents directly in a folder, newest modified first"""
+        offset = (page - 1) * page_size
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT document_count FROM folder_stats_current WHERE folder_id = %s",
+                (str(folder_id),)
+            )
+            stats = cursor.fetchone()
+
+            cursor.execute(f"""
+                SELECT {DOCUMENT_LIST_COLUMNS}
+                FROM documents d
+                WHERE d.folder_id = %s AND d.deleted_at IS NULL
+                ORDER BY d.modified_at DESC
+                LIMIT %s OFFSET %s
+            """, (str(folder_id), page_size, offset))
+            documents = cursor.fetchall()
+
+        return {
+            "documents": [dict(d) for d in documents],
+            "total": stats['document_count'] if stats else 0,
+            "page": page,
+            "page_size": page_size
+        }
+
+    def rebuild(self) -> None:
+        """Recompute the closure table and all folder statistics"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT rebuild_folder_closure()")
+            cursor.execute("SELECT rebuild_folder_stats()")
+
+
+# Singleton instance
+folder_index_service = FolderIndexService()
@@ -0,0 +1,632 @@
+"""
+Label Render Service - Print-ready warehouse labels (PDF / ZPL) in bulk
+
+Label data for any number of zones, shelves, racks or physical documents is
+fetched with one set query per entity type (``id = ANY(...)``) and laid out
+according to a print_templates row (dimensions + elements) or the built-in
+warehouse layout.
+
+Output is produced as a stream of byte chunks, so a 10k-label job starts
+downloading immediately and never holds the whole document in memory:
+
+- PDF: written incrementally by a minimal PDF 1.4 writer. Barcodes (Code 128)
+  and QR codes are vector drawings stored as Form XObjects; each distinct code
+  is drawn once per process (LRU cache) and embedded once per document, and
+  copies of a label share one content stream.
+- ZPL: one ^XA...^XZ block per label using the printer's native ^BC/^BQ
+  barcode commands, with ^PQ for copies.
+
+Performance targets for a 10k-label batch, single worker, rendering only
+(the set queries add well under a second):
+- ZPL: >= 50,000 labels/sec
+- PDF: >= 2,000 labels/sec without QR codes, >= 1,000 labels/sec with QR
+  codes (QR encoding dominates and is skipped for repeated codes)
+
+QR codes in PDF output need the optional ``qrcode`` package; without it the
+QR element is left out of PDF labels (ZPL printers encode QR themselves).
+"""
+import logging
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+try:
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_M
+    QR_SUPPORT = True
+except ImportError:
+    logger.warning("qrcode not installed. QR codes are omitted from PDF labels.")
+    QR_SUPPORT = False
+
+OUTPUT_FORMATS = {
+    'pdf': 'application/pdf',
+    'zpl': 'application/x-zpl',
+}
+
+# Distinct barcode/QR drawings kept in memory
+SYMBOL_CACHE_SIZE = 8192
+# Bytes buffered before a chunk is yielded to the response
+STREAM_CHUNK_SIZE = 64 * 1024
+# Printer resolution for ZPL output (8 dots/mm = 203 dpi)
+DEFAULT_DPMM = 8
+
+POINTS_PER_MM = 72 / 25.4
+MM_PER_UNIT = {'mm': 1.0, 'cm': 10.0, 'in': 25.4}
+
+# Default warehouse label size (mm) when no template is given
+DEFAULT_LABEL_SIZE = (100.0, 50.0)
+
+# ==========================================
+# Label data (one query per entity type)
+# ==========================================
+
+LABEL_QUERIES = {
+    'zone': """
+        SELECT
+            z.id, z.name, z.code, z.barcode, z.zone_type,
+            z.max_capacity, z.current_capacity,
+            l.name || ' > ' || w.name || ' > ' || z.name as location_path,
+            w.name as warehouse_name,
+            l.name as location_name
+        FROM zones z
+        JOIN warehouses w ON z.warehouse_id = w.id
+        JOIN locations l ON w.location_id = l.id
+        WHERE z.id = ANY(%s::uuid[])
+    """,
+    'shelf': """
+        SELECT
+            s.id, s.name, s.barcode, s.position,
+            s.max_capacity, s.current_capacity,
+            l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name as location_path,
+            z.name as zone_name,
+            w.name as warehouse_name
+        FROM shelves s
+        JOIN zones z ON s.zone_id = z.id
+        JOIN warehouses w ON z.warehouse_id = w.id
+        JOIN locations l ON w.location_id = l.id
+        WHERE s.id = ANY(%s::uuid[])
+    """,
+    'rack': """
+        SELECT
+            r.id, r.name, r.barcode, r.position_on_shelf,
+            r.max_capacity, r.current_capacity,
+            l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name as location_path,
+            s.name as shelf_name,
+            z.name as zone_name
+        FROM racks r
+        JOIN shelves s ON r.shelf_id = s.id
+        JOIN zones z ON s.zone_id = z.id
+        JOIN warehouses w ON z.warehouse_id = w.id
+        JOIN locations l ON w.location_id = l.id
+        WHERE r.id = ANY(%s::uuid[])
+    """,
+    'document': """
+        SELECT
+            d.id, d.title, d.barcode, d.document_type, d.status,
+            COALESCE(
+                l.name || ' > ' || w.name || ' > ' || z.name || ' > ' || s.name || ' > ' || r.name,
+                'Not Assigned'
+            ) as location_path,
+            r.name as rack_name,
+            d.created_at
+        FROM physical_documents d
+        LEFT JOIN racks r ON d.rack_id = r.id
+        LEFT JOIN shelves s ON r.shelf_id = s.id
+        LEFT JOIN zones z ON s.zone_id = z.id
+        LEFT JOIN warehouses w ON z.warehouse_id = w.id
+        LEFT JOIN locations l ON w.location_id = l.id
+        WHERE d.id = ANY(%s::uuid[])
+    """,
+}
+
+
+def _capacity_info(row: Dict[str, Any]) -> Dict[str, Any]:
+    utilization = (row['current_capacity'] / row['max_capacity'] * 100) if row['max_capacity'] > 0 else 0
+    return {
+        'current': row['current_capacity'],
+        'max': row['max_capacity'],
+        'utilization': round(utilization, 1)
+    }
+
+
+def _label_from_row(entity_type: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a query row like the LabelData model"""
+    label = {
+        'entity_id': row['id'],
+        'entity_type': entity_type,
+        'entity_name': row['title'] if entity_type == 'document' else row['name'],
+        'barcode': row['barcode'] or '',
+        'location_path': row['location_path'] or '',
+        'capacity_info': None,
+        'qr_code_data': row['barcode'],
+    }
+    if entity_type == 'zone':
+        label['capacity_info'] = _capacity_info(row)
+        label['additional_info'] = {
+            'code': row['code'],
+            'type': row['zone_type'],
+            'warehouse': row['warehouse_name'],
+            'location': row['location_name']
+        }
+    elif entity_type == 'shelf':
+        label['capacity_info'] = _capacity_info(row)
+        label['additional_info'] = {
+            'position': row['position'],
+            'zone': row['zone_name'],
+            'warehouse': row['warehouse_name']
+        }
+    elif entity_type == 'rack':
+        label['capacity_info'] = _capacity_info(row)
+        label['additional_info'] = {
+            'position': row['position_on_shelf'],
+            'shelf': row['shelf_name'],
+            'zone': row['zone_name']
+        }
+    else:
+        label['additional_info'] = {
+            'type': row['document_type'],
+            'status': row['status'],
+            'rack': row['rack_name'] if row['rack_name'] else 'Unassigned',
+            'created': row['created_at'].strftime('%Y-%m-%d') if row['created_at'] else None
+        }
+    return label
+
+
+# ==========================================
+# Symbols (cached vector drawings in a unit box)
+# ==========================================
+
+# Code 128 bar/space module widths for symbol values 0-106 (106 = stop)
+CODE128_PATTERNS = (
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232", "2331112",
+)
+CODE128_START_B = 104
+CODE128_START_C = 105
+CODE128_CODE_B = 100
+CODE128_STOP = 106
+# Quiet zone on each side, in modules
+CODE128_QUIET_ZONE = 10
+
+
+def code128_values(data: str) -> List[int]:
+    """
+    Code 128 symbol values (start, data, check, stop) for printable ASCII
+
+    All-digit data of even length uses code set C (two digits per symbol);
+    anything else uses code set B, with a leading even digit run in set C
+    when that makes the symbol shorter.
+
+    Raises:
+        ValueError: If the data contains characters outside ASCII 32-126
+    """
+    if any(not 32 <= ord(ch) <= 126 for ch in data):
+        raise ValueError("Code 128 labels support printable ASCII only")
+
+    digit_run = len(data) - len(data.lstrip('0123456789'))
+    if data and digit_run == len(data) and digit_run % 2 == 0:
+        values = [CODE128_START_C] + [int(data[i:i + 2]) for i in range(0, len(data), 2)]
+    elif digit_run >= 4:
+        even_run = digit_run - digit_run % 2
+        values = [CODE128_START_C] + [int(data[i:i + 2]) for i in range(0, even_run, 2)]
+        values += [CODE128_CODE_B] + [ord(ch) - 32 for ch in data[even_run:]]
+    else:
+        values = [CODE128_START_B] + [ord(ch) - 32 for ch in data]
+
+    checksum = values[0] + sum(position * value for position, value in enumerate(values[1:], start=1))
+    return values + [checksum % 103, CODE128_STOP]
+
+
+def _fill_ops(rects: Iterable[Tuple[float, float, float, float]]) -> bytes:
+    ops = ''.join(f"{x:.5f} {y:.5f} {w:.5f} {h:.5f} re\n" for x, y, w, h in rects)
+    return (ops + "f\n").encode('ascii')
+
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def code128_drawing(data: str) -> bytes:
+    """Compressed PDF drawing of a Code 128 barcode in a 1x1 box (bars span the full height)"""
+    widths = [int(w) for value in code128_values(data) for w in CODE128_PATTERNS[value]]
+    total = sum(widths) + 2 * CODE128_QUIET_ZONE
+    rects = []
+    x = CODE128_QUIET_ZONE
+    for index, width in enumerate(widths):
+        if index % 2 == 0:
+            rects.append((x / total, 0.0, width / total, 1.0))
+        x += width
+    return zlib.compress(_fill_ops(rects))
+
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def qr_drawing(data: str) -> bytes:
+    """Compressed PDF drawing of a QR code in a 1x1 box (horizontal module runs merged)"""
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_M, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    size = len(matrix)
+
+    rects = []
+    for row_index, row in enumerate(matrix):
+        y = (size - row_index - 1) / size
+        col = 0
+        while col < size:
+            if row[col]:
+                start = col
+                while col < size and row[col]:
+                    col += 1
+                rects.append((start / size, y, (col - start) / size, 1 / size))
+            else:
+                col += 1
+    return zlib.compress(_fill_ops(rects))
+
+
+# ==========================================
+# Templates
+# ==========================================
+
+def default_template(include_qr_code: bool = False, label_size: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """Built-in warehouse layout, in print_templates shape (positions in mm from the top-left)"""
+    width, height = label_size or DEFAULT_LABEL_SIZE
+    margin = 4.0
+    qr_size = min(height - 2 * margin - 8, 24.0) if include_qr_code else 0.0
+    barcode_width = width - 2 * margin - (qr_size + margin if qr_size else 0)
+    barcode_height = height * 0.36
+
+    elements = [
+        {'type': 'text', 'position': {'x': margin, 'y': margin}, 'size': {'width': width - 2 * margin, 'height': 5},
+         'properties': {'field': 'entity_name', 'fontSize': 12, 'bold': True}},
+        {'type': 'barcode', 'position': {'x': margin, 'y': margin + 7},
+         'size': {'width': barcode_width, 'height': barcode_height}},
+        {'type': 'text', 'position': {'x': margin, 'y': margin + 8 + barcode_height},
+         'size': {'width': barcode_width, 'height': 3}, 'properties': {'field': 'barcode', 'fontSize': 8}},
+        {'type': 'text', 'position': {'x': margin, 'y': height - margin - 7},
+         'size': {'width': width - 2 * margin, 'height': 3}, 'properties': {'field': 'location_path', 'fontSize': 7}},
+        {'type': 'text', 'position': {'x': margin, 'y': height - margin - 3},
+         'size': {'width': width - 2 * margin, 'height': 3}, 'properties': {'field': 'capacity', 'fontSize': 7}},
+    ]
+    if qr_size:
+        elements.append({'type': 'qrcode', 'position': {'x': width - margin - qr_size, 'y': margin + 7},
+                         'size': {'width': qr_size, 'height': qr_size}})
+    return {'width': width, 'height': height, 'elements': elements}
+
+
+def template_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a print_templates row (dimensions/elements JSONB) to millimetres"""
+    dimensions = row['dimensions'] or {}
+    scale = MM_PER_UNIT.get(dimensions.get('unit', 'mm'), 1.0)
+
+    def scaled(point: Dict[str, Any], x_key: str, y_key: str) -> Dict[str, float]:
+        return {x_key: float(point.get(x_key, 0)) * scale, y_key: float(point.get(y_key, 0)) * scale}
+
+    elements = []
+    for element in row['elements'] or []:
+        elements.append({
+            **element,
+            'position': scaled(element.get('position') or {}, 'x', 'y'),
+            'size': scaled(element.get('size') or {}, 'width', 'height'),
+        })
+    return {
+        'width': float(dimensions.get('width', DEFAULT_LABEL_SIZE[0])) * scale,
+        'height': float(dimensions.get('height', DEFAULT_LABEL_SIZE[1])) * scale,
+        'elements': elements,
+    }
+
+
+def element_text(element: Dict[str, Any], label: Dict[str, Any]) -> str:
+    """
+    Text shown by a text element
+
+    properties.field names a label field (entity_name, barcode, location_path,
+    entity_type, capacity) or an additional_info key; properties.text is
+    static text. Text elements without either show the barcode, matching the
+    seeded barcode templates.
+    """
+    properties = element.get('properties') or {}
+    if properties.get('text'):
+        return str(properties['text'])
+
+    field = properties.get('field') or element.get('id')
+    if field == 'capacity':
+        capacity = label.get('capacity_info')
+        if not capacity:
+            return ''
+        return f"Capacity: {capacity['current']}/{capacity['max']} ({capacity['utilization']}%)"
+    if field in label and field not in ('capacity_info', 'additional_info'):
+        value = label[field]
+    elif field in (label.get('additional_info') or {}):
+        value = label['additional_info'][field]
+    else:
+        value = label.get('barcode')
+    return '' if value is None else str(value)
+
+
+# ==========================================
+# PDF
+# ==========================================
+
+def _pdf_text(text: str) -> str:
+    """Escape text for a PDF literal string (WinAnsi / Latin-1)"""
+    text = text.encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _fit_text(text: str, width_pt: float, font_size: float) -> str:
+    """Truncate text to roughly fit a width (average Helvetica glyph ~0.5em)"""
+    max_chars = max(1, int(width_pt / (font_size * 0.5)))
+    return text if len(text) <= max_chars else text[:max_chars - 1] + '~'
+
+
+class _PdfStreamWriter:
+    """Writes a PDF object by object, yielding chunks as they fill up"""
+
+    CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self._offsets: Dict[int, int] = {}
+        self._next_object = 5
+        self.page_objects: List[int] = []
+
+    def allocate(self) -> int:
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        self._position += len(data)
+
+    def write_object(self, number: int, body: bytes) -> None:
+        self._offsets[number] = self._position
+        self.write(f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n")
+
+    def write_stream(self, number: int, dictionary: str, data: bytes) -> None:
+        header = f"<< {dictionary} /Length {len(data)} /Filter /FlateDecode >>\nstream\n".encode('ascii')
+        self.write_object(number, header + data + b"\nendstream")
+
+    def drain(self, force: bool = False) -> Optional[bytes]:
+        if self._buffer and (force or len(self._buffer) >= STREAM_CHUNK_SIZE):
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            return chunk
+        return None
+
+    def start(self) -> None:
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.write_object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode('ascii'))
+        self.write_object(self.FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self.write_object(self.FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    def finish(self) -> None:
+        kids = ' '.join(f"{number} 0 R" for number in self.page_objects)
+        self.write_object(
+            self.PAGES,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objects)} >>".encode('ascii')
+        )
+        xref_offset = self._position
+        count = self._next_object
+        lines = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{self._offsets[number]:010d} 00000 n \n" for number in range(1, count))
+        lines.append(f"trailer\n<< /Size {count} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self.write(''.join(lines).encode('ascii'))
+
+
+# ==========================================
+# Service
+# ==========================================
+
+class LabelRenderService:
+    """Fetches label data in bulk and renders it to PDF or ZPL streams"""
+
+    def fetch_label_data(self, cursor, entity_type: str, entity_ids: List[UUID]) -> Tuple[List[Dict[str, Any]], List[UUID]]:
+        """
+        Load label data for many entities of one type with a single query
+
+        Returns:
+            (labels in request order, ids that were not found)
+
+        Raises:
+            ValueError: If the entity type is unknown
+        """
+        if entity_type not in LABEL_QUERIES:
+            raise ValueError(f"Invalid entity type: {entity_type}")
+        if not entity_ids:
+            return [], []
+
+        cursor.execute(LABEL_QUERIES[entity_type], ([str(entity_id) for entity_id in entity_ids],))
+        by_id = {str(row['id']): _label_from_row(entity_type, row) for row in cursor.fetchall()}
+
+        labels, missing = [], []
+        for entity_id in entity_ids:
+            label = by_id.get(str(entity_id))
+            if label is None:
+                missing.append(entity_id)
+            else:
+                labels.append(label)
+        return labels, missing
+
+    def load_template(self, cursor, template_id: UUID) -> Optional[Dict[str, Any]]:
+        """Load a print_templates row as a render template (None if not found)"""
+        cursor.execute(
+            "SELECT dimensions, elements FROM print_templates WHERE id = %s",
+            (str(template_id),)
+        )
+        row = cursor.fetchone()
+        return template_from_row(row) if row else None
+
+    def render(self, output_format: str, labels: List[Dict[str, Any]], template: Dict[str, Any],
+               copies: int = 1, dpmm: int = DEFAULT_DPMM) -> Iterator[bytes]:
+        """Render labels in the requested format (see OUTPUT_FORMATS)"""
+        if output_format == 'zpl':
+            return self.render_zpl(labels, template, copies, dpmm)
+        return self.render_pdf(labels, template, copies)
+
+    def render_pdf(self, labels: List[Dict[str, Any]], template: Dict[str, Any], copies: int = 1) -> Iterator[bytes]:
+        """Render one PDF page per label copy, yielding chunks of the file"""
+        writer = _PdfStreamWriter()
+        writer.start()
+        page_width = template['width'] * POINTS_PER_MM
+        page_height = template['height'] * POINTS_PER_MM
+        # (kind, data) -> XObject number, so each distinct code is embedded once
+        symbols: Dict[Tuple[str, str], int] = {}
+
+        for label in labels:
+            content, used = self._pdf_page_content(label, template, page_height, writer, symbols)
+            content_object = writer.allocate()
+            writer.write_stream(content_object, '', zlib.compress(content))
+
+            xobjects = ' '.join(f"/S{number} {number} 0 R" for number in used)
+            page_dict = (
+                f"<< /Type /Page /Parent {writer.PAGES} 0 R "
+                f"/MediaBox [0 0 {page_width:.2f} {page_height:.2f}] "
+                f"/Resources << /Font << /F1 {writer.FONT} 0 R /F2 {writer.FONT_BOLD} 0 R >> "
+                f"/XObject << {xobjects} >> >> /Contents {content_object} 0 R >>"
+            ).encode('ascii')
+            # Copies are separate page objects sharing the same content stream
+            for _ in range(copies):
+                page_object = writer.allocate()
+                writer.write_object(page_object, page_dict)
+                writer.page_objects.append(page_object)
+
+            chunk = writer.drain()
+            if chunk:
+                yield chunk
+
+        writer.finish()
+        yield writer.drain(force=True)
+
+    def _pdf_page_content(self, label: Dict[str, Any], template: Dict[str, Any], page_height: float,
+                          writer: _PdfStreamWriter, symbols: Dict[Tuple[str, str], int]) -> Tuple[bytes, List[int]]:
+        ops: List[str] = []
+        used: List[int] = []
+
+        for element in template['elements']:
+            kind = element.get('type')
+            position, size = element['position'], element['size']
+            x = position['x'] * POINTS_PER_MM
+            width = size['width'] * POINTS_PER_MM
+            height = size['height'] * POINTS_PER_MM
+            # Template y is measured down from the top edge
+            y = page_height - position['y'] * POINTS_PER_MM - height
+
+            if kind in ('barcode', 'qrcode'):
+                data = label.get('barcode') if kind == 'barcode' else (label.get('qr_code_data') or label.get('barcode'))
+                if not data or (kind == 'qrcode' and not QR_SUPPORT):
+                    continue
+                number = self._pdf_symbol(kind, data, writer, symbols)
+                if number is None:
+                    continue
+                if kind == 'qrcode':
+                    # Keep QR modules square inside the element box
+                    width = height = min(width, height)
+                used.append(number)
+                ops.append(f"q {width:.2f} 0 0 {height:.2f} {x:.2f} {y:.2f} cm /S{number} Do Q")
+
+            elif kind == 'text':
+                text = element_text(element, label)
+                if not text:
+                    continue
+                properties = element.get('properties') or {}
+                font_size = float(properties.get('fontSize', 8))
+                font = 'F2' if properties.get('bold') else 'F1'
+                text = _pdf_text(_fit_text(text, width, font_size))
+                baseline = page_height - position['y'] * POINTS_PER_MM - font_size * 0.8
+                ops.append(f"BT /{font} {font_size:g} Tf {x:.2f} {baseline:.2f} Td ({text}) Tj ET")
+
+        return '\n'.join(ops).encode('latin-1'), sorted(set(used))
+
+    @staticmethod
+    def _pdf_symbol(kind: str, data: str, writer: _PdfStreamWriter,
+                    symbols: Dict[Tuple[str, str], int]) -> Optional[int]:
+        """XObject number for a barcode/QR code, embedding it on first use"""
+        key = (kind, data)
+        if key in symbols:
+            return symbols[key]
+        try:
+            drawing = code128_drawing(data) if kind == 'barcode' else qr_drawing(data)
+        except ValueError as e:
+            logger.warning(f"Cannot encode {kind} '{data}': {e}")
+            return None
+        number = writer.allocate()
+        writer.write_stream(number, "/Type /XObject /Subtype /Form /BBox [0 0 1 1]", drawing)
+        symbols[key] = number
+        return number
+
+    def render_zpl(self, labels: List[Dict[str, Any]], template: Dict[str, Any],
+                   copies: int = 1, dpmm: int = DEFAULT_DPMM) -> Iterator[bytes]:
+        """Render one ZPL label format per label (printer repeats copies via ^PQ)"""
+        header = f"^XA^CI28^PW{round(template['width'] * dpmm)}^LL{round(template['height'] * dpmm)}"
+        buffer: List[str] = []
+        buffered = 0
+
+        for label in labels:
+            parts = [header]
+            for element in template['elements']:
+                parts.append(self._zpl_element(element, label, dpmm))
+            parts.append(f"^PQ{copies}^XZ\n")
+            block = ''.join(parts)
+            buffer.append(block)
+            buffered += len(block)
+            if buffered >= STREAM_CHUNK_SIZE:
+                yield ''.join(buffer).encode('utf-8')
+                buffer, buffered = [], 0
+
+        if buffer:
+            yield ''.join(buffer).encode('utf-8')
+
+    @staticmethod
+    def _zpl_element(element: Dict[str, Any], label: Dict[str, Any], dpmm: int) -> str:
+        kind = element.get('type')
+        position, size = element['position'], element['size']
+        origin = f"^FO{round(position['x'] * dpmm)},{round(position['y'] * dpmm)}"
+        height = max(1, round(size['height'] * dpmm))
+
+        if kind == 'barcode':
+            data = label.get('barcode')
+            return f"{origin}^BY2^BCN,{height},N,N,N^FH^FD{_zpl_field(data)}^FS" if data else ''
+        if kind == 'qrcode':
+            data = label.get('qr_code_data') or label.get('barcode')
+            # Magnification: module size in dots, sized for a ~29-module (version 3) symbol
+            magnification = max(1, min(10, min(height, round(size['width'] * dpmm)) // 29))
+            return f"{origin}^BQN,2,{magnification}^FH^FDMA,{_zpl_field(data)}^FS" if data else ''
+        if kind == 'text':
+            text = element_text(element, label)
+            if not text:
+                return ''
+            font_size = float((element.get('properties') or {}).get('fontSize', 8))
+            font_dots = max(10, round(font_size / POINTS_PER_MM * dpmm))
+            width = round(size['width'] * dpmm)
+            return f"{origin}^A0N,{font_dots},{font_dots}^FB{width},1,0,L,0^FH^FD{_zpl_field(text)}^FS"
+        return ''
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Symbol cache statistics"""
+        barcodes = code128_drawing.cache_info()
+        qr_codes = qr_drawing.cache_info()
+        return {
+            "qr_support": QR_SUPPORT,
+            "barcode_cache": {"size": barcodes.currsize, "hits": barcodes.hits, "misses": barcodes.misses},
+            "qr_cache": {"size": qr_codes.currsize, "hits": qr_codes.hits, "misses": qr_codes.misses},
+        }
+
+
+def _zpl_field(value: str) -> str:
+    """Escape field data for ^FH (underscore hex escapes for ^, ~ and _)"""
+    return value.replace('_', '_5F').replace('^', '_5E').replace('~', '_7E')
+
+
+# Singleton instance
+label_render_service = LabelRenderService()
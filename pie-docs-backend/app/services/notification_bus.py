@@ -0,0 +1,261 @@
+"""
+Notification Bus - Cross-process fan-out for websocket notifications
+
+Websocket connections live in the worker process that accepted them, so a
+notification raised in one uvicorn worker or replica has to reach the
+others. The bus publishes every outgoing notification with
+NOTIFY on WEBSOCKET_BUS_CHANNEL; each process LISTENs on a dedicated
+connection and hands what it receives to the connection manager, which
+delivers it to whichever recipients are connected locally. A process skips
+its own messages (it has already delivered them locally).
+
+Payloads over the NOTIFY limit are written to websocket_message_spill
+(migration 30) and only their id is notified. All notifications of one
+publish call are sent in one transaction, so they arrive in order.
+
+Delivery is best effort: messages published while a listener is
+reconnecting are not replayed to it (notifications are also stored and can
+be fetched through the notifications API). With WEBSOCKET_BUS_BACKEND=local
+nothing leaves the process, which suits a single-worker deployment.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+import psycopg2
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('postgres', 'local')
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+# Spilled payloads older than this are pruned by publishers
+SPILL_RETENTION_SECONDS = 300
+SPILL_PRUNE_INTERVAL_SECONDS = 60
+# Listener connection health check and reconnect delay
+HEALTH_CHECK_SECONDS = 30
+RECONNECT_SECONDS = 5
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class NotificationBus:
+    """Postgres LISTEN/NOTIFY pub/sub between API processes"""
+
+    def __init__(
+        self,
+        backend: str = settings.WEBSOCKET_BUS_BACKEND,
+        channel: str = settings.WEBSOCKET_BUS_CHANNEL
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown websocket bus backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.channel = channel
+        # Identifies this process's messages on the channel
+        self.origin = uuid4().hex
+        self._sequence = itertools.count()
+        self._handler: Optional[Handler] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._inbox: Optional[asyncio.Queue] = None
+        self._conn = None
+        self._lost: Optional[asyncio.Event] = None
+        self._pruned_at = 0.0
+        self._published = 0
+        self._spilled = 0
+        self._received = 0
+        self._publish_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != 'local'
+
+    def start(self, handler: Handler):
+        """Start listening on the running event loop; handler receives other processes' messages"""
+        self._handler = handler
+        if not self.enabled:
+            logger.info("Websocket notification bus is process-local")
+            return
+        if self._task is None or self._task.done():
+            self._inbox = asyncio.Queue()
+            self._dispatcher = asyncio.get_event_loop().create_task(self._dispatch())
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info(f"Websocket notification bus listening on '{self.channel}'")
+
+    async def shutdown(self):
+        for task in (self._task, self._dispatcher):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._dispatcher = None
+        self._close()
+
+    # ==========================================
+    # Publishing
+    # ==========================================
+
+    async def publish(self, envelopes: List[Dict[str, Any]]) -> None:
+        """Send envelopes to the other processes (in order, one transaction)"""
+        if not self.enabled or not envelopes:
+            return
+        payloads = [
+            # The sequence number keeps identical messages in one transaction
+            # from being folded into a single notification
+            json.dumps({**envelope, 'o': self.origin, 's': next(self._sequence)}, default=str)
+            for envelope in envelopes
+        ]
+        try:
+            await run_in_threadpool(self._notify, payloads)
+            self._published += len(payloads)
+        except Exception as e:
+            self._publish_errors += 1
+            logger.error(f"Failed to publish {len(payloads)} websocket notifications: {e}")
+
+    def _notify(self, payloads: List[str]) -> None:
+        with get_db_cursor(commit=True) as cursor:
+            for index, payload in enumerate(payloads):
+                if len(payload.encode('utf-8')) > MAX_NOTIFY_PAYLOAD_BYTES:
+                    cursor.execute(
+                        "INSERT INTO websocket_message_spill (payload) VALUES (%s) RETURNING id",
+                        (payload,)
+                    )
+                    payloads[index] = json.dumps({'o': self.origin, 'ref': cursor.fetchone()['id']})
+                    self._spilled += 1
+
+            cursor.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                (self.channel, payloads)
+            )
+
+            if self._spilled and time.monotonic() - self._pruned_at > SPILL_PRUNE_INTERVAL_SECONDS:
+                cursor.execute(
+                    "DELETE FROM websocket_message_spill WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => %s)",
+                    (SPILL_RETENTION_SECONDS,)
+                )
+                self._pruned_at = time.monotonic()
+
+    # ==========================================
+    # Listening
+    # ==========================================
+
+    def _connect(self):
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self._conn = conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self._connect)
+                await self._listen()
+            except asyncio.CancelledError:
+                self._close()
+                raise
+            except Exception as e:
+                logger.error(f"Websocket notification bus listener error: {e}")
+            self._close()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        self._lost = asyncio.Event()
+        fileno = self._conn.fileno()
+        loop.add_reader(fileno, self._on_notify)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._lost.wait(), HEALTH_CHECK_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                await loop.run_in_executor(None, self._check_connection)
+                self._drain_notifies()
+        finally:
+            loop.remove_reader(fileno)
+
+    def _check_connection(self):
+        if self._conn.closed:
+            raise ConnectionError("Listener connection closed")
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def _on_notify(self):
+        """Queue NOTIFY payloads from the listener connection (event loop reader callback)"""
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.warning(f"Websocket notification bus connection lost: {e}")
+            self._conn.close()
+            self._lost.set()
+            return
+        self._drain_notifies()
+
+    def _drain_notifies(self):
+        # Also called after the health check, whose query collects
+        # notifications without waking the reader callback
+        while self._conn.notifies:
+            self._inbox.put_nowait(self._conn.notifies.pop(0).payload)
+
+    async def _dispatch(self):
+        """Hand received envelopes to the handler in arrival order"""
+        while True:
+            payload = await self._inbox.get()
+            try:
+                envelope = json.loads(payload)
+                if envelope.get('o') == self.origin:
+                    continue
+                if 'ref' in envelope:
+                    envelope = await run_in_threadpool(self._load_spilled, envelope['ref'])
+                    if envelope is None:
+                        continue
+                self._received += 1
+                self._handler(envelope)
+            except Exception as e:
+                logger.warning(f"Dropped websocket bus message: {e}")
+
+    @staticmethod
+    def _load_spilled(spill_id: int) -> Optional[Dict[str, Any]]:
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT payload FROM websocket_message_spill WHERE id = %s", (spill_id,))
+            row = cursor.fetchone()
+        if not row:
+            logger.warning(f"Spilled websocket message {spill_id} already pruned")
+            return None
+        return json.loads(row['payload'])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.backend,
+            'channel': self.channel if self.enabled else None,
+            'listening': self._conn is not None and not self._conn.closed,
+            'published': self._published,
+            'spilled': self._spilled,
+            'received': self._received,
+            'publish_errors': self._publish_errors,
+            'inbox_depth': self._inbox.qsize() if self._inbox is not None else 0,
+        }
+
+
+# Singleton instance
+notification_bus = NotificationBus()
@@ -3,15 +3,28 @@ Notification service for approval system.
 Handles real-time notifications, email notifications, and in-app alerts.
 """
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
+from collections import defaultdict
 from datetime import datetime
-from psycopg2.extras import Json
 from app.services.websocket_manager import connection_manager
+from app.services.notification_store import digest_key, notification_store
 from app.database import get_db_cursor
 
 logger = logging.getLogger(__name__)
 
+# Stored notification titles per type (formatted with the notification data)
+NOTIFICATION_TITLES = {
+    "approval_required": "Approval required: {document_title}",
+    "approval_decision": "Document {decision}: {document_title}",
+    "approval_escalated": "Approval escalated: {document_title}",
+    "changes_requested": "Changes requested: {document_title}",
+    "deadline_approaching": "Approval deadline approaching: {document_title}",
+    "workflow_advanced": "Approval moved to step {current_step} of {total_steps}: {document_title}",
+    "bulk_action_completed": "Bulk {action} completed: {succeeded_count} of {total_count} succeeded",
+    "approval_assigned": "Approval assigned: {document_title}",
+}
+
 
 class NotificationService:
     """Service for managing approval notifications"""
@@ -55,18 +68,9 @@ class NotificationService:
         comments: Optional[str] = None
     ):
         """Notify users of an approval decision"""
-        notification = {
-            "type": "approval_decision",
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": {
-                "approval_request_id": approval_request_id,
-                "document_title": document_title,
-                "decision": decision,
-                "decided_by": decided_by,
-                "comments": comments,
-                "action_required": False
-            }
-        }
+        notification = NotificationService._decision_notification(
+            approval_request_id, document_title, decision, decided_by, comments
+        )
 
         await connection_manager.send_to_multiple_users(notification, user_ids)
         NotificationService._store_notifications(user_ids, notification)
@@ -109,17 +113,9 @@ class NotificationService:
         comments: str
     ):
         """Notify users that changes have been requested"""
-        notification = {
-            "type": "changes_requested",
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": {
-                "approval_request_id": approval_request_id,
-                "document_title": document_title,
-                "requested_by": requested_by,
-                "comments": comments,
-                "action_required": True
-            }
-        }
+        notification = NotificationService._changes_requested_notification(
+            approval_request_id, document_title, requested_by, comments
+        )
 
         await connection_manager.send_to_multiple_users(notification, user_ids)
         NotificationService._store_notifications(user_ids, notification)
@@ -163,18 +159,9 @@ class NotificationService:
         new_approvers: List[str]
     ):
         """Notify users that workflow has advanced to next step"""
-        notification = {
-            "type": "workflow_advanced",
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": {
-                "approval_request_id": approval_request_id,
-                "document_title": document_title,
-                "current_step": current_step,
-                "total_steps": total_steps,
-                "new_approvers": new_approvers,
-                "action_required": False
-            }
-        }
+        notification = NotificationService._workflow_advanced_notification(
+            approval_request_id, document_title, current_step, total_steps, new_approvers
+        )
 
         await connection_manager.send_to_multiple_users(notification, user_ids)
         NotificationService._store_notifications(user_ids, notification)
@@ -190,18 +177,9 @@ class NotificationService:
         total_count: int
     ):
         """Notify user of bulk action completion"""
-        notification = {
-            "type": "bulk_action_completed",
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": {
-                "action": action,
-                "succeeded_count": succeeded_count,
-                "failed_count": failed_count,
-                "total_count": total_count,
-                "success_rate": round((succeeded_count / total_count) * 100, 2) if total_count > 0 else 0,
-                "action_required": False
-            }
-        }
+        notification = NotificationService._bulk_completed_notification(
+            action, succeeded_count, failed_count, total_count
+        )
 
         await connection_manager.send_personal_message(notification, user_id)
         NotificationService._store_notifications([user_id], notification)
@@ -234,50 +212,192 @@ class NotificationService:
 
         logger.info(f"Sent approval_assigned notification to {len(user_ids)} users")
 
+    @staticmethod
+    async def notify_bulk_approval_results(
+        decided_by: str,
+        action: str,
+        comments: Optional[str],
+        requests: List[Dict[str, Any]],
+        progress: Dict[str, Dict[str, Any]],
+        failed_count: int,
+        total_count: int
+    ):
+        """
+        Notify requesters, next-step approvers and the acting user of a bulk
+        approval action as one grouped fan-out. Uses the same notification
+        types as the single-request endpoints.
+        requests: rows with id, requester_id, assigned_to, document_title
+        progress: workflow progression result per request id (approvals only)
+        """
+        deliveries = []
+        for request in requests:
+            request_id = str(request['id'])
+            document_title = request.get('document_title') or 'Unknown Document'
+            requester = [str(request['requester_id'])] if request.get('requester_id') else []
+
+            if action == 'request_changes':
+                notification = NotificationService._changes_requested_notification(
+                    request_id, document_title, decided_by, comments
+                )
+            else:
+                decision = 'approved' if action == 'approve' else 'rejected'
+                notification = NotificationService._decision_notification(
+                    request_id, document_title, decision, decided_by, comments
+                )
+            deliveries.append((requester, notification))
+
+            result = progress.get(request_id)
+            if result and result.get('advanced') and result.get('new_status') == 'pending':
+                assigned_to = [str(uid) for uid in request.get('assigned_to') or []]
+                deliveries.append((assigned_to, NotificationService._workflow_advanced_notification(
+                    request_id, document_title, result.get('current_step'), result.get('total_steps'), assigned_to
+                )))
+
+        succeeded_count = len(requests)
+        deliveries.append(([str(decided_by)], NotificationService._bulk_completed_notification(
+            action, succeeded_count, failed_count, total_count
+        )))
+
+        recipients = await NotificationService._fan_out(deliveries)
+        logger.info(
+            f"Sent bulk {action} notifications for {succeeded_count} requests to {recipients} users"
+        )
+
+    @staticmethod
+    async def _fan_out(deliveries: List[Tuple[List[str], Dict[str, Any]]]) -> int:
+        """
+        Deliver many notifications at once: all messages go out with one
+        websocket batch (in order per user) and are stored with one insert.
+        Returns the number of distinct recipients.
+        """
+        await connection_manager.send_batch(deliveries)
+
+        rows = [
+            (str(user_id), notification)
+            for user_ids, notification in deliveries
+            for user_id in user_ids
+        ]
+        NotificationService._store_notification_rows(rows)
+        return len({user_id for user_id, _ in rows})
+
+    @staticmethod
+    def _decision_notification(
+        approval_request_id: str,
+        document_title: str,
+        decision: str,
+        decided_by: str,
+        comments: Optional[str]
+    ) -> Dict[str, Any]:
+        return {
+            "type": "approval_decision",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {
+                "approval_request_id": approval_request_id,
+                "document_title": document_title,
+                "decision": decision,
+                "decided_by": decided_by,
+                "comments": comments,
+                "action_required": False
+            }
+        }
+
+    @staticmethod
+    def _changes_requested_notification(
+        approval_request_id: str,
+        document_title: str,
+        requested_by: str,
+        comments: Optional[str]
+    ) -> Dict[str, Any]:
+        return {
+            "type": "changes_requested",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {
+                "approval_request_id": approval_request_id,
+                "document_title": document_title,
+                "requested_by": requested_by,
+                "comments": comments,
+                "action_required": True
+            }
+        }
+
+    @staticmethod
+    def _workflow_advanced_notification(
+        approval_request_id: str,
+        document_title: str,
+        current_step: int,
+        total_steps: int,
+        new_approvers: List[str]
+    ) -> Dict[str, Any]:
+        return {
+            "type": "workflow_advanced",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {
+                "approval_request_id": approval_request_id,
+                "document_title": document_title,
+                "current_step": current_step,
+                "total_steps": total_steps,
+                "new_approvers": new_approvers,
+                "action_required": False
+            }
+        }
+
+    @staticmethod
+    def _bulk_completed_notification(
+        action: str,
+        succeeded_count: int,
+        failed_count: int,
+        total_count: int
+    ) -> Dict[str, Any]:
+        return {
+            "type": "bulk_action_completed",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {
+                "action": action,
+                "succeeded_count": succeeded_count,
+                "failed_count": failed_count,
+                "total_count": total_count,
+                "success_rate": round((succeeded_count / total_count) * 100, 2) if total_count > 0 else 0,
+                "action_required": False
+            }
+        }
+
     @staticmethod
     def _store_notifications(user_ids: List[str], notification: Dict[str, Any]):
         """Store notifications in database for later retrieval"""
-        try:
-            with get_db_cursor(commit=True) as cursor:
-                # Check if notifications table exists
-                cursor.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables
-                        WHERE table_name = 'notifications'
-                    )
-                """)
-                table_exists = cursor.fetchone()[0]
-
-                if not table_exists:
-                    # Create notifications table if it doesn't exist
-                    cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS notifications (
-                            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-                            user_id UUID NOT NULL,
-                            type VARCHAR(100) NOT NULL,
-                            data JSONB NOT NULL,
-                            read BOOLEAN DEFAULT false,
-                            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                        )
-                    """)
-                    cursor.execute("""
-                        CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id)
-                    """)
-                    cursor.execute("""
-                        CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications(created_at DESC)
-                    """)
-                    logger.info("Created notifications table")
-
-                # Insert notification for each user
-                for user_id in user_ids:
-                    cursor.execute("""
-                        INSERT INTO notifications (user_id, type, data)
-                        VALUES (%s, %s, %s)
-                    """, (user_id, notification["type"], Json(notification)))
+        NotificationService._store_notification_rows([(user_id, notification) for user_id in user_ids])
 
+    @staticmethod
+    def _store_notification_rows(rows: List[Tuple[str, Dict[str, Any]]]):
+        """
+        Store (user_id, notification) pairs with a single multi-row insert.
+        Informational notifications (no action required) are stored as
+        digests, so a burst of them reaches each user as one notification.
+        """
+        if not rows:
+            return
+        try:
+            notification_store.add([
+                NotificationService._notification_row(user_id, notification)
+                for user_id, notification in rows
+            ])
         except Exception as e:
             logger.error(f"Error storing notifications: {e}")
 
+    @staticmethod
+    def _notification_row(user_id: str, notification: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a real-time notification onto a notifications table row"""
+        data = notification.get("data") or {}
+        title = NOTIFICATION_TITLES.get(notification["type"], "{document_title}")
+        return {
+            "user_id": user_id,
+            "title": title.format_map(defaultdict(str, data)).strip() or notification["type"],
+            "message": data.get("comments") or data.get("reason"),
+            "notification_type": notification["type"],
+            "related_approval_id": data.get("approval_request_id"),
+            "data": notification,
+            "digest_key": None if data.get("action_required") else digest_key(notification["type"]),
+        }
+
     @staticmethod
     async def get_user_notifications(user_id: str, unread_only: bool = False, limit: int = 50):
         """Get notifications for a user"""
@@ -290,7 +410,7 @@ class NotificationService:
                 params = [user_id]
 
                 if unread_only:
-                    query += " AND read = false"
+                    query += " AND is_read = false"
 
                 query += " ORDER BY created_at DESC LIMIT %s"
                 params.append(limit)
@@ -302,6 +422,15 @@ class NotificationService:
             logger.error(f"Error getting user notifications: {e}")
             return []
 
+    @staticmethod
+    async def get_unread_count(user_id: str) -> int:
+        """Unread notifications of a user (from the materialized counters)"""
+        try:
+            return notification_store.get_unread_count(user_id)
+        except Exception as e:
+            logger.error(f"Error getting unread notification count: {e}")
+            return 0
+
     @staticmethod
     async def mark_notification_read(notification_id: str, user_id: str):
         """Mark a notification as read"""
@@ -309,8 +438,8 @@ class NotificationService:
             with get_db_cursor(commit=True) as cursor:
                 cursor.execute("""
                     UPDATE notifications
-                    SET read = true
-                    WHERE id = %s AND user_id = %s
+                    SET is_read = true, read_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND user_id = %s AND is_read = false
                 """, (notification_id, user_id))
         except Exception as e:
             logger.error(f"Error marking notification as read: {e}")
@@ -322,8 +451,8 @@ class NotificationService:
             with get_db_cursor(commit=True) as cursor:
                 cursor.execute("""
                     UPDATE notifications
-                    SET read = true
-                    WHERE user_id = %s AND read = false
+                    SET is_read = true, read_at = CURRENT_TIMESTAMP
+                    WHERE user_id = %s AND is_read = false
                 """, (user_id,))
         except Exception as e:
             logger.error(f"Error marking all notifications as read: {e}")
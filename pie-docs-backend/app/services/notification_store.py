@@ -0,0 +1,125 @@
+"""
+Notification Store - Bulk persistence, digests and unread counters
+
+A fan-out (one event, many recipients) or a batch of events is written with
+a single multi-row insert. The notifications table and its counters are
+created by migrations (04, 31), so writes do no schema checks.
+
+Digests: a row with a digest_key is folded into the recipient's open
+(unread) notification with the same key - event_count goes up and the
+notification shows the latest event - instead of adding a row.
+digest_key() buckets keys into NOTIFICATION_DIGEST_WINDOW_SECONDS windows,
+so a burst of events becomes one notification per window; once the user
+reads it, the next event starts a new one.
+
+Per-user total/unread counts come from notification_counters, kept up to
+date by statement-level triggers (migration 31), adjusted for notifications
+that have expired.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from psycopg2.extras import Json, execute_values
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Columns written by add(); missing keys are stored as NULL
+COLUMNS = (
+    'user_id', 'title', 'message', 'notification_type', 'action_url', 'action_label',
+    'related_document_id', 'related_task_id', 'related_approval_id', 'expires_at',
+    'data', 'digest_key', 'event_count',
+)
+
+
+def digest_key(key: str, window_seconds: int = settings.NOTIFICATION_DIGEST_WINDOW_SECONDS) -> Optional[str]:
+    """Digest key for events that should coalesce within the current window (None when digests are off)"""
+    if window_seconds <= 0:
+        return None
+    return f"{key}:{int(time.time() // window_seconds)}"
+
+
+class NotificationStore:
+    """Writes and counts rows of the notifications table"""
+
+    @staticmethod
+    def add(rows: List[Dict[str, Any]], cursor=None) -> List[str]:
+        """
+        Insert notifications (dicts keyed by COLUMNS) with one statement and
+        return their ids. Rows sharing a user and digest key are folded into
+        each other and into that user's open digest. Pass a cursor to write
+        inside the caller's transaction.
+        """
+        if not rows:
+            return []
+
+        # One row per (user, digest key): a statement cannot update the same
+        # conflicting row twice
+        merged: Dict[Any, Dict[str, Any]] = {}
+        for index, row in enumerate(rows):
+            key = (str(row['user_id']), row['digest_key']) if row.get('digest_key') else index
+            if key in merged:
+                previous = merged[key]
+                row = {**row, 'event_count': previous['event_count'] + (row.get('event_count') or 1)}
+            else:
+                row = {**row, 'event_count': row.get('event_count') or 1}
+            merged[key] = row
+
+        values = [
+            tuple(
+                Json(row.get(column)) if column == 'data' and row.get(column) is not None
+                else str(row[column]) if column == 'user_id'
+                else row.get(column)
+                for column in COLUMNS
+            )
+            for row in merged.values()
+        ]
+        query = f"""
+            INSERT INTO notifications ({', '.join(COLUMNS)})
+            VALUES %s
+            ON CONFLICT (user_id, digest_key) WHERE digest_key IS NOT NULL AND is_read = false
+            DO UPDATE SET
+                title = EXCLUDED.title,
+                message = EXCLUDED.message,
+                data = EXCLUDED.data,
+                event_count = notifications.event_count + EXCLUDED.event_count,
+                last_event_at = CURRENT_TIMESTAMP
+            RETURNING id
+        """
+
+        if cursor is not None:
+            result = execute_values(cursor, query, values, page_size=1000, fetch=True)
+        else:
+            with get_db_cursor(commit=True) as own_cursor:
+                result = execute_values(own_cursor, query, values, page_size=1000, fetch=True)
+        return [str(row['id']) for row in result]
+
+    @staticmethod
+    def get_counts(user_id: Any) -> Dict[str, int]:
+        """Total and unread notifications of a user, excluding expired ones"""
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                SELECT
+                    COALESCE(c.total_count, 0) - e.total AS total,
+                    COALESCE(c.unread_count, 0) - e.unread AS unread
+                FROM (
+                    SELECT COUNT(*) AS total, COUNT(*) FILTER (WHERE is_read IS NOT TRUE) AS unread
+                    FROM notifications
+                    WHERE user_id = %s
+                    AND expires_at IS NOT NULL AND expires_at <= CURRENT_TIMESTAMP
+                ) e
+                LEFT JOIN notification_counters c ON c.user_id = %s
+            """, (str(user_id), str(user_id)))
+            counts = cursor.fetchone()
+        return {'total': max(counts['total'], 0), 'unread': max(counts['unread'], 0)}
+
+    @staticmethod
+    def get_unread_count(user_id: Any) -> int:
+        return NotificationStore.get_counts(user_id)['unread']
+
+
+# Singleton instance
+notification_store = NotificationStore()
@@ -17,9 +17,6 @@ OPENAI_API_KEY = None
 
 try:
     from openai import OpenAI
-    import fitz  # PyMuPDF for PDF processing
-    from PIL import Image
-    import io
 
     # Get API key from environment or use provided key
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -32,12 +29,16 @@ try:
 
 except ImportError as e:
     logger.warning(f"OCR dependencies not fully installed: {e}")
-    logger.warning("Install: pip install openai PyMuPDF Pillow")
+    logger.warning("Install: pip install openai")
 
 
 class OCRService:
     """Service for OCR processing using GPT-4 Vision"""
 
+    MODEL = "gpt-4-vision-preview"
+    # Bump when the extraction prompt changes so cached results are not reused
+    PROMPT_VERSION = "ocr-v1"
+
     def __init__(self):
         self.openai_available = OPENAI_AVAILABLE
         if self.openai_available:
@@ -49,11 +50,6 @@ class OCRService:
         """Check if OCR service is available"""
         return self.openai_available
 
-    def _encode_image_to_base64(self, image_path: Path) -> str:
-        """Encode image file to base64 string"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-
     def _get_image_mime_type(self, image_path: Path) -> str:
         """Get MIME type for image"""
         extension = image_path.suffix.lower()
@@ -78,6 +74,29 @@ class OCRService:
             image_path: Path to image file
             language: Language hint (not strictly used by GPT-4 Vision)
 
+        Returns:
+            Tuple of (success, extracted_text, confidence, error_message)
+        """
+        if not self.openai_available:
+            return False, None, None, "OpenAI API not available. Please configure API key."
+
+        try:
+            image_data = image_path.read_bytes()
+        except OSError as e:
+            logger.error(f"Error reading image for Vision OCR: {e}")
+            return False, None, None, str(e)
+
+        return self.process_image_data(image_data, self._get_image_mime_type(image_path), language)
+
+    def process_image_data(
+        self,
+        image_data: bytes,
+        mime_type: str,
+        language: str = 'eng'
+    ) -> Tuple[bool, Optional[str], Optional[float], Optional[str]]:
+        """
+        Process in-memory image bytes (e.g. a rendered PDF page) with GPT-4 Vision OCR
+
         Returns:
             Tuple of (success, extracted_text, confidence, error_message)
         """
@@ -86,12 +105,11 @@ class OCRService:
 
         try:
             # Encode image to base64
-            base64_image = self._encode_image_to_base64(image_path)
-            mime_type = self._get_image_mime_type(image_path)
+            base64_image = base64.b64encode(image_data).decode('utf-8')
 
             # Call GPT-4 Vision API
             response = self.client.chat.completions.create(
-                model="gpt-4-vision-preview",
+                model=self.MODEL,
                 messages=[
                     {
                         "role": "user",
@@ -142,15 +160,20 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
         self,
         pdf_path: Path,
         language: str = 'eng',
-        max_pages: Optional[int] = None
+        max_pages: Optional[int] = None,
+        content_sha256: Optional[str] = None
     ) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """
         Process a PDF file with GPT-4 Vision OCR
 
+        Pages are read from the shared page-render cache, so pages already
+        rasterized for classification, extraction or previews are not re-rendered.
+
         Args:
             pdf_path: Path to PDF file
             language: Language hint
             max_pages: Maximum number of pages to process (None = all)
+            content_sha256: Known SHA-256 of the file (shares renders across duplicates)
 
         Returns:
             Tuple of (success, ocr_results_dict, error_message)
@@ -164,41 +187,26 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
             return False, None, "OpenAI API not available. Please configure API key."
 
         try:
-            # Open PDF
-            pdf_document = fitz.open(pdf_path)
-            page_count = len(pdf_document)
-
-            if max_pages:
-                page_count = min(page_count, max_pages)
-
-            logger.info(f"Processing PDF with {page_count} pages using Vision OCR")
+            from app.services.page_render_service import page_render_service, OCR_DPI
 
             all_text = []
             page_results = []
             all_confidences = []
+            page_count = 0
 
-            for page_num in range(page_count):
-                page = pdf_document[page_num]
-
-                # Convert page to image (PNG format for better quality)
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x scaling for better quality
-                img_data = pix.tobytes("png")
-
-                # Save to temporary file
-                temp_path = Path(f"C:/Users/Book 3/Desktop/Pivot Pie Projects/Pie-Docs/pie-docs-backend/temp/ocr_page_{page_num}.png")
-                temp_path.parent.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Processing PDF {pdf_path.name} using Vision OCR")
 
-                with open(temp_path, "wb") as f:
-                    f.write(img_data)
+            for page_num, page_image in page_render_service.iter_pages(
+                pdf_path,
+                dpi=OCR_DPI,  # 2x scaling for better quality
+                fmt='png',
+                max_pages=max_pages,
+                content_sha256=content_sha256
+            ):
+                page_count += 1
 
                 # Process with Vision OCR
-                success, text, confidence, error = self.process_image(temp_path, language)
-
-                # Clean up temp file
-                try:
-                    temp_path.unlink()
-                except:
-                    pass
+                success, text, confidence, error = self.process_image_data(page_image, 'image/png', language)
 
                 if success and text:
                     all_text.append(text)
@@ -213,8 +221,6 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
                 else:
                     logger.warning(f"Failed to process page {page_num + 1}: {error}")
 
-            pdf_document.close()
-
             # Calculate overall metrics
             full_text = '\n\n--- Page Break ---\n\n'.join(all_text)
             overall_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0.0
@@ -238,7 +244,8 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
     def process_document(
         self,
         file_path: Path,
-        language: str = 'eng'
+        language: str = 'eng',
+        content_sha256: Optional[str] = None
     ) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """
         Process any document (image or PDF) with GPT-4 Vision OCR
@@ -246,6 +253,7 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
         Args:
             file_path: Path to document
             language: Language hint
+            content_sha256: Known SHA-256 of the file (optional)
 
         Returns:
             Tuple of (success, ocr_results_dict, error_message)
@@ -257,7 +265,7 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
         extension = file_path.suffix.lower()
 
         if extension == '.pdf':
-            return self.process_pdf(file_path, language)
+            return self.process_pdf(file_path, language, content_sha256=content_sha256)
         elif extension in ['.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif', '.webp']:
             success, text, confidence, error = self.process_image(file_path, language)
             if success:
@@ -278,6 +286,40 @@ Return ONLY the extracted text with preserved formatting. Do NOT add any comment
         else:
             return False, None, f"Unsupported file type: {extension}"
 
+    def process_document_cached(
+        self,
+        file_path: Path,
+        language: str = 'eng',
+        content_sha256: Optional[str] = None
+    ) -> Tuple[bool, Optional[Dict], Optional[str], bool]:
+        """
+        Process a document, reusing any result cached for identical file bytes
+
+        Args:
+            file_path: Path to document
+            language: Language hint
+            content_sha256: Known SHA-256 of the file (computed if omitted)
+
+        Returns:
+            Tuple of (success, ocr_results_dict, error_message, cached)
+        """
+        from app.services.ai_result_cache import ai_result_cache
+
+        if not file_path.exists():
+            return False, None, f"File not found: {file_path}", False
+
+        content_sha256 = ai_result_cache.hash_file(file_path, content_sha256)
+        task = f"ocr:{language}"
+
+        cached = ai_result_cache.get(content_sha256, task, self.MODEL, self.PROMPT_VERSION)
+        if cached:
+            return True, cached, None, True
+
+        success, results, error = self.process_document(file_path, language, content_sha256)
+        if success and results:
+            ai_result_cache.put(content_sha256, task, self.MODEL, self.PROMPT_VERSION, results)
+        return success, results, error, False
+
     def generate_mock_ocr_result(
         self,
         file_path: Path
@@ -0,0 +1,297 @@
+"""
+Page Render Service - Shared, size-bounded cache of rasterized PDF pages
+
+OCR, classification, metadata extraction and thumbnails all need page images.
+Each (document, page, DPI, format) is rendered once with PyMuPDF into an
+on-disk cache and reused by every consumer. Pages are rendered lazily, one at
+a time, so asking for page 1 of a 500-page PDF renders exactly one page.
+
+Thumbnail renditions are stored in the same directory through store() and
+read_cached(), so page renders and thumbnails share one byte budget.
+
+The cache directory is bounded by PAGE_CACHE_MAX_BYTES with LRU eviction.
+The LRU index is per process, so every worker enforces the budget against
+the entries it knows about: with N workers the directory can reach up to N
+times PAGE_CACHE_MAX_BYTES, and any worker may evict a page another one is
+about to read. Pages are therefore handed out as bytes (or decoded images),
+never as cache paths, and an entry that disappears before it is read is
+treated as a miss and rendered again.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Render presets shared by consumers so they hit the same cache entries
+OCR_DPI = 144      # 2x zoom, lossless PNG for text extraction
+VISION_DPI = 108   # 1.5x zoom, JPEG for vision prompts and thumbnails
+MAX_EDGE = 2048    # Longest side of any rendered page (vision API limit)
+JPEG_QUALITY = 85
+
+SUPPORTED_FORMATS = ('png', 'jpeg')
+
+# Try to import PDF libraries
+try:
+    import fitz  # PyMuPDF
+    from PIL import Image
+    RENDER_SUPPORT = True
+except ImportError:
+    logger.warning("PyMuPDF/Pillow not installed. PDF page rendering is unavailable.")
+    RENDER_SUPPORT = False
+
+
+class PageRenderService:
+    """
+    Rasterizes PDF pages on demand into a shared LRU disk cache
+
+    Cache entries are keyed by the document's content SHA-256 when known
+    (so duplicate uploads share renders), otherwise by path, size and mtime.
+    """
+
+    def __init__(self, cache_dir: Path = None, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir or settings.PAGE_CACHE_DIR)
+        self.max_bytes = max_bytes or settings.PAGE_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[Path, int]"] = None
+        self._total_bytes = 0
+
+    def is_available(self) -> bool:
+        """Check if PDF page rendering is available"""
+        return RENDER_SUPPORT
+
+    # ==========================================
+    # Cache keys and LRU index
+    # ==========================================
+
+    @staticmethod
+    def source_key(pdf_path: Path, content_sha256: Optional[str] = None) -> str:
+        """Stable identity for a source file"""
+        if content_sha256:
+            return content_sha256
+        stat = pdf_path.stat()
+        identity = f"{pdf_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def entry_path(self, source_key: str, name: str) -> Path:
+        """Cache location of a named entry derived from a source file"""
+        return self.cache_dir / source_key[:2] / f"{source_key}_{name}"
+
+    def _page_entry_path(self, source_key: str, page_number: int, dpi: int, fmt: str) -> Path:
+        extension = 'jpg' if fmt == 'jpeg' else fmt
+        return self.entry_path(source_key, f"p{page_number}_{dpi}dpi.{extension}")
+
+    def _load_index(self) -> None:
+        """Build the LRU index from disk, oldest access first (called under lock)"""
+        if self._index is not None:
+            return
+
+        entries = []
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob('*/*'):
+                try:
+                    stat = path.stat()
+                    entries.append((stat.st_atime, path, stat.st_size))
+                except OSError:
+                    continue
+
+        entries.sort(key=lambda e: e[0])
+        self._index = OrderedDict((path, size) for _, path, size in entries)
+        self._total_bytes = sum(self._index.values())
+
+    def _touch(self, path: Path) -> None:
+        """Mark an entry as most recently used"""
+        with self._lock:
+            self._load_index()
+            if path in self._index:
+                self._index.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _forget(self, path: Path) -> None:
+        """Drop an entry that was evicted (by this or another process) from the index"""
+        with self._lock:
+            self._load_index()
+            self._total_bytes -= self._index.pop(path, 0)
+
+    def _add(self, path: Path, size: int) -> None:
+        """Register a new entry and evict least recently used entries over budget"""
+        with self._lock:
+            self._load_index()
+            self._total_bytes += size - self._index.pop(path, 0)
+            self._index[path] = size
+
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_path, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    old_path.unlink()
+                except OSError:
+                    pass
+
+    def read_cached(self, path: Path) -> Optional[bytes]:
+        """Bytes of a cache entry, or None if it was never stored or has been evicted"""
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self._forget(path)
+            return None
+        self._touch(path)
+        return data
+
+    def store(self, path: Path, data: bytes) -> None:
+        """Write a cache entry and charge it against the byte budget"""
+        # Write atomically so concurrent readers never see a partial file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        self._add(path, len(data))
+
+    # ==========================================
+    # Rendering
+    # ==========================================
+
+    def get_page_count(self, pdf_path: Path) -> int:
+        """Number of pages in a PDF (reads only the page tree)"""
+        if not RENDER_SUPPORT:
+            raise RuntimeError("PDF rendering not available - PyMuPDF not installed")
+        with fitz.open(pdf_path) as pdf_document:
+            return len(pdf_document)
+
+    def _render(self, pdf_document, page_number: int, dpi: int, fmt: str) -> bytes:
+        """Rasterize one page of an open PDF to image bytes"""
+        page = pdf_document[page_number]
+
+        zoom = dpi / 72
+        longest = max(page.rect.width, page.rect.height) * zoom
+        if longest > MAX_EDGE:
+            zoom *= MAX_EDGE / longest
+
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+
+        if fmt == 'png':
+            return pix.tobytes("png")
+
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue()
+
+    def _get_or_render(
+        self,
+        pdf_path: Path,
+        pdf_document,
+        key: str,
+        page_number: int,
+        dpi: int,
+        fmt: str
+    ) -> Tuple[bytes, object]:
+        """
+        Return the image bytes for a page, rendering it on a miss
+
+        pdf_document is opened lazily and returned so callers iterating pages
+        keep a single open handle and never open the PDF when everything hits.
+        """
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported render format: {fmt}")
+
+        entry = self._page_entry_path(key, page_number, dpi, fmt)
+        data = self.read_cached(entry)
+        if data is not None:
+            return data, pdf_document
+
+        # Never rendered, or evicted since; render it (again)
+
+        if not RENDER_SUPPORT:
+            raise RuntimeError("PDF rendering not available - PyMuPDF not installed")
+
+        if pdf_document is None:
+            pdf_document = fitz.open(pdf_path)
+
+        data = self._render(pdf_document, page_number, dpi, fmt)
+        self.store(entry, data)
+
+        logger.debug(f"Rendered page {page_number + 1} of {pdf_path.name} at {dpi}dpi ({len(data)} bytes)")
+        return data, pdf_document
+
+    def render_page(
+        self,
+        pdf_path: Path,
+        page_number: int = 0,
+        dpi: int = VISION_DPI,
+        fmt: str = 'jpeg',
+        content_sha256: Optional[str] = None
+    ) -> bytes:
+        """Get the image bytes for a single page (0-indexed), rendering it if needed"""
+        key = self.source_key(pdf_path, content_sha256)
+        data, pdf_document = self._get_or_render(pdf_path, None, key, page_number, dpi, fmt)
+        if pdf_document is not None:
+            pdf_document.close()
+        return data
+
+    def open_page(
+        self,
+        pdf_path: Path,
+        page_number: int = 0,
+        dpi: int = VISION_DPI,
+        fmt: str = 'jpeg',
+        content_sha256: Optional[str] = None
+    ) -> "Image.Image":
+        """Get a single page (0-indexed) as a decoded PIL image"""
+        data = self.render_page(pdf_path, page_number, dpi, fmt, content_sha256)
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return img
+
+    def iter_pages(
+        self,
+        pdf_path: Path,
+        dpi: int = VISION_DPI,
+        fmt: str = 'jpeg',
+        max_pages: Optional[int] = None,
+        content_sha256: Optional[str] = None
+    ) -> Iterator[Tuple[int, bytes]]:
+        """
+        Lazily yield (page_number, image_bytes) for each page
+
+        Pages are rendered one at a time as the caller advances, so stopping
+        early never renders the remaining pages.
+        """
+        key = self.source_key(pdf_path, content_sha256)
+        page_count = self.get_page_count(pdf_path)
+        if max_pages:
+            page_count = min(page_count, max_pages)
+
+        pdf_document = None
+        try:
+            for page_number in range(page_count):
+                data, pdf_document = self._get_or_render(pdf_path, pdf_document, key, page_number, dpi, fmt)
+                yield page_number, data
+        finally:
+            if pdf_document is not None:
+                pdf_document.close()
+
+    def get_stats(self) -> dict:
+        """Current cache size and entry count"""
+        with self._lock:
+            self._load_index()
+            return {
+                "cache_dir": str(self.cache_dir),
+                "entries": len(self._index),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+# Singleton instance
+page_render_service = PageRenderService()
@@ -0,0 +1,308 @@
+"""
+Routing Rule Matcher - Compiled, cached approval routing rules
+
+Active routing_rules are compiled once into predicate lists (regexes
+precompiled, "in" lists turned into sets) and bucketed by the field most
+rules test for equality, usually document_type. Each bucket is pre-merged
+with the rules that cannot be bucketed, so matching a document is one dict
+lookup and a scan of its candidates in priority order - no query and no
+JSON interpretation per document.
+
+The cache is invalidated by the routing rule endpoints after they commit.
+A reload every ROUTING_RULES_REFRESH_SECONDS picks up edits made through
+other worker processes.
+
+Condition semantics are those of ApprovalService.evaluate_routing_conditions:
+one operator per field (the first of OPERATORS present), unknown operators
+are ignored, and a rule whose conditions cannot be compiled never matches.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Checked in this order; only the first operator present in a condition applies
+OPERATORS = ('equals', 'not_equals', 'contains', 'greater_than', 'less_than', 'in', 'not_in', 'regex')
+
+# Values usable as bucket keys (equal values of these types hash equally)
+_INDEXABLE_TYPES = (str, int, float, bool, type(None))
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _membership(values: Any) -> Callable[[Any], bool]:
+    """Fast membership test for an "in"/"not_in" operand"""
+    if isinstance(values, list) and all(isinstance(v, _INDEXABLE_TYPES) for v in values):
+        members = frozenset(values)
+
+        def contains(value: Any) -> bool:
+            try:
+                return value in members
+            except TypeError:
+                # Unhashable document value: fall back to list equality
+                return value in values
+        return contains
+    return lambda value: value in values
+
+
+def _compile_condition(field: str, condition: Dict[str, Any]) -> Optional[Predicate]:
+    if 'equals' in condition:
+        expected = condition['equals']
+        return lambda doc: doc.get(field) == expected
+
+    if 'not_equals' in condition:
+        rejected = condition['not_equals']
+        return lambda doc: doc.get(field) != rejected
+
+    if 'contains' in condition:
+        needle = condition['contains']
+
+        def contains(doc: Dict[str, Any]) -> bool:
+            value = doc.get(field)
+            return isinstance(value, str) and needle in value
+        return contains
+
+    if 'greater_than' in condition:
+        bound = condition['greater_than']
+
+        def greater_than(doc: Dict[str, Any]) -> bool:
+            value = doc.get(field)
+            return _is_number(value) and value > bound
+        return greater_than
+
+    if 'less_than' in condition:
+        bound = condition['less_than']
+
+        def less_than(doc: Dict[str, Any]) -> bool:
+            value = doc.get(field)
+            return _is_number(value) and value < bound
+        return less_than
+
+    if 'in' in condition:
+        is_member = _membership(condition['in'])
+        return lambda doc: is_member(doc.get(field))
+
+    if 'not_in' in condition:
+        is_member = _membership(condition['not_in'])
+        return lambda doc: not is_member(doc.get(field))
+
+    if 'regex' in condition:
+        pattern = re.compile(condition['regex'])
+
+        def regex(doc: Dict[str, Any]) -> bool:
+            value = doc.get(field)
+            return isinstance(value, str) and pattern.match(value) is not None
+        return regex
+
+    # No known operator: the condition always passes
+    return None
+
+
+def compile_conditions(conditions: Dict[str, Any]) -> Predicate:
+    """
+    Compile routing rule conditions into a single predicate.
+    Raises ValueError if the conditions are malformed (e.g. an invalid regex).
+    """
+    if not isinstance(conditions, dict):
+        raise ValueError("Routing conditions must be an object of field -> condition")
+
+    predicates: List[Predicate] = []
+    for field, condition in conditions.items():
+        if not isinstance(condition, dict):
+            raise ValueError(f"Condition for '{field}' must be an object of operator -> value")
+        try:
+            predicate = _compile_condition(field, condition)
+        except re.error as e:
+            raise ValueError(f"Invalid regex for '{field}': {e}")
+        if predicate is not None:
+            predicates.append(predicate)
+
+    def matches(document_metadata: Dict[str, Any]) -> bool:
+        try:
+            for predicate in predicates:
+                if not predicate(document_metadata):
+                    return False
+            return True
+        except TypeError:
+            # e.g. comparing a number against a non-numeric bound
+            return False
+    return matches
+
+
+def _index_keys(condition: Any) -> Optional[Tuple[Any, ...]]:
+    """Bucket keys a condition restricts its field to, or None if it cannot be bucketed"""
+    if not isinstance(condition, dict):
+        return None
+    operator = next((op for op in OPERATORS if op in condition), None)
+    if operator == 'equals' and isinstance(condition['equals'], _INDEXABLE_TYPES):
+        return (condition['equals'],)
+    if operator == 'in' and isinstance(condition['in'], list) and all(
+        isinstance(v, _INDEXABLE_TYPES) for v in condition['in']
+    ):
+        return tuple(condition['in'])
+    return None
+
+
+class _CompiledRule:
+    __slots__ = ('order', 'id', 'target_chain_id', 'priority', 'matches')
+
+    def __init__(self, order: int, row: Dict[str, Any], matches: Predicate):
+        self.order = order
+        self.id = row['id']
+        self.target_chain_id = row['target_chain_id']
+        self.priority = row['priority']
+        self.matches = matches
+
+
+class RoutingRuleMatcher:
+    """Process-local compiled routing rules, bucketed by the most selective equality field"""
+
+    def __init__(self, refresh_seconds: int = settings.ROUTING_RULES_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        # (index field, index field value -> candidate rules for that value,
+        #  rules that do not restrict the index field); lists in priority order.
+        # Swapped as one tuple so matching never sees a half-applied reload.
+        self._rules: Tuple[Optional[str], Dict[Any, List[_CompiledRule]], List[_CompiledRule]] = (None, {}, [])
+        self._rule_count = 0
+        self._invalid_rules = 0
+
+    # ==========================================
+    # Loading
+    # ==========================================
+
+    def load(self) -> None:
+        """(Re)load and compile all active routing rules"""
+        started = time.monotonic()
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, conditions, target_chain_id, priority
+                FROM routing_rules
+                WHERE is_active = true
+                ORDER BY priority DESC, name
+            """)
+            rows = cursor.fetchall()
+
+        compiled: List[Tuple[_CompiledRule, Dict[str, Any]]] = []
+        invalid = 0
+        for row in rows:
+            try:
+                matches = compile_conditions(row['conditions'])
+            except ValueError as e:
+                logger.warning(f"Routing rule {row['id']} skipped: {e}")
+                invalid += 1
+                continue
+            compiled.append((_CompiledRule(len(compiled), row, matches), row['conditions']))
+
+        # Bucket on the field the most rules pin to specific values
+        field_counts = Counter(
+            field
+            for _, conditions in compiled
+            for field, condition in conditions.items()
+            if _index_keys(condition) is not None
+        )
+        index_field = field_counts.most_common(1)[0][0] if field_counts else None
+
+        buckets: Dict[Any, List[_CompiledRule]] = {}
+        unindexed: List[_CompiledRule] = []
+        for rule, conditions in compiled:
+            keys = _index_keys(conditions.get(index_field)) if index_field in conditions else None
+            if keys is None:
+                unindexed.append(rule)
+                continue
+            for key in keys:
+                bucket = buckets.setdefault(key, [])
+                if not bucket or bucket[-1] is not rule:
+                    bucket.append(rule)
+
+        # Each bucket also holds the unindexed rules, merged in priority order
+        # once here rather than per match
+        for key, bucket in buckets.items():
+            buckets[key] = sorted(bucket + unindexed, key=lambda rule: rule.order)
+
+        with self._lock:
+            self._rules = (index_field, buckets, unindexed)
+            self._rule_count = len(compiled)
+            self._invalid_rules = invalid
+            self._loaded_at = time.monotonic()
+
+        logger.info(
+            f"Routing rules compiled: {len(compiled)} rules ({invalid} invalid), "
+            f"indexed on {index_field or 'nothing'} in {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+
+    def invalidate(self) -> None:
+        """Force a reload on the next match"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            try:
+                self.load()
+            except Exception as e:
+                if self._loaded_at is None:
+                    raise
+                logger.warning(f"Routing rule reload failed, keeping previous rules: {e}")
+
+    # ==========================================
+    # Matching
+    # ==========================================
+
+    def _first_match(self, document_metadata: Dict[str, Any]) -> Optional[UUID]:
+        for rule in self._candidates(document_metadata):
+            if rule.matches(document_metadata):
+                return rule.target_chain_id
+        return None
+
+    def _candidates(self, document_metadata: Dict[str, Any]) -> List[_CompiledRule]:
+        index_field, buckets, unindexed = self._rules
+        if index_field is None:
+            return unindexed
+        try:
+            bucket = buckets.get(document_metadata.get(index_field))
+        except TypeError:
+            # Unhashable value cannot equal any bucketed scalar
+            bucket = None
+        return bucket if bucket is not None else unindexed
+
+    def match(self, document_metadata: Dict[str, Any]) -> Optional[UUID]:
+        """Target chain of the highest-priority matching rule, or None"""
+        self._ensure_fresh()
+        return self._first_match(document_metadata)
+
+    def match_many(self, documents: List[Dict[str, Any]]) -> List[Optional[UUID]]:
+        """Target chain per document (one freshness check for the whole batch)"""
+        self._ensure_fresh()
+        return [self._first_match(document_metadata) for document_metadata in documents]
+
+    def get_stats(self) -> Dict[str, Any]:
+        loaded_at = self._loaded_at
+        index_field, buckets, unindexed = self._rules
+        return {
+            'loaded': loaded_at is not None,
+            'age_seconds': round(time.monotonic() - loaded_at, 1) if loaded_at is not None else None,
+            'rules': self._rule_count,
+            'invalid_rules': self._invalid_rules,
+            'index_field': index_field,
+            'buckets': len(buckets),
+            'unindexed_rules': len(unindexed),
+        }
+
+
+# Singleton instance
+routing_rule_matcher = RoutingRuleMatcher()
@@ -0,0 +1,117 @@
+"""
+Smart Folders - Criteria validation and materialized membership reads
+
+Smart folder membership lives in smart_folder_members and is maintained by
+database triggers (migration 35): a changed document is matched only
+against the folders the smart_folder_terms inverted index names as
+candidates, and a folder is re-materialized when its criteria change. This
+module validates criteria before they are stored, reads folder contents
+from the materialized membership and can force a refresh.
+"""
+import logging
+from datetime import date
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from app.database import get_db_cursor
+from app.services.folder_index import DOCUMENT_LIST_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# SmartFolderCriteria (frontend) keys evaluated by smart_folder_matches()
+LIST_CRITERIA = ('documentTypes', 'tags', 'authors', 'status', 'contentKeywords')
+RANGE_CRITERIA = ('dateRange', 'sizeRange')
+
+
+def validate_smart_criteria(criteria: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Check criteria have the shape the matcher understands; raises ValueError.
+    Lists are any-of, criteria are ANDed, and at least one must be set.
+    """
+    if not criteria:
+        raise ValueError("Smart criteria required for smart folders")
+
+    unknown = set(criteria) - set(LIST_CRITERIA) - set(RANGE_CRITERIA)
+    if unknown:
+        raise ValueError(f"Unknown smart criteria: {', '.join(sorted(unknown))}")
+
+    for key in LIST_CRITERIA:
+        values = criteria.get(key)
+        if values is not None and (
+            not isinstance(values, list) or not all(isinstance(value, str) for value in values)
+        ):
+            raise ValueError(f"{key} must be a list of strings")
+
+    date_range = criteria.get('dateRange')
+    if date_range is not None:
+        if not isinstance(date_range, dict):
+            raise ValueError("dateRange must be an object with start and end")
+        for bound in ('start', 'end'):
+            value = date_range.get(bound)
+            if value:
+                try:
+                    date.fromisoformat(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"dateRange.{bound} must be a YYYY-MM-DD date")
+
+    size_range = criteria.get('sizeRange')
+    if size_range is not None:
+        if not isinstance(size_range, dict):
+            raise ValueError("sizeRange must be an object with min and max")
+        for bound in ('min', 'max'):
+            value = size_range.get(bound)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"sizeRange.{bound} must be a number of bytes")
+
+    if not any(criteria.get(key) for key in LIST_CRITERIA + RANGE_CRITERIA):
+        raise ValueError("Smart criteria must set at least one criterion")
+
+    return criteria
+
+
+class SmartFolderService:
+    """Reads and refreshes materialized smart folder membership"""
+
+    def refresh(self, folder_id: UUID) -> Dict[str, Any]:
+        """Re-materialize a folder from its criteria (normally done by triggers)"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute(
+                "SELECT refresh_smart_folder_members(%s) AS document_count",
+                (str(folder_id),)
+            )
+            document_count = cursor.fetchone()['document_count']
+            cursor.execute("SELECT last_refreshed_at FROM folders WHERE id = %s", (str(folder_id),))
+            refreshed_at = cursor.fetchone()['last_refreshed_at']
+
+        return {'document_count': document_count, 'refreshed_at': refreshed_at}
+
+    def list_documents(self, folder_id: UUID, page: int, page_size: int) -> Dict[str, Any]:
+        """One page of a smart folder's documents, newest modified first"""
+        offset = (page - 1) * page_size
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) AS total FROM smart_folder_members WHERE folder_id = %s",
+                (str(folder_id),)
+            )
+            total = cursor.fetchone()['total']
+
+            cursor.execute(f"""
+                SELECT {DOCUMENT_LIST_COLUMNS}
+                FROM smart_folder_members m
+                JOIN documents d ON d.id = m.document_id
+                WHERE m.folder_id = %s
+                ORDER BY d.modified_at DESC
+                LIMIT %s OFFSET %s
+            """, (str(folder_id), page_size, offset))
+            documents = cursor.fetchall()
+
+        return {
+            "documents": [dict(d) for d in documents],
+            "total": total,
+            "page": page,
+            "page_size": page_size
+        }
+
+
+# Singleton instance
+smart_folder_service = SmartFolderService()
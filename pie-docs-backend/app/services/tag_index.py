@@ -0,0 +1,95 @@
+"""
+Tag Index - Related tags and tag facets from the co-occurrence matrix
+
+tags.usage_count and tag_cooccurrence (live documents carrying both tags of
+a pair) are maintained by triggers on documents (migration 37). Related
+tags and facet counts are read from the matrix instead of unnesting
+documents.tags across the table.
+"""
+import logging
+from typing import Any, Dict, List
+
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class TagIndexService:
+    """Reads tag co-occurrence and rebuilds the tag index"""
+
+    def related_tags(self, tag: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Tags most often found on documents carrying the given tag"""
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                SELECT c.tag_b AS name, c.document_count, t.usage_count, t.color
+                FROM tag_cooccurrence c
+                LEFT JOIN tags t ON t.name = c.tag_b
+                WHERE c.tag_a = %s
+                ORDER BY c.document_count DESC, c.tag_b
+                LIMIT %s
+            """, (tag, limit))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def tag_facets(self, selected: List[str], limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Tags to refine a tag filter with. With no selection these are the
+        most used tags; with one selected tag document_count is exact; with
+        several it is the smallest pair count, an upper bound on documents
+        carrying all of them.
+        """
+        selected = sorted(set(selected))
+        with get_db_cursor() as cursor:
+            if not selected:
+                cursor.execute("""
+                    SELECT name, usage_count AS document_count
+                    FROM tags
+                    WHERE usage_count > 0
+                    ORDER BY usage_count DESC, name
+                    LIMIT %s
+                """, (limit,))
+            else:
+                cursor.execute("""
+                    SELECT tag_b AS name, MIN(document_count) AS document_count
+                    FROM tag_cooccurrence
+                    WHERE tag_a = ANY(%s) AND NOT (tag_b = ANY(%s))
+                    GROUP BY tag_b
+                    HAVING COUNT(*) = %s
+                    ORDER BY document_count DESC, tag_b
+                    LIMIT %s
+                """, (selected, selected, len(selected), limit))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def can_match_all(self, tags: List[str]) -> bool:
+        """
+        False when no live document can carry every tag: one of them is
+        unused or some pair never occurs together. True does not guarantee
+        a match for three or more tags.
+        """
+        tags = sorted(set(tags))
+        if not tags:
+            return True
+
+        with get_db_cursor() as cursor:
+            if len(tags) == 1:
+                cursor.execute(
+                    "SELECT 1 FROM tags WHERE name = %s AND usage_count > 0",
+                    (tags[0],)
+                )
+                return cursor.fetchone() is not None
+
+            cursor.execute("""
+                SELECT COUNT(*) AS pairs
+                FROM tag_cooccurrence
+                WHERE tag_a = ANY(%s) AND tag_b = ANY(%s) AND tag_a < tag_b
+                AND document_count > 0
+            """, (tags, tags))
+            return cursor.fetchone()['pairs'] == len(tags) * (len(tags) - 1) // 2
+
+    def rebuild(self) -> None:
+        """Recompute usage counts and the co-occurrence matrix from documents"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT rebuild_tag_index()")
+
+
+# Singleton instance
+tag_index_service = TagIndexService()
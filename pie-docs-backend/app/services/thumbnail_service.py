@@ -6,14 +6,17 @@ Estimated Time: 2 hours
 Dependencies: TASK-BE-001
 """
 
-import os
+import io
+import threading
+import weakref
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont
-import io
 import logging
 from uuid import UUID
 
+from app.services.page_render_service import page_render_service
+
 logger = logging.getLogger(__name__)
 
 # Thumbnail settings
@@ -21,13 +24,18 @@ THUMBNAIL_SIZE = (300, 400)  # Width x Height
 THUMBNAIL_QUALITY = 85
 THUMBNAIL_FORMAT = 'JPEG'
 
-# Try to import PDF libraries
-try:
-    import fitz  # PyMuPDF
-    PDF_SUPPORT = True
-except ImportError:
-    logger.warning("PyMuPDF not installed. PDF thumbnail generation will be limited.")
-    PDF_SUPPORT = False
+# On-demand renditions: name -> bounding box (width, height)
+THUMBNAIL_SIZES = {
+    'list': (96, 128),
+    'grid': THUMBNAIL_SIZE,
+    'preview': (1000, 1400),  # Single page preview
+}
+# Output formats: name -> (PIL format, file extension, media type)
+THUMBNAIL_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
 
 
 class ThumbnailService:
@@ -46,6 +54,193 @@ class ThumbnailService:
         """
         self.size = size
         self.quality = quality
+        # One lock per rendition, alive only while some request holds or waits on it
+        self._render_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+        self._render_locks_guard = threading.Lock()
+
+    # ==========================================
+    # On-demand renditions
+    # ==========================================
+
+    @staticmethod
+    def is_supported(file_path: Path) -> bool:
+        """Check if a thumbnail can be rendered for this file"""
+        extension = file_path.suffix.lower()
+        return extension == '.pdf' or extension in IMAGE_EXTENSIONS
+
+    @staticmethod
+    def rendition_path(source_key: str, size: str = 'grid', fmt: str = 'jpeg', page_number: int = 0) -> Path:
+        """
+        Cache location of a rendition
+
+        Renditions live in the page render cache and share its LRU byte
+        budget, so they may be evicted and rendered again at any time.
+        """
+        extension = THUMBNAIL_FORMATS[fmt][1]
+        return page_render_service.entry_path(source_key, f"{size}_p{page_number}.{extension}")
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._render_locks_guard:
+            lock = self._render_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._render_locks[key] = lock
+            return lock
+
+    def _load_page_image(self, source_path: Path, size: str, page_number: int, content_sha256: Optional[str]) -> Image.Image:
+        """Open the source as an RGB image (PDF pages come from the shared page-render cache)"""
+        if source_path.suffix.lower() == '.pdf':
+            from app.services.page_render_service import OCR_DPI, VISION_DPI
+
+            if not page_render_service.is_available():
+                raise RuntimeError("PDF rendering not available - PyMuPDF not installed")
+            if page_number >= page_render_service.get_page_count(source_path):
+                raise ValueError(f"Page {page_number + 1} does not exist")
+
+            # Page previews reuse the higher-resolution OCR renders
+            if size == 'preview':
+                source = page_render_service.open_page(
+                    source_path, page_number, dpi=OCR_DPI, fmt='png', content_sha256=content_sha256
+                )
+            else:
+                source = page_render_service.open_page(
+                    source_path, page_number, dpi=VISION_DPI, fmt='jpeg', content_sha256=content_sha256
+                )
+        elif page_number != 0:
+            raise ValueError("Images have a single page")
+        else:
+            source = Image.open(source_path)
+
+        with source as img:
+            img.load()
+            if img.mode in ('RGBA', 'LA', 'P'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+                return background
+            return img.convert('RGB')
+
+    def get_or_create(
+        self,
+        source_path: Path,
+        source_key: str,
+        size: str = 'grid',
+        fmt: str = 'jpeg',
+        page_number: int = 0,
+        content_sha256: Optional[str] = None
+    ) -> bytes:
+        """
+        Return a cached rendition, rendering it on a miss
+
+        Concurrent requests for the same rendition wait on a per-key lock
+        and reuse the first render instead of rendering it again.
+
+        Args:
+            source_path: Stored document file
+            source_key: Cache identity (content SHA-256, or document ID)
+            size: One of THUMBNAIL_SIZES
+            fmt: One of THUMBNAIL_FORMATS
+            page_number: Page to render (0-indexed, PDFs only)
+            content_sha256: Known SHA-256 of the file (shares PDF page renders)
+
+        Returns:
+            Encoded image bytes (never a cache path, which may be evicted)
+
+        Raises:
+            ValueError: Unknown size/format or page out of range
+        """
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"Unknown thumbnail size: {size}")
+        if fmt not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Unknown thumbnail format: {fmt}")
+
+        output_path = self.rendition_path(source_key, size, fmt, page_number)
+        data = page_render_service.read_cached(output_path)
+        if data is not None:
+            return data
+
+        with self._lock_for(str(output_path)):
+            # Another request may have rendered it while we waited
+            data = page_render_service.read_cached(output_path)
+            if data is not None:
+                return data
+
+            img = self._load_page_image(source_path, size, page_number, content_sha256)
+            img.thumbnail(THUMBNAIL_SIZES[size], Image.Resampling.LANCZOS)
+
+            buffer = io.BytesIO()
+            pil_format = THUMBNAIL_FORMATS[fmt][0]
+            if pil_format == 'WEBP':
+                img.save(buffer, pil_format, quality=self.quality, method=4)
+            else:
+                img.save(buffer, pil_format, quality=self.quality, optimize=True)
+            data = buffer.getvalue()
+            page_render_service.store(output_path, data)
+
+        logger.info(f"Thumbnail rendered: {output_path}")
+        return data
+
+    def prerender(
+        self,
+        source_path: Path,
+        source_key: str,
+        sizes: Tuple[str, ...] = ('grid',),
+        fmt: str = 'jpeg',
+        content_sha256: Optional[str] = None
+    ) -> None:
+        """Render renditions ahead of the first request (run as a background task after upload)"""
+        for size in sizes:
+            try:
+                self.get_or_create(source_path, source_key, size=size, fmt=fmt, content_sha256=content_sha256)
+            except Exception as e:
+                logger.warning(f"Background thumbnail rendering failed for {source_path.name} ({size}): {e}")
+
+    def get_for_document(
+        self,
+        document: Dict,
+        size: str = 'grid',
+        fmt: str = 'jpeg',
+        page_number: int = 0
+    ) -> Optional[bytes]:
+        """
+        Resolve a rendition for a document row (id, file_storage_path, thumbnail_path, checksum_sha256)
+
+        Falls back to the thumbnail stored at upload by earlier versions when
+        the source file cannot be rendered.
+
+        Returns:
+            Image bytes, or None if no thumbnail is available
+        """
+        from app.services.file_storage_service import file_storage_service
+
+        checksum = document.get('checksum_sha256')
+        storage_path = document.get('file_storage_path')
+        if storage_path:
+            source_path = file_storage_service.get_file_path(storage_path)
+            if source_path.exists() and self.is_supported(source_path):
+                try:
+                    return self.get_or_create(
+                        source_path,
+                        checksum or str(document['id']),
+                        size=size,
+                        fmt=fmt,
+                        page_number=page_number,
+                        content_sha256=checksum
+                    )
+                except ValueError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Thumbnail rendering failed for document {document['id']}: {e}")
+
+        legacy_path = document.get('thumbnail_path')
+        if legacy_path and size == 'grid' and fmt == 'jpeg' and page_number == 0:
+            legacy_file = file_storage_service.get_file_path(legacy_path)
+            try:
+                return legacy_file.read_bytes()
+            except FileNotFoundError:
+                pass
+        return None
 
     def generate_from_image(
         self,
@@ -97,65 +292,53 @@ class ThumbnailService:
         self,
         pdf_path: Path,
         output_path: Path,
-        page_number: int = 0
+        page_number: int = 0,
+        content_sha256: Optional[str] = None
     ) -> Tuple[bool, Optional[str]]:
         """
         Generate thumbnail from PDF file (first page by default)
 
+        The page image comes from the shared page-render cache, so the same
+        render is reused by classification and metadata extraction.
+
         Args:
             pdf_path: Path to source PDF
             output_path: Path where thumbnail should be saved
             page_number: Page number to generate thumbnail from (0-indexed)
+            content_sha256: Known SHA-256 of the file (optional)
 
         Returns:
             Tuple of (success, error_message)
         """
-        if not PDF_SUPPORT:
+        from app.services.page_render_service import page_render_service, VISION_DPI
+
+        # PDF pages are rendered by page_render_service (PyMuPDF)
+        if not page_render_service.is_available():
             return self._generate_pdf_placeholder(output_path)
 
         try:
-            # Open PDF
-            pdf_document = fitz.open(pdf_path)
-
             # Check if page exists
-            if page_number >= len(pdf_document):
+            if page_number >= page_render_service.get_page_count(pdf_path):
                 page_number = 0
 
-            # Get page
-            page = pdf_document[page_number]
-
-            # Calculate zoom to fit thumbnail size
-            # Get page dimensions
-            page_rect = page.rect
-            page_width = page_rect.width
-            page_height = page_rect.height
-
-            # Calculate zoom factor to fit within thumbnail size
-            zoom_x = self.size[0] / page_width
-            zoom_y = self.size[1] / page_height
-            zoom = min(zoom_x, zoom_y) * 2  # *2 for better quality
-
-            # Create matrix for transformation
-            mat = fitz.Matrix(zoom, zoom)
-
-            # Render page to image
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-
-            # Convert to PIL Image
-            img_data = pix.tobytes("jpeg")
-            img = Image.open(io.BytesIO(img_data))
-
-            # Resize to exact thumbnail size (in case it's larger)
-            img.thumbnail(self.size, Image.Resampling.LANCZOS)
+            # Render (or reuse) the page image
+            page_image = page_render_service.open_page(
+                pdf_path,
+                page_number=page_number,
+                dpi=VISION_DPI,
+                fmt='jpeg',
+                content_sha256=content_sha256
+            )
 
-            # Ensure output directory exists
-            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with page_image as img:
+                # Resize to exact thumbnail size (in case it's larger)
+                img.thumbnail(self.size, Image.Resampling.LANCZOS)
 
-            # Save thumbnail
-            img.save(output_path, THUMBNAIL_FORMAT, quality=self.quality, optimize=True)
+                # Ensure output directory exists
+                output_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # Close PDF
-            pdf_document.close()
+                # Save thumbnail
+                img.save(output_path, THUMBNAIL_FORMAT, quality=self.quality, optimize=True)
 
             logger.info(f"PDF thumbnail generated: {output_path}")
             return True, None
@@ -229,7 +412,8 @@ class ThumbnailService:
         self,
         file_path: Path,
         output_path: Path,
-        file_type: Optional[str] = None
+        file_type: Optional[str] = None,
+        content_sha256: Optional[str] = None
     ) -> Tuple[bool, Optional[str]]:
         """
         Generate thumbnail from any supported file type
@@ -238,6 +422,7 @@ class ThumbnailService:
             file_path: Path to source file
             output_path: Path where thumbnail should be saved
             file_type: File type (pdf, image, etc.) - auto-detected if None
+            content_sha256: Known SHA-256 of the file (shares PDF page renders)
 
         Returns:
             Tuple of (success, error_message)
@@ -254,7 +439,7 @@ class ThumbnailService:
 
         # Generate thumbnail based on type
         if file_type == 'pdf':
-            return self.generate_from_pdf(file_path, output_path)
+            return self.generate_from_pdf(file_path, output_path, content_sha256=content_sha256)
         elif file_type == 'image':
             return self.generate_from_image(file_path, output_path)
         else:
@@ -0,0 +1,181 @@
+"""
+Warehouse Hierarchy Service - Location tree built in one pass and cached in memory
+
+The Location → Warehouse → Zone → Shelf → Rack tree is loaded with a single
+pre-joined query (plus one query for the location row and, optionally, one
+windowed query for a bounded preview of documents per rack), so the number of
+queries no longer grows with the number of racks.
+
+Built trees are cached per location. Create/update/delete endpoints in
+warehouse.py and warehouse_extensions.py invalidate the cache; a short TTL
+bounds staleness from writes made elsewhere (uploads, mobile scans) or by
+other worker processes.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class WarehouseHierarchyCache:
+    """Per-location cache of the warehouse hierarchy tree"""
+
+    def __init__(self, ttl_seconds: int = settings.WAREHOUSE_HIERARCHY_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (location_id, documents_per_rack) -> (built_at, tree)
+        self._trees: Dict[Tuple[str, int], Tuple[float, Dict[str, Any]]] = {}
+        # Bumped on every invalidation so a build that raced a write is not cached
+        self._generation = 0
+
+    def get(self, location_id: UUID, documents_per_rack: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Get the hierarchy for a location, building it on a cache miss
+
+        Returns:
+            Hierarchy dict, or None if the location does not exist
+        """
+        key = (str(location_id), documents_per_rack)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._trees.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                return entry[1]
+            generation = self._generation
+
+        tree = self.build(location_id, documents_per_rack)
+        if tree is None:
+            return None
+
+        with self._lock:
+            if generation == self._generation:
+                self._trees[key] = (now, tree)
+        return tree
+
+    def invalidate(self, location_id: Optional[UUID] = None) -> None:
+        """Drop cached trees for one location, or all locations when not given"""
+        with self._lock:
+            self._generation += 1
+            if location_id is None:
+                self._trees.clear()
+            else:
+                for key in [k for k in self._trees if k[0] == str(location_id)]:
+                    del self._trees[key]
+
+    # ==========================================
+    # Tree construction
+    # ==========================================
+
+    def build(self, location_id: UUID, documents_per_rack: int = 0) -> Optional[Dict[str, Any]]:
+        """Load and assemble the hierarchy for a location (no caching)"""
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT * FROM locations WHERE id = %s", (str(location_id),))
+            location = cursor.fetchone()
+            if not location:
+                return None
+
+            # One row per rack (or per empty warehouse/zone/shelf), parents repeated
+            cursor.execute("""
+                WITH rack_counts AS (
+                    SELECT pd.rack_id, COUNT(*) AS document_count
+                    FROM physical_documents pd
+                    JOIN racks r ON pd.rack_id = r.id
+                    JOIN shelves s ON r.shelf_id = s.id
+                    JOIN zones z ON s.zone_id = z.id
+                    JOIN warehouses w ON z.warehouse_id = w.id
+                    WHERE w.location_id = %s
+                    GROUP BY pd.rack_id
+                )
+                SELECT
+                    to_jsonb(w) AS warehouse,
+                    to_jsonb(z) AS zone,
+                    to_jsonb(s) AS shelf,
+                    to_jsonb(r) AS rack,
+                    COALESCE(rc.document_count, 0) AS document_count
+                FROM warehouses w
+                LEFT JOIN zones z ON z.warehouse_id = w.id
+                LEFT JOIN shelves s ON s.zone_id = z.id
+                LEFT JOIN racks r ON r.shelf_id = s.id
+                LEFT JOIN rack_counts rc ON rc.rack_id = r.id
+                WHERE w.location_id = %s
+                ORDER BY w.name, w.id, z.name, z.id, s.position, s.id, r.position, r.id
+            """, (str(location_id), str(location_id)))
+            rows = cursor.fetchall()
+
+            documents_by_rack: Dict[str, list] = {}
+            if documents_per_rack > 0:
+                cursor.execute("""
+                    SELECT * FROM (
+                        SELECT pd.*, ROW_NUMBER() OVER (
+                            PARTITION BY pd.rack_id ORDER BY pd.title, pd.id
+                        ) AS rack_row
+                        FROM physical_documents pd
+                        JOIN racks r ON pd.rack_id = r.id
+                        JOIN shelves s ON r.shelf_id = s.id
+                        JOIN zones z ON s.zone_id = z.id
+                        JOIN warehouses w ON z.warehouse_id = w.id
+                        WHERE w.location_id = %s
+                    ) ranked
+                    WHERE rack_row <= %s
+                """, (str(location_id), documents_per_rack))
+                for doc in cursor.fetchall():
+                    doc = dict(doc)
+                    doc.pop('rack_row', None)
+                    documents_by_rack.setdefault(str(doc['rack_id']), []).append(doc)
+
+        warehouses: Dict[str, Dict] = {}
+        zones: Dict[str, Dict] = {}
+        shelves: Dict[str, Dict] = {}
+
+        for row in rows:
+            warehouse = row['warehouse']
+            warehouse_node = warehouses.get(warehouse['id'])
+            if warehouse_node is None:
+                warehouse_node = warehouses[warehouse['id']] = {**warehouse, 'zones': []}
+
+            zone = row['zone']
+            if not zone:
+                continue
+            zone_node = zones.get(zone['id'])
+            if zone_node is None:
+                zone_node = zones[zone['id']] = {**zone, 'shelves': []}
+                warehouse_node['zones'].append(zone_node)
+
+            shelf = row['shelf']
+            if not shelf:
+                continue
+            shelf_node = shelves.get(shelf['id'])
+            if shelf_node is None:
+                shelf_node = shelves[shelf['id']] = {**shelf, 'racks': []}
+                zone_node['shelves'].append(shelf_node)
+
+            rack = row['rack']
+            if not rack:
+                continue
+            documents = documents_by_rack.get(rack['id'], [])
+            shelf_node['racks'].append({
+                **rack,
+                'document_count': row['document_count'],
+                'documents': documents,
+                'documents_truncated': row['document_count'] > len(documents)
+            })
+
+        logger.debug(
+            f"Built warehouse hierarchy for location {location_id}: "
+            f"{len(warehouses)} warehouses, {len(shelves)} shelves, {len(rows)} rows"
+        )
+        return {
+            "location": dict(location),
+            "warehouses": list(warehouses.values())
+        }
+
+
+# Singleton instance
+warehouse_hierarchy_cache = WarehouseHierarchyCache()
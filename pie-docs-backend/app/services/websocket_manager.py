@@ -1,122 +1,257 @@
 """
 WebSocket connection manager for real-time notifications.
 Handles user connections, broadcasting, and targeted messaging.
+
+Every connection has a bounded outbound queue drained by its own writer
+task, so sending never waits on a client: messages are queued and the call
+returns. A client whose queue fills up (WEBSOCKET_SEND_QUEUE_SIZE) or whose
+send takes longer than WEBSOCKET_SEND_TIMEOUT_SECONDS is a slow consumer and
+is disconnected (close code 1013, try again later) instead of holding up
+memory or other clients.
+
+Messages are delivered to this process's connections directly and published
+on the notification bus (app/services/notification_bus.py) for the
+connections held by other workers and replicas.
 """
-import logging
-from typing import Dict, Set, Optional, Any
-from fastapi import WebSocket
-from uuid import UUID
+import asyncio
 import json
+import logging
+import time
+from collections import deque
 from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from app.config import settings
+from app.services.notification_bus import notification_bus
 
 logger = logging.getLogger(__name__)
 
+# Close code for dropped slow consumers (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Recent delivery latencies kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+class _Client:
+    """A connection with its outbound queue and writer task"""
+
+    __slots__ = ('websocket', 'user_id', 'queue', 'writer', 'connected_at', 'last_activity')
+
+    def __init__(self, websocket: WebSocket, user_id: str, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        # (message text, time the message was published)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.connected_at = datetime.utcnow().isoformat()
+        self.last_activity = self.connected_at
+
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time notifications"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        queue_size: int = settings.WEBSOCKET_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.WEBSOCKET_SEND_TIMEOUT_SECONDS
+    ):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
         # Store active connections by user_id
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        # Track connection metadata
-        self.connection_metadata: Dict[WebSocket, Dict[str, Any]] = {}
+        self._clients: Dict[WebSocket, _Client] = {}
+        self.bus = notification_bus
+        # Delivery metrics
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._sent = 0
+        self._dropped_clients = 0
+        self._peak_queue_depth = 0
+
+    def start(self):
+        """Start receiving other processes' messages (call from the running event loop)"""
+        self.bus.start(self._on_bus_message)
+
+    async def shutdown(self):
+        await self.bus.shutdown()
+        for websocket in list(self._clients):
+            self.disconnect(websocket)
 
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept and register a new WebSocket connection"""
         await websocket.accept()
 
-        # Initialize user's connection set if not exists
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = set()
-
-        # Add connection to user's set
-        self.active_connections[user_id].add(websocket)
-
-        # Store metadata
-        self.connection_metadata[websocket] = {
-            "user_id": user_id,
-            "connected_at": datetime.utcnow().isoformat(),
-            "last_activity": datetime.utcnow().isoformat()
-        }
+        client = _Client(websocket, user_id, self.queue_size)
+        client.writer = asyncio.get_event_loop().create_task(self._write(client))
+        self._clients[websocket] = client
+        self.active_connections.setdefault(user_id, set()).add(websocket)
 
         logger.info(f"WebSocket connected for user {user_id}. Total connections: {len(self.active_connections[user_id])}")
 
     def disconnect(self, websocket: WebSocket):
-        """Remove a WebSocket connection"""
-        # Find and remove from user's connection set
-        user_id = self.connection_metadata.get(websocket, {}).get("user_id")
-
-        if user_id and user_id in self.active_connections:
-            self.active_connections[user_id].discard(websocket)
+        """Remove a WebSocket connection (safe to call more than once)"""
+        client = self._clients.pop(websocket, None)
+        if client is None:
+            return
 
+        connections = self.active_connections.get(client.user_id)
+        if connections is not None:
+            connections.discard(websocket)
             # Clean up empty user entries
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
+            if not connections:
+                del self.active_connections[client.user_id]
 
-        # Remove metadata
-        if websocket in self.connection_metadata:
-            del self.connection_metadata[websocket]
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
 
-        logger.info(f"WebSocket disconnected for user {user_id}")
+        logger.info(f"WebSocket disconnected for user {client.user_id}")
 
-    async def send_personal_message(self, message: dict, user_id: str):
-        """Send a message to all connections of a specific user"""
-        if user_id not in self.active_connections:
-            logger.debug(f"No active connections for user {user_id}")
-            return
+    # ==========================================
+    # Sending
+    # ==========================================
 
-        message_json = json.dumps(message)
-        disconnected = set()
+    def queue_message(self, websocket: WebSocket, message: dict) -> bool:
+        """Queue a message for one connection of this process (e.g. a reply to the client)"""
+        return self.queue_text(websocket, json.dumps(message, default=str))
 
-        # Send to all user's connections
-        for websocket in self.active_connections[user_id]:
-            try:
-                await websocket.send_text(message_json)
-                # Update last activity
-                if websocket in self.connection_metadata:
-                    self.connection_metadata[websocket]["last_activity"] = datetime.utcnow().isoformat()
-            except Exception as e:
-                logger.error(f"Error sending message to user {user_id}: {e}")
-                disconnected.add(websocket)
+    def queue_text(self, websocket: WebSocket, text: str) -> bool:
+        """Queue an already serialized message for one connection of this process"""
+        client = self._clients.get(websocket)
+        if client is None:
+            return False
+        return self._enqueue(client, text, time.time())
 
-        # Clean up disconnected sockets
-        for websocket in disconnected:
-            self.disconnect(websocket)
+    async def send_personal_message(self, message: dict, user_id: str):
+        """Send a message to all connections of a specific user"""
+        await self.send_batch([([user_id], message)])
 
     async def send_to_multiple_users(self, message: dict, user_ids: list):
         """Send a message to multiple users"""
-        for user_id in user_ids:
-            await self.send_personal_message(message, str(user_id))
+        await self.send_batch([(user_ids, message)])
 
     async def broadcast(self, message: dict):
         """Broadcast a message to all connected users"""
-        message_json = json.dumps(message)
-        disconnected = []
-
-        for user_id, connections in self.active_connections.items():
-            for websocket in connections:
-                try:
-                    await websocket.send_text(message_json)
-                except Exception as e:
-                    logger.error(f"Error broadcasting to user {user_id}: {e}")
-                    disconnected.append(websocket)
-
-        # Clean up disconnected sockets
-        for websocket in disconnected:
-            self.disconnect(websocket)
+        await self.send_batch([(None, message)])
+
+    async def send_batch(self, deliveries: List[Tuple[Optional[Iterable[Any]], dict]]):
+        """
+        Send (user_ids, message) pairs - user_ids None meaning everyone - in
+        order. Local connections get them immediately; other processes get
+        them with a single publish.
+        """
+        published_at = time.time()
+        envelopes = []
+        for user_ids, message in deliveries:
+            users = [str(user_id) for user_id in user_ids] if user_ids is not None else None
+            text = json.dumps(message, default=str)
+            self._deliver(users, text, published_at)
+            envelopes.append({'u': users, 'm': text, 't': published_at})
+        await self.bus.publish(envelopes)
+
+    def _on_bus_message(self, envelope: Dict[str, Any]):
+        self._deliver(envelope.get('u'), envelope['m'], envelope.get('t') or time.time())
+
+    def _deliver(self, user_ids: Optional[List[str]], text: str, published_at: float):
+        if user_ids is None:
+            clients = list(self._clients.values())
+        else:
+            clients = [
+                self._clients[websocket]
+                for user_id in user_ids
+                for websocket in self.active_connections.get(user_id, ())
+            ]
+        for client in clients:
+            self._enqueue(client, text, published_at)
+
+    def _enqueue(self, client: _Client, text: str, published_at: float) -> bool:
+        try:
+            client.queue.put_nowait((text, published_at))
+        except asyncio.QueueFull:
+            self._drop(client, f"outbound queue full ({self.queue_size} messages)")
+            return False
+        depth = client.queue.qsize()
+        if depth > self._peak_queue_depth:
+            self._peak_queue_depth = depth
+        return True
+
+    async def _write(self, client: _Client):
+        """Drain one connection's queue"""
+        while True:
+            text, published_at = await client.queue.get()
+            try:
+                await asyncio.wait_for(client.websocket.send_text(text), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._drop(client, f"send exceeded {self.send_timeout}s")
+                return
+            except Exception as e:
+                logger.error(f"Error sending message to user {client.user_id}: {e}")
+                self.disconnect(client.websocket)
+                return
+            self._sent += 1
+            # Cross-replica latency includes any clock difference between hosts
+            self._latencies.append(max(time.time() - published_at, 0.0))
+            client.last_activity = datetime.utcnow().isoformat()
+
+    def _drop(self, client: _Client, reason: str):
+        """Disconnect a slow consumer"""
+        if client.websocket not in self._clients:
+            return
+        logger.warning(f"Dropping slow WebSocket client for user {client.user_id}: {reason}")
+        self._dropped_clients += 1
+        self.disconnect(client.websocket)
+        asyncio.get_event_loop().create_task(self._close(client.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            pass
+
+    # ==========================================
+    # Introspection
+    # ==========================================
 
     def get_connected_users(self) -> list:
-        """Get list of all connected user IDs"""
+        """Get list of all connected user IDs (this process only)"""
         return list(self.active_connections.keys())
 
     def get_user_connection_count(self, user_id: str) -> int:
-        """Get number of active connections for a user"""
+        """Get number of active connections for a user (this process only)"""
         return len(self.active_connections.get(user_id, set()))
 
     def is_user_connected(self, user_id: str) -> bool:
-        """Check if a user has any active connections"""
+        """Check if a user has any active connections (this process only)"""
         return user_id in self.active_connections and len(self.active_connections[user_id]) > 0
 
+    def get_stats(self) -> Dict[str, Any]:
+        depths = [client.queue.qsize() for client in self._clients.values()]
+        latencies = sorted(self._latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000, 2)
+
+        return {
+            'connections': len(self._clients),
+            'users': len(self.active_connections),
+            'queue_capacity': self.queue_size,
+            'queued_messages': sum(depths),
+            'max_queue_depth': max(depths, default=0),
+            'peak_queue_depth': self._peak_queue_depth,
+            'messages_sent': self._sent,
+            'dropped_clients': self._dropped_clients,
+            'delivery_latency_ms': {
+                'samples': len(latencies),
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(latencies[-1] * 1000, 2) if latencies else None,
+            },
+            'bus': self.bus.get_stats(),
+        }
+
 
 # Global connection manager instance
 connection_manager = ConnectionManager()
@@ -6,10 +6,13 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
 from uuid import UUID
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 
 from app.database import get_db_cursor
+from app.services.notification_store import digest_key, notification_store
+from app.services.workflow_expressions import ExpressionError, compile_expression
+from app.services.workflow_graph import workflow_graph_cache
 
 logger = logging.getLogger(__name__)
 
@@ -236,28 +239,24 @@ class NotificationStepHandler(StepHandler):
                     'data': {}
                 }
 
-            # Create notifications
-            notification_ids = []
-            with get_db_cursor(commit=True) as cursor:
-                for recipient_id in recipients:
-                    cursor.execute(
-                        """
-                        INSERT INTO notifications
-                            (user_id, title, message, notification_type,
-                             related_document_id, is_read)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        RETURNING id
-                        """,
-                        (
-                            recipient_id,
-                            step_data.get('data', {}).get('title', 'Workflow Notification'),
-                            step_data.get('data', {}).get('description', 'A workflow step has been completed'),
-                            notification_type,
-                            str(document_id) if document_id else None,
-                            False
-                        )
-                    )
-                    notification_ids.append(str(cursor.fetchone()['id']))
+            # Create notifications (one insert for all recipients). Repeated
+            # runs of this step coalesce into a digest per recipient.
+            notification_ids = notification_store.add([
+                {
+                    'user_id': recipient_id,
+                    'title': step_data.get('data', {}).get('title', 'Workflow Notification'),
+                    'message': step_data.get('data', {}).get('description', 'A workflow step has been completed'),
+                    'notification_type': notification_type,
+                    'related_document_id': str(document_id) if document_id else None,
+                    'data': {
+                        'workflow_id': str(workflow_id) if workflow_id else None,
+                        'step_id': step_data.get('id'),
+                        'document_id': str(document_id) if document_id else None,
+                    },
+                    'digest_key': digest_key(f"workflow:{workflow_id}:{step_data.get('id')}"),
+                }
+                for recipient_id in recipients
+            ])
 
             logger.info(f"Created {len(notification_ids)} notifications for workflow step")
 
@@ -292,7 +291,9 @@ class DecisionStepHandler(StepHandler):
         execution_context: Dict[str, Any]
     ) -> Dict[str, Any]:
         """
-        Execute a decision step by evaluating conditions
+        Execute a decision step by evaluating its condition expression
+        (see app.services.workflow_expressions) against the execution data.
+        The associated document is available as "document" when referenced.
         """
         try:
             # Extract decision configuration
@@ -300,9 +301,14 @@ class DecisionStepHandler(StepHandler):
             condition = config.get('condition', '')
             execution_data = execution_context.get('execution_data', {})
 
-            # Simple condition evaluation (can be enhanced with expression parser)
-            # For now, check if a key exists in execution data
-            result = self._evaluate_condition(condition, execution_data)
+            # Compiled once per distinct condition
+            expression = compile_expression(condition or '')
+
+            scope = execution_data
+            if 'document' in expression.names and execution_context.get('document_id'):
+                scope = {**execution_data, 'document': self._load_document(execution_context['document_id'])}
+
+            result = expression.test(scope)
 
             logger.info(f"Decision step evaluated: {condition} = {result}")
 
@@ -316,37 +322,29 @@ class DecisionStepHandler(StepHandler):
                 'decision_result': result  # Can be used for routing
             }
 
+        # Routing without a result would silently take a branch, so a
+        # condition that cannot be evaluated fails the execution instead
+        except ExpressionError as e:
+            logger.error(f"Invalid decision condition in step {step_data.get('id')}: {e}")
+            raise ValueError(f"Invalid condition: {str(e)}") from e
         except Exception as e:
             logger.error(f"Error executing decision step: {e}")
-            return {
-                'success': False,
-                'message': f'Failed to evaluate decision: {str(e)}',
-                'data': {}
-            }
-
-    def _evaluate_condition(self, condition: str, data: Dict[str, Any]) -> bool:
-        """
-        Simple condition evaluator
-        TODO: Implement proper expression parser for complex conditions
-        """
-        if not condition:
-            return True
-
-        # Simple key existence check
-        if condition.startswith('has:'):
-            key = condition.replace('has:', '').strip()
-            return key in data
-
-        # Simple equality check
-        if '==' in condition:
-            key, value = condition.split('==')
-            key = key.strip()
-            value = value.strip().strip('"\'')
-            return str(data.get(key)) == value
+            raise
 
-        # Default to True if we can't evaluate
-        logger.warning(f"Could not evaluate condition: {condition}")
-        return True
+    @staticmethod
+    def _load_document(document_id: str) -> Optional[Dict[str, Any]]:
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, title, document_type, author, mime_type, file_size,
+                       created_at, modified_at, metadata, tags
+                FROM documents
+                WHERE id = %s
+                """,
+                (document_id,)
+            )
+            document = cursor.fetchone()
+        return dict(document) if document else None
 
 
 class TimerStepHandler(StepHandler):
@@ -377,7 +375,8 @@ class TimerStepHandler(StepHandler):
                 minutes=delay_minutes
             )
 
-            resume_at = datetime.utcnow() + total_delay
+            # Timezone-aware so it is stored unambiguously in workflow_executions.resume_at
+            resume_at = datetime.now(timezone.utc) + total_delay
 
             logger.info(f"Timer step scheduled to resume at {resume_at}")
 
@@ -389,7 +388,7 @@ class TimerStepHandler(StepHandler):
                     'delay': str(total_delay)
                 },
                 'waiting': True,  # Waiting for timer
-                'resume_at': resume_at
+                'resume_at': resume_at  # Picked up by workflow_timer_scheduler
             }
 
         except Exception as e:
@@ -439,19 +438,13 @@ class WorkflowExecutionEngine:
             execution_id: UUID of the created execution
         """
         try:
-            # Fetch workflow
-            with get_db_cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, name, elements, connections FROM workflows WHERE id = %s",
-                    (str(workflow_id),)
-                )
-                workflow = cursor.fetchone()
+            # Compiled graph of the current workflow version
+            graph = workflow_graph_cache.get(workflow_id)
 
-            if not workflow:
+            if not graph:
                 raise ValueError(f"Workflow {workflow_id} not found")
 
-            elements = workflow['elements'] or []
-            if not elements:
+            if not graph.steps:
                 raise ValueError("Workflow has no elements to execute")
 
             # Create execution record
@@ -476,12 +469,10 @@ class WorkflowExecutionEngine:
 
             logger.info(f"Started workflow execution {execution_id}")
 
-            # Find the first step (element with no incoming connections)
-            first_step = self._find_first_step(elements, workflow['connections'] or [])
-
-            if first_step:
+            # The first step is the element with no incoming connections
+            if graph.first_step_id:
                 # Execute the first step
-                await self.execute_next_step(execution_id, first_step['id'])
+                await self.execute_next_step(execution_id, graph.first_step_id)
             else:
                 logger.warning(f"No starting step found for workflow {workflow_id}")
 
@@ -491,55 +482,33 @@ class WorkflowExecutionEngine:
             logger.error(f"Error starting workflow execution: {e}")
             raise
 
-    def _find_first_step(
-        self,
-        elements: List[Dict[str, Any]],
-        connections: List[Dict[str, Any]]
-    ) -> Optional[Dict[str, Any]]:
-        """Find the first step (element with no incoming connections)"""
-        # Support both 'targetId' and 'target' formats
-        target_ids = {conn.get('targetId') or conn.get('target') for conn in connections}
-
-        for element in elements:
-            if element['id'] not in target_ids:
-                return element
-
-        # If all elements have incoming connections, return the first one
-        return elements[0] if elements else None
-
     async def execute_next_step(self, execution_id: str, step_id: str) -> Dict[str, Any]:
         """Execute the next step in a workflow"""
         try:
-            # Fetch execution and workflow
-            with get_db_cursor() as cursor:
+            # Set the current step and fetch the execution with its workflow
+            # version (the definition itself comes from the graph cache)
+            with get_db_cursor(commit=True) as cursor:
                 cursor.execute(
                     """
-                    SELECT we.*, w.elements, w.connections
-                    FROM workflow_executions we
-                    JOIN workflows w ON w.id = we.workflow_id
-                    WHERE we.id = %s
+                    UPDATE workflow_executions we
+                    SET current_step_id = %s
+                    FROM workflows w
+                    WHERE we.id = %s AND w.id = we.workflow_id
+                    RETURNING we.workflow_id, we.document_id, we.execution_data, w.version
                     """,
-                    (execution_id,)
+                    (step_id, execution_id)
                 )
                 execution = cursor.fetchone()
 
             if not execution:
                 raise ValueError(f"Execution {execution_id} not found")
 
-            # Find the step element
-            elements = execution['elements'] or []
-            step_element = next((e for e in elements if e['id'] == step_id), None)
+            graph = workflow_graph_cache.get(execution['workflow_id'], execution['version'])
+            step_element = graph.get_step(step_id) if graph else None
 
             if not step_element:
                 raise ValueError(f"Step {step_id} not found in workflow")
 
-            # Update current step
-            with get_db_cursor(commit=True) as cursor:
-                cursor.execute(
-                    "UPDATE workflow_executions SET current_step_id = %s WHERE id = %s",
-                    (step_id, execution_id)
-                )
-
             # Get handler and execute
             handler = self.get_handler(step_element['type'])
             if not handler:
@@ -554,25 +523,33 @@ class WorkflowExecutionEngine:
 
             result = await handler.execute(step_element, execution_context)
 
-            # Update execution with result
-            updated_data = {**execution_context['execution_data'], **result.get('data', {})}
+            # Merge the step's data into the execution; timer steps park the
+            # execution as waiting until resume_at
+            resume_at = result.get('resume_at')
 
             with get_db_cursor(commit=True) as cursor:
                 cursor.execute(
                     """
                     UPDATE workflow_executions
-                    SET execution_data = %s::jsonb
+                    SET execution_data = COALESCE(execution_data, '{}'::jsonb) || %s::jsonb,
+                        status = CASE WHEN %s THEN 'waiting' ELSE status END,
+                        resume_at = %s
                     WHERE id = %s
                     """,
-                    (json.dumps(updated_data), execution_id)
+                    (json.dumps(result.get('data', {})), resume_at is not None, resume_at, execution_id)
                 )
 
+            if resume_at is not None:
+                from app.services.workflow_timer_scheduler import workflow_timer_scheduler
+                workflow_timer_scheduler.schedule(resume_at)
+
             # If step is not waiting, move to next step
             if not result.get('waiting'):
-                next_step = self._find_next_step(
+                next_step = graph.next_step_id(
                     step_id,
-                    execution['connections'] or [],
-                    result.get('decision_result')
+                    result.get('decision_result'),
+                    {**execution_context['execution_data'], **result.get('data', {})},
+                    load_document=self._document_loader(execution_context['document_id'])
                 )
 
                 if next_step:
@@ -589,27 +566,50 @@ class WorkflowExecutionEngine:
             await self.complete_execution(execution_id, 'failed', str(e))
             raise
 
-    def _find_next_step(
-        self,
-        current_step_id: str,
-        connections: List[Dict[str, Any]],
-        decision_result: Optional[bool] = None
-    ) -> Optional[str]:
-        """Find the next step to execute"""
-        # Find outgoing connections from current step
-        # Support both 'sourceId'/'source' and 'targetId'/'target' formats
-        outgoing = [c for c in connections if (c.get('sourceId') or c.get('source')) == current_step_id]
-
-        if not outgoing:
+    async def resume_execution(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Continue a waiting execution after its current step (e.g. once a timer
+        is due). Returns the next step's result, or None if the execution was
+        not waiting or had no further steps.
+        """
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute(
+                """
+                UPDATE workflow_executions we
+                SET status = 'running', resume_at = NULL
+                FROM workflows w
+                WHERE we.id = %s AND we.status = 'waiting' AND w.id = we.workflow_id
+                RETURNING we.workflow_id, we.document_id, we.current_step_id, we.execution_data, w.version
+                """,
+                (execution_id,)
+            )
+            execution = cursor.fetchone()
+
+        if not execution:
+            logger.debug(f"Execution {execution_id} is no longer waiting")
             return None
 
-        # If there's a decision result, filter by condition
-        if decision_result is not None:
-            # TODO: Implement condition matching
-            pass
+        graph = workflow_graph_cache.get(execution['workflow_id'], execution['version'])
+        next_step = graph.next_step_id(
+            execution['current_step_id'],
+            data=execution['execution_data'],
+            load_document=self._document_loader(execution['document_id'])
+        ) if graph else None
 
-        # Return the first outgoing connection's target
-        return outgoing[0].get('targetId') or outgoing[0].get('target') if outgoing else None
+        logger.info(f"Resuming execution {execution_id} after step {execution['current_step_id']}")
+
+        if next_step:
+            return await self.execute_next_step(execution_id, next_step)
+
+        await self.complete_execution(execution_id, 'completed')
+        return None
+
+    @staticmethod
+    def _document_loader(document_id: Optional[Any]):
+        """Loads the execution's document for connection conditions that reference it"""
+        if not document_id:
+            return None
+        return lambda: DecisionStepHandler._load_document(str(document_id))
 
     async def complete_execution(
         self,
@@ -0,0 +1,497 @@
+"""
+Workflow Expressions - Safe compiled conditions for workflow decisions
+
+Decision steps and conditional connections use a small expression language
+with Python syntax:
+
+    document.metadata.amount > 10000 and document.document_type == "invoice"
+    vendor.country not in ["US", "CA"] or priority == "urgent"
+    date(document.metadata.due_date) - now() < days(7)
+    has("approval_id") and len(approvers) >= 2
+
+Supported: literals (numbers, strings, true/false/null, lists), names and
+dotted/indexed lookups into the evaluation data, comparisons (==, !=, <, <=,
+>, >=, in, not in), and/or/not, + - * / %, "a if cond else b", and the
+functions in FUNCTIONS. Date strings are parsed when compared with or added
+to dates. Missing fields evaluate to null, and comparisons or arithmetic on
+mismatched types yield false/null instead of raising.
+
+Expressions are parsed with ast and compiled into closures once; nothing is
+ever passed to eval/exec and only whitelisted node types and functions are
+accepted. Compiled expressions are cached by source text, so each distinct
+condition in a workflow version is compiled once per process.
+"""
+import ast
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+MAX_EXPRESSION_LENGTH = 2000
+MAX_EXPRESSION_NODES = 300
+
+# Bare words accepted as literals (besides Python's True/False/None)
+NAMED_CONSTANTS = {'true': True, 'false': False, 'null': None, 'none': None}
+
+Evaluator = Callable[['_Context'], Any]
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be compiled or evaluated"""
+    pass
+
+
+class _Context:
+    __slots__ = ('data', 'now')
+
+    def __init__(self, data: Dict[str, Any], now: datetime):
+        self.data = data
+        self.now = now
+
+
+# ==========================================
+# Value helpers
+# ==========================================
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    """ISO date/datetime string, date or datetime -> timezone-aware datetime (naive = UTC)"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.endswith('Z'):
+            text = text[:-1] + '+00:00'
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _coerce_pair(left: Any, right: Any):
+    """Parse a date string compared against a date"""
+    if isinstance(left, (datetime, date)) and isinstance(right, str):
+        return to_datetime(left), to_datetime(right)
+    if isinstance(right, (datetime, date)) and isinstance(left, str):
+        return to_datetime(left), to_datetime(right)
+    if isinstance(left, date) and isinstance(right, date):
+        return to_datetime(left), to_datetime(right)
+    return left, right
+
+
+def _lookup(value: Any, key: Any) -> Any:
+    if isinstance(value, dict):
+        return value.get(key)
+    if isinstance(value, (list, tuple, str)) and isinstance(key, int) and not isinstance(key, bool):
+        try:
+            return value[key]
+        except IndexError:
+            return None
+    return None
+
+
+def _path_exists(data: Dict[str, Any], path: str) -> bool:
+    value: Any = data
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return False
+        value = value[part]
+    return True
+
+
+def _number(value: Any) -> Optional[float]:
+    if _is_number(value):
+        return value
+    if isinstance(value, str):
+        try:
+            number = float(value.replace(',', '').strip())
+        except ValueError:
+            return None
+        return int(number) if number.is_integer() else number
+    return None
+
+
+def _duration(unit: str) -> Callable[[Any], Optional[timedelta]]:
+    def make(amount: Any) -> Optional[timedelta]:
+        amount = _number(amount)
+        return timedelta(**{unit: amount}) if amount is not None else None
+    return make
+
+
+def _string_function(method: str) -> Callable[..., Any]:
+    def call(value: Any, *args: Any) -> Any:
+        if not isinstance(value, str) or not all(isinstance(arg, str) for arg in args):
+            return None
+        return getattr(value, method)(*args)
+    return call
+
+
+# Functions callable from expressions (plus now(), today() and has(), which need the context)
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    'date': to_datetime,
+    'days': _duration('days'),
+    'hours': _duration('hours'),
+    'minutes': _duration('minutes'),
+    'number': _number,
+    'str': lambda value: str(value),
+    'len': lambda value: len(value) if isinstance(value, (str, list, dict)) else None,
+    'lower': _string_function('lower'),
+    'upper': _string_function('upper'),
+    'startswith': _string_function('startswith'),
+    'endswith': _string_function('endswith'),
+    'abs': lambda value: abs(value) if _is_number(value) else None,
+    'min': lambda *values: min(values) if values and all(_is_number(v) for v in values) else None,
+    'max': lambda *values: max(values) if values and all(_is_number(v) for v in values) else None,
+}
+
+
+# ==========================================
+# Operators
+# ==========================================
+
+def _compare(op: type, left: Any, right: Any) -> bool:
+    if op in (ast.In, ast.NotIn):
+        if isinstance(right, str):
+            found = isinstance(left, str) and left in right
+        elif isinstance(right, (list, tuple, dict, frozenset, set)):
+            try:
+                found = left in right
+            except TypeError:
+                found = False
+        else:
+            found = False
+        return found if op is ast.In else not found
+
+    left, right = _coerce_pair(left, right)
+    if op is ast.Eq:
+        return left == right
+    if op is ast.NotEq:
+        return left != right
+    if left is None or right is None:
+        return False
+    try:
+        if op is ast.Lt:
+            return left < right
+        if op is ast.LtE:
+            return left <= right
+        if op is ast.Gt:
+            return left > right
+        return left >= right
+    except TypeError:
+        return False
+
+
+def _arithmetic(op: type, left: Any, right: Any) -> Any:
+    if left is None or right is None:
+        return None
+
+    # Date strings next to a duration or date are parsed
+    if isinstance(left, str) and isinstance(right, (timedelta, datetime, date)):
+        left = to_datetime(left)
+    if isinstance(right, str) and isinstance(left, (datetime, date)):
+        right = to_datetime(right)
+    if isinstance(left, date) and not isinstance(left, datetime):
+        left = to_datetime(left)
+    if isinstance(right, date) and not isinstance(right, datetime):
+        right = to_datetime(right)
+    if left is None or right is None:
+        return None
+
+    numbers = _is_number(left) and _is_number(right)
+    try:
+        if op is ast.Add:
+            if numbers or (isinstance(left, str) and isinstance(right, str)):
+                return left + right
+            if isinstance(left, (datetime, timedelta)) and isinstance(right, timedelta):
+                return left + right
+            if isinstance(left, timedelta) and isinstance(right, datetime):
+                return right + left
+        elif op is ast.Sub:
+            if numbers:
+                return left - right
+            if isinstance(left, datetime) and isinstance(right, (datetime, timedelta)):
+                return left - right
+            if isinstance(left, timedelta) and isinstance(right, timedelta):
+                return left - right
+        elif op is ast.Mult:
+            if numbers:
+                return left * right
+            if isinstance(left, timedelta) and _is_number(right):
+                return left * right
+            if _is_number(left) and isinstance(right, timedelta):
+                return right * left
+        elif op is ast.Div:
+            if numbers or (isinstance(left, timedelta) and (_is_number(right) or isinstance(right, timedelta))):
+                return left / right
+        elif op is ast.Mod:
+            if numbers:
+                return left % right
+    except (ArithmeticError, OverflowError):
+        return None
+    return None
+
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod)
+_COMPARE_OPERATORS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn)
+
+
+# ==========================================
+# Compiler
+# ==========================================
+
+class _Compiler:
+    """Turns a validated ast into nested closures"""
+
+    def __init__(self):
+        # Top-level data names the expression reads
+        self.names = set()
+
+    def compile(self, node: ast.AST) -> Evaluator:
+        method = getattr(self, f'_{type(node).__name__}', None)
+        if method is None:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+        return method(node)
+
+    @staticmethod
+    def _constant(value: Any) -> Evaluator:
+        return lambda ctx: value
+
+    def _Constant(self, node: ast.Constant) -> Evaluator:
+        if not isinstance(node.value, (str, int, float, bool, type(None))):
+            raise ExpressionError(f"Unsupported literal: {node.value!r}")
+        return self._constant(node.value)
+
+    @staticmethod
+    def _check_identifier(name: str) -> None:
+        if name.startswith('__'):
+            raise ExpressionError(f"Invalid name: {name}")
+
+    def _Name(self, node: ast.Name) -> Evaluator:
+        name = node.id
+        self._check_identifier(name)
+        if name.lower() in NAMED_CONSTANTS:
+            return self._constant(NAMED_CONSTANTS[name.lower()])
+        self.names.add(name)
+        return lambda ctx: ctx.data.get(name)
+
+    def _Attribute(self, node: ast.Attribute) -> Evaluator:
+        self._check_identifier(node.attr)
+        value = self.compile(node.value)
+        key = node.attr
+        return lambda ctx: _lookup(value(ctx), key)
+
+    def _Subscript(self, node: ast.Subscript) -> Evaluator:
+        if isinstance(node.slice, ast.Slice):
+            raise ExpressionError("Slices are not supported")
+        value = self.compile(node.value)
+        key = self.compile(node.slice)
+        return lambda ctx: _lookup(value(ctx), key(ctx))
+
+    def _sequence(self, node) -> Evaluator:
+        items = [self.compile(item) for item in node.elts]
+        return lambda ctx: tuple(item(ctx) for item in items)
+
+    _List = _Tuple = _Set = _sequence
+
+    def _literal_members(self, node: ast.AST) -> Optional[FrozenSet[Any]]:
+        """Members of a literal list used with in/not in, as a set"""
+        if not isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return None
+        members = []
+        for item in node.elts:
+            if isinstance(item, ast.Constant) and isinstance(item.value, (str, int, float, bool, type(None))):
+                members.append(item.value)
+            elif isinstance(item, ast.Name) and item.id.lower() in NAMED_CONSTANTS:
+                members.append(NAMED_CONSTANTS[item.id.lower()])
+            else:
+                return None
+        return frozenset(members)
+
+    def _Compare(self, node: ast.Compare) -> Evaluator:
+        left = self.compile(node.left)
+        steps = []
+        for op, comparator in zip(node.ops, node.comparators):
+            if not isinstance(op, _COMPARE_OPERATORS):
+                raise ExpressionError(f"Unsupported comparison: {type(op).__name__}")
+            members = self._literal_members(comparator) if isinstance(op, (ast.In, ast.NotIn)) else None
+            if members is not None:
+                steps.append((type(op), None, members))
+            else:
+                steps.append((type(op), self.compile(comparator), None))
+
+        if len(steps) == 1:
+            op, right, members = steps[0]
+            if members is not None:
+                negate = op is ast.NotIn
+
+                def membership(ctx):
+                    value = left(ctx)
+                    try:
+                        found = value in members
+                    except TypeError:
+                        found = False
+                    return not found if negate else found
+                return membership
+            return lambda ctx: _compare(op, left(ctx), right(ctx))
+
+        def chained(ctx):
+            current = left(ctx)
+            for op, right, members in steps:
+                value = members if members is not None else right(ctx)
+                if not _compare(op, current, value):
+                    return False
+                current = value
+            return True
+        return chained
+
+    def _BoolOp(self, node: ast.BoolOp) -> Evaluator:
+        values = [self.compile(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            def all_of(ctx):
+                result = True
+                for value in values:
+                    result = value(ctx)
+                    if not result:
+                        return result
+                return result
+            return all_of
+
+        def any_of(ctx):
+            result = False
+            for value in values:
+                result = value(ctx)
+                if result:
+                    return result
+            return result
+        return any_of
+
+    def _UnaryOp(self, node: ast.UnaryOp) -> Evaluator:
+        operand = self.compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda ctx: not operand(ctx)
+        if isinstance(node.op, ast.USub):
+            def negative(ctx):
+                value = operand(ctx)
+                return -value if _is_number(value) or isinstance(value, timedelta) else None
+            return negative
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+
+    def _BinOp(self, node: ast.BinOp) -> Evaluator:
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        op = type(node.op)
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        return lambda ctx: _arithmetic(op, left(ctx), right(ctx))
+
+    def _IfExp(self, node: ast.IfExp) -> Evaluator:
+        test = self.compile(node.test)
+        body = self.compile(node.body)
+        orelse = self.compile(node.orelse)
+        return lambda ctx: body(ctx) if test(ctx) else orelse(ctx)
+
+    def _Call(self, node: ast.Call) -> Evaluator:
+        if not isinstance(node.func, ast.Name):
+            raise ExpressionError("Only built-in functions can be called")
+        if node.keywords:
+            raise ExpressionError("Keyword arguments are not supported")
+        name = node.func.id
+
+        if name == 'now':
+            return lambda ctx: ctx.now
+        if name == 'today':
+            return lambda ctx: ctx.now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if name == 'has':
+            if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str):
+                raise ExpressionError('has() takes one quoted field name, e.g. has("amount")')
+            path = node.args[0].value
+            self.names.add(path.split('.')[0])
+            return lambda ctx: _path_exists(ctx.data, path)
+
+        function = FUNCTIONS.get(name)
+        if function is None:
+            raise ExpressionError(f"Unknown function: {name}")
+        args = [self.compile(arg) for arg in node.args]
+
+        def call(ctx):
+            try:
+                return function(*(arg(ctx) for arg in args))
+            except (TypeError, ValueError, ArithmeticError):
+                return None
+        return call
+
+
+class Expression:
+    """A compiled expression; evaluate() against a dict of data"""
+
+    __slots__ = ('source', 'names', '_evaluate')
+
+    def __init__(self, source: str, names: FrozenSet[str], evaluate: Evaluator):
+        self.source = source
+        # Top-level data names referenced (e.g. to load document data only when needed)
+        self.names = names
+        self._evaluate = evaluate
+
+    def evaluate(self, data: Dict[str, Any], now: Optional[datetime] = None) -> Any:
+        context = _Context(data or {}, now or datetime.now(timezone.utc))
+        try:
+            return self._evaluate(context)
+        except ExpressionError:
+            raise
+        except (TypeError, ValueError, ArithmeticError, RecursionError) as e:
+            raise ExpressionError(f"Error evaluating '{self.source}': {e}")
+
+    def test(self, data: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        return bool(self.evaluate(data, now))
+
+    def __repr__(self):
+        return f"Expression({self.source!r})"
+
+
+# Legacy condition forms: "has:key" and "key == bare-word" (compared as text)
+_LEGACY_HAS = re.compile(r'^\s*has:\s*(.+?)\s*$')
+_LEGACY_EQUALS = re.compile(r'^\s*([A-Za-z_][\w.]*)\s*==\s*([A-Za-z_][\w\-]*)\s*$')
+
+
+def _translate_legacy(source: str) -> str:
+    match = _LEGACY_HAS.match(source)
+    if match:
+        return f'has({match.group(1)!r})'
+    match = _LEGACY_EQUALS.match(source)
+    if match and match.group(2).lower() not in NAMED_CONSTANTS:
+        return f'str({match.group(1)}) == {match.group(2)!r}'
+    return source
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(source: str) -> Expression:
+    """Parse and compile an expression (cached by source text). Raises ExpressionError."""
+    if not isinstance(source, str):
+        raise ExpressionError("Expression must be a string")
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+
+    text = _translate_legacy(source).strip()
+    if not text:
+        return Expression(source, frozenset(), lambda ctx: True)
+
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression '{source}': {e.msg}")
+
+    if sum(1 for _ in ast.walk(tree)) > MAX_EXPRESSION_NODES:
+        raise ExpressionError(f"Expression has more than {MAX_EXPRESSION_NODES} nodes")
+
+    compiler = _Compiler()
+    evaluate = compiler.compile(tree.body)
+    return Expression(source, frozenset(compiler.names), evaluate)
@@ -0,0 +1,213 @@
+"""
+Workflow Graph - Compiled workflow definitions cached per version
+
+A workflow's elements/connections JSON is compiled once into a graph with
+steps indexed by id and outgoing connections indexed by source (connection
+conditions precompiled), and cached by (workflow id, version). The workflows
+router bumps version on every update, so a cached graph never goes stale;
+executions only need to read the version to find their graph.
+
+Routing from a step takes the first outgoing connection whose condition
+holds, else the first unconditional one:
+- condition "true"/"yes" or "false"/"no" (or such a label when the
+  connection has no condition) matches a decision step's result
+- any other condition is an expression (app.services.workflow_expressions)
+  evaluated against the execution data, with the decision result as "result"
+  and the execution's document as "document" (loaded only when referenced)
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import get_db_cursor
+from app.services.workflow_expressions import Expression, ExpressionError, compile_expression
+
+logger = logging.getLogger(__name__)
+
+# Connection conditions/labels that select a decision branch
+BRANCH_WORDS = {'true': True, 'yes': True, 'false': False, 'no': False}
+
+
+class _Route:
+    """Outgoing connection with its precompiled condition"""
+
+    __slots__ = ('target_id', 'branch', 'expression', 'error')
+
+    def __init__(self, connection: Dict[str, Any]):
+        self.target_id = connection.get('targetId') or connection.get('target')
+        # True/False for decision branches, None when unconditional or an expression
+        self.branch: Optional[bool] = None
+        self.expression: Optional[Expression] = None
+        self.error: Optional[str] = None
+
+        condition = (connection.get('condition') or '').strip()
+        label = (connection.get('label') or '').strip().lower()
+        if condition.lower() in BRANCH_WORDS:
+            self.branch = BRANCH_WORDS[condition.lower()]
+        elif condition:
+            try:
+                self.expression = compile_expression(condition)
+            except ExpressionError as e:
+                # Never taken; reported when routing reaches it
+                self.error = str(e)
+        elif label in BRANCH_WORDS:
+            self.branch = BRANCH_WORDS[label]
+
+    @property
+    def conditional(self) -> bool:
+        return self.branch is not None or self.expression is not None or self.error is not None
+
+
+class CompiledWorkflow:
+    """Adjacency-indexed workflow graph for one workflow version"""
+
+    __slots__ = ('workflow_id', 'version', 'steps', 'outgoing', 'first_step_id')
+
+    def __init__(self, workflow_id: str, version: int, elements: List[Dict[str, Any]], connections: List[Dict[str, Any]]):
+        self.workflow_id = workflow_id
+        self.version = version
+        # step id -> element
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        for element in elements:
+            self.steps.setdefault(element['id'], element)
+            # Warm the expression cache with decision conditions (errors surface when the step runs)
+            condition = ((element.get('data') or {}).get('config') or {}).get('condition')
+            if isinstance(condition, str) and condition:
+                try:
+                    compile_expression(condition)
+                except ExpressionError:
+                    pass
+
+        # step id -> outgoing routes (in definition order)
+        # Support both 'sourceId'/'source' and 'targetId'/'target' formats
+        self.outgoing: Dict[str, List[_Route]] = {}
+        target_ids = set()
+        for connection in connections:
+            source_id = connection.get('sourceId') or connection.get('source')
+            route = _Route(connection)
+            target_ids.add(route.target_id)
+            self.outgoing.setdefault(source_id, []).append(route)
+
+        # First step: element with no incoming connections, else the first element
+        self.first_step_id: Optional[str] = next(
+            (element['id'] for element in elements if element['id'] not in target_ids),
+            elements[0]['id'] if elements else None
+        )
+
+    def get_step(self, step_id: str) -> Optional[Dict[str, Any]]:
+        return self.steps.get(step_id)
+
+    def next_step_id(
+        self,
+        step_id: str,
+        decision_result: Optional[bool] = None,
+        data: Optional[Dict[str, Any]] = None,
+        load_document: Optional[Callable[[], Optional[Dict[str, Any]]]] = None
+    ) -> Optional[str]:
+        """
+        Target of the first matching outgoing connection (None ends the
+        workflow); load_document supplies "document" to expressions that use it
+        """
+        outgoing = self.outgoing.get(step_id)
+        if not outgoing:
+            return None
+
+        default = None
+        scope = None
+        for route in outgoing:
+            if not route.conditional:
+                if default is None:
+                    default = route.target_id
+                continue
+
+            if route.branch is not None:
+                if decision_result is not None and bool(decision_result) == route.branch:
+                    return route.target_id
+            elif route.expression is not None:
+                if scope is None:
+                    scope = {**(data or {}), 'result': decision_result}
+                if 'document' in route.expression.names and load_document is not None:
+                    scope['document'] = load_document()
+                    load_document = None
+                try:
+                    if route.expression.test(scope):
+                        return route.target_id
+                except ExpressionError as e:
+                    logger.warning(f"Workflow {self.workflow_id} v{self.version}: {e}")
+            else:
+                logger.warning(f"Workflow {self.workflow_id} v{self.version}: skipping connection to {route.target_id}: {route.error}")
+
+        return default
+
+
+class WorkflowGraphCache:
+    """Process-local LRU of compiled workflows keyed by (workflow id, version)"""
+
+    def __init__(self, max_size: int = settings.WORKFLOW_GRAPH_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._graphs: "OrderedDict[Tuple[str, int], CompiledWorkflow]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, workflow_id: Any, version: Optional[int] = None) -> Optional[CompiledWorkflow]:
+        """
+        Compiled graph of a workflow version. Without a version (or on a miss)
+        the definition is loaded from the database; returns None if the
+        workflow does not exist.
+        """
+        key = (str(workflow_id), version)
+        if version is not None:
+            with self._lock:
+                graph = self._graphs.get(key)
+                if graph is not None:
+                    self._graphs.move_to_end(key)
+                    self._hits += 1
+                    return graph
+
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, version, elements, connections FROM workflows WHERE id = %s",
+                (str(workflow_id),)
+            )
+            workflow = cursor.fetchone()
+
+        if not workflow:
+            return None
+
+        # Cached under the version actually loaded (the row may have moved on)
+        graph = CompiledWorkflow(
+            str(workflow['id']),
+            workflow['version'],
+            workflow['elements'] or [],
+            workflow['connections'] or []
+        )
+        with self._lock:
+            self._misses += 1
+            self._graphs[(graph.workflow_id, graph.version)] = graph
+            self._graphs.move_to_end((graph.workflow_id, graph.version))
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def invalidate(self, workflow_id: Any) -> None:
+        """Drop all cached versions of a workflow (e.g. after it is deleted)"""
+        workflow_id = str(workflow_id)
+        with self._lock:
+            for key in [key for key in self._graphs if key[0] == workflow_id]:
+                del self._graphs[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'cached_graphs': len(self._graphs),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+            }
+
+
+# Singleton instance
+workflow_graph_cache = WorkflowGraphCache()
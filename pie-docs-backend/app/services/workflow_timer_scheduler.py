@@ -0,0 +1,165 @@
+"""
+Durable timer scheduler for workflow executions.
+
+Timer steps park their execution as status 'waiting' with resume_at set
+(migration 29 indexes waiting executions by resume_at). The scheduler sleeps
+until the earliest known resume_at - read from the index, or pushed by the
+engine when it schedules a timer in this process - then claims due
+executions and resumes them.
+
+Every replica runs the scheduler. Claiming is FOR UPDATE SKIP LOCKED and
+moves resume_at forward by a lease instead of clearing it, so each due
+execution is resumed by one replica, and one whose resume was interrupted
+(crash, restart) becomes due again when the lease expires. Timers survive
+restarts because the due time lives only in the database.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# Executions claimed per query
+CLAIM_BATCH_SIZE = 100
+# Executions resumed concurrently
+MAX_CONCURRENT_RESUMES = 20
+
+
+class WorkflowTimerScheduler:
+    """Resumes waiting workflow executions at their resume_at"""
+
+    def __init__(
+        self,
+        poll_seconds: int = settings.WORKFLOW_TIMER_POLL_SECONDS,
+        lease_seconds: int = settings.WORKFLOW_TIMER_LEASE_SECONDS
+    ):
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Earliest known resume_at as a Unix timestamp
+        self._next_due: Optional[float] = None
+        self._resumed = 0
+
+    def start(self):
+        """Start the scheduler on the running event loop"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info("Workflow timer scheduler started")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Workflow timer scheduler stopped")
+
+    def schedule(self, resume_at: datetime):
+        """Wake the scheduler earlier if resume_at precedes the next known due time"""
+        due = resume_at.timestamp()
+        if self._next_due is None or due < self._next_due:
+            self._next_due = due
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    # ==========================================
+    # Loop
+    # ==========================================
+
+    async def _run(self):
+        while True:
+            timeout = self.poll_seconds
+            if self._next_due is not None:
+                timeout = min(timeout, self._next_due - time.time())
+
+            self._wakeup.clear()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            try:
+                await self._resume_due()
+                self._next_due = await run_in_threadpool(self._next_resume_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Workflow timer scheduler error: {e}", exc_info=True)
+
+    async def _resume_due(self):
+        # Imported here: the engine imports this module to schedule timers
+        from app.services.workflow_execution import execution_engine
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_RESUMES)
+
+        async def resume(execution_id: str):
+            async with semaphore:
+                try:
+                    await execution_engine.resume_execution(execution_id)
+                    self._resumed += 1
+                except Exception as e:
+                    # The engine has already marked the execution failed
+                    logger.error(f"Failed to resume workflow execution {execution_id}: {e}")
+
+        while True:
+            execution_ids = await run_in_threadpool(self._claim_due, CLAIM_BATCH_SIZE)
+            if not execution_ids:
+                return
+            await asyncio.gather(*(resume(execution_id) for execution_id in execution_ids))
+            if len(execution_ids) < CLAIM_BATCH_SIZE:
+                return
+
+    def _claim_due(self, limit: int) -> List[str]:
+        """Lease due executions to this process"""
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("""
+                WITH due AS (
+                    SELECT id
+                    FROM workflow_executions
+                    WHERE status = 'waiting'
+                    AND resume_at <= CURRENT_TIMESTAMP
+                    ORDER BY resume_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE workflow_executions we
+                SET resume_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                FROM due
+                WHERE we.id = due.id
+                RETURNING we.id
+            """, (limit, self.lease_seconds))
+            return [str(row['id']) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _next_resume_at() -> Optional[float]:
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                SELECT MIN(resume_at) AS next_due
+                FROM workflow_executions
+                WHERE status = 'waiting' AND resume_at IS NOT NULL
+            """)
+            next_due = cursor.fetchone()['next_due']
+        return next_due.timestamp() if next_due else None
+
+    def get_stats(self):
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'next_due': datetime.fromtimestamp(self._next_due).isoformat() if self._next_due else None,
+            'resumed': self._resumed,
+        }
+
+
+# Global scheduler instance
+workflow_timer_scheduler = WorkflowTimerScheduler()
@@ -0,0 +1,264 @@
+"""
+Conditional and ranged file responses
+
+Shared by the download, preview and thumbnail endpoints:
+- ETag derived from the stored checksum_sha256 (no file read needed)
+- Conditional GET: If-None-Match / If-Modified-Since -> 304 Not Modified
+- Byte ranges: single "bytes=start-end" range -> 206 Partial Content,
+  so PDF viewers can seek and downloads can resume in large files
+- If-Range so a resumed download restarts cleanly if the file changed
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Chunk size for streaming byte ranges
+RANGE_CHUNK_SIZE = 64 * 1024  # 64KB
+
+# Cache policies
+CACHE_REVALIDATE = 'private, no-cache'  # Always revalidate, 304 when unchanged
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'  # Versioned URLs only
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': '*',
+    'Access-Control-Expose-Headers': 'ETag, Last-Modified, Content-Range, Accept-Ranges, Content-Length'
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested byte range lies outside the file"""
+
+
+def make_etag(checksum: Optional[str], stat_result: Optional[os.stat_result] = None, variant: str = '') -> Optional[str]:
+    """
+    Build an ETag, strong when the content checksum is known
+
+    Args:
+        checksum: Stored SHA-256 of the content
+        stat_result: File stat, used for a weak ETag when there is no checksum
+        variant: Distinguishes representations of the same content (e.g. 'thumb')
+    """
+    suffix = f"-{variant}" if variant else ''
+    if checksum:
+        return f'"{checksum}{suffix}"'
+    if stat_result is not None:
+        return f'W/"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}{suffix}"'
+    return None
+
+
+def thumbnail_version(checksum: str) -> str:
+    """Version token appended to thumbnail URLs (?v=...) so they can be cached as immutable"""
+    return checksum[:16]
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if header.strip() == '*':
+        return True
+    bare = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    """Parse an HTTP-date; "-0000" dates come back naive and are taken as UTC"""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def if_range_matches(if_range: str, etag: Optional[str], last_modified: datetime) -> bool:
+    """
+    Evaluate an If-Range header: the Range applies only if it still matches
+
+    Entity tags use strong comparison, so weak tags (W/...) never match.
+    Anything else is an HTTP-date and must equal Last-Modified exactly.
+    """
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return bool(etag) and not if_range.startswith('W/') and not etag.startswith('W/') and if_range == etag
+    since = _parse_http_date(if_range)
+    return since is not None and last_modified.replace(microsecond=0) == since
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return bool(etag) and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified_response(etag: Optional[str], cache_control: str, last_modified: Optional[datetime] = None) -> Response:
+    """304 response carrying the validators and cache policy"""
+    headers = {'Cache-Control': cache_control, **CORS_HEADERS}
+    if etag:
+        headers['ETag'] = etag
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified, usegmt=True)
+    return Response(status_code=304, headers=headers)
+
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into inclusive (start, end)
+
+    Returns None when the header is absent, malformed or multi-range
+    (the full body is served instead, as RFC 9110 allows).
+
+    Raises:
+        RangeNotSatisfiable: If the range starts beyond the end of the file
+    """
+    if not range_header or not range_header.startswith('bytes='):
+        return None
+
+    spec = range_header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+
+    if file_size == 0:
+        raise RangeNotSatisfiable()
+
+    start_str, end_str = (part.strip() for part in spec.split('-', 1))
+    try:
+        if start_str == '':
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, file_size - length), file_size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else file_size - 1
+    except ValueError:
+        return None
+
+    if start >= file_size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, min(end, file_size - 1)
+
+
+def _iter_file_range(file_path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def conditional_bytes_response(
+    request: Request,
+    data: bytes,
+    media_type: str,
+    etag: Optional[str],
+    cache_control: str
+) -> Response:
+    """
+    Serve small in-memory content (thumbnails) with an ETag validator
+
+    Without a checksum ETag, one is derived from the content itself.
+    """
+    etag = etag or f'"{hashlib.sha256(data).hexdigest()}"'
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
+
+    headers: Dict[str, str] = {
+        'Cache-Control': cache_control,
+        'ETag': etag,
+        **CORS_HEADERS
+    }
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+def conditional_file_response(
+    request: Request,
+    file_path: Path,
+    media_type: str,
+    etag: Optional[str],
+    cache_control: str,
+    content_disposition: Optional[str] = None,
+    stat_result: Optional[os.stat_result] = None
+) -> Response:
+    """
+    Serve a file with ETag/Last-Modified validators and single byte-range support
+
+    Callers should check is_not_modified() with the checksum ETag before this,
+    so unchanged files are answered without touching the filesystem.
+    """
+    stat_result = stat_result or file_path.stat()
+    file_size = stat_result.st_size
+    last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+    etag = etag or make_etag(None, stat_result)
+
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, cache_control, last_modified)
+
+    headers: Dict[str, str] = {
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': cache_control,
+        'ETag': etag,
+        'Last-Modified': format_datetime(last_modified, usegmt=True),
+        **CORS_HEADERS
+    }
+    if content_disposition:
+        headers['Content-Disposition'] = content_disposition
+
+    # If-Range: only honour Range when the client's copy is still current
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and if_range and not if_range_matches(if_range, etag, last_modified):
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, file_size)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=416,
+            headers={'Content-Range': f'bytes */{file_size}', **CORS_HEADERS}
+        )
+
+    if byte_range is None:
+        return FileResponse(
+            path=str(file_path),
+            media_type=media_type,
+            headers=headers,
+            stat_result=stat_result
+        )
+
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_file_range(file_path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
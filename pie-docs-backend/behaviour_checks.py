@@ -0,0 +1,25 @@
+"""
+Shared check helpers for the behavioural test scripts (test_*.py)
+
+Each script calls check() for every expectation and finish() at the end,
+which prints the summary and exits non-zero if any check failed.
+"""
+import sys
+
+failures = 0
+
+
+def check(label, actual, expected):
+    """Compare one result with its expected value and print [OK] or [FAIL]"""
+    global failures
+    if actual == expected:
+        print(f"   [OK] {label}: {actual}")
+    else:
+        failures += 1
+        print(f"   [FAIL] {label}: expected {expected}, got {actual}")
+
+
+def finish():
+    """Print the summary and exit with the result"""
+    print(f"\n{'[OK] All checks passed' if not failures else f'[ERROR] {failures} check(s) failed'}")
+    sys.exit(1 if failures else 0)
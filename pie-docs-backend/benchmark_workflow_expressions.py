@@ -0,0 +1,76 @@
+"""
+Micro-benchmark for workflow decision expressions
+(app/services/workflow_expressions.py) on typical invoice-routing conditions.
+
+Reports per-evaluation cost of the compiled expressions and, for
+comparison, the cost of parsing + compiling on every evaluation (what a
+per-execution interpreter without the cache would pay).
+
+Usage: python benchmark_workflow_expressions.py [iterations]
+"""
+import sys
+import time
+from datetime import datetime, timezone
+
+from app.services.workflow_expressions import compile_expression
+
+CONDITIONS = [
+    'document.metadata.amount > 10000',
+    'document.document_type == "invoice" and document.metadata.amount >= 5000',
+    'vendor.country not in ["US", "CA", "MX"] or vendor.risk_score > 70',
+    'date(document.metadata.due_date) - now() < days(7)',
+    'number(document.metadata.total) > 25000 and department in ["finance", "legal"]',
+    'has("po_number") and startswith(po_number, "PO-")',
+    'status == approved',
+    'cost_center == "CC-100" and amount > 1000 and amount <= 50000 and not urgent',
+]
+
+DATA = {
+    'amount': 18250.5,
+    'status': 'approved',
+    'department': 'finance',
+    'cost_center': 'CC-100',
+    'urgent': False,
+    'po_number': 'PO-2026-00123',
+    'vendor': {'name': 'Acme GmbH', 'country': 'DE', 'risk_score': 35},
+    'document': {
+        'document_type': 'invoice',
+        'metadata': {
+            'amount': 18250.5,
+            'total': '18,250.50',
+            'due_date': '2026-11-02',
+            'invoice_number': 'INV-88812',
+        },
+    },
+}
+
+
+def bench(label, func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<12} {elapsed / iterations * 1e6:8.2f} us/eval  ({iterations / elapsed:,.0f} evals/s)")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    now = datetime.now(timezone.utc)
+    uncached_compile = compile_expression.__wrapped__
+
+    print("=" * 80)
+    print(f"Workflow expression benchmark ({iterations:,} iterations per condition)")
+    print("=" * 80)
+
+    for condition in CONDITIONS:
+        expression = compile_expression(condition)
+        print(f"\n{condition}")
+        print(f"  result       {expression.evaluate(DATA, now)}")
+        bench("compiled", lambda: expression.test(DATA, now), iterations)
+        bench("parse+eval", lambda: uncached_compile(condition).test(DATA, now), max(iterations // 20, 1))
+
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+-- ============================================
+-- AI RESULT CACHE
+-- Content-addressed cache of OCR, classification, summary,
+-- key-term and metadata extraction results
+-- ============================================
+-- Results are keyed by the SHA-256 of the file bytes (documents.checksum_sha256),
+-- the AI task, the model and the prompt version, so the cache is shared across
+-- documents: re-uploaded duplicates reuse the earlier result.
+-- Eviction is least-recently-accessed, bounded by total result size
+-- (see AI_RESULT_CACHE_MAX_BYTES in app/config.py).
+
+CREATE TABLE IF NOT EXISTS ai_result_cache (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+
+    -- Cache key
+    content_sha256 VARCHAR(64) NOT NULL,
+    task VARCHAR(100) NOT NULL, -- ocr, classification, summary:short, metadata_extraction, ...
+    model VARCHAR(100) NOT NULL,
+    prompt_version VARCHAR(200) NOT NULL,
+
+    -- Cached payload
+    result_data JSONB NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+
+    -- Usage tracking
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_accessed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT unique_ai_result_cache_key UNIQUE (content_sha256, task, model, prompt_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ai_result_cache_task ON ai_result_cache(task);
+CREATE INDEX IF NOT EXISTS idx_ai_result_cache_last_accessed ON ai_result_cache(last_accessed_at DESC);
+
+COMMENT ON TABLE ai_result_cache IS 'Content-hash keyed cache of AI extraction results shared across documents';
+COMMENT ON COLUMN ai_result_cache.content_sha256 IS 'SHA-256 of the source file bytes';
+COMMENT ON COLUMN ai_result_cache.prompt_version IS 'Prompt version plus any input fingerprint (e.g. available document types)';
+COMMENT ON COLUMN ai_result_cache.size_bytes IS 'Size of result_data in bytes, used for size-bounded eviction';
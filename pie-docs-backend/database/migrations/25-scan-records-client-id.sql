@@ -0,0 +1,22 @@
+-- ============================================
+-- SCAN RECORDS: IDEMPOTENT OFFLINE SYNC
+-- Device-generated client_scan_id so retried bulk uploads
+-- from mobile scanners do not duplicate scan records
+-- ============================================
+-- scan_records is created by migrations/create_warehouse_mobile_tables.sql
+-- (which already includes the column for fresh installs); this upgrades
+-- existing databases. Used by POST /api/v1/warehouse/mobile/scans/bulk with
+-- ON CONFLICT (session_id, client_scan_id) DO NOTHING.
+
+DO $$
+BEGIN
+    IF to_regclass('public.scan_records') IS NOT NULL THEN
+        ALTER TABLE scan_records ADD COLUMN IF NOT EXISTS client_scan_id VARCHAR(100);
+
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_scan_records_client_scan_id
+            ON scan_records(session_id, client_scan_id)
+            WHERE client_scan_id IS NOT NULL;
+
+        COMMENT ON COLUMN scan_records.client_scan_id IS 'ID generated on the scanning device; unique per session so offline re-syncs are idempotent';
+    END IF;
+END $$;
@@ -0,0 +1,19 @@
+-- ============================================
+-- BARCODE CODE ALLOCATION
+-- Sequence backing bulk barcode generation
+-- ============================================
+-- app/services/barcode_allocator.py reserves contiguous blocks of serials
+-- (nextval + setval under an advisory lock) and derives each code from its
+-- serial plus a GS1 mod-10 check digit, so generation jobs never draw
+-- random codes or probe barcode_records for uniqueness.
+
+CREATE SEQUENCE IF NOT EXISTS barcode_code_seq
+    AS BIGINT
+    START WITH 1
+    INCREMENT BY 1
+    NO CYCLE;
+
+COMMENT ON SEQUENCE barcode_code_seq IS 'Serial numbers for generated barcode codes (see barcode_allocator.py)';
+
+-- Jobs are polled while they run in the background
+CREATE INDEX IF NOT EXISTS idx_barcode_jobs_created_at ON barcode_generation_jobs(created_at DESC);
@@ -0,0 +1,113 @@
+-- ============================================
+-- WAREHOUSE CAPACITY COUNTERS
+-- Trigger-maintained occupancy counts
+-- ============================================
+-- racks.current_documents, shelves.current_racks and zones.current_capacity
+-- (number of shelves) were incremented ad hoc by some create paths and never
+-- decremented on moves or deletes, so they drifted. They are now maintained
+-- by row triggers on the child tables and are exact for every write path.
+--
+-- Capacity limits stay enforced by the API (it locks the parent row and
+-- checks the counter before inserting). The "current <= max" CHECKs are
+-- dropped so that writes which deliberately allow over-capacity (uploads)
+-- keep the counters exact instead of failing or skipping the increment.
+
+-- ==========================================
+-- Counter maintenance
+-- ==========================================
+
+-- Shared by the three child tables; TG_ARGV: parent table, counter column, parent FK column
+CREATE OR REPLACE FUNCTION maintain_warehouse_capacity_counter()
+RETURNS TRIGGER AS $$
+DECLARE
+    parent_table TEXT := TG_ARGV[0];
+    counter_column TEXT := TG_ARGV[1];
+    parent_column TEXT := TG_ARGV[2];
+    old_parent UUID;
+    new_parent UUID;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_parent := (to_jsonb(OLD) ->> parent_column)::uuid;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_parent := (to_jsonb(NEW) ->> parent_column)::uuid;
+    END IF;
+
+    IF old_parent IS NOT DISTINCT FROM new_parent THEN
+        RETURN NULL;
+    END IF;
+
+    IF old_parent IS NOT NULL THEN
+        EXECUTE format('UPDATE %I SET %I = GREATEST(%I - 1, 0) WHERE id = $1', parent_table, counter_column, counter_column)
+        USING old_parent;
+    END IF;
+    IF new_parent IS NOT NULL THEN
+        EXECUTE format('UPDATE %I SET %I = %I + 1 WHERE id = $1', parent_table, counter_column, counter_column)
+        USING new_parent;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS physical_documents_rack_counter ON physical_documents;
+CREATE TRIGGER physical_documents_rack_counter
+    AFTER INSERT OR DELETE OR UPDATE OF rack_id ON physical_documents
+    FOR EACH ROW EXECUTE FUNCTION maintain_warehouse_capacity_counter('racks', 'current_documents', 'rack_id');
+
+DROP TRIGGER IF EXISTS racks_shelf_counter ON racks;
+CREATE TRIGGER racks_shelf_counter
+    AFTER INSERT OR DELETE OR UPDATE OF shelf_id ON racks
+    FOR EACH ROW EXECUTE FUNCTION maintain_warehouse_capacity_counter('shelves', 'current_racks', 'shelf_id');
+
+DROP TRIGGER IF EXISTS shelves_zone_counter ON shelves;
+CREATE TRIGGER shelves_zone_counter
+    AFTER INSERT OR DELETE OR UPDATE OF zone_id ON shelves
+    FOR EACH ROW EXECUTE FUNCTION maintain_warehouse_capacity_counter('zones', 'current_capacity', 'zone_id');
+
+-- ==========================================
+-- Constraints
+-- ==========================================
+
+ALTER TABLE zones DROP CONSTRAINT IF EXISTS zones_current_capacity_check;
+ALTER TABLE zones ADD CONSTRAINT zones_current_capacity_check CHECK (current_capacity >= 0);
+
+ALTER TABLE shelves DROP CONSTRAINT IF EXISTS shelves_current_racks_check;
+ALTER TABLE shelves ADD CONSTRAINT shelves_current_racks_check CHECK (current_racks >= 0);
+
+ALTER TABLE racks DROP CONSTRAINT IF EXISTS racks_current_documents_check;
+ALTER TABLE racks ADD CONSTRAINT racks_current_documents_check CHECK (current_documents >= 0);
+
+-- Incremental capacity snapshots read rows changed since a watermark
+CREATE INDEX IF NOT EXISTS idx_zones_updated_at ON zones(updated_at);
+CREATE INDEX IF NOT EXISTS idx_shelves_updated_at ON shelves(updated_at);
+CREATE INDEX IF NOT EXISTS idx_racks_updated_at ON racks(updated_at);
+
+-- ==========================================
+-- Backfill exact counts
+-- ==========================================
+
+UPDATE racks r
+SET current_documents = c.document_count
+FROM (
+    SELECT r2.id, (SELECT COUNT(*) FROM physical_documents d WHERE d.rack_id = r2.id) AS document_count
+    FROM racks r2
+) c
+WHERE r.id = c.id AND r.current_documents <> c.document_count;
+
+UPDATE shelves s
+SET current_racks = c.rack_count
+FROM (
+    SELECT s2.id, (SELECT COUNT(*) FROM racks r WHERE r.shelf_id = s2.id) AS rack_count
+    FROM shelves s2
+) c
+WHERE s.id = c.id AND s.current_racks <> c.rack_count;
+
+UPDATE zones z
+SET current_capacity = c.shelf_count
+FROM (
+    SELECT z2.id, (SELECT COUNT(*) FROM shelves s WHERE s.zone_id = z2.id) AS shelf_count
+    FROM zones z2
+) c
+WHERE z.id = c.id AND z.current_capacity <> c.shelf_count;
+
+COMMENT ON FUNCTION maintain_warehouse_capacity_counter() IS 'Keeps racks.current_documents, shelves.current_racks and zones.current_capacity equal to their child row counts';
@@ -0,0 +1,35 @@
+-- ============================================
+-- APPROVAL ESCALATION DEADLINES
+-- Deadline index and change notifications
+-- ============================================
+-- app/services/approval_scheduler.py sleeps until the earliest pending
+-- deadline instead of polling. It reads upcoming deadlines through the
+-- partial index below and is woken by NOTIFY approval_deadlines whenever a
+-- pending request gets a new or earlier deadline, from any API replica.
+
+-- Matches ESCALATION_ELIGIBLE in app/services/approval_service.py
+CREATE INDEX IF NOT EXISTS idx_approval_requests_escalation_deadline
+    ON approval_requests(deadline)
+    WHERE status = 'pending'
+    AND deadline IS NOT NULL
+    AND (escalation_date IS NULL OR escalation_date < deadline);
+
+-- Payload: deadline as Unix epoch seconds
+CREATE OR REPLACE FUNCTION notify_approval_deadline()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status = 'pending' AND NEW.deadline IS NOT NULL AND (
+        TG_OP = 'INSERT'
+        OR NEW.deadline IS DISTINCT FROM OLD.deadline
+        OR NEW.status IS DISTINCT FROM OLD.status
+    ) THEN
+        PERFORM pg_notify('approval_deadlines', extract(epoch FROM NEW.deadline)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS approval_requests_deadline_notify ON approval_requests;
+CREATE TRIGGER approval_requests_deadline_notify
+    AFTER INSERT OR UPDATE OF deadline, status ON approval_requests
+    FOR EACH ROW EXECUTE FUNCTION notify_approval_deadline();
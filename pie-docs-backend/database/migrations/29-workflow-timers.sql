@@ -0,0 +1,16 @@
+-- ============================================
+-- WORKFLOW TIMERS
+-- Durable resume times for waiting executions
+-- ============================================
+-- Timer steps park an execution as status 'waiting' with resume_at set.
+-- app/services/workflow_timer_scheduler.py reads the earliest resume_at and
+-- claims due executions through the partial index below; while an
+-- execution is being resumed its resume_at is pushed forward by a lease.
+
+ALTER TABLE workflow_executions ADD COLUMN IF NOT EXISTS resume_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_workflow_executions_resume_at
+    ON workflow_executions(resume_at)
+    WHERE status = 'waiting' AND resume_at IS NOT NULL;
+
+COMMENT ON COLUMN workflow_executions.resume_at IS 'When a waiting execution is due to continue after its current (timer) step';
@@ -0,0 +1,21 @@
+-- ============================================
+-- WEBSOCKET MESSAGE SPILL
+-- Oversized cross-replica notification payloads
+-- ============================================
+-- Websocket notifications are fanned out across API workers and replicas
+-- with NOTIFY (app/services/notification_bus.py). NOTIFY payloads are
+-- limited to 8000 bytes, so larger messages are written here and only the
+-- row id is notified; listeners read the row. Rows are short-lived (the
+-- publisher prunes them after a few minutes) and need no crash safety,
+-- hence UNLOGGED.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS websocket_message_spill (
+    id BIGSERIAL PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_websocket_message_spill_created_at
+    ON websocket_message_spill(created_at);
+
+COMMENT ON TABLE websocket_message_spill IS 'Websocket notification payloads too large for NOTIFY, referenced by id from the notification channel';
@@ -0,0 +1,135 @@
+-- ============================================
+-- NOTIFICATION STORE
+-- Event payloads, digests and per-user counters
+-- ============================================
+-- app/services/notification_store.py writes a whole fan-out with one
+-- multi-row insert. Informational notifications can carry a digest_key:
+-- while a user has an unread notification with the same key, further
+-- events are folded into it (event_count, last_event_at, latest payload)
+-- instead of adding rows.
+--
+-- notification_counters keeps each user's total and unread counts. The
+-- triggers below are statement-level with transition tables, so a fan-out
+-- to hundreds of users or a mark-all-read updates the counters with one
+-- grouped upsert per statement, not one per row. Counter rows are always
+-- locked in user_id order (ORDER BY on the upserts, an ordered FOR UPDATE
+-- before the delete path's UPDATE), so two fan-outs touching overlapping
+-- users cannot deadlock on each other. Expired notifications
+-- are still counted here; readers subtract them through
+-- idx_notifications_user_expiring.
+
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS data JSONB;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS digest_key VARCHAR(255);
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS event_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS last_event_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- At most one open (unread) digest per user and key; the ON CONFLICT target
+-- of digest inserts
+CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_open_digest
+    ON notifications(user_id, digest_key)
+    WHERE digest_key IS NOT NULL AND is_read = false;
+
+CREATE INDEX IF NOT EXISTS idx_notifications_user_expiring
+    ON notifications(user_id, expires_at)
+    WHERE expires_at IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS notification_counters (
+    user_id UUID PRIMARY KEY,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION apply_notification_counter_deltas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO notification_counters AS c (user_id, total_count, unread_count)
+        SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE is_read IS NOT TRUE)
+        FROM new_rows
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_count = c.total_count + EXCLUDED.total_count,
+            unread_count = c.unread_count + EXCLUDED.unread_count,
+            updated_at = CURRENT_TIMESTAMP;
+
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM 1
+        FROM notification_counters
+        WHERE user_id IN (SELECT user_id FROM old_rows)
+        ORDER BY user_id
+        FOR UPDATE;
+
+        UPDATE notification_counters c SET
+            total_count = c.total_count - d.total,
+            unread_count = c.unread_count - d.unread,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT user_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE is_read IS NOT TRUE) AS unread
+            FROM old_rows
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+        ) d
+        WHERE c.user_id = d.user_id;
+
+    ELSE
+        -- Read-state (or owner) changes: +1 for the new row, -1 for the old
+        INSERT INTO notification_counters AS c (user_id, total_count, unread_count)
+        SELECT user_id, SUM(total), SUM(unread)
+        FROM (
+            SELECT user_id, 1 AS total, CASE WHEN is_read IS NOT TRUE THEN 1 ELSE 0 END AS unread
+            FROM new_rows
+            UNION ALL
+            SELECT user_id, -1, CASE WHEN is_read IS NOT TRUE THEN -1 ELSE 0 END
+            FROM old_rows
+        ) deltas
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        HAVING SUM(total) <> 0 OR SUM(unread) <> 0
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_count = c.total_count + EXCLUDED.total_count,
+            unread_count = c.unread_count + EXCLUDED.unread_count,
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notification_counters_insert ON notifications;
+CREATE TRIGGER trigger_notification_counters_insert
+    AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_notification_counter_deltas();
+
+DROP TRIGGER IF EXISTS trigger_notification_counters_update ON notifications;
+CREATE TRIGGER trigger_notification_counters_update
+    AFTER UPDATE ON notifications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_notification_counter_deltas();
+
+DROP TRIGGER IF EXISTS trigger_notification_counters_delete ON notifications;
+CREATE TRIGGER trigger_notification_counters_delete
+    AFTER DELETE ON notifications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_notification_counter_deltas();
+
+-- Backfill (and repair) the counters from existing notifications
+INSERT INTO notification_counters (user_id, total_count, unread_count)
+SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE is_read IS NOT TRUE)
+FROM notifications
+WHERE user_id IS NOT NULL
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET
+    total_count = EXCLUDED.total_count,
+    unread_count = EXCLUDED.unread_count,
+    updated_at = CURRENT_TIMESTAMP;
+
+COMMENT ON TABLE notification_counters IS 'Per-user notification totals maintained by statement-level triggers on notifications';
+COMMENT ON COLUMN notifications.digest_key IS 'Notifications with the same key are folded into one unread notification per user';
+COMMENT ON COLUMN notifications.event_count IS 'Number of events folded into this notification';
@@ -0,0 +1,179 @@
+-- ============================================
+-- AUDIT LOG PARTITIONING
+-- Monthly partitions and batch checksum chaining
+-- ============================================
+-- audit_logs becomes a table partitioned by month of created_at (UTC
+-- boundaries), so inserts touch small indexes, time-range queries prune to
+-- a few partitions and old months can be detached or archived as a unit.
+--
+-- The per-row chain trigger (migrations 09/99) read the newest row's
+-- chain_checksum on every insert, serializing all audit writes. Rows now
+-- only get their own checksum on insert. app/services/audit_chain.py
+-- seals new rows asynchronously in batches: each batch hashes its rows'
+-- checksums in (created_at, id) order and chains to the previous batch of
+-- the same partition (audit_log_batches), and its rows point at it through
+-- batch_id. Partitions chain independently and can be verified in
+-- parallel. Rows copied from the old table keep their legacy
+-- chain_checksum and are sealed like new rows.
+
+CREATE OR REPLACE FUNCTION calculate_audit_checksum()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Same fields as the legacy checksum (migration 99); no lookup of other rows
+    NEW.checksum := encode(digest(CONCAT(
+        COALESCE(NEW.user_id::TEXT, ''),
+        COALESCE(NEW.action, ''),
+        COALESCE(NEW.resource_type, ''),
+        COALESCE(NEW.resource_id::TEXT, ''),
+        COALESCE(NEW.metadata::TEXT, '{}'),
+        COALESCE(NEW.ip_address::TEXT, ''),
+        COALESCE(NEW.created_at::TEXT, '')
+    ), 'sha256'), 'hex');
+    NEW.verification_status := 'pending';
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create monthly partitions (with the checksum trigger, which partitioned
+-- tables cannot carry themselves before PostgreSQL 13) covering p_from
+-- through p_months_ahead months after the current month
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(
+    p_from TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    p_months_ahead INTEGER DEFAULT 2
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP;
+    last_month TIMESTAMP;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    month_start := date_trunc('month', LEAST(p_from, CURRENT_TIMESTAMP) AT TIME ZONE 'UTC');
+    last_month := date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC') + make_interval(months => p_months_ahead);
+
+    WHILE month_start <= last_month LOOP
+        partition_name := 'audit_logs_' || to_char(month_start, '"y"YYYY"m"MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start AT TIME ZONE 'UTC',
+                (month_start + INTERVAL '1 month') AT TIME ZONE 'UTC'
+            );
+            EXECUTE format(
+                'CREATE TRIGGER audit_checksum_trigger BEFORE INSERT ON %I '
+                'FOR EACH ROW EXECUTE FUNCTION calculate_audit_checksum()',
+                partition_name
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Batches sealed by app/services/audit_chain.py, chained per partition
+CREATE TABLE IF NOT EXISTS audit_log_batches (
+    id BIGSERIAL PRIMARY KEY,
+    partition_name VARCHAR(63) NOT NULL,
+    row_count INTEGER NOT NULL,
+    first_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    -- sha256 of the rows' checksums concatenated in (created_at, id) order
+    batch_checksum VARCHAR(64) NOT NULL,
+    -- sha256(previous chain_checksum of the partition || batch_checksum)
+    prev_chain_checksum VARCHAR(64) NOT NULL,
+    chain_checksum VARCHAR(64) NOT NULL,
+    sealed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_log_batches_partition ON audit_log_batches(partition_name, id);
+
+DO $$
+DECLARE
+    oldest TIMESTAMP WITH TIME ZONE;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs')
+    ) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned;
+    DROP TRIGGER IF EXISTS audit_checksum_trigger ON audit_logs_unpartitioned;
+
+    CREATE TABLE audit_logs (
+        id UUID NOT NULL DEFAULT uuid_generate_v4(),
+
+        -- Event classification
+        event_type VARCHAR(100) NOT NULL,
+        resource_type VARCHAR(100),
+        resource_id UUID,
+
+        -- Actor information
+        user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+        ip_address VARCHAR(45),
+        user_agent TEXT,
+
+        -- Event details
+        action VARCHAR(100) NOT NULL,
+        description TEXT,
+        metadata JSONB DEFAULT '{}'::jsonb,
+
+        -- Change tracking
+        old_values JSONB,
+        new_values JSONB,
+
+        -- Result
+        success BOOLEAN DEFAULT true,
+        error_message TEXT,
+
+        -- Integrity
+        checksum VARCHAR(64),
+        chain_checksum VARCHAR(64),
+        verification_status VARCHAR(20) DEFAULT 'pending',
+        batch_id BIGINT,
+
+        -- Timestamp
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+        -- Keyset pagination order; also serves created_at range scans
+        PRIMARY KEY (created_at, id)
+    ) PARTITION BY RANGE (created_at);
+
+    -- Rows outside every monthly partition (e.g. clock skew far ahead)
+    CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+    CREATE TRIGGER audit_checksum_trigger BEFORE INSERT ON audit_logs_default
+        FOR EACH ROW EXECUTE FUNCTION calculate_audit_checksum();
+
+    SELECT MIN(created_at) INTO oldest FROM audit_logs_unpartitioned;
+    PERFORM ensure_audit_log_partitions(COALESCE(oldest, CURRENT_TIMESTAMP), 2);
+
+    -- Triggers recompute checksum on insert; legacy rows keep their chain
+    INSERT INTO audit_logs (
+        id, event_type, resource_type, resource_id, user_id, ip_address, user_agent,
+        action, description, metadata, old_values, new_values, success, error_message,
+        chain_checksum, created_at
+    )
+    SELECT
+        id, event_type, resource_type, resource_id, user_id, ip_address, user_agent,
+        action, description, metadata, old_values, new_values, success, error_message,
+        chain_checksum, COALESCE(created_at, CURRENT_TIMESTAMP)
+    FROM audit_logs_unpartitioned;
+
+    DROP TABLE audit_logs_unpartitioned;
+END $$;
+
+-- Indexes on the parent cascade to every partition
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_resource ON audit_logs(resource_type, resource_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_event ON audit_logs(event_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_metadata ON audit_logs USING gin(metadata);
+-- Rows waiting to be sealed into a batch
+CREATE INDEX IF NOT EXISTS idx_audit_logs_unsealed ON audit_logs(created_at) WHERE batch_id IS NULL;
+
+COMMENT ON TABLE audit_logs IS 'Comprehensive audit trail for all system events, partitioned by month';
+COMMENT ON COLUMN audit_logs.batch_id IS 'Sealed batch (audit_log_batches) whose chained hash covers this row';
+COMMENT ON COLUMN audit_logs.chain_checksum IS 'Legacy per-row chain (rows written before partitioning); new rows are chained per batch';
+COMMENT ON TABLE audit_log_batches IS 'Hash-chained batches of audit log rows, one chain per partition';
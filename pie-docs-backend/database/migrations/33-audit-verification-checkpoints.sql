@@ -0,0 +1,24 @@
+-- ============================================
+-- AUDIT VERIFICATION CHECKPOINTS
+-- Last verified batch per audit log partition
+-- ============================================
+-- app/services/audit_verification.py verifies the batch hash chains of
+-- audit_logs partitions (migration 32) in parallel. After a partition
+-- verifies, the last batch checked and its chain_checksum are recorded
+-- here, so the next run only checks newer batches: it confirms the
+-- checkpointed batch still carries the same chain_checksum and continues
+-- the chain from it. Rows are streamed in (batch_id, created_at, id)
+-- order, served by an index on the parent that cascades to every partition.
+
+CREATE TABLE IF NOT EXISTS audit_verification_checkpoints (
+    partition_name VARCHAR(63) PRIMARY KEY,
+    last_batch_id BIGINT NOT NULL,
+    chain_checksum VARCHAR(64) NOT NULL,
+    verified_batches BIGINT NOT NULL DEFAULT 0,
+    verified_rows BIGINT NOT NULL DEFAULT 0,
+    verified_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_batch ON audit_logs(batch_id, created_at, id) WHERE batch_id IS NOT NULL;
+
+COMMENT ON TABLE audit_verification_checkpoints IS 'Per-partition audit chain verification progress; later runs resume after last_batch_id';
@@ -0,0 +1,222 @@
+-- ============================================
+-- CHECKOUT ANALYTICS ROLLUP
+-- Trigger-maintained checkout dashboard aggregates
+-- ============================================
+-- GET /api/v1/checkinout/analytics used to run seven aggregates over all of
+-- document_checkout_records per request. The aggregates are now kept in
+-- rollup tables by statement-level triggers (transition tables, like the
+-- notification counters of migration 31): each checkout, check-in, extend
+-- or force check-in adds its rows' contributions and subtracts their old
+-- ones, and statements that change nothing the rollups count leave them
+-- untouched. The endpoint reads everything in one query
+-- (app/services/checkout_analytics.py).
+--
+-- is_overdue only changes when something rewrites it, so the service also
+-- runs mark_overdue_checkouts() periodically; the flags it sets flow into
+-- the rollups through the same triggers.
+--
+-- rebuild_checkout_analytics() recomputes all rollups from scratch
+-- (backfill below, or repair).
+
+-- Single row of whole-table totals
+CREATE TABLE IF NOT EXISTS checkout_analytics_totals (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    active_count BIGINT NOT NULL DEFAULT 0,          -- status = 'checked-out'
+    overdue_count BIGINT NOT NULL DEFAULT 0,         -- is_overdue = true
+    completed_count BIGINT NOT NULL DEFAULT 0,       -- checkin_date IS NOT NULL
+    completed_hours_sum NUMERIC NOT NULL DEFAULT 0,  -- sum of (checkin_date - checkout_date) in hours
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO checkout_analytics_totals (id) VALUES (true) ON CONFLICT (id) DO NOTHING;
+
+-- Active checkouts per department ('Unassigned' when the record has none)
+CREATE TABLE IF NOT EXISTS checkout_analytics_departments (
+    department VARCHAR(100) PRIMARY KEY,
+    active_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Check-ins per calendar day
+CREATE TABLE IF NOT EXISTS checkout_analytics_daily_checkins (
+    checkin_day DATE PRIMARY KEY,
+    checkin_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- All-time checkouts per document; rows of deleted documents are dropped by
+-- the join on read
+CREATE TABLE IF NOT EXISTS checkout_analytics_documents (
+    document_id UUID PRIMARY KEY,
+    checkout_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_checkout_analytics_documents_count
+    ON checkout_analytics_documents(checkout_count DESC);
+
+-- Overdue list of the dashboard (oldest due first)
+CREATE INDEX IF NOT EXISTS idx_checkout_records_overdue_due
+    ON document_checkout_records(due_date)
+    WHERE is_overdue = true;
+
+-- ==========================================
+-- Incremental maintenance
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION apply_checkout_analytics_deltas()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes_sql TEXT;
+BEGIN
+    -- +1 for every new row version, -1 for every old one
+    changes_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+        ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1 AS sign, * FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        WITH changes AS (%s),
+        totals AS (
+            UPDATE checkout_analytics_totals t SET
+                active_count = t.active_count + d.active,
+                overdue_count = t.overdue_count + d.overdue,
+                completed_count = t.completed_count + d.completed,
+                completed_hours_sum = t.completed_hours_sum + d.hours,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT
+                    COALESCE(SUM(sign) FILTER (WHERE status = 'checked-out'), 0) AS active,
+                    COALESCE(SUM(sign) FILTER (WHERE is_overdue = true), 0) AS overdue,
+                    COALESCE(SUM(sign) FILTER (WHERE checkin_date IS NOT NULL), 0) AS completed,
+                    COALESCE(SUM(sign * EXTRACT(EPOCH FROM (checkin_date - checkout_date)) / 3600)
+                        FILTER (WHERE checkin_date IS NOT NULL), 0) AS hours
+                FROM changes
+            ) d
+            WHERE t.id AND (d.active <> 0 OR d.overdue <> 0 OR d.completed <> 0 OR d.hours <> 0)
+        ),
+        departments AS (
+            INSERT INTO checkout_analytics_departments AS c (department, active_count)
+            SELECT COALESCE(user_department, 'Unassigned'), SUM(sign)
+            FROM changes
+            WHERE status = 'checked-out'
+            GROUP BY 1
+            HAVING SUM(sign) <> 0
+            ON CONFLICT (department) DO UPDATE SET active_count = c.active_count + EXCLUDED.active_count
+        ),
+        daily AS (
+            INSERT INTO checkout_analytics_daily_checkins AS c (checkin_day, checkin_count)
+            SELECT checkin_date::date, SUM(sign)
+            FROM changes
+            WHERE checkin_date IS NOT NULL
+            GROUP BY 1
+            HAVING SUM(sign) <> 0
+            ON CONFLICT (checkin_day) DO UPDATE SET checkin_count = c.checkin_count + EXCLUDED.checkin_count
+        )
+        INSERT INTO checkout_analytics_documents AS c (document_id, checkout_count)
+        SELECT document_id, SUM(sign)
+        FROM changes
+        GROUP BY 1
+        HAVING SUM(sign) <> 0
+        ON CONFLICT (document_id) DO UPDATE SET checkout_count = c.checkout_count + EXCLUDED.checkout_count
+    $sql$, changes_sql);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_checkout_analytics_insert ON document_checkout_records;
+CREATE TRIGGER trigger_checkout_analytics_insert
+    AFTER INSERT ON document_checkout_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_checkout_analytics_deltas();
+
+DROP TRIGGER IF EXISTS trigger_checkout_analytics_update ON document_checkout_records;
+CREATE TRIGGER trigger_checkout_analytics_update
+    AFTER UPDATE ON document_checkout_records
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_checkout_analytics_deltas();
+
+DROP TRIGGER IF EXISTS trigger_checkout_analytics_delete ON document_checkout_records;
+CREATE TRIGGER trigger_checkout_analytics_delete
+    AFTER DELETE ON document_checkout_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_checkout_analytics_deltas();
+
+-- ==========================================
+-- Overdue sweep and rebuild
+-- ==========================================
+
+-- Now returns the number of checkouts newly flagged (was void)
+DROP FUNCTION IF EXISTS mark_overdue_checkouts();
+CREATE FUNCTION mark_overdue_checkouts()
+RETURNS INTEGER AS $$
+DECLARE
+    flagged INTEGER;
+BEGIN
+    UPDATE document_checkout_records
+    SET is_overdue = true,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE status = 'checked-out'
+      AND is_active = true
+      AND due_date < CURRENT_TIMESTAMP
+      AND is_overdue = false;
+    GET DIAGNOSTICS flagged = ROW_COUNT;
+    RETURN flagged;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_checkout_analytics()
+RETURNS void AS $$
+BEGIN
+    -- Blocks checkout writes for the duration so no delta is lost
+    LOCK TABLE document_checkout_records IN SHARE MODE;
+
+    UPDATE checkout_analytics_totals t SET
+        active_count = s.active,
+        overdue_count = s.overdue,
+        completed_count = s.completed,
+        completed_hours_sum = s.hours,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT
+            COUNT(*) FILTER (WHERE status = 'checked-out') AS active,
+            COUNT(*) FILTER (WHERE is_overdue = true) AS overdue,
+            COUNT(*) FILTER (WHERE checkin_date IS NOT NULL) AS completed,
+            COALESCE(SUM(EXTRACT(EPOCH FROM (checkin_date - checkout_date)) / 3600)
+                FILTER (WHERE checkin_date IS NOT NULL), 0) AS hours
+        FROM document_checkout_records
+    ) s
+    WHERE t.id;
+
+    DELETE FROM checkout_analytics_departments;
+    INSERT INTO checkout_analytics_departments (department, active_count)
+    SELECT COALESCE(user_department, 'Unassigned'), COUNT(*)
+    FROM document_checkout_records
+    WHERE status = 'checked-out'
+    GROUP BY 1;
+
+    DELETE FROM checkout_analytics_daily_checkins;
+    INSERT INTO checkout_analytics_daily_checkins (checkin_day, checkin_count)
+    SELECT checkin_date::date, COUNT(*)
+    FROM document_checkout_records
+    WHERE checkin_date IS NOT NULL
+    GROUP BY 1;
+
+    DELETE FROM checkout_analytics_documents;
+    INSERT INTO checkout_analytics_documents (document_id, checkout_count)
+    SELECT document_id, COUNT(*)
+    FROM document_checkout_records
+    GROUP BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill
+SELECT rebuild_checkout_analytics();
+
+COMMENT ON TABLE checkout_analytics_totals IS 'Checkout dashboard totals maintained by statement-level triggers on document_checkout_records';
+COMMENT ON TABLE checkout_analytics_departments IS 'Active checkouts per department, trigger-maintained';
+COMMENT ON TABLE checkout_analytics_daily_checkins IS 'Check-ins per day, trigger-maintained';
+COMMENT ON TABLE checkout_analytics_documents IS 'All-time checkouts per document, trigger-maintained';
+COMMENT ON FUNCTION rebuild_checkout_analytics() IS 'Recomputes the checkout analytics rollups from document_checkout_records';
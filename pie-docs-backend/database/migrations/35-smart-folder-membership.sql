@@ -0,0 +1,260 @@
+-- ============================================
+-- SMART FOLDER MEMBERSHIP
+-- Materialized smart folder contents, maintained incrementally
+-- ============================================
+-- A smart folder's smart_criteria (SmartFolderCriteria in the frontend) are
+-- evaluated once and their result is stored in smart_folder_members, so
+-- listing a smart folder is an indexed read.
+--
+-- Criteria ANDed together; list criteria match any of their values:
+--   documentTypes    document_type (case-insensitive)
+--   status           status (case-insensitive)
+--   authors          author
+--   tags             tags
+--   dateRange        created_at between start and end (inclusive dates)
+--   sizeRange        file_size between min and max (either may be null)
+--   contentKeywords  full-text match of any keyword (search_vector)
+--
+-- Membership is kept current by triggers on both sides:
+-- - documents: when a matching-relevant column changes, the document is
+--   checked only against candidate folders found through the inverted index
+--   smart_folder_terms, not against every folder. Each folder is indexed
+--   under the values of one list criterion (its anchor: tags, then authors,
+--   documentTypes, status), which every member must match. Folders with
+--   only range/keyword criteria are indexed under ('*', '*') and are
+--   candidates for every document.
+-- - folders: creating a smart folder or changing its criteria, type or
+--   deleted_at re-materializes that folder, pre-filtered by its anchor.
+
+CREATE TABLE IF NOT EXISTS smart_folder_members (
+    folder_id UUID NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    matched_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (folder_id, document_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_smart_folder_members_document ON smart_folder_members(document_id);
+
+-- Inverted index of folder criteria: (field, term) -> folders anchored on it
+CREATE TABLE IF NOT EXISTS smart_folder_terms (
+    field VARCHAR(32) NOT NULL,
+    term TEXT NOT NULL,
+    folder_id UUID NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    PRIMARY KEY (field, term, folder_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_smart_folder_terms_folder ON smart_folder_terms(folder_id);
+
+-- Anchor pre-filters of folder re-materialization
+CREATE INDEX IF NOT EXISTS idx_documents_tags ON documents USING gin(tags);
+CREATE INDEX IF NOT EXISTS idx_documents_author ON documents(author);
+
+-- ==========================================
+-- Matching
+-- ==========================================
+
+-- Values of a criteria list, or NULL when the criterion is absent or empty
+CREATE OR REPLACE FUNCTION smart_criteria_values(c JSONB, field TEXT, lowercase BOOLEAN DEFAULT false)
+RETURNS TEXT[] AS $$
+    SELECT NULLIF(ARRAY(
+        SELECT CASE WHEN lowercase THEN lower(value) ELSE value END
+        FROM jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(c -> field) = 'array' THEN c -> field ELSE '[]'::jsonb END
+        ) AS value
+        WHERE value <> ''
+    ), '{}');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION smart_folder_matches(c JSONB, d documents)
+RETURNS BOOLEAN AS $$
+    SELECT d.deleted_at IS NULL
+        AND (smart_criteria_values(c, 'documentTypes', true) IS NULL
+             OR lower(d.document_type) = ANY(smart_criteria_values(c, 'documentTypes', true)))
+        AND (smart_criteria_values(c, 'status', true) IS NULL
+             OR lower(d.status) = ANY(smart_criteria_values(c, 'status', true)))
+        AND (smart_criteria_values(c, 'authors') IS NULL
+             OR d.author = ANY(smart_criteria_values(c, 'authors')))
+        AND (smart_criteria_values(c, 'tags') IS NULL
+             OR d.tags && smart_criteria_values(c, 'tags'))
+        AND (NULLIF(c #>> '{dateRange,start}', '') IS NULL
+             OR d.created_at >= (c #>> '{dateRange,start}')::date)
+        AND (NULLIF(c #>> '{dateRange,end}', '') IS NULL
+             OR d.created_at < (c #>> '{dateRange,end}')::date + 1)
+        AND (jsonb_typeof(c #> '{sizeRange,min}') IS DISTINCT FROM 'number'
+             OR d.file_size >= (c #>> '{sizeRange,min}')::numeric)
+        AND (jsonb_typeof(c #> '{sizeRange,max}') IS DISTINCT FROM 'number'
+             OR d.file_size <= (c #>> '{sizeRange,max}')::numeric)
+        AND (smart_criteria_values(c, 'contentKeywords') IS NULL
+             OR EXISTS (
+                 SELECT 1 FROM unnest(smart_criteria_values(c, 'contentKeywords')) AS keyword
+                 WHERE d.search_vector @@ plainto_tsquery('english', keyword)
+             ));
+$$ LANGUAGE sql STABLE;
+
+-- Index entries of a folder: the values of its anchor criterion
+CREATE OR REPLACE FUNCTION smart_folder_criteria_terms(c JSONB)
+RETURNS TABLE (field TEXT, term TEXT) AS $$
+    SELECT anchor.field, unnest(anchor.terms)
+    FROM (
+        SELECT field, terms
+        FROM (VALUES
+            (1, 'tags', smart_criteria_values(c, 'tags')),
+            (2, 'authors', smart_criteria_values(c, 'authors')),
+            (3, 'documentTypes', smart_criteria_values(c, 'documentTypes', true)),
+            (4, 'status', smart_criteria_values(c, 'status', true)),
+            (5, '*', ARRAY['*'])
+        ) AS anchors(priority, field, terms)
+        WHERE terms IS NOT NULL
+        ORDER BY priority
+        LIMIT 1
+    ) anchor;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Index lookup keys of a document
+CREATE OR REPLACE FUNCTION smart_folder_document_terms(d documents)
+RETURNS TABLE (field TEXT, term TEXT) AS $$
+    SELECT 'tags', tag FROM unnest(d.tags) AS tag
+    UNION ALL SELECT 'authors', d.author WHERE d.author IS NOT NULL
+    UNION ALL SELECT 'documentTypes', lower(d.document_type) WHERE d.document_type IS NOT NULL
+    UNION ALL SELECT 'status', lower(d.status) WHERE d.status IS NOT NULL
+    UNION ALL SELECT '*', '*';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ==========================================
+-- Maintenance
+-- ==========================================
+
+-- Re-index and re-materialize one folder; returns its member count
+CREATE OR REPLACE FUNCTION refresh_smart_folder_members(p_folder_id UUID)
+RETURNS INTEGER AS $$
+DECLARE
+    folder RECORD;
+    anchor_field TEXT;
+    anchor_terms TEXT[];
+    prefilter TEXT;
+    members INTEGER;
+BEGIN
+    SELECT id, folder_type, smart_criteria, deleted_at INTO folder
+    FROM folders WHERE id = p_folder_id;
+
+    DELETE FROM smart_folder_terms WHERE folder_id = p_folder_id;
+
+    IF folder.id IS NULL OR folder.folder_type IS DISTINCT FROM 'smart'
+       OR folder.deleted_at IS NOT NULL OR folder.smart_criteria IS NULL THEN
+        DELETE FROM smart_folder_members WHERE folder_id = p_folder_id;
+        RETURN 0;
+    END IF;
+
+    INSERT INTO smart_folder_terms (field, term, folder_id)
+    SELECT DISTINCT t.field, t.term, p_folder_id
+    FROM smart_folder_criteria_terms(folder.smart_criteria) t;
+
+    SELECT t.field, array_agg(t.term) INTO anchor_field, anchor_terms
+    FROM smart_folder_terms t
+    WHERE t.folder_id = p_folder_id
+    GROUP BY t.field;
+
+    prefilter := CASE anchor_field
+        WHEN 'tags' THEN 'd.tags && $2'
+        WHEN 'authors' THEN 'd.author = ANY($2)'
+        WHEN 'documentTypes' THEN 'lower(d.document_type) = ANY($2)'
+        WHEN 'status' THEN 'lower(d.status) = ANY($2)'
+        ELSE 'true'
+    END;
+
+    EXECUTE format($sql$
+        WITH matched AS (
+            SELECT d.id FROM documents d
+            WHERE d.deleted_at IS NULL AND %s AND smart_folder_matches($1, d)
+        ),
+        removed AS (
+            DELETE FROM smart_folder_members m
+            WHERE m.folder_id = $3
+            AND NOT EXISTS (SELECT 1 FROM matched WHERE matched.id = m.document_id)
+        )
+        INSERT INTO smart_folder_members (folder_id, document_id)
+        SELECT $3, id FROM matched
+        ON CONFLICT (folder_id, document_id) DO NOTHING
+    $sql$, prefilter) USING folder.smart_criteria, anchor_terms, p_folder_id;
+
+    UPDATE folders SET last_refreshed_at = CURRENT_TIMESTAMP WHERE id = p_folder_id;
+
+    SELECT COUNT(*) INTO members FROM smart_folder_members WHERE folder_id = p_folder_id;
+    RETURN members;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_folder_smart_membership()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_smart_folder_members(NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Match one changed document against its candidate folders
+CREATE OR REPLACE FUNCTION sync_document_smart_membership()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH matched AS (
+        SELECT f.id
+        FROM folders f
+        WHERE f.id IN (
+            SELECT t.folder_id
+            FROM smart_folder_document_terms(NEW) dt
+            JOIN smart_folder_terms t ON t.field = dt.field AND t.term = dt.term
+        )
+        AND f.folder_type = 'smart'
+        AND f.deleted_at IS NULL
+        AND smart_folder_matches(f.smart_criteria, NEW)
+    ),
+    removed AS (
+        DELETE FROM smart_folder_members m
+        WHERE m.document_id = NEW.id
+        AND NOT EXISTS (SELECT 1 FROM matched WHERE matched.id = m.folder_id)
+    )
+    INSERT INTO smart_folder_members (folder_id, document_id)
+    SELECT id, NEW.id FROM matched
+    ON CONFLICT (folder_id, document_id) DO NOTHING;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_folders_smart_membership ON folders;
+CREATE TRIGGER trigger_folders_smart_membership
+    AFTER INSERT OR UPDATE OF smart_criteria, folder_type, deleted_at ON folders
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_folder_smart_membership();
+
+DROP TRIGGER IF EXISTS trigger_documents_smart_membership_insert ON documents;
+CREATE TRIGGER trigger_documents_smart_membership_insert
+    AFTER INSERT ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_document_smart_membership();
+
+-- Only when a column the criteria can read actually changes
+DROP TRIGGER IF EXISTS trigger_documents_smart_membership_update ON documents;
+CREATE TRIGGER trigger_documents_smart_membership_update
+    AFTER UPDATE OF document_type, status, author, tags, created_at, file_size,
+        title, content, ocr_text, deleted_at ON documents
+    FOR EACH ROW
+    WHEN (
+        OLD.document_type IS DISTINCT FROM NEW.document_type
+        OR OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.author IS DISTINCT FROM NEW.author
+        OR OLD.tags IS DISTINCT FROM NEW.tags
+        OR OLD.created_at IS DISTINCT FROM NEW.created_at
+        OR OLD.file_size IS DISTINCT FROM NEW.file_size
+        OR OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.content IS DISTINCT FROM NEW.content
+        OR OLD.ocr_text IS DISTINCT FROM NEW.ocr_text
+        OR OLD.deleted_at IS DISTINCT FROM NEW.deleted_at
+    )
+    EXECUTE FUNCTION sync_document_smart_membership();
+
+-- Backfill existing smart folders
+SELECT refresh_smart_folder_members(id) FROM folders WHERE folder_type = 'smart';
+
+COMMENT ON TABLE smart_folder_members IS 'Materialized smart folder contents, maintained by triggers on documents and folders';
+COMMENT ON TABLE smart_folder_terms IS 'Inverted index of smart folder criteria: candidate folders per document field value';
@@ -0,0 +1,308 @@
+-- ============================================
+-- FOLDER CLOSURE TABLE AND SUBTREE STATISTICS
+-- Indexed hierarchy reads and cached per-subtree aggregates
+-- ============================================
+-- folder_closure holds one row per (ancestor, descendant) pair, including
+-- each folder with itself at depth 0, so a subtree or an ancestor chain is
+-- one indexed lookup instead of a recursive CTE over deep trees
+-- (client/year/month/type).
+--
+-- folder_stats caches per folder:
+--   document_count / total_size           documents directly in the folder
+--   subtree_document_count / _total_size  documents in the folder and all
+--                                         of its descendants
+--   subtree_folder_count                  descendant folders
+-- Only documents with deleted_at IS NULL count; soft-deleted folders keep
+-- counting toward their ancestors (like the folder_statistics view).
+--
+-- Both are maintained by triggers. Closure maintenance must run after the
+-- folder row exists, so it is an AFTER trigger next to the BEFORE
+-- trigger_folder_path of migration 18, keyed on parent_id (the column the
+-- API writes). Document inserts, moves, size changes and (soft) deletes
+-- apply their delta to the folder's ancestor rows, locked in id order.
+-- rebuild_folder_stats() recomputes everything.
+
+CREATE TABLE IF NOT EXISTS folder_closure (
+    ancestor_id UUID NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    descendant_id UUID NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_folder_closure_descendant ON folder_closure(descendant_id, depth);
+
+CREATE TABLE IF NOT EXISTS folder_stats (
+    folder_id UUID PRIMARY KEY REFERENCES folders(id) ON DELETE CASCADE,
+    document_count BIGINT NOT NULL DEFAULT 0,
+    total_size BIGINT NOT NULL DEFAULT 0,
+    subtree_document_count BIGINT NOT NULL DEFAULT 0,
+    subtree_total_size BIGINT NOT NULL DEFAULT 0,
+    subtree_folder_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Folder document listings (newest modified first)
+CREATE INDEX IF NOT EXISTS idx_documents_folder_modified
+    ON documents(folder_id, modified_at DESC)
+    WHERE deleted_at IS NULL;
+
+-- ==========================================
+-- Statistics maintenance
+-- ==========================================
+
+-- Add a document delta to a folder and all of its ancestors
+CREATE OR REPLACE FUNCTION apply_folder_stats_delta(p_folder_id UUID, p_count BIGINT, p_size BIGINT)
+RETURNS void AS $$
+BEGIN
+    -- The folder is being hard-deleted (cascade): its ancestors were
+    -- already adjusted by remove_folder_from_stats()
+    IF NOT EXISTS (SELECT 1 FROM folders WHERE id = p_folder_id) THEN
+        RETURN;
+    END IF;
+
+    -- Lock in a fixed order so concurrent writers under a shared ancestor
+    -- queue instead of deadlocking
+    PERFORM 1 FROM folder_stats
+    WHERE folder_id IN (SELECT ancestor_id FROM folder_closure WHERE descendant_id = p_folder_id)
+    ORDER BY folder_id
+    FOR UPDATE;
+
+    UPDATE folder_stats s SET
+        document_count = s.document_count + CASE WHEN c.depth = 0 THEN p_count ELSE 0 END,
+        total_size = s.total_size + CASE WHEN c.depth = 0 THEN p_size ELSE 0 END,
+        subtree_document_count = s.subtree_document_count + p_count,
+        subtree_total_size = s.subtree_total_size + p_size,
+        updated_at = CURRENT_TIMESTAMP
+    FROM folder_closure c
+    WHERE c.descendant_id = p_folder_id
+    AND s.folder_id = c.ancestor_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_document_folder_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_folder UUID;
+    new_folder UUID;
+    old_size BIGINT := 0;
+    new_size BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+        old_folder := OLD.folder_id;
+        old_size := COALESCE(OLD.file_size, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.deleted_at IS NULL THEN
+        new_folder := NEW.folder_id;
+        new_size := COALESCE(NEW.file_size, 0);
+    END IF;
+
+    IF old_folder IS NOT DISTINCT FROM new_folder THEN
+        IF new_folder IS NOT NULL AND old_size <> new_size THEN
+            PERFORM apply_folder_stats_delta(new_folder, 0, new_size - old_size);
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    IF old_folder IS NOT NULL THEN
+        PERFORM apply_folder_stats_delta(old_folder, -1, -old_size);
+    END IF;
+    IF new_folder IS NOT NULL THEN
+        PERFORM apply_folder_stats_delta(new_folder, 1, new_size);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_documents_folder_stats ON documents;
+CREATE TRIGGER trigger_documents_folder_stats
+    AFTER INSERT OR DELETE ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_document_folder_stats();
+
+DROP TRIGGER IF EXISTS trigger_documents_folder_stats_update ON documents;
+CREATE TRIGGER trigger_documents_folder_stats_update
+    AFTER UPDATE OF folder_id, file_size, deleted_at ON documents
+    FOR EACH ROW
+    WHEN (
+        OLD.folder_id IS DISTINCT FROM NEW.folder_id
+        OR OLD.file_size IS DISTINCT FROM NEW.file_size
+        OR OLD.deleted_at IS DISTINCT FROM NEW.deleted_at
+    )
+    EXECUTE FUNCTION sync_document_folder_stats();
+
+-- ==========================================
+-- Closure maintenance
+-- ==========================================
+
+-- Add (p_sign = 1) or remove (-1) a folder's whole subtree from the
+-- aggregates of its proper ancestors
+CREATE OR REPLACE FUNCTION shift_folder_subtree_stats(p_folder_id UUID, p_sign INTEGER)
+RETURNS void AS $$
+DECLARE
+    moved_documents BIGINT;
+    moved_size BIGINT;
+    moved_folders INTEGER;
+BEGIN
+    SELECT subtree_document_count, subtree_total_size, subtree_folder_count + 1
+    INTO moved_documents, moved_size, moved_folders
+    FROM folder_stats WHERE folder_id = p_folder_id;
+
+    PERFORM 1 FROM folder_stats
+    WHERE folder_id IN (
+        SELECT ancestor_id FROM folder_closure WHERE descendant_id = p_folder_id AND depth > 0
+    )
+    ORDER BY folder_id
+    FOR UPDATE;
+
+    UPDATE folder_stats s SET
+        subtree_document_count = s.subtree_document_count + p_sign * COALESCE(moved_documents, 0),
+        subtree_total_size = s.subtree_total_size + p_sign * COALESCE(moved_size, 0),
+        subtree_folder_count = s.subtree_folder_count + p_sign * COALESCE(moved_folders, 1),
+        updated_at = CURRENT_TIMESTAMP
+    FROM folder_closure c
+    WHERE c.descendant_id = p_folder_id
+    AND c.depth > 0
+    AND s.folder_id = c.ancestor_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_folder_closure()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0
+        UNION ALL
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM folder_closure
+        WHERE descendant_id = NEW.parent_id;
+
+        INSERT INTO folder_stats (folder_id) VALUES (NEW.id)
+        ON CONFLICT (folder_id) DO NOTHING;
+        PERFORM shift_folder_subtree_stats(NEW.id, 1);
+        RETURN NULL;
+    END IF;
+
+    IF OLD.parent_id IS NOT DISTINCT FROM NEW.parent_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM folder_closure
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+    ) THEN
+        RAISE EXCEPTION 'Cannot move folder % into itself or its descendants', NEW.id;
+    END IF;
+
+    -- Detach the subtree from its old ancestors...
+    PERFORM shift_folder_subtree_stats(NEW.id, -1);
+    DELETE FROM folder_closure c
+    USING folder_closure sub
+    WHERE sub.ancestor_id = NEW.id
+    AND c.descendant_id = sub.descendant_id
+    AND c.ancestor_id NOT IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id);
+
+    -- ...and attach it under the new parent
+    INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM folder_closure sup
+    CROSS JOIN folder_closure sub
+    WHERE sup.descendant_id = NEW.parent_id
+    AND sub.ancestor_id = NEW.id;
+    PERFORM shift_folder_subtree_stats(NEW.id, 1);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Hard deletes: the folder's subtree leaves its ancestors' aggregates. A
+-- cascaded child whose parent is already gone was covered by the parent.
+CREATE OR REPLACE FUNCTION remove_folder_from_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.parent_id IS NULL OR EXISTS (SELECT 1 FROM folders WHERE id = OLD.parent_id) THEN
+        PERFORM shift_folder_subtree_stats(OLD.id, -1);
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_folder_closure ON folders;
+CREATE TRIGGER trigger_folder_closure
+    AFTER INSERT OR UPDATE OF parent_id ON folders
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_folder_closure();
+
+DROP TRIGGER IF EXISTS trigger_folder_stats_delete ON folders;
+CREATE TRIGGER trigger_folder_stats_delete
+    BEFORE DELETE ON folders
+    FOR EACH ROW
+    EXECUTE FUNCTION remove_folder_from_stats();
+
+-- ==========================================
+-- Rebuild and backfill
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION rebuild_folder_closure()
+RETURNS void AS $$
+BEGIN
+    LOCK TABLE folders IN SHARE MODE;
+    DELETE FROM folder_closure;
+
+    INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE walk AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+        FROM folders
+        UNION ALL
+        SELECT w.ancestor_id, f.id, w.depth + 1
+        FROM walk w
+        JOIN folders f ON f.parent_id = w.descendant_id
+        WHERE w.depth < 256
+    )
+    SELECT ancestor_id, descendant_id, MIN(depth)
+    FROM walk
+    GROUP BY ancestor_id, descendant_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_folder_stats()
+RETURNS void AS $$
+BEGIN
+    -- Waits for in-flight deltas, and holds new ones until the rebuild commits
+    LOCK TABLE folder_stats IN EXCLUSIVE MODE;
+    DELETE FROM folder_stats;
+
+    INSERT INTO folder_stats (
+        folder_id, document_count, total_size,
+        subtree_document_count, subtree_total_size, subtree_folder_count
+    )
+    WITH direct AS (
+        SELECT folder_id, COUNT(*) AS documents, COALESCE(SUM(file_size), 0) AS size
+        FROM documents
+        WHERE deleted_at IS NULL AND folder_id IS NOT NULL
+        GROUP BY folder_id
+    ),
+    subtree AS (
+        SELECT c.ancestor_id,
+               COALESCE(SUM(d.documents), 0) AS documents,
+               COALESCE(SUM(d.size), 0) AS size,
+               COUNT(*) - 1 AS folders
+        FROM folder_closure c
+        LEFT JOIN direct d ON d.folder_id = c.descendant_id
+        GROUP BY c.ancestor_id
+    )
+    SELECT f.id,
+           COALESCE(d.documents, 0), COALESCE(d.size, 0),
+           COALESCE(s.documents, 0), COALESCE(s.size, 0), COALESCE(s.folders, 0)
+    FROM folders f
+    LEFT JOIN direct d ON d.folder_id = f.id
+    LEFT JOIN subtree s ON s.ancestor_id = f.id;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_folder_closure();
+SELECT rebuild_folder_stats();
+
+COMMENT ON TABLE folder_closure IS 'Ancestor/descendant pairs of the folder hierarchy (depth 0 = the folder itself)';
+COMMENT ON TABLE folder_stats IS 'Cached direct and subtree document counts and sizes per folder, maintained by triggers';
+COMMENT ON FUNCTION rebuild_folder_stats() IS 'Recomputes folder_stats from documents and folder_closure';
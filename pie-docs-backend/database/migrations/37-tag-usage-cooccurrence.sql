@@ -0,0 +1,142 @@
+-- ============================================
+-- TAG USAGE AND CO-OCCURRENCE
+-- Trigger-maintained tag counts and tag pair matrix
+-- ============================================
+-- Documents carry their tags in documents.tags (the upload path writes the
+-- array directly), so tags.usage_count was never updated. It is now kept
+-- equal to the number of live documents (deleted_at IS NULL) carrying the
+-- tag by a row trigger on documents, which also creates tags rows for new
+-- tag names.
+--
+-- tag_cooccurrence(tag_a, tag_b) counts the live documents carrying both
+-- tags, stored in both directions so "tags related to X" is an index
+-- range scan on tag_a. The same trigger applies the difference between a
+-- document's old and new tag pairs; pairs that drop to zero are removed so
+-- the matrix stays sparse.
+--
+-- Tag names longer than tags.name allows are not counted.
+-- rebuild_tag_index() recomputes both from documents.
+
+CREATE TABLE IF NOT EXISTS tag_cooccurrence (
+    tag_a VARCHAR(100) NOT NULL,
+    tag_b VARCHAR(100) NOT NULL,
+    document_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tag_a, tag_b)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tag_cooccurrence_related ON tag_cooccurrence(tag_a, document_count DESC);
+CREATE INDEX IF NOT EXISTS idx_tags_usage_count ON tags(usage_count DESC);
+
+-- Distinct, sorted, countable tags of a tag array
+CREATE OR REPLACE FUNCTION normalized_document_tags(p_tags TEXT[])
+RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_agg(DISTINCT tag ORDER BY tag), '{}')
+    FROM unnest(p_tags) AS tag
+    WHERE length(tag) BETWEEN 1 AND 100;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION sync_document_tag_index()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_tags TEXT[] := '{}';
+    new_tags TEXT[] := '{}';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+        old_tags := normalized_document_tags(OLD.tags);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.deleted_at IS NULL THEN
+        new_tags := normalized_document_tags(NEW.tags);
+    END IF;
+
+    IF old_tags = new_tags THEN
+        RETURN NULL;
+    END IF;
+
+    -- Rows are upserted in name order so concurrent writers lock popular
+    -- tags in the same order. A removed tag without a tags row has nothing
+    -- to decrement and is skipped rather than inserted with a negative count.
+    INSERT INTO tags AS t (name, usage_count)
+    SELECT name, SUM(delta)
+    FROM (
+        SELECT unnest(new_tags) AS name, 1 AS delta
+        UNION ALL
+        SELECT unnest(old_tags), -1
+    ) deltas
+    GROUP BY name
+    HAVING SUM(delta) > 0
+        OR (SUM(delta) < 0 AND EXISTS (SELECT 1 FROM tags WHERE tags.name = deltas.name))
+    ORDER BY name
+    ON CONFLICT (name) DO UPDATE SET usage_count = GREATEST(t.usage_count + EXCLUDED.usage_count, 0);
+
+    INSERT INTO tag_cooccurrence AS c (tag_a, tag_b, document_count)
+    SELECT tag_a, tag_b, SUM(delta)
+    FROM (
+        SELECT a.tag AS tag_a, b.tag AS tag_b, 1 AS delta
+        FROM unnest(new_tags) a(tag), unnest(new_tags) b(tag)
+        WHERE a.tag <> b.tag
+        UNION ALL
+        SELECT a.tag, b.tag, -1
+        FROM unnest(old_tags) a(tag), unnest(old_tags) b(tag)
+        WHERE a.tag <> b.tag
+    ) deltas
+    GROUP BY tag_a, tag_b
+    HAVING SUM(delta) <> 0
+    ORDER BY tag_a, tag_b
+    ON CONFLICT (tag_a, tag_b) DO UPDATE SET document_count = c.document_count + EXCLUDED.document_count;
+
+    IF cardinality(old_tags) > 1 THEN
+        DELETE FROM tag_cooccurrence
+        WHERE tag_a = ANY(old_tags) AND tag_b = ANY(old_tags) AND document_count <= 0;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_documents_tag_index ON documents;
+CREATE TRIGGER trigger_documents_tag_index
+    AFTER INSERT OR DELETE ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_document_tag_index();
+
+DROP TRIGGER IF EXISTS trigger_documents_tag_index_update ON documents;
+CREATE TRIGGER trigger_documents_tag_index_update
+    AFTER UPDATE OF tags, deleted_at ON documents
+    FOR EACH ROW
+    WHEN (OLD.tags IS DISTINCT FROM NEW.tags OR OLD.deleted_at IS DISTINCT FROM NEW.deleted_at)
+    EXECUTE FUNCTION sync_document_tag_index();
+
+CREATE OR REPLACE FUNCTION rebuild_tag_index()
+RETURNS void AS $$
+BEGIN
+    -- Holds document tag changes until the rebuild commits
+    LOCK TABLE tags, tag_cooccurrence IN EXCLUSIVE MODE;
+
+    CREATE TEMP TABLE live_document_tags ON COMMIT DROP AS
+    SELECT d.id AS document_id, tag
+    FROM documents d, unnest(normalized_document_tags(d.tags)) AS tag
+    WHERE d.deleted_at IS NULL;
+
+    UPDATE tags SET usage_count = 0 WHERE usage_count <> 0;
+    INSERT INTO tags AS t (name, usage_count)
+    SELECT tag, COUNT(*)
+    FROM live_document_tags
+    GROUP BY tag
+    ON CONFLICT (name) DO UPDATE SET usage_count = EXCLUDED.usage_count;
+
+    DELETE FROM tag_cooccurrence;
+    INSERT INTO tag_cooccurrence (tag_a, tag_b, document_count)
+    SELECT a.tag, b.tag, COUNT(*)
+    FROM live_document_tags a
+    JOIN live_document_tags b ON b.document_id = a.document_id AND b.tag <> a.tag
+    GROUP BY a.tag, b.tag;
+
+    DROP TABLE live_document_tags;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill (replaces the seeded usage counts with real ones)
+SELECT rebuild_tag_index();
+
+COMMENT ON TABLE tag_cooccurrence IS 'Live documents carrying both tags, stored in both directions; maintained by triggers on documents';
+COMMENT ON COLUMN tags.usage_count IS 'Live documents carrying the tag in documents.tags; maintained by triggers';
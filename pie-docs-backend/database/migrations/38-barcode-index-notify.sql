@@ -0,0 +1,60 @@
+-- ============================================
+-- BARCODE INDEX CHANGE NOTIFICATIONS
+-- Keeps every worker's in-memory barcode index current
+-- ============================================
+-- app/services/barcode_index.py holds zones, shelves, racks, physical
+-- documents and the location tree in process memory. Each worker LISTENs
+-- on barcode_index and re-reads the notified rows, so a change committed
+-- through any worker or replica (or directly in SQL) reaches every index
+-- within the NOTIFY delivery delay instead of waiting for a full reload.
+--
+-- Payload: '<table>:<id>'. Postgres folds identical payloads within one
+-- transaction, so a row changed several times is notified once.
+
+CREATE OR REPLACE FUNCTION notify_barcode_index_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    row_id UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    PERFORM pg_notify('barcode_index', TG_TABLE_NAME || ':' || row_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only the columns the index holds (name, barcode, status, parent) notify
+
+DROP TRIGGER IF EXISTS locations_barcode_index_notify ON locations;
+CREATE TRIGGER locations_barcode_index_notify
+    AFTER INSERT OR DELETE OR UPDATE OF name, status ON locations
+    FOR EACH ROW EXECUTE FUNCTION notify_barcode_index_change();
+
+DROP TRIGGER IF EXISTS warehouses_barcode_index_notify ON warehouses;
+CREATE TRIGGER warehouses_barcode_index_notify
+    AFTER INSERT OR DELETE OR UPDATE OF name, barcode, status, location_id ON warehouses
+    FOR EACH ROW EXECUTE FUNCTION notify_barcode_index_change();
+
+DROP TRIGGER IF EXISTS zones_barcode_index_notify ON zones;
+CREATE TRIGGER zones_barcode_index_notify
+    AFTER INSERT OR DELETE OR UPDATE OF name, barcode, status, warehouse_id ON zones
+    FOR EACH ROW EXECUTE FUNCTION notify_barcode_index_change();
+
+DROP TRIGGER IF EXISTS shelves_barcode_index_notify ON shelves;
+CREATE TRIGGER shelves_barcode_index_notify
+    AFTER INSERT OR DELETE OR UPDATE OF name, barcode, status, zone_id ON shelves
+    FOR EACH ROW EXECUTE FUNCTION notify_barcode_index_change();
+
+DROP TRIGGER IF EXISTS racks_barcode_index_notify ON racks;
+CREATE TRIGGER racks_barcode_index_notify
+    AFTER INSERT OR DELETE OR UPDATE OF name, barcode, status, shelf_id ON racks
+    FOR EACH ROW EXECUTE FUNCTION notify_barcode_index_change();
+
+DROP TRIGGER IF EXISTS physical_documents_barcode_index_notify ON physical_documents;
+CREATE TRIGGER physical_documents_barcode_index_notify
+    AFTER INSERT OR DELETE OR UPDATE OF title, barcode, status, rack_id ON physical_documents
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_barcode_index_change();
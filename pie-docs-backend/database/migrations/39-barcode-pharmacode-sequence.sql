@@ -0,0 +1,24 @@
+-- ============================================
+-- PHARMACODE SERIALS
+-- Separate sequence for the bounded pharmacode range
+-- ============================================
+-- Pharmacode can only encode 3..131070. Drawing it from barcode_code_seq
+-- (migration 26) meant every other format's jobs used up that range, and
+-- pharmacode jobs failed once the shared sequence passed 131070.
+-- barcode_allocator.py now reserves pharmacode serials from this sequence,
+-- starting past the highest pharmacode already issued.
+
+CREATE SEQUENCE IF NOT EXISTS barcode_pharmacode_seq
+    AS BIGINT
+    START WITH 3
+    MINVALUE 3
+    INCREMENT BY 1
+    NO CYCLE;
+
+SELECT setval('barcode_pharmacode_seq', MAX(r.code::bigint))
+FROM barcode_records r
+JOIN barcode_formats f ON f.id = r.format_id
+WHERE f.standard = 'pharmacode' AND r.code ~ '^[0-9]{1,6}$'
+HAVING MAX(r.code::bigint) BETWEEN 3 AND 131070;
+
+COMMENT ON SEQUENCE barcode_pharmacode_seq IS 'Serial numbers for generated pharmacodes, 3..131070 (see barcode_allocator.py)';
@@ -0,0 +1,152 @@
+-- ============================================
+-- STRIPED CHECKOUT ANALYTICS TOTALS
+-- Spread the dashboard totals over shard rows
+-- ============================================
+-- Migration 34 kept the dashboard totals in a single row, so every
+-- checkout, check-in, extend and overdue sweep updated the same row and
+-- concurrent checkout transactions queued behind each other's row lock.
+-- The totals now live in CHECKOUT_TOTAL_SHARDS (16) rows: each statement
+-- adds its delta to the row picked by its backend PID, and readers sum
+-- the shards (app/services/checkout_analytics.py).
+--
+-- The per-department, per-day and per-document upserts now run in key
+-- order, so two statements touching the same keys lock them in the same
+-- order instead of deadlocking.
+
+CREATE TABLE IF NOT EXISTS checkout_analytics_total_shards (
+    shard SMALLINT PRIMARY KEY CHECK (shard BETWEEN 0 AND 15),
+    active_count BIGINT NOT NULL DEFAULT 0,          -- status = 'checked-out'
+    overdue_count BIGINT NOT NULL DEFAULT 0,         -- is_overdue = true
+    completed_count BIGINT NOT NULL DEFAULT 0,       -- checkin_date IS NOT NULL
+    completed_hours_sum NUMERIC NOT NULL DEFAULT 0,  -- sum of (checkin_date - checkout_date) in hours
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO checkout_analytics_total_shards (shard)
+SELECT generate_series(0, 15)
+ON CONFLICT (shard) DO NOTHING;
+
+-- ==========================================
+-- Incremental maintenance
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION apply_checkout_analytics_deltas()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes_sql TEXT;
+BEGIN
+    -- +1 for every new row version, -1 for every old one
+    changes_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+        ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1 AS sign, * FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        WITH changes AS (%s),
+        totals AS (
+            UPDATE checkout_analytics_total_shards t SET
+                active_count = t.active_count + d.active,
+                overdue_count = t.overdue_count + d.overdue,
+                completed_count = t.completed_count + d.completed,
+                completed_hours_sum = t.completed_hours_sum + d.hours,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT
+                    COALESCE(SUM(sign) FILTER (WHERE status = 'checked-out'), 0) AS active,
+                    COALESCE(SUM(sign) FILTER (WHERE is_overdue = true), 0) AS overdue,
+                    COALESCE(SUM(sign) FILTER (WHERE checkin_date IS NOT NULL), 0) AS completed,
+                    COALESCE(SUM(sign * EXTRACT(EPOCH FROM (checkin_date - checkout_date)) / 3600)
+                        FILTER (WHERE checkin_date IS NOT NULL), 0) AS hours
+                FROM changes
+            ) d
+            WHERE t.shard = pg_backend_pid() %% 16
+              AND (d.active <> 0 OR d.overdue <> 0 OR d.completed <> 0 OR d.hours <> 0)
+        ),
+        departments AS (
+            INSERT INTO checkout_analytics_departments AS c (department, active_count)
+            SELECT COALESCE(user_department, 'Unassigned'), SUM(sign)
+            FROM changes
+            WHERE status = 'checked-out'
+            GROUP BY 1
+            HAVING SUM(sign) <> 0
+            ORDER BY 1
+            ON CONFLICT (department) DO UPDATE SET active_count = c.active_count + EXCLUDED.active_count
+        ),
+        daily AS (
+            INSERT INTO checkout_analytics_daily_checkins AS c (checkin_day, checkin_count)
+            SELECT checkin_date::date, SUM(sign)
+            FROM changes
+            WHERE checkin_date IS NOT NULL
+            GROUP BY 1
+            HAVING SUM(sign) <> 0
+            ORDER BY 1
+            ON CONFLICT (checkin_day) DO UPDATE SET checkin_count = c.checkin_count + EXCLUDED.checkin_count
+        )
+        INSERT INTO checkout_analytics_documents AS c (document_id, checkout_count)
+        SELECT document_id, SUM(sign)
+        FROM changes
+        GROUP BY 1
+        HAVING SUM(sign) <> 0
+        ORDER BY 1
+        ON CONFLICT (document_id) DO UPDATE SET checkout_count = c.checkout_count + EXCLUDED.checkout_count
+    $sql$, changes_sql);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==========================================
+-- Rebuild
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION rebuild_checkout_analytics()
+RETURNS void AS $$
+BEGIN
+    -- Blocks checkout writes for the duration so no delta is lost
+    LOCK TABLE document_checkout_records IN SHARE MODE;
+
+    -- Whole totals go to shard 0; the other shards restart from zero
+    UPDATE checkout_analytics_total_shards t SET
+        active_count = CASE WHEN t.shard = 0 THEN s.active ELSE 0 END,
+        overdue_count = CASE WHEN t.shard = 0 THEN s.overdue ELSE 0 END,
+        completed_count = CASE WHEN t.shard = 0 THEN s.completed ELSE 0 END,
+        completed_hours_sum = CASE WHEN t.shard = 0 THEN s.hours ELSE 0 END,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT
+            COUNT(*) FILTER (WHERE status = 'checked-out') AS active,
+            COUNT(*) FILTER (WHERE is_overdue = true) AS overdue,
+            COUNT(*) FILTER (WHERE checkin_date IS NOT NULL) AS completed,
+            COALESCE(SUM(EXTRACT(EPOCH FROM (checkin_date - checkout_date)) / 3600)
+                FILTER (WHERE checkin_date IS NOT NULL), 0) AS hours
+        FROM document_checkout_records
+    ) s;
+
+    DELETE FROM checkout_analytics_departments;
+    INSERT INTO checkout_analytics_departments (department, active_count)
+    SELECT COALESCE(user_department, 'Unassigned'), COUNT(*)
+    FROM document_checkout_records
+    WHERE status = 'checked-out'
+    GROUP BY 1;
+
+    DELETE FROM checkout_analytics_daily_checkins;
+    INSERT INTO checkout_analytics_daily_checkins (checkin_day, checkin_count)
+    SELECT checkin_date::date, COUNT(*)
+    FROM document_checkout_records
+    WHERE checkin_date IS NOT NULL
+    GROUP BY 1;
+
+    DELETE FROM checkout_analytics_documents;
+    INSERT INTO checkout_analytics_documents (document_id, checkout_count)
+    SELECT document_id, COUNT(*)
+    FROM document_checkout_records
+    GROUP BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill the shards, then retire the single-row table
+SELECT rebuild_checkout_analytics();
+DROP TABLE IF EXISTS checkout_analytics_totals;
+
+COMMENT ON TABLE checkout_analytics_total_shards IS 'Checkout dashboard totals striped over 16 rows (sum on read); maintained by statement-level triggers on document_checkout_records';
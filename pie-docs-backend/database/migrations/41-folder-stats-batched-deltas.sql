@@ -0,0 +1,187 @@
+-- ============================================
+-- BATCHED FOLDER STATISTICS DELTAS
+-- One ordered lock pass per statement and per folder move
+-- ============================================
+-- Migration 36 applied document deltas row by row: every document locked
+-- the folder_stats rows of all of its folder's ancestors, and a move locked
+-- the old ancestors and then the new ones in two separate ordered passes,
+-- so two moves in opposite directions could deadlock.
+--
+-- Document changes are now applied by statement-level triggers (transition
+-- tables, like migrations 31 and 34): a statement's deltas are summed per
+-- ancestor first, then every affected folder_stats row is locked in one
+-- pass in folder_id order and updated once. A bulk upload or a move of many
+-- documents touches each ancestor once, and a move locks the old and new
+-- ancestors together. Folder moves likewise lock the union of the old and
+-- new ancestors in one ordered pass before shifting the subtree.
+--
+-- Writers whose folders share an ancestor (every folder shares the roots)
+-- still serialize on that ancestor's row until they commit; batching cuts
+-- the number of row updates per statement, not that contention.
+
+CREATE OR REPLACE FUNCTION apply_document_folder_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes_sql TEXT;
+    folder_ids UUID[];
+    direct_counts BIGINT[];
+    direct_sizes BIGINT[];
+    subtree_counts BIGINT[];
+    subtree_sizes BIGINT[];
+BEGIN
+    -- +1 for every live new row version, -1 for every live old one
+    changes_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, folder_id, file_size FROM new_rows WHERE deleted_at IS NULL'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, folder_id, file_size FROM old_rows WHERE deleted_at IS NULL'
+        ELSE 'SELECT 1 AS sign, folder_id, file_size FROM new_rows WHERE deleted_at IS NULL
+              UNION ALL
+              SELECT -1 AS sign, folder_id, file_size FROM old_rows WHERE deleted_at IS NULL'
+    END;
+
+    -- Folders that no longer exist (hard delete in progress) are skipped:
+    -- their ancestors were adjusted by remove_folder_from_stats()
+    EXECUTE format($sql$
+        WITH changes AS (%s),
+        direct AS (
+            SELECT ch.folder_id,
+                   SUM(ch.sign) AS documents,
+                   SUM(ch.sign * COALESCE(ch.file_size, 0)) AS size
+            FROM changes ch
+            JOIN folders f ON f.id = ch.folder_id
+            GROUP BY ch.folder_id
+            HAVING SUM(ch.sign) <> 0 OR SUM(ch.sign * COALESCE(ch.file_size, 0)) <> 0
+        ),
+        deltas AS (
+            SELECT c.ancestor_id AS folder_id,
+                   COALESCE(SUM(d.documents) FILTER (WHERE c.depth = 0), 0) AS direct_count,
+                   COALESCE(SUM(d.size) FILTER (WHERE c.depth = 0), 0) AS direct_size,
+                   SUM(d.documents) AS subtree_count,
+                   SUM(d.size) AS subtree_size
+            FROM direct d
+            JOIN folder_closure c ON c.descendant_id = d.folder_id
+            GROUP BY c.ancestor_id
+        )
+        SELECT array_agg(folder_id ORDER BY folder_id),
+               array_agg(direct_count ORDER BY folder_id),
+               array_agg(direct_size ORDER BY folder_id),
+               array_agg(subtree_count ORDER BY folder_id),
+               array_agg(subtree_size ORDER BY folder_id)
+        FROM deltas
+    $sql$, changes_sql)
+    INTO folder_ids, direct_counts, direct_sizes, subtree_counts, subtree_sizes;
+
+    IF folder_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- One pass in a fixed order so concurrent writers under a shared
+    -- ancestor queue instead of deadlocking
+    PERFORM 1 FROM folder_stats
+    WHERE folder_id = ANY(folder_ids)
+    ORDER BY folder_id
+    FOR UPDATE;
+
+    UPDATE folder_stats s SET
+        document_count = s.document_count + d.direct_count,
+        total_size = s.total_size + d.direct_size,
+        subtree_document_count = s.subtree_document_count + d.subtree_count,
+        subtree_total_size = s.subtree_total_size + d.subtree_size,
+        updated_at = CURRENT_TIMESTAMP
+    FROM unnest(folder_ids, direct_counts, direct_sizes, subtree_counts, subtree_sizes)
+        AS d(folder_id, direct_count, direct_size, subtree_count, subtree_size)
+    WHERE s.folder_id = d.folder_id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_documents_folder_stats ON documents;
+DROP TRIGGER IF EXISTS trigger_documents_folder_stats_update ON documents;
+DROP FUNCTION IF EXISTS sync_document_folder_stats();
+DROP FUNCTION IF EXISTS apply_folder_stats_delta(UUID, BIGINT, BIGINT);
+
+-- Transition tables rule out UPDATE OF column lists; statements that change
+-- no folder_id, file_size or deleted_at sum to no deltas and lock nothing
+DROP TRIGGER IF EXISTS trigger_documents_folder_stats_insert ON documents;
+CREATE TRIGGER trigger_documents_folder_stats_insert
+    AFTER INSERT ON documents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_document_folder_stats();
+
+CREATE TRIGGER trigger_documents_folder_stats_update
+    AFTER UPDATE ON documents
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_document_folder_stats();
+
+DROP TRIGGER IF EXISTS trigger_documents_folder_stats_delete ON documents;
+CREATE TRIGGER trigger_documents_folder_stats_delete
+    AFTER DELETE ON documents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_document_folder_stats();
+
+-- ==========================================
+-- Folder moves
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION sync_folder_closure()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0
+        UNION ALL
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM folder_closure
+        WHERE descendant_id = NEW.parent_id;
+
+        INSERT INTO folder_stats (folder_id) VALUES (NEW.id)
+        ON CONFLICT (folder_id) DO NOTHING;
+        PERFORM shift_folder_subtree_stats(NEW.id, 1);
+        RETURN NULL;
+    END IF;
+
+    IF OLD.parent_id IS NOT DISTINCT FROM NEW.parent_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM folder_closure
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+    ) THEN
+        RAISE EXCEPTION 'Cannot move folder % into itself or its descendants', NEW.id;
+    END IF;
+
+    -- Lock the old and the new ancestors together, in one ordered pass; the
+    -- two shifts below then only touch rows this transaction already holds
+    PERFORM 1 FROM folder_stats
+    WHERE folder_id IN (
+        SELECT ancestor_id FROM folder_closure WHERE descendant_id = NEW.id AND depth > 0
+        UNION
+        SELECT ancestor_id FROM folder_closure WHERE descendant_id = NEW.parent_id
+    )
+    ORDER BY folder_id
+    FOR UPDATE;
+
+    -- Detach the subtree from its old ancestors...
+    PERFORM shift_folder_subtree_stats(NEW.id, -1);
+    DELETE FROM folder_closure c
+    USING folder_closure sub
+    WHERE sub.ancestor_id = NEW.id
+    AND c.descendant_id = sub.descendant_id
+    AND c.ancestor_id NOT IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id);
+
+    -- ...and attach it under the new parent
+    INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM folder_closure sup
+    CROSS JOIN folder_closure sub
+    WHERE sup.descendant_id = NEW.parent_id
+    AND sub.ancestor_id = NEW.id;
+    PERFORM shift_folder_subtree_stats(NEW.id, 1);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,55 @@
+-- ============================================
+-- PER-FORMAT BARCODE SERIALS
+-- One sequence per fixed-length numeric format
+-- ============================================
+-- EAN13, EAN8, UPC, UPCE, ITF14 and ITF codes hold a fixed number of data
+-- digits (EAN8 seven, UPCE six), so drawing them from the shared
+-- barcode_code_seq (migration 26) meant the small formats stopped working
+-- once the shared sequence outgrew them. Like pharmacode (migration 39),
+-- each of these formats now reserves serials from its own sequence, whose
+-- MAXVALUE is the largest serial the format can hold without a prefix.
+-- Each sequence starts past the highest serial already issued for its
+-- format (the code's data digits, after the UPC-E number system digit).
+-- barcode_code_seq keeps serving the alphanumeric formats.
+
+DO $$
+DECLARE
+    f RECORD;
+    sequence_name TEXT;
+    highest BIGINT;
+BEGIN
+    FOR f IN
+        SELECT * FROM (VALUES
+            ('EAN13', 13, 0),
+            ('EAN8', 8, 0),
+            ('UPC', 12, 0),
+            ('UPCE', 8, 1),
+            ('ITF14', 14, 0),
+            ('ITF', 14, 0)
+        ) AS formats(standard, code_length, system_digits)
+    LOOP
+        sequence_name := 'barcode_' || lower(f.standard) || '_seq';
+
+        EXECUTE format(
+            'CREATE SEQUENCE IF NOT EXISTS %I AS BIGINT START WITH 1 MINVALUE 1 MAXVALUE %s NO CYCLE',
+            sequence_name,
+            (10::NUMERIC ^ (f.code_length - 1 - f.system_digits))::BIGINT - 1
+        );
+        EXECUTE format(
+            'COMMENT ON SEQUENCE %I IS %L',
+            sequence_name,
+            'Serial numbers for generated ' || f.standard || ' codes (see barcode_allocator.py)'
+        );
+
+        SELECT MAX(substr(r.code, 1 + f.system_digits, f.code_length - 1 - f.system_digits)::BIGINT)
+        INTO highest
+        FROM barcode_records r
+        JOIN barcode_formats bf ON bf.id = r.format_id
+        WHERE bf.standard = f.standard
+          AND r.code ~ ('^[0-9]{' || f.code_length || '}$');
+
+        IF highest > 0 THEN
+            PERFORM setval(sequence_name, highest);
+        END IF;
+    END LOOP;
+END $$;
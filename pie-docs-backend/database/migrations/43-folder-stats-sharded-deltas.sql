@@ -0,0 +1,306 @@
+-- ============================================
+-- SHARDED FOLDER STATISTICS DELTAS
+-- Writers add to delta shards; folder_stats is folded in periodically
+-- ============================================
+-- Migration 41 still updated the folder_stats row of every ancestor in the
+-- writing transaction, so all uploads under a top-level folder queued on
+-- that folder's row (and every upload on its root's row) until commit.
+--
+-- Like the checkout totals (migration 40), statistics changes now go to
+-- folder_stats_delta: one row per (folder, shard), where the shard is
+-- picked by the writer's backend PID, so concurrent writers under the same
+-- ancestor update different rows. Document changes, folder creation, moves
+-- and hard deletes all write deltas; a statement upserts its rows in
+-- (folder_id) order, so writers sharing a shard cannot deadlock.
+--
+-- Readers use folder_stats_current (folder_stats plus the summed deltas).
+-- app/services/folder_index.py calls fold_folder_stats_delta() every
+-- FOLDER_STATS_FOLD_SECONDS to move the deltas into folder_stats; rows a
+-- writer holds at that moment are skipped and folded on the next run.
+-- Deltas of hard-deleted folders are dropped by the fold.
+
+CREATE TABLE IF NOT EXISTS folder_stats_delta (
+    folder_id UUID NOT NULL,
+    shard SMALLINT NOT NULL CHECK (shard BETWEEN 0 AND 15),
+    document_count BIGINT NOT NULL DEFAULT 0,
+    total_size BIGINT NOT NULL DEFAULT 0,
+    subtree_document_count BIGINT NOT NULL DEFAULT 0,
+    subtree_total_size BIGINT NOT NULL DEFAULT 0,
+    subtree_folder_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (folder_id, shard)
+);
+
+CREATE OR REPLACE VIEW folder_stats_current AS
+SELECT s.folder_id,
+       s.document_count + COALESCE(d.document_count, 0) AS document_count,
+       s.total_size + COALESCE(d.total_size, 0) AS total_size,
+       s.subtree_document_count + COALESCE(d.subtree_document_count, 0) AS subtree_document_count,
+       s.subtree_total_size + COALESCE(d.subtree_total_size, 0) AS subtree_total_size,
+       s.subtree_folder_count + COALESCE(d.subtree_folder_count, 0) AS subtree_folder_count
+FROM folder_stats s
+LEFT JOIN (
+    SELECT folder_id,
+           SUM(document_count)::bigint AS document_count,
+           SUM(total_size)::bigint AS total_size,
+           SUM(subtree_document_count)::bigint AS subtree_document_count,
+           SUM(subtree_total_size)::bigint AS subtree_total_size,
+           SUM(subtree_folder_count)::integer AS subtree_folder_count
+    FROM folder_stats_delta
+    GROUP BY folder_id
+) d ON d.folder_id = s.folder_id;
+
+-- ==========================================
+-- Document changes
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION apply_document_folder_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes_sql TEXT;
+BEGIN
+    -- +1 for every live new row version, -1 for every live old one
+    changes_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, folder_id, file_size FROM new_rows WHERE deleted_at IS NULL'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, folder_id, file_size FROM old_rows WHERE deleted_at IS NULL'
+        ELSE 'SELECT 1 AS sign, folder_id, file_size FROM new_rows WHERE deleted_at IS NULL
+              UNION ALL
+              SELECT -1 AS sign, folder_id, file_size FROM old_rows WHERE deleted_at IS NULL'
+    END;
+
+    -- Folders that no longer exist (hard delete in progress) are skipped:
+    -- their ancestors were adjusted by remove_folder_from_stats()
+    EXECUTE format($sql$
+        WITH changes AS (%s),
+        direct AS (
+            SELECT ch.folder_id,
+                   SUM(ch.sign) AS documents,
+                   SUM(ch.sign * COALESCE(ch.file_size, 0)) AS size
+            FROM changes ch
+            JOIN folders f ON f.id = ch.folder_id
+            GROUP BY ch.folder_id
+            HAVING SUM(ch.sign) <> 0 OR SUM(ch.sign * COALESCE(ch.file_size, 0)) <> 0
+        )
+        INSERT INTO folder_stats_delta AS s (
+            folder_id, shard, document_count, total_size, subtree_document_count, subtree_total_size
+        )
+        SELECT c.ancestor_id,
+               pg_backend_pid() %% 16,
+               COALESCE(SUM(d.documents) FILTER (WHERE c.depth = 0), 0),
+               COALESCE(SUM(d.size) FILTER (WHERE c.depth = 0), 0),
+               SUM(d.documents),
+               SUM(d.size)
+        FROM direct d
+        JOIN folder_closure c ON c.descendant_id = d.folder_id
+        GROUP BY c.ancestor_id
+        ORDER BY c.ancestor_id
+        ON CONFLICT (folder_id, shard) DO UPDATE SET
+            document_count = s.document_count + EXCLUDED.document_count,
+            total_size = s.total_size + EXCLUDED.total_size,
+            subtree_document_count = s.subtree_document_count + EXCLUDED.subtree_document_count,
+            subtree_total_size = s.subtree_total_size + EXCLUDED.subtree_total_size
+    $sql$, changes_sql);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==========================================
+-- Folder creation, moves and hard deletes
+-- ==========================================
+
+-- Take a folder's whole subtree out of the aggregates of p_from and add it
+-- to those of p_to (either may be empty). Ancestors in both cancel out.
+CREATE OR REPLACE FUNCTION shift_folder_subtree_stats(p_folder_id UUID, p_from UUID[], p_to UUID[])
+RETURNS void AS $$
+DECLARE
+    moved_documents BIGINT;
+    moved_size BIGINT;
+    moved_folders INTEGER;
+BEGIN
+    SELECT subtree_document_count, subtree_total_size, subtree_folder_count + 1
+    INTO moved_documents, moved_size, moved_folders
+    FROM folder_stats_current WHERE folder_id = p_folder_id;
+
+    INSERT INTO folder_stats_delta AS s (
+        folder_id, shard, subtree_document_count, subtree_total_size, subtree_folder_count
+    )
+    SELECT a.folder_id,
+           pg_backend_pid() % 16,
+           SUM(a.sign) * COALESCE(moved_documents, 0),
+           SUM(a.sign) * COALESCE(moved_size, 0),
+           SUM(a.sign) * COALESCE(moved_folders, 1)
+    FROM (
+        SELECT unnest(p_from) AS folder_id, -1 AS sign
+        UNION ALL
+        SELECT unnest(p_to), 1
+    ) a
+    GROUP BY a.folder_id
+    HAVING SUM(a.sign) <> 0
+    ORDER BY a.folder_id
+    ON CONFLICT (folder_id, shard) DO UPDATE SET
+        subtree_document_count = s.subtree_document_count + EXCLUDED.subtree_document_count,
+        subtree_total_size = s.subtree_total_size + EXCLUDED.subtree_total_size,
+        subtree_folder_count = s.subtree_folder_count + EXCLUDED.subtree_folder_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Proper ancestors of a folder
+CREATE OR REPLACE FUNCTION folder_ancestor_ids(p_folder_id UUID)
+RETURNS UUID[] AS $$
+    SELECT COALESCE(array_agg(ancestor_id), '{}')
+    FROM folder_closure
+    WHERE descendant_id = p_folder_id AND depth > 0;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION sync_folder_closure()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_ancestors UUID[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0
+        UNION ALL
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM folder_closure
+        WHERE descendant_id = NEW.parent_id;
+
+        INSERT INTO folder_stats (folder_id) VALUES (NEW.id)
+        ON CONFLICT (folder_id) DO NOTHING;
+        PERFORM shift_folder_subtree_stats(NEW.id, '{}', folder_ancestor_ids(NEW.id));
+        RETURN NULL;
+    END IF;
+
+    IF OLD.parent_id IS NOT DISTINCT FROM NEW.parent_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM folder_closure
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+    ) THEN
+        RAISE EXCEPTION 'Cannot move folder % into itself or its descendants', NEW.id;
+    END IF;
+
+    old_ancestors := folder_ancestor_ids(NEW.id);
+
+    -- Detach the subtree from its old ancestors...
+    DELETE FROM folder_closure c
+    USING folder_closure sub
+    WHERE sub.ancestor_id = NEW.id
+    AND c.descendant_id = sub.descendant_id
+    AND c.ancestor_id NOT IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id);
+
+    -- ...and attach it under the new parent
+    INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM folder_closure sup
+    CROSS JOIN folder_closure sub
+    WHERE sup.descendant_id = NEW.parent_id
+    AND sub.ancestor_id = NEW.id;
+
+    -- One ordered upsert for both sides; shared ancestors are untouched
+    PERFORM shift_folder_subtree_stats(NEW.id, old_ancestors, folder_ancestor_ids(NEW.id));
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Hard deletes: the folder's subtree leaves its ancestors' aggregates. A
+-- cascaded child whose parent is already gone was covered by the parent.
+CREATE OR REPLACE FUNCTION remove_folder_from_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.parent_id IS NULL OR EXISTS (SELECT 1 FROM folders WHERE id = OLD.parent_id) THEN
+        PERFORM shift_folder_subtree_stats(OLD.id, folder_ancestor_ids(OLD.id), '{}');
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS shift_folder_subtree_stats(UUID, INTEGER);
+
+-- ==========================================
+-- Fold and rebuild
+-- ==========================================
+
+-- Move the deltas into folder_stats; returns the number of folders updated.
+-- Callers run one fold at a time (folder_index.py takes an advisory lock).
+CREATE OR REPLACE FUNCTION fold_folder_stats_delta()
+RETURNS INTEGER AS $$
+DECLARE
+    folded INTEGER;
+BEGIN
+    WITH taken AS (
+        DELETE FROM folder_stats_delta d
+        USING (
+            SELECT folder_id, shard FROM folder_stats_delta
+            ORDER BY folder_id, shard
+            FOR UPDATE SKIP LOCKED
+        ) l
+        WHERE d.folder_id = l.folder_id AND d.shard = l.shard
+        RETURNING d.*
+    )
+    UPDATE folder_stats s SET
+        document_count = s.document_count + t.document_count,
+        total_size = s.total_size + t.total_size,
+        subtree_document_count = s.subtree_document_count + t.subtree_document_count,
+        subtree_total_size = s.subtree_total_size + t.subtree_total_size,
+        subtree_folder_count = s.subtree_folder_count + t.subtree_folder_count,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT folder_id,
+               SUM(document_count) AS document_count,
+               SUM(total_size) AS total_size,
+               SUM(subtree_document_count) AS subtree_document_count,
+               SUM(subtree_total_size) AS subtree_total_size,
+               SUM(subtree_folder_count) AS subtree_folder_count
+        FROM taken
+        GROUP BY folder_id
+    ) t
+    WHERE s.folder_id = t.folder_id;
+
+    GET DIAGNOSTICS folded = ROW_COUNT;
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_folder_stats()
+RETURNS void AS $$
+BEGIN
+    -- Waits for in-flight deltas, and holds new ones until the rebuild commits
+    LOCK TABLE folder_stats, folder_stats_delta IN EXCLUSIVE MODE;
+    DELETE FROM folder_stats_delta;
+    DELETE FROM folder_stats;
+
+    INSERT INTO folder_stats (
+        folder_id, document_count, total_size,
+        subtree_document_count, subtree_total_size, subtree_folder_count
+    )
+    WITH direct AS (
+        SELECT folder_id, COUNT(*) AS documents, COALESCE(SUM(file_size), 0) AS size
+        FROM documents
+        WHERE deleted_at IS NULL AND folder_id IS NOT NULL
+        GROUP BY folder_id
+    ),
+    subtree AS (
+        SELECT c.ancestor_id,
+               COALESCE(SUM(d.documents), 0) AS documents,
+               COALESCE(SUM(d.size), 0) AS size,
+               COUNT(*) - 1 AS folders
+        FROM folder_closure c
+        LEFT JOIN direct d ON d.folder_id = c.descendant_id
+        GROUP BY c.ancestor_id
+    )
+    SELECT f.id,
+           COALESCE(d.documents, 0), COALESCE(d.size, 0),
+           COALESCE(s.documents, 0), COALESCE(s.size, 0), COALESCE(s.folders, 0)
+    FROM folders f
+    LEFT JOIN direct d ON d.folder_id = f.id
+    LEFT JOIN subtree s ON s.ancestor_id = f.id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON TABLE folder_stats_delta IS 'Pending folder_stats changes striped over 16 shards per folder; folded into folder_stats by fold_folder_stats_delta()';
+COMMENT ON VIEW folder_stats_current IS 'folder_stats plus pending deltas; read this instead of folder_stats';
+COMMENT ON FUNCTION fold_folder_stats_delta() IS 'Moves folder_stats_delta into folder_stats, skipping rows writers currently hold';
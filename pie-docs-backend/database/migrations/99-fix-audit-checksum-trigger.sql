@@ -2,16 +2,16 @@
 -- Fix: Audit Checksum Trigger Column Names
 -- Fixes entity_type reference to use resource_type
 -- ============================================
+-- Sorts after migration 32 and is re-run with it, so it must define the
+-- same function: the row's own checksum only. Chaining is done in batches
+-- by app/services/audit_chain.py; looking up the previous row's
+-- chain_checksum here would serialize every audit insert again.
 
--- Drop and recreate checksum calculation function with correct column names
 CREATE OR REPLACE FUNCTION calculate_audit_checksum()
 RETURNS TRIGGER AS $$
-DECLARE
-    prev_chain_checksum VARCHAR(64);
-    checksum_data TEXT;
 BEGIN
-    -- Calculate checksum of current entry using actual column names
-    checksum_data := CONCAT(
+    -- Same fields as the legacy checksum, using actual column names
+    NEW.checksum := encode(digest(CONCAT(
         COALESCE(NEW.user_id::TEXT, ''),
         COALESCE(NEW.action, ''),
         COALESCE(NEW.resource_type, ''),  -- Changed from entity_type
@@ -19,26 +19,8 @@ BEGIN
         COALESCE(NEW.metadata::TEXT, '{}'),  -- Changed from changes
         COALESCE(NEW.ip_address::TEXT, ''),
         COALESCE(NEW.created_at::TEXT, '')
-    );
-
-    NEW.checksum := encode(digest(checksum_data, 'sha256'), 'hex');
-
-    -- Get previous entry's chain checksum for chaining
-    SELECT chain_checksum INTO prev_chain_checksum
-    FROM audit_logs
-    WHERE id != NEW.id
-    ORDER BY created_at DESC
-    LIMIT 1;
-
-    -- Chain current checksum with previous chain checksum
-    IF prev_chain_checksum IS NOT NULL THEN
-        NEW.chain_checksum := encode(digest(CONCAT(NEW.checksum, prev_chain_checksum), 'sha256'), 'hex');
-    ELSE
-        NEW.chain_checksum := NEW.checksum;
-    END IF;
-
-    NEW.verification_status := 'verified';
-
+    ), 'sha256'), 'hex');
+    NEW.verification_status := 'pending';
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -48,5 +30,5 @@ DO $$
 BEGIN
     RAISE NOTICE 'Audit checksum trigger fixed:';
     RAISE NOTICE '  - Updated column names: entity_type -> resource_type, entity_id -> resource_id';
-    RAISE NOTICE '  - Trigger will now work correctly with actual table schema';
+    RAISE NOTICE '  - Per-row checksum only; batches are chained by audit_chain.py (migration 32)';
 END $$;
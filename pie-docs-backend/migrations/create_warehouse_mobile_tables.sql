@@ -37,6 +37,7 @@ CREATE TABLE scan_records (
     notes TEXT,
     verified BOOLEAN DEFAULT FALSE,
     offline BOOLEAN DEFAULT FALSE,
+    client_scan_id VARCHAR(100),  -- Device-generated ID, unique per session (idempotent offline sync)
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -54,6 +55,7 @@ CREATE INDEX idx_scan_records_entity_type ON scan_records(entity_type);
 CREATE INDEX idx_scan_records_entity_id ON scan_records(entity_id);
 CREATE INDEX idx_scan_records_scanned_at ON scan_records(scanned_at);
 CREATE INDEX idx_scan_records_verified ON scan_records(verified);
+CREATE UNIQUE INDEX idx_scan_records_client_scan_id ON scan_records(session_id, client_scan_id) WHERE client_scan_id IS NOT NULL;
 
 -- Trigger for updated_at
 CREATE OR REPLACE FUNCTION update_scan_sessions_timestamp()
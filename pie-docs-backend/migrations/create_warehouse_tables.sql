@@ -83,7 +83,7 @@ CREATE TABLE zones (
     zone_type VARCHAR(50) NOT NULL CHECK (zone_type IN ('storage', 'receiving', 'dispatch', 'processing', 'archive')),
     area DECIMAL(10,2) NOT NULL CHECK (area > 0),
     max_capacity INTEGER NOT NULL CHECK (max_capacity > 0),
-    current_capacity INTEGER NOT NULL DEFAULT 0 CHECK (current_capacity >= 0 AND current_capacity <= max_capacity),
+    current_capacity INTEGER NOT NULL DEFAULT 0 CHECK (current_capacity >= 0),
     environmental_control JSONB, -- {temperature_min, temperature_max, humidity_min, humidity_max, monitoring_enabled}
     access_level INTEGER NOT NULL CHECK (access_level BETWEEN 1 AND 5),
     status VARCHAR(20) NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'inactive', 'maintenance', 'decommissioned')),
@@ -116,7 +116,7 @@ CREATE TABLE shelves (
     dimensions JSONB NOT NULL, -- {width: number, depth: number, height: number} in cm
     weight_capacity DECIMAL(10,2) NOT NULL CHECK (weight_capacity > 0),
     max_racks INTEGER NOT NULL CHECK (max_racks > 0),
-    current_racks INTEGER NOT NULL DEFAULT 0 CHECK (current_racks >= 0 AND current_racks <= max_racks),
+    current_racks INTEGER NOT NULL DEFAULT 0 CHECK (current_racks >= 0),
     position JSONB NOT NULL, -- {row: string, column: number, level: number}
     status VARCHAR(20) NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'inactive', 'maintenance', 'decommissioned')),
     metadata JSONB DEFAULT '{}',
@@ -150,7 +150,7 @@ CREATE TABLE racks (
     dimensions JSONB NOT NULL, -- {width: number, depth: number, height: number} in cm
     weight_capacity DECIMAL(10,2) NOT NULL CHECK (weight_capacity > 0),
     max_documents INTEGER NOT NULL CHECK (max_documents > 0),
-    current_documents INTEGER NOT NULL DEFAULT 0 CHECK (current_documents >= 0 AND current_documents <= max_documents),
+    current_documents INTEGER NOT NULL DEFAULT 0 CHECK (current_documents >= 0),
     position VARCHAR(50) NOT NULL, -- Position on shelf (e.g., "A1", "B2")
     customer_id UUID, -- Optional customer assignment
     assignment_type VARCHAR(50) NOT NULL DEFAULT 'general' CHECK (assignment_type IN ('general', 'customer_dedicated', 'document_specific')),
@@ -354,6 +354,57 @@ CREATE TRIGGER update_documents_updated_at BEFORE UPDATE ON physical_documents
 CREATE TRIGGER update_assignments_updated_at BEFORE UPDATE ON customer_rack_assignments
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- ========================================
+-- CAPACITY COUNTER TRIGGERS
+-- ========================================
+-- current_documents / current_racks / current_capacity always equal the
+-- number of child rows (see database/migrations/27-warehouse-capacity-triggers.sql)
+
+-- Shared by the three child tables; TG_ARGV: parent table, counter column, parent FK column
+CREATE OR REPLACE FUNCTION maintain_warehouse_capacity_counter()
+RETURNS TRIGGER AS $$
+DECLARE
+    parent_table TEXT := TG_ARGV[0];
+    counter_column TEXT := TG_ARGV[1];
+    parent_column TEXT := TG_ARGV[2];
+    old_parent UUID;
+    new_parent UUID;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_parent := (to_jsonb(OLD) ->> parent_column)::uuid;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_parent := (to_jsonb(NEW) ->> parent_column)::uuid;
+    END IF;
+
+    IF old_parent IS NOT DISTINCT FROM new_parent THEN
+        RETURN NULL;
+    END IF;
+
+    IF old_parent IS NOT NULL THEN
+        EXECUTE format('UPDATE %I SET %I = GREATEST(%I - 1, 0) WHERE id = $1', parent_table, counter_column, counter_column)
+        USING old_parent;
+    END IF;
+    IF new_parent IS NOT NULL THEN
+        EXECUTE format('UPDATE %I SET %I = %I + 1 WHERE id = $1', parent_table, counter_column, counter_column)
+        USING new_parent;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER physical_documents_rack_counter
+    AFTER INSERT OR DELETE OR UPDATE OF rack_id ON physical_documents
+    FOR EACH ROW EXECUTE FUNCTION maintain_warehouse_capacity_counter('racks', 'current_documents', 'rack_id');
+
+CREATE TRIGGER racks_shelf_counter
+    AFTER INSERT OR DELETE OR UPDATE OF shelf_id ON racks
+    FOR EACH ROW EXECUTE FUNCTION maintain_warehouse_capacity_counter('shelves', 'current_racks', 'shelf_id');
+
+CREATE TRIGGER shelves_zone_counter
+    AFTER INSERT OR DELETE OR UPDATE OF zone_id ON shelves
+    FOR EACH ROW EXECUTE FUNCTION maintain_warehouse_capacity_counter('zones', 'current_capacity', 'zone_id');
+
 -- ========================================
 -- SEED DATA (Optional - for testing)
 -- ========================================
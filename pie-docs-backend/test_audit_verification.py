@@ -0,0 +1,156 @@
+"""
+Behavioural test of verify_segment on intact and tampered audit batches
+(user-045, user-046)
+
+No database is needed: verify_segment is pointed at an in-memory partition
+(a fake connection serving audit_log_batches and the partition's rows), built
+with the same row, batch and chain checksums the sealer writes. Each case
+tampers one thing and checks that verification stops at the right batch
+with the right reason. Exits non-zero if any check fails.
+"""
+import sys
+import os
+import copy
+sys.path.insert(0, os.path.dirname(__file__))
+
+import app.services.audit_verification as audit_verification
+from app.services.audit_checksums import batch_checksum, chain_checksum, partition_genesis, row_checksum
+from behaviour_checks import check, finish
+
+PARTITION = 'audit_logs_2026_01'
+
+
+class FakeCursor:
+    def __init__(self, partition):
+        self.partition = partition
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        query = str(query)
+        if 'WHERE id = %s AND partition_name' in query:
+            batch_id = params[0]
+            self.result = [(b[4],) for b in self.partition['batches'] if b[0] == batch_id]
+        elif 'FROM audit_log_batches' in query:
+            after = params[1]
+            self.result = [b for b in self.partition['batches'] if b[0] > after]
+        else:
+            after = params[0]
+            self.result = [r for r in self.partition['rows'] if r[0] > after]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+    def __iter__(self):
+        return iter(self.result)
+
+
+class FakeConnection:
+    def __init__(self, partition):
+        self.partition = partition
+
+    def set_session(self, **kwargs):
+        pass
+
+    def cursor(self, name=None):
+        return FakeCursor(self.partition)
+
+    def close(self):
+        pass
+
+
+def make_row(batch_id, index, action='document.view'):
+    created_at = f"2026-01-0{batch_id} 10:00:0{index}+00"
+    user_id, resource_type, resource_id = 'user-1', 'document', f'doc-{batch_id}-{index}'
+    metadata, ip_address = '{}', '10.0.0.1'
+    checksum = row_checksum(user_id, action, resource_type, resource_id, metadata, ip_address, created_at=created_at)
+    return [batch_id, f'row-{batch_id}-{index}', created_at, user_id, action,
+            resource_type, resource_id, metadata, ip_address, checksum]
+
+
+def make_partition(batch_count=3, rows_per_batch=3):
+    """Sealed partition: (id, row_count, batch_checksum, prev_chain_checksum, chain_checksum) per batch"""
+    rows, batches = [], []
+    prev = partition_genesis(PARTITION)
+    for batch_id in range(1, batch_count + 1):
+        batch_rows = [make_row(batch_id, index) for index in range(rows_per_batch)]
+        batch_hash = batch_checksum(row[9] for row in batch_rows)
+        chain = chain_checksum(prev, batch_hash)
+        batches.append([batch_id, rows_per_batch, batch_hash, prev, chain])
+        rows.extend(batch_rows)
+        prev = chain
+    return {'batches': batches, 'rows': rows}
+
+
+def verify(partition, checkpoint_batch_id=None, checkpoint_chain=None):
+    frozen = {
+        'batches': [tuple(b) for b in partition['batches']],
+        'rows': [tuple(r) for r in partition['rows']],
+    }
+    audit_verification.psycopg2.connect = lambda dsn: FakeConnection(frozen)
+    return audit_verification.verify_segment(PARTITION, checkpoint_batch_id, checkpoint_chain, dsn='fake')
+
+
+def broken_at(result):
+    first = result['first_broken'] or {}
+    return result['status'], first.get('batch_id'), first.get('reason', '').split(' (')[0]
+
+
+intact = make_partition()
+
+print("\n1. Intact partition...")
+result = verify(intact)
+check("status", result['status'], 'ok')
+check("batches, rows checked", (result['batches_checked'], result['rows_checked']), (3, 9))
+check("chain checksum", result['chain_checksum'], intact['batches'][-1][4])
+
+print("\n2. Resume from a checkpoint...")
+result = verify(intact, 2, intact['batches'][1][4])
+check("status", result['status'], 'ok')
+check("batches checked after checkpoint", result['batches_checked'], 1)
+
+print("\n3. Row altered, checksum left alone...")
+tampered = copy.deepcopy(intact)
+tampered['rows'][4][4] = 'document.delete'
+check("verification", broken_at(verify(tampered)), ('broken', 2, 'Row checksum mismatch'))
+
+print("\n4. Row altered and its checksum recomputed...")
+tampered = copy.deepcopy(intact)
+tampered['rows'][4] = make_row(2, 1, action='document.delete')
+check("verification", broken_at(verify(tampered)), ('broken', 2, 'Batch checksum mismatch'))
+
+print("\n5. Row deleted from a batch...")
+tampered = copy.deepcopy(intact)
+del tampered['rows'][4]
+check("verification", broken_at(verify(tampered)), ('broken', 2, 'Batch has 2 rows, sealed with 3'))
+
+print("\n6. Row added to a sealed batch...")
+tampered = copy.deepcopy(intact)
+tampered['rows'].insert(6, make_row(2, 3))
+check("verification", broken_at(verify(tampered)), ('broken', 2, 'Batch has 4 rows, sealed with 3'))
+
+print("\n7. Batch resealed over tampered rows (chain no longer links)...")
+tampered = copy.deepcopy(intact)
+tampered['rows'][4] = make_row(2, 1, action='document.delete')
+new_hash = batch_checksum(row[9] for row in tampered['rows'][3:6])
+tampered['batches'][1][2] = new_hash
+tampered['batches'][1][4] = chain_checksum(tampered['batches'][1][3], new_hash)
+check("verification", broken_at(verify(tampered)), ('broken', 3, 'Chain link broken'))
+
+print("\n8. Whole batch removed...")
+tampered = copy.deepcopy(intact)
+tampered['rows'] = [row for row in tampered['rows'] if row[0] != 2]
+check("verification", broken_at(verify(tampered)), ('broken', 2, 'Sealed batch has no rows'))
+
+print("\n9. Checkpointed batch rewritten...")
+check("verification", broken_at(verify(intact, 2, 'stale-chain')), ('broken', 2, 'Checkpointed batch is missing or its chain checksum changed'))
+
+finish()
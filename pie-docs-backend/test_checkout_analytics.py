@@ -0,0 +1,109 @@
+"""
+Behavioural test of the checkout analytics triggers (migrations 34 and 40, user-047)
+
+Runs against the configured database inside one transaction that is rolled
+back at the end. Rollups may already hold real data, so totals are checked
+as changes from a baseline; departments use names unique to this run.
+Covers checkout (insert), check-in and overdue flag (update), soft delete
+(is_active = false, which the rollups keep counting), moves between
+departments and documents, and deletes. Exits non-zero if any check fails.
+"""
+import sys
+import os
+import uuid
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database import get_db_cursor, init_db_pool
+from behaviour_checks import check, finish
+
+
+def totals(cursor):
+    cursor.execute("""
+        SELECT SUM(active_count)::bigint AS active, SUM(overdue_count)::bigint AS overdue,
+               SUM(completed_count)::bigint AS completed, ROUND(SUM(completed_hours_sum), 3) AS hours
+        FROM checkout_analytics_total_shards
+    """)
+    row = cursor.fetchone()
+    cursor.execute("SELECT checkin_count FROM checkout_analytics_daily_checkins WHERE checkin_day = CURRENT_DATE")
+    today = cursor.fetchone()
+    return {
+        'active': row['active'],
+        'overdue': row['overdue'],
+        'completed': row['completed'],
+        'hours': float(row['hours']),
+        'today': today['checkin_count'] if today else 0,
+    }
+
+
+def changes(cursor, baseline):
+    current = totals(cursor)
+    return {key: round(current[key] - baseline[key], 3) for key in current}
+
+
+def department(cursor, name):
+    cursor.execute("SELECT active_count FROM checkout_analytics_departments WHERE department = %s", (name,))
+    row = cursor.fetchone()
+    return row['active_count'] if row else 0
+
+
+def document_count(cursor, document_id):
+    cursor.execute("SELECT checkout_count FROM checkout_analytics_documents WHERE document_id = %s", (document_id,))
+    row = cursor.fetchone()
+    return row['checkout_count'] if row else 0
+
+
+init_db_pool()
+
+with get_db_cursor() as cursor:
+    try:
+        dept_a = f"test-dept-{uuid.uuid4().hex[:8]}"
+        dept_b = f"test-dept-{uuid.uuid4().hex[:8]}"
+        cursor.execute("INSERT INTO documents (title) VALUES ('checkout test 1'), ('checkout test 2') RETURNING id")
+        doc1, doc2 = [row['id'] for row in cursor.fetchall()]
+        baseline = totals(cursor)
+
+        print("\n1. Two checkouts in one statement...")
+        cursor.execute("""
+            INSERT INTO document_checkout_records (document_id, user_name, user_department, status, checkout_date, due_date)
+            VALUES (%s, 'tester', %s, 'checked-out', NOW() - INTERVAL '2 hours', NOW() + INTERVAL '1 day'),
+                   (%s, 'tester', %s, 'checked-out', NOW() - INTERVAL '2 hours', NOW() + INTERVAL '1 day')
+            RETURNING id
+        """, (doc1, dept_a, doc1, dept_a))
+        first, second = [row['id'] for row in cursor.fetchall()]
+        check("totals", changes(cursor, baseline), {'active': 2, 'overdue': 0, 'completed': 0, 'hours': 0, 'today': 0})
+        check("department", department(cursor, dept_a), 2)
+        check("document checkouts", document_count(cursor, doc1), 2)
+
+        print("\n2. Check one in (2 hours) and flag the other overdue...")
+        cursor.execute("""
+            UPDATE document_checkout_records
+            SET status = 'checked-in', checkin_date = checkout_date + INTERVAL '2 hours'
+            WHERE id = %s
+        """, (first,))
+        cursor.execute("UPDATE document_checkout_records SET is_overdue = true WHERE id = %s", (second,))
+        check("totals", changes(cursor, baseline), {'active': 1, 'overdue': 1, 'completed': 1, 'hours': 2.0, 'today': 1})
+        check("department", department(cursor, dept_a), 1)
+
+        print("\n3. Soft delete (is_active = false) leaves the rollups unchanged...")
+        cursor.execute("UPDATE document_checkout_records SET is_active = false WHERE id = %s", (second,))
+        check("totals", changes(cursor, baseline), {'active': 1, 'overdue': 1, 'completed': 1, 'hours': 2.0, 'today': 1})
+
+        print("\n4. Move a checkout to another department and document...")
+        cursor.execute(
+            "UPDATE document_checkout_records SET user_department = %s, document_id = %s WHERE id = %s",
+            (dept_b, doc2, second)
+        )
+        check("old department", department(cursor, dept_a), 0)
+        check("new department", department(cursor, dept_b), 1)
+        check("old document checkouts", document_count(cursor, doc1), 1)
+        check("new document checkouts", document_count(cursor, doc2), 1)
+
+        print("\n5. Delete both records...")
+        cursor.execute("DELETE FROM document_checkout_records WHERE id IN (%s, %s)", (first, second))
+        check("totals", changes(cursor, baseline), {'active': 0, 'overdue': 0, 'completed': 0, 'hours': 0, 'today': 0})
+        check("department", department(cursor, dept_b), 0)
+        check("document checkouts", document_count(cursor, doc1) + document_count(cursor, doc2), 0)
+    finally:
+        cursor.connection.rollback()
+
+finish()
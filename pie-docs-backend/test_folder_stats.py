@@ -0,0 +1,118 @@
+"""
+Behavioural test of the folder closure and statistics triggers
+(migrations 36, 41 and 43, user-049)
+
+Runs against the configured database inside one transaction that is rolled
+back at the end. Builds root -> a -> a1 and root -> b, then covers document
+inserts (single and bulk), size updates, moves between folders, soft delete
+and restore, a folder move and a hard delete, then folds the pending deltas
+into folder_stats. Exits non-zero if any check fails.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database import get_db_cursor, init_db_pool
+from behaviour_checks import check, finish
+
+
+def create_folder(cursor, name, parent_id=None):
+    cursor.execute(
+        "INSERT INTO folders (name, path, parent_id) VALUES (%s, %s, %s) RETURNING id",
+        (name, f"/{name}", parent_id)
+    )
+    return cursor.fetchone()['id']
+
+
+def stats(cursor, folder_id, table='folder_stats_current'):
+    """(direct documents, direct size, subtree documents, subtree size, subtree folders)"""
+    cursor.execute(f"""
+        SELECT document_count, total_size, subtree_document_count, subtree_total_size, subtree_folder_count
+        FROM {table} WHERE folder_id = %s
+    """, (folder_id,))
+    row = cursor.fetchone()
+    return tuple(row.values()) if row else None
+
+
+def ancestors(cursor, folder_id):
+    cursor.execute(
+        "SELECT ancestor_id FROM folder_closure WHERE descendant_id = %s AND depth > 0 ORDER BY depth",
+        (folder_id,)
+    )
+    return [row['ancestor_id'] for row in cursor.fetchall()]
+
+
+init_db_pool()
+
+with get_db_cursor() as cursor:
+    try:
+        root = create_folder(cursor, 'stats-root')
+        a = create_folder(cursor, 'stats-a', root)
+        a1 = create_folder(cursor, 'stats-a1', a)
+        b = create_folder(cursor, 'stats-b', root)
+        check("closure of a1", ancestors(cursor, a1), [a, root])
+        check("root", stats(cursor, root), (0, 0, 0, 0, 3))
+
+        print("\n1. Insert one document, then two in one statement...")
+        cursor.execute("INSERT INTO documents (title, folder_id, file_size) VALUES ('d1', %s, 100) RETURNING id", (a1,))
+        d1 = cursor.fetchone()['id']
+        cursor.execute("""
+            INSERT INTO documents (title, folder_id, file_size)
+            VALUES ('d2', %s, 10), ('d3', %s, 20)
+            RETURNING id
+        """, (b, b))
+        d2, d3 = [row['id'] for row in cursor.fetchall()]
+        check("a1", stats(cursor, a1), (1, 100, 1, 100, 0))
+        check("a", stats(cursor, a), (0, 0, 1, 100, 1))
+        check("b", stats(cursor, b), (2, 30, 2, 30, 0))
+        check("root", stats(cursor, root), (0, 0, 3, 130, 3))
+
+        print("\n2. Size update...")
+        cursor.execute("UPDATE documents SET file_size = 150 WHERE id = %s", (d1,))
+        check("a1", stats(cursor, a1), (1, 150, 1, 150, 0))
+        check("root", stats(cursor, root), (0, 0, 3, 180, 3))
+
+        print("\n3. Move a document from a1 to b...")
+        cursor.execute("UPDATE documents SET folder_id = %s WHERE id = %s", (b, d1))
+        check("a1", stats(cursor, a1), (0, 0, 0, 0, 0))
+        check("a", stats(cursor, a), (0, 0, 0, 0, 1))
+        check("b", stats(cursor, b), (3, 180, 3, 180, 0))
+        check("root", stats(cursor, root), (0, 0, 3, 180, 3))
+
+        print("\n4. Soft delete and restore...")
+        cursor.execute("UPDATE documents SET deleted_at = NOW() WHERE id = %s", (d2,))
+        check("b after soft delete", stats(cursor, b), (2, 170, 2, 170, 0))
+        check("root after soft delete", stats(cursor, root), (0, 0, 2, 170, 3))
+        cursor.execute("UPDATE documents SET deleted_at = NULL WHERE id = %s", (d2,))
+        check("b after restore", stats(cursor, b), (3, 180, 3, 180, 0))
+
+        print("\n5. Move folder b under a...")
+        cursor.execute("UPDATE folders SET parent_id = %s WHERE id = %s", (a, b))
+        check("closure of b", ancestors(cursor, b), [a, root])
+        check("a", stats(cursor, a), (0, 0, 3, 180, 2))
+        check("root", stats(cursor, root), (0, 0, 3, 180, 3))
+
+        print("\n6. Move a folder into its own subtree is rejected...")
+        cursor.execute("SAVEPOINT cycle")
+        try:
+            cursor.execute("UPDATE folders SET parent_id = %s WHERE id = %s", (b, a))
+            check("cycle rejected", False, True)
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT cycle")
+            check("cycle rejected", True, True)
+
+        print("\n7. Hard delete a document...")
+        cursor.execute("DELETE FROM documents WHERE id = %s", (d3,))
+        check("b", stats(cursor, b), (2, 160, 2, 160, 0))
+        check("root", stats(cursor, root), (0, 0, 2, 160, 3))
+
+        print("\n8. Fold the pending deltas into folder_stats...")
+        cursor.execute("SELECT fold_folder_stats_delta()")
+        cursor.execute("SELECT COUNT(*) AS pending FROM folder_stats_delta WHERE folder_id = ANY(%s::uuid[])", ([root, a, a1, b],))
+        check("pending deltas", cursor.fetchone()['pending'], 0)
+        check("root in folder_stats", stats(cursor, root, 'folder_stats'), (0, 0, 2, 160, 3))
+        check("b in folder_stats", stats(cursor, b, 'folder_stats'), (2, 160, 2, 160, 0))
+    finally:
+        cursor.connection.rollback()
+
+finish()
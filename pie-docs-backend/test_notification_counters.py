@@ -0,0 +1,75 @@
+"""
+Behavioural test of the notification counter triggers (migration 31, user-044)
+
+Runs against the configured database inside one transaction that is rolled
+back at the end, so nothing is left behind. Notifications are hard-deleted
+(there is no soft delete); "move" reassigns a notification to another user.
+Exits non-zero if any check fails.
+"""
+import sys
+import os
+import uuid
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database import get_db_cursor, init_db_pool
+from behaviour_checks import check, finish
+
+
+def create_user(cursor, name):
+    suffix = uuid.uuid4().hex[:12]
+    cursor.execute(
+        "INSERT INTO users (email, username, password_hash) VALUES (%s, %s, 'x') RETURNING id",
+        (f"{name}-{suffix}@test.local", f"{name}-{suffix}")
+    )
+    return cursor.fetchone()['id']
+
+
+def counters(cursor, user_id):
+    cursor.execute(
+        "SELECT total_count, unread_count FROM notification_counters WHERE user_id = %s",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    return (row['total_count'], row['unread_count']) if row else (0, 0)
+
+
+init_db_pool()
+
+with get_db_cursor() as cursor:
+    try:
+        alice = create_user(cursor, 'counter-alice')
+        bob = create_user(cursor, 'counter-bob')
+
+        print("\n1. Fan-out insert (one multi-row statement)...")
+        cursor.execute("""
+            INSERT INTO notifications (user_id, title, is_read)
+            VALUES (%s, 'a1', false), (%s, 'a2', false), (%s, 'a3', false),
+                   (%s, 'b1', false), (%s, 'b2', true)
+        """, (alice, alice, alice, bob, bob))
+        check("alice (total, unread)", counters(cursor, alice), (3, 3))
+        check("bob (total, unread)", counters(cursor, bob), (2, 1))
+
+        print("\n2. Mark two read, then mark all read...")
+        cursor.execute(
+            "UPDATE notifications SET is_read = true WHERE user_id = %s AND title IN ('a1', 'a2')",
+            (alice,)
+        )
+        check("alice after marking two read", counters(cursor, alice), (3, 1))
+        cursor.execute("UPDATE notifications SET is_read = true WHERE user_id = %s", (alice,))
+        check("alice after mark-all-read", counters(cursor, alice), (3, 0))
+
+        print("\n3. Move an unread notification to another user...")
+        cursor.execute("UPDATE notifications SET user_id = %s WHERE user_id = %s AND title = 'b1'", (alice, bob))
+        check("alice after move", counters(cursor, alice), (4, 1))
+        check("bob after move", counters(cursor, bob), (1, 0))
+
+        print("\n4. Delete...")
+        cursor.execute("DELETE FROM notifications WHERE user_id = %s AND is_read = true", (alice,))
+        check("alice after deleting read ones", counters(cursor, alice), (1, 1))
+        cursor.execute("DELETE FROM notifications WHERE user_id IN (%s, %s)", (alice, bob))
+        check("alice after deleting all", counters(cursor, alice), (0, 0))
+        check("bob after deleting all", counters(cursor, bob), (0, 0))
+    finally:
+        cursor.connection.rollback()
+
+finish()
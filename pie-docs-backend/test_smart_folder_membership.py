@@ -0,0 +1,76 @@
+"""
+Behavioural test of the smart folder membership triggers (migration 35, user-048)
+
+Runs against the configured database inside one transaction that is rolled
+back at the end. Covers document inserts, updates that enter and leave a
+folder's criteria, soft delete and restore, and criteria changes that move
+membership to other documents. Exits non-zero if any check fails.
+"""
+import sys
+import os
+import uuid
+sys.path.insert(0, os.path.dirname(__file__))
+
+from psycopg2.extras import Json
+
+from app.database import get_db_cursor, init_db_pool
+from behaviour_checks import check, finish
+
+
+def members(cursor, folder_id):
+    cursor.execute(
+        "SELECT d.title FROM smart_folder_members m JOIN documents d ON d.id = m.document_id WHERE m.folder_id = %s",
+        (folder_id,)
+    )
+    return sorted(row['title'] for row in cursor.fetchall())
+
+
+init_db_pool()
+
+with get_db_cursor() as cursor:
+    try:
+        tag = f"smart-{uuid.uuid4().hex[:8]}"
+        other_tag = f"smart-{uuid.uuid4().hex[:8]}"
+
+        cursor.execute("""
+            INSERT INTO folders (name, path, folder_type, smart_criteria)
+            VALUES ('smart test', '/smart test', 'smart', %s)
+            RETURNING id
+        """, (Json({'tags': [tag], 'status': ['Draft']}),))
+        folder = cursor.fetchone()['id']
+
+        print("\n1. Insert matching and non-matching documents...")
+        cursor.execute("""
+            INSERT INTO documents (title, tags, status)
+            VALUES ('match', %s, 'draft'), ('wrong status', %s, 'published'), ('other tag', %s, 'draft')
+            RETURNING id, title
+        """, ([tag], [tag], [other_tag]))
+        ids = {row['title']: row['id'] for row in cursor.fetchall()}
+        check("members", members(cursor, folder), ['match'])
+
+        print("\n2. Updates entering and leaving the criteria...")
+        cursor.execute("UPDATE documents SET status = 'draft' WHERE id = %s", (ids['wrong status'],))
+        check("after status change", members(cursor, folder), ['match', 'wrong status'])
+        cursor.execute("UPDATE documents SET tags = %s WHERE id = %s", ([other_tag], ids['match']))
+        check("after tag removed", members(cursor, folder), ['wrong status'])
+
+        print("\n3. Soft delete and restore...")
+        cursor.execute("UPDATE documents SET deleted_at = NOW() WHERE id = %s", (ids['wrong status'],))
+        check("after soft delete", members(cursor, folder), [])
+        cursor.execute("UPDATE documents SET deleted_at = NULL WHERE id = %s", (ids['wrong status'],))
+        check("after restore", members(cursor, folder), ['wrong status'])
+
+        print("\n4. Criteria change moves membership...")
+        cursor.execute(
+            "UPDATE folders SET smart_criteria = %s WHERE id = %s",
+            (Json({'tags': [other_tag]}), folder)
+        )
+        check("after criteria change", members(cursor, folder), ['match', 'other tag'])
+
+        print("\n5. Hard delete...")
+        cursor.execute("DELETE FROM documents WHERE id = %s", (ids['other tag'],))
+        check("after delete", members(cursor, folder), ['match'])
+    finally:
+        cursor.connection.rollback()
+
+finish()
@@ -0,0 +1,77 @@
+"""
+Behavioural test of the tag usage and co-occurrence triggers (migration 37, user-050)
+
+Runs against the configured database inside one transaction that is rolled
+back at the end; tag names are unique to the run. Covers inserts, tag
+updates, soft delete and restore, hard delete, and removing a tag that has
+no tags row (which must not create one with a negative count). Exits
+non-zero if any check fails.
+"""
+import sys
+import os
+import uuid
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database import get_db_cursor, init_db_pool
+from behaviour_checks import check, finish
+
+
+def usage(cursor, *names):
+    cursor.execute("SELECT name, usage_count FROM tags WHERE name = ANY(%s)", (list(names),))
+    counts = {row['name']: row['usage_count'] for row in cursor.fetchall()}
+    return tuple(counts.get(name) for name in names)
+
+
+def pair(cursor, tag_a, tag_b):
+    """Pair count in both directions (None when the pair has no row)"""
+    cursor.execute("""
+        SELECT tag_a, document_count FROM tag_cooccurrence
+        WHERE (tag_a, tag_b) IN ((%s, %s), (%s, %s))
+    """, (tag_a, tag_b, tag_b, tag_a))
+    counts = {row['tag_a']: row['document_count'] for row in cursor.fetchall()}
+    return counts.get(tag_a), counts.get(tag_b)
+
+
+init_db_pool()
+
+with get_db_cursor() as cursor:
+    try:
+        run = uuid.uuid4().hex[:8]
+        a, b, c, x = (f"{run}-{name}" for name in 'abcx')
+
+        print("\n1. Insert documents...")
+        cursor.execute("INSERT INTO documents (title, tags) VALUES ('t1', %s), ('t2', %s) RETURNING id", ([a, b], [a, c]))
+        d1, d2 = [row['id'] for row in cursor.fetchall()]
+        check("usage a, b, c", usage(cursor, a, b, c), (2, 1, 1))
+        check("pair a-b", pair(cursor, a, b), (1, 1))
+        check("pair a-c", pair(cursor, a, c), (1, 1))
+
+        print("\n2. Replace a document's tags...")
+        cursor.execute("UPDATE documents SET tags = %s WHERE id = %s", ([b, c], d1))
+        check("usage a, b, c", usage(cursor, a, b, c), (1, 1, 2))
+        check("pair a-b removed", pair(cursor, a, b), (None, None))
+        check("pair b-c", pair(cursor, b, c), (1, 1))
+
+        print("\n3. Soft delete and restore...")
+        cursor.execute("UPDATE documents SET deleted_at = NOW() WHERE id = %s", (d2,))
+        check("usage a, c after soft delete", usage(cursor, a, c), (0, 1))
+        check("pair a-c removed", pair(cursor, a, c), (None, None))
+        cursor.execute("UPDATE documents SET deleted_at = NULL WHERE id = %s", (d2,))
+        check("usage a, c after restore", usage(cursor, a, c), (1, 2))
+        check("pair a-c restored", pair(cursor, a, c), (1, 1))
+
+        print("\n4. Hard delete...")
+        cursor.execute("DELETE FROM documents WHERE id = %s", (d1,))
+        check("usage b, c", usage(cursor, b, c), (0, 1))
+        check("pair b-c removed", pair(cursor, b, c), (None, None))
+
+        print("\n5. Removing a tag that has no tags row...")
+        cursor.execute("INSERT INTO documents (title, tags) VALUES ('t3', %s) RETURNING id", ([x],))
+        d3 = cursor.fetchone()['id']
+        cursor.execute("DELETE FROM tags WHERE name = %s", (x,))
+        cursor.execute("UPDATE documents SET tags = '{}' WHERE id = %s", (d3,))
+        check("usage x (no row created)", usage(cursor, x), (None,))
+    finally:
+        cursor.connection.rollback()
+
+finish()
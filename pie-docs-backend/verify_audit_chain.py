@@ -0,0 +1,59 @@
+"""
+Verify the audit log hash chains (app/services/audit_verification.py).
+
+Partitions are verified in parallel worker processes. By default only
+batches sealed since each partition's last verified checkpoint are
+checked; --full re-verifies everything. Exits with status 1 if any chain
+is broken and 2 if verification failed to run for a partition.
+
+Usage: python verify_audit_chain.py [--full] [--workers N] [--partition NAME ...]
+"""
+import argparse
+import json
+import sys
+
+from app.config import settings
+from app.services.audit_verification import AuditChainVerifier
+
+
+def print_segment(result):
+    if result['status'] == 'ok':
+        print(
+            f"  {result['partition']}: ok, {result['batches_checked']} batches / "
+            f"{result['rows_checked']} rows checked in {result.get('duration_seconds', 0)}s"
+        )
+    elif result['status'] == 'broken':
+        broken = result['first_broken']
+        print(f"  {result['partition']}: BROKEN at batch {broken['batch_id']}: {broken['reason']}")
+        if broken['row_id']:
+            print(f"      row {broken['row_id']} created {broken['created_at']}")
+    else:
+        print(f"  {result['partition']}: ERROR {result.get('error')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the audit log hash chains")
+    parser.add_argument('--full', action='store_true', help="ignore checkpoints and verify from each partition's start")
+    parser.add_argument('--workers', type=int, default=settings.AUDIT_VERIFY_WORKERS, help="worker processes")
+    parser.add_argument('--partition', action='append', help="only verify this partition (repeatable)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    verifier = AuditChainVerifier(workers=args.workers)
+    if not args.json:
+        print(f"Verifying audit chain ({'full' if args.full else 'incremental'}, {args.workers} workers)...")
+    report = verifier.run(full=args.full, partitions=args.partition, on_result=None if args.json else print_segment)
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print(
+            f"\n{report['status'].upper()}: {report['batches_checked']} batches / {report['rows_checked']} rows "
+            f"checked in {report['duration_seconds']}s; {report['unsealed_rows']} rows not sealed yet"
+        )
+
+    return {'ok': 0, 'broken': 1}.get(report['status'], 2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
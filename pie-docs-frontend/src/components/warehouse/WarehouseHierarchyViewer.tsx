@@ -63,7 +63,7 @@ export const WarehouseHierarchyViewer: React.FC<WarehouseHierarchyViewerProps> =
           sum + (wh.zones?.reduce((zSum, z) =>
             zSum + (z.shelves?.reduce((sSum, s) =>
               sSum + (s.racks?.reduce((rSum, r) =>
-                rSum + (r.documents?.length || 0), 0) || 0), 0) || 0), 0) || 0), 0) || 0)
+                rSum + (r.document_count ?? r.documents?.length ?? 0), 0) || 0), 0) || 0), 0) || 0), 0) || 0)
       }), { totalLocations: 0, totalWarehouses: 0, totalZones: 0, totalDocuments: 0 });
 
       setStats(totalStats);
@@ -441,8 +441,8 @@ export const warehouseStatsService = {
   /**
    * Get complete warehouse hierarchy for a location
    */
-  async getHierarchy(locationId: string): Promise<WarehouseHierarchy> {
-    const response = await apiClient.get(`${API_BASE}/hierarchy/${locationId}`);
+  async getHierarchy(locationId: string, documentsPerRack = 20): Promise<WarehouseHierarchy> {
+    const response = await apiClient.get(`${API_BASE}/hierarchy/${locationId}?documents_per_rack=${documentsPerRack}`);
     return response.data;
   }
 };
@@ -657,12 +657,34 @@ export const navigationService = {
     return response.data;
   },
 
+  /**
+   * Get one page of the documents in a rack (ordered by title)
+   */
+  async getRackDocumentsPage(rackId: string, page: number = 1, pageSize: number = 100): Promise<PhysicalDocument[]> {
+    const params = new URLSearchParams();
+    params.append('page', page.toString());
+    params.append('page_size', pageSize.toString());
+
+    const response = await apiClient.get(`${API_BASE}/racks/${rackId}/documents?${params.toString()}`);
+    return response.data;
+  },
+
   /**
    * Get all documents in a rack
+   *
+   * The endpoint is paginated, so pages are fetched until a short page
+   * marks the end.
    */
   async getRackDocuments(rackId: string): Promise<PhysicalDocument[]> {
-    const response = await apiClient.get(`${API_BASE}/racks/${rackId}/documents`);
-    return response.data;
+    const pageSize = 500;
+    const documents: PhysicalDocument[] = [];
+    for (let page = 1; ; page++) {
+      const batch = await navigationService.getRackDocumentsPage(rackId, page, pageSize);
+      documents.push(...batch);
+      if (batch.length < pageSize) {
+        return documents;
+      }
+    }
   }
 };
 
@@ -25,8 +25,15 @@ class NotificationWebSocket {
     this.userId = userId;
     this.isIntentionallyClosed = false;
 
+    // The server identifies the user from the access token, not the user id
+    const token = localStorage.getItem('authToken') || sessionStorage.getItem('authToken');
+    if (!token) {
+      console.warn('No access token, not connecting notifications WebSocket');
+      return;
+    }
+
     const wsUrl = import.meta.env.VITE_WS_URL || 'ws://localhost:8000';
-    const url = `${wsUrl}/api/v1/ws/notifications?user_id=${userId}`;
+    const url = `${wsUrl}/api/v1/ws/notifications?token=${encodeURIComponent(token)}`;
 
     try {
       this.ws = new WebSocket(url);
@@ -470,7 +470,9 @@ export interface WarehouseHierarchy {
     zones: (Zone & {
       shelves: (Shelf & {
         racks: (Rack & {
-          documents: PhysicalDocument[];
+          document_count: number;
+          documents: PhysicalDocument[];  // First documents_per_rack only
+          documents_truncated: boolean;
         })[];
       })[];
     })[];